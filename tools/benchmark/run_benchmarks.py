@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""Benchmark suite for the UPPS validator and converter.
+
+For each size tier a synthetic persona (see ``synthetic_persona.py``) is
+written to a temporary directory and every stage is timed separately:
+
+- validator: ``load_yaml``, the schema check, building the
+  ``ProfileIndex``, each reference check, the association graph analysis
+  and the streaming validation,
+- converter: ``load_yaml`` of a legacy persona, each step of
+  ``CONVERSION_STEPS`` and ``dump_yaml``.
+
+Each stage is run ``--repeat`` times and the best wall time is reported
+(the least disturbed by other load on the machine),
+together with the throughput (MB/s for loading and dumping, items/s for the
+checks and conversion steps) and the peak Python memory allocated by one
+extra warm-up run under ``tracemalloc``.
+
+Results can be stored as a baseline (``--save-baseline``) and compared
+against it later (``--compare``); a stage whose time or peak memory exceeds
+the baseline by more than ``--threshold`` is reported as a regression and
+the exit code is 1. Timings depend on the machine, so the baseline should be
+recorded on the machine that runs the comparison; peak memory is
+reproducible across machines.
+
+使用方法:
+  python run_benchmarks.py
+  python run_benchmarks.py --tiers small medium --save-baseline
+  python run_benchmarks.py --compare --threshold 0.3
+
+必要なパッケージ:
+  - pyyaml
+  - jsonschema
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+TOOLS_DIR = Path(__file__).resolve().parents[1]
+# 検証ツール・変換ツールのモジュールは各ディレクトリからの相対インポートを前提としている
+for _tool in ("validator", "converter"):
+    sys.path.insert(0, str(TOOLS_DIR / _tool))
+
+import converter_utils  # noqa: E402
+import validator_utils  # noqa: E402
+from association_graph import check_association_graph  # noqa: E402
+from stream_validator import check_profile_streaming  # noqa: E402
+from synthetic_persona import SIZE_TIERS, dump_persona, generate_legacy_persona, generate_persona  # noqa: E402
+
+BASELINE_FORMAT = 1
+DEFAULT_BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_TIERS = ("small", "medium", "large")
+DEFAULT_REPEAT = 5
+# 基準値からこの割合以上遅くなった段階を性能劣化とみなす
+DEFAULT_THRESHOLD = 0.25
+# これより短い段階の差は計測誤差として扱う（秒）
+NOISE_FLOOR = 0.005
+# これより小さいピークメモリの差は性能劣化として扱わない（KiB）
+MEMORY_NOISE_FLOOR_KB = 64
+
+
+@dataclass
+class StageResult:
+    """Timing of one benchmark stage."""
+
+    suite: str
+    stage: str
+    seconds: float
+    throughput: float
+    unit: str
+    peak_kb: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.suite}.{self.stage}"
+
+
+def _measure(func: Callable, repeat: int, setup: Callable[[], Tuple] | None = None) -> Tuple[float, int]:
+    """Return the best wall time of ``func`` and its peak allocation in KiB.
+
+    ``setup`` runs untimed before every call and returns the arguments
+    passed to ``func``.
+    """
+    # メモリ計測の実行をウォームアップも兼ねて先に行う
+    args = setup() if setup else ()
+    tracemalloc.start()
+    try:
+        func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), peak // 1024
+
+
+def _result(suite: str, stage: str, seconds: float, peak_kb: int, amount: float, unit: str) -> StageResult:
+    return StageResult(suite, stage, seconds, amount / seconds if seconds > 0 else 0.0, unit, peak_kb)
+
+
+def bench_validator(path: Path, repeat: int) -> List[StageResult]:
+    suite = "validator"
+    size_mb = path.stat().st_size / 1e6
+    results = []
+
+    seconds, peak = _measure(lambda: validator_utils.load_yaml(str(path)), repeat)
+    results.append(_result(suite, "load_yaml", seconds, peak, size_mb, "MB/s"))
+
+    profile = validator_utils.load_yaml(str(path))
+    items = len(profile["memory_system"]["memories"]) + len(profile["association_system"]["associations"])
+    schema, _ = validator_utils.load_schema()
+    validator_utils.get_schema_validator(schema)
+
+    seconds, peak = _measure(lambda: validator_utils.check_schema(profile, schema), repeat)
+    results.append(_result(suite, "schema", seconds, peak, items, "items/s"))
+
+    seconds, peak = _measure(lambda: validator_utils.ProfileIndex.from_profile(profile), repeat)
+    results.append(_result(suite, "profile_index", seconds, peak, items, "items/s"))
+
+    index = validator_utils.ProfileIndex.from_profile(profile)
+    expected = validator_utils.EXPECTED_PROFILE_VERSION
+    # 項目数に比例する検査は items/s、それ以外は1回あたりの処理速度（calls/s）で示す
+    checks = {
+        "version": (lambda: validator_utils.check_version(profile, expected), False),
+        "emotion_references": (lambda: validator_utils.check_emotion_references(profile, index), True),
+        "memory_references": (lambda: validator_utils.check_memory_references(profile, index), True),
+        "association_references": (
+            lambda: validator_utils.check_association_references(profile, index),
+            True,
+        ),
+        "cognitive_system": (lambda: validator_utils.check_cognitive_system(profile), False),
+        "dialogue_instructions": (lambda: validator_utils.check_dialogue_instructions(profile), False),
+        "non_dialogue_metadata": (lambda: validator_utils.check_non_dialogue_metadata(profile), False),
+        "association_graph": (lambda: check_association_graph(profile, index), True),
+    }
+    for name, (check, per_item) in checks.items():
+        seconds, peak = _measure(check, repeat)
+        if per_item:
+            results.append(_result(suite, name, seconds, peak, items, "items/s"))
+        else:
+            results.append(_result(suite, name, seconds, peak, 1, "calls/s"))
+
+    seconds, peak = _measure(lambda: check_profile_streaming(str(path), schema), repeat)
+    results.append(_result(suite, "stream_validate", seconds, peak, size_mb, "MB/s"))
+    return results
+
+
+def bench_converter(path: Path, repeat: int) -> List[StageResult]:
+    suite = "converter"
+    size_mb = path.stat().st_size / 1e6
+    results = []
+
+    seconds, peak = _measure(lambda: converter_utils.load_yaml(str(path)), repeat)
+    results.append(_result(suite, "load_yaml", seconds, peak, size_mb, "MB/s"))
+
+    legacy = converter_utils.load_yaml(str(path))
+    memories = len(legacy["memory_trace"]["memories"])
+
+    # 各ステップは直前までのステップを適用したプロファイルに対して計測する
+    def prepared(upto: int) -> Callable[[], Tuple[Dict, converter_utils.ConversionReport]]:
+        def setup():
+            profile = dict(legacy)
+            report = converter_utils.ConversionReport()
+            for convert in converter_utils.CONVERSION_STEPS[:upto]:
+                profile = convert(profile, report)
+            return profile, report
+        return setup
+
+    for i, convert in enumerate(converter_utils.CONVERSION_STEPS):
+        seconds, peak = _measure(convert, repeat, setup=prepared(i))
+        results.append(_result(suite, convert.__name__, seconds, peak, memories, "items/s"))
+
+    converted, _ = converter_utils.convert_profile(legacy)
+    seconds, peak = _measure(lambda: converter_utils.dump_yaml(converted), repeat)
+    results.append(_result(suite, "dump_yaml", seconds, peak, size_mb, "MB/s"))
+    return results
+
+
+def run_tier(tier: str, repeat: int, seed: int, workdir: Path) -> List[StageResult]:
+    size = SIZE_TIERS[tier]
+    persona_path = workdir / f"{tier}.yaml"
+    legacy_path = workdir / f"{tier}_legacy.yaml"
+    persona_path.write_text(dump_persona(generate_persona(size, seed)), encoding="utf-8")
+    legacy_path.write_text(dump_persona(generate_legacy_persona(size, seed)), encoding="utf-8")
+    return bench_validator(persona_path, repeat) + bench_converter(legacy_path, repeat)
+
+
+def load_baseline(path: Path) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != BASELINE_FORMAT:
+        raise ValueError(f"ベースラインの形式が異なります: {path}")
+    return data
+
+
+def save_baseline(path: Path, results: Dict[str, List[StageResult]], repeat: int, seed: int) -> None:
+    """Write ``results`` to the baseline, keeping tiers that were not run."""
+    try:
+        tiers = load_baseline(path).get("tiers", {})
+    except (OSError, ValueError):
+        tiers = {}
+    for tier, tier_results in results.items():
+        tiers[tier] = {r.key: {"seconds": round(r.seconds, 6), "peak_kb": r.peak_kb} for r in tier_results}
+    data = {
+        "format": BASELINE_FORMAT,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "seed": seed,
+        "tiers": tiers,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def baseline_entries(results: Dict[str, List[StageResult]], baseline: Dict) -> Dict[Tuple[str, str], Dict]:
+    """Return ``(tier, stage) -> baseline entry`` for every stage in both."""
+    matched = {}
+    for tier, tier_results in results.items():
+        base_tier = baseline.get("tiers", {}).get(tier, {})
+        for r in tier_results:
+            if r.key in base_tier:
+                matched[(tier, r.key)] = base_tier[r.key]
+    return matched
+
+
+def regressions_of(result: StageResult, base: Dict, threshold: float) -> List[str]:
+    """Return which of ``time`` and ``memory`` regressed against ``base``."""
+    kinds = []
+    seconds = base.get("seconds", 0)
+    if result.seconds > seconds * (1 + threshold) and result.seconds - seconds > NOISE_FLOOR:
+        kinds.append("time")
+    peak_kb = base.get("peak_kb", 0)
+    if result.peak_kb > peak_kb * (1 + threshold) and result.peak_kb - peak_kb > MEMORY_NOISE_FLOOR_KB:
+        kinds.append("memory")
+    return kinds
+
+
+def format_table(
+    results: Dict[str, List[StageResult]], bases: Dict[Tuple[str, str], Dict], threshold: float
+) -> str:
+    lines = []
+    for tier, tier_results in results.items():
+        lines.append(f"=== {tier} ===")
+        lines.append(f"{'stage':<56}{'time':>12}{'throughput':>20}{'peak':>12}{'vs base':>10}")
+        for r in tier_results:
+            base = bases.get((tier, r.key))
+            mark = ""
+            if base is not None and base.get("seconds"):
+                mark = f"{r.seconds / base['seconds']:>9.2f}x"
+                kinds = regressions_of(r, base, threshold)
+                if kinds:
+                    mark += f" ⚠️ {'/'.join(kinds)}"
+            lines.append(
+                f"{r.key:<56}{r.seconds * 1000:>10.2f}ms{r.throughput:>13.1f} {r.unit:<7}{r.peak_kb:>9} KiB{mark}"
+            )
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the UPPS validator and converter")
+    parser.add_argument(
+        "--tiers",
+        nargs="+",
+        choices=sorted(SIZE_TIERS),
+        default=list(DEFAULT_TIERS),
+        help=f"Size tiers to run (default: {' '.join(DEFAULT_TIERS)})",
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per stage")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic personas")
+    parser.add_argument("--format", choices=["human", "json"], default="human")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE_PATH), help="Baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare with the baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"Relative slowdown reported as a regression (default: {DEFAULT_THRESHOLD})",
+    )
+    args = parser.parse_args()
+
+    results: Dict[str, List[StageResult]] = {}
+    with tempfile.TemporaryDirectory(prefix="upps-bench-") as workdir:
+        for tier in args.tiers:
+            if args.format == "human":
+                print(f"{tier} を計測中...", file=sys.stderr)
+            results[tier] = run_tier(tier, args.repeat, args.seed, Path(workdir))
+
+    bases: Dict[Tuple[str, str], Dict] = {}
+    if args.compare:
+        try:
+            bases = baseline_entries(results, load_baseline(Path(args.baseline)))
+        except (OSError, ValueError) as e:
+            print(f"❌ ベースラインを読み込めません: {e}", file=sys.stderr)
+            sys.exit(2)
+
+    regressions = [
+        (tier, r.key, kinds)
+        for tier, tier_results in results.items()
+        for r in tier_results
+        if (tier, r.key) in bases
+        for kinds in [regressions_of(r, bases[(tier, r.key)], args.threshold)]
+        if kinds
+    ]
+
+    if args.format == "json":
+        json.dump(
+            {
+                "tiers": {tier: [asdict(r) for r in tier_results] for tier, tier_results in results.items()},
+                "regressions": [
+                    {"tier": tier, "stage": key, "kinds": kinds} for tier, key, kinds in regressions
+                ],
+            },
+            sys.stdout,
+            ensure_ascii=False,
+            indent=2,
+        )
+        print()
+    else:
+        print(format_table(results, bases, args.threshold))
+        if args.compare:
+            if regressions:
+                print(f"⚠️ {len(regressions)}件の段階で処理時間またはメモリが基準値より{args.threshold:.0%}以上増えています")
+            else:
+                print("✅ 基準値からの性能劣化はありません")
+
+    if args.save_baseline:
+        save_baseline(Path(args.baseline), results, args.repeat, args.seed)
+        if args.format == "human":
+            print(f"ベースラインを保存しました: {args.baseline}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
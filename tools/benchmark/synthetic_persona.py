@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""Deterministic synthetic UPPS personas for benchmarks.
+
+``generate_persona`` builds a schema-valid extended-model profile whose
+size is set by the number of emotions, memories, associations, compound
+(AND/OR) triggers and ``change_tracking`` entries. ``generate_legacy_persona``
+builds the legacy ``state``/``memory_trace``/``cognitive_profile`` form read
+by the converter. The same parameters and seed always give the same
+profile, so benchmark runs and stored baselines stay comparable.
+
+使用方法:
+  python synthetic_persona.py --tier medium -o medium.yaml
+  python synthetic_persona.py --memories 5000 --associations 20000 --legacy -o legacy.yaml
+
+必要なパッケージ:
+  - pyyaml
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+from dataclasses import asdict, dataclass
+from typing import Dict, List
+
+import yaml
+
+# libyamlが利用可能な場合はCダンパーを使用する
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+PROFILE_VERSION = "2025.3 v1.0.0"
+
+BASIC_EMOTIONS = ("joy", "sadness", "anger", "fear", "disgust", "surprise")
+MEMORY_TYPES = ("episodic", "semantic", "procedural", "autobiographical")
+VALENCES = ("positive", "negative", "neutral", "mixed")
+ABILITIES = ("verbal_comprehension", "perceptual_reasoning", "working_memory", "processing_speed")
+
+# 記憶の本文に使う語彙（話題語の抽出・トークン数の見積もりが実データに近くなるよう日本語を混ぜる）
+_TOPICS = (
+    "学校", "家族", "仕事", "旅行", "病院", "音楽", "試験", "友人", "引っ越し", "事故",
+    "祖母", "電車", "コンサート", "サッカー", "プロジェクト", "休暇", "手紙", "誕生日",
+)
+_PHRASES = (
+    "のことをよく覚えている",
+    "で大きな失敗をした",
+    "の帰り道に雨が降っていた",
+    "について何度も考えた",
+    "のあと、しばらく眠れなかった",
+    "で初めて褒められた",
+)
+
+
+@dataclass(frozen=True)
+class PersonaSize:
+    """Number of items of each kind in a synthetic persona."""
+
+    emotions: int = 8
+    memories: int = 20
+    associations: int = 40
+    compound_triggers: int = 5
+    change_entries: int = 5
+
+
+# ベンチマークの規模（associationsのうちcompound_triggers件がAND/OR条件になる）
+SIZE_TIERS: Dict[str, PersonaSize] = {
+    "small": PersonaSize(emotions=8, memories=20, associations=40, compound_triggers=5, change_entries=5),
+    "medium": PersonaSize(emotions=16, memories=500, associations=2000, compound_triggers=200, change_entries=100),
+    "large": PersonaSize(emotions=32, memories=5000, associations=20000, compound_triggers=2000, change_entries=1000),
+    "xlarge": PersonaSize(emotions=64, memories=50000, associations=200000, compound_triggers=20000, change_entries=5000),
+}
+
+
+def _emotion_ids(count: int) -> List[str]:
+    ids = list(BASIC_EMOTIONS[:count])
+    ids.extend(f"emotion_{i:03d}" for i in range(len(ids), count))
+    return ids
+
+
+def _content(rng: random.Random, i: int) -> str:
+    topic = rng.choice(_TOPICS)
+    other = rng.choice(_TOPICS)
+    return f"{topic}{rng.choice(_PHRASES)}。{other}{rng.choice(_PHRASES)}（記録{i}）"
+
+
+def _condition(rng: random.Random, emotion_ids: List[str], memory_ids: List[str]) -> Dict:
+    kind = rng.random()
+    if kind < 0.45:
+        return {"type": "emotion", "id": rng.choice(emotion_ids), "threshold": rng.randint(40, 90)}
+    if kind < 0.9:
+        return {"type": "memory", "id": rng.choice(memory_ids)}
+    return {
+        "type": "external",
+        "category": "topic",
+        "items": [rng.choice(_TOPICS) for _ in range(2)],
+    }
+
+
+def generate_persona(size: PersonaSize = PersonaSize(), seed: int = 0) -> Dict:
+    """Return a schema-valid extended-model profile of the given size."""
+    rng = random.Random(seed)
+    emotion_ids = _emotion_ids(max(size.emotions, 1))
+    basic = emotion_ids[: len(BASIC_EMOTIONS)]
+    additional = emotion_ids[len(BASIC_EMOTIONS):]
+
+    emotion_system: Dict = {
+        "model": "Ekman",
+        "emotions": {e: {"baseline": rng.randint(10, 70)} for e in basic},
+    }
+    if additional:
+        emotion_system["additional_emotions"] = {
+            e: {"baseline": rng.randint(10, 70)} for e in additional
+        }
+    if len(basic) >= 2:
+        emotion_system["compound_emotions"] = {"bittersweet": {"components": basic[:2]}}
+
+    memory_ids = [f"memory_{i:06d}" for i in range(max(size.memories, 1))]
+    memories = []
+    for i, memory_id in enumerate(memory_ids):
+        memories.append(
+            {
+                "id": memory_id,
+                "type": rng.choice(MEMORY_TYPES),
+                "content": _content(rng, i),
+                "period": f"{rng.randint(5, 40)}歳",
+                "importance": rng.randint(0, 100),
+                "emotional_valence": rng.choice(VALENCES),
+                "associated_emotions": rng.sample(emotion_ids, min(2, len(emotion_ids))),
+            }
+        )
+
+    associations = []
+    compound = min(size.compound_triggers, size.associations)
+    for i in range(size.associations):
+        if i < compound:
+            trigger = {
+                "operator": rng.choice(("AND", "OR")),
+                "conditions": [
+                    _condition(rng, emotion_ids, memory_ids) for _ in range(rng.randint(2, 4))
+                ],
+            }
+        elif i % 2 == 0:
+            trigger = {"type": "memory", "id": rng.choice(memory_ids)}
+        else:
+            trigger = {"type": "emotion", "id": rng.choice(emotion_ids), "threshold": rng.randint(40, 90)}
+        if rng.random() < 0.5:
+            response = {"type": "emotion", "id": rng.choice(emotion_ids)}
+        else:
+            response = {"type": "memory", "id": rng.choice(memory_ids)}
+        response["association_strength"] = rng.randint(10, 95)
+        associations.append({"id": f"association_{i:06d}", "trigger": trigger, "response": response})
+
+    change_tracking: Dict = {"emotion_baseline_changes": [], "association_strength_changes": []}
+    for i in range(size.change_entries):
+        if i % 2 == 0 or not associations:
+            change_tracking["emotion_baseline_changes"].append(
+                {
+                    "emotion_id": emotion_ids[i % len(emotion_ids)],
+                    "cumulative_change": rng.randint(-10, 10),
+                    "change_log": [f"2025-01-{i % 28 + 1:02d} {rng.randint(-3, 3):+d} session_{i}"],
+                }
+            )
+        else:
+            change_tracking["association_strength_changes"].append(
+                {
+                    "association_id": associations[i % len(associations)]["id"],
+                    "cumulative_change": rng.randint(-20, 20),
+                    "change_log": [f"2025-01-{i % 28 + 1:02d} {rng.randint(-5, 5):+d} session_{i}"],
+                }
+            )
+
+    return {
+        "personal_info": {"name": f"合成ペルソナ{seed}", "age": rng.randint(18, 80), "gender": "不明"},
+        "background": "ベンチマーク用に生成された合成ペルソナ。",
+        "personality": {
+            "model": "BigFive",
+            "traits": {
+                trait: round(rng.random(), 2)
+                for trait in ("openness", "conscientiousness", "extraversion", "agreeableness", "neuroticism")
+            },
+        },
+        "current_emotion_state": {e: rng.randint(0, 100) for e in emotion_ids},
+        "emotion_system": emotion_system,
+        "memory_system": {"memories": memories},
+        "association_system": {"associations": associations},
+        "cognitive_system": {
+            "model": "WAIS-IV",
+            "abilities": {ability: {"level": rng.randint(30, 90)} for ability in ABILITIES},
+            "general_ability": {"level": rng.randint(30, 90)},
+        },
+        "dialogue_instructions": {"direct_description": "落ち着いた口調で話す。"},
+        "non_dialogue_metadata": {
+            "clinical_data": {"primary_diagnosis": {"icd_11": "6A70", "severity": "moderate"}},
+            "administrative": {"version": PROFILE_VERSION, "file_id": f"synthetic_{seed}"},
+        },
+        "change_tracking": change_tracking,
+    }
+
+
+def generate_legacy_persona(size: PersonaSize = PersonaSize(), seed: int = 0) -> Dict:
+    """Return a schema-valid legacy profile (``state``/``memory_trace``/``cognitive_profile``).
+
+    The profile converted by ``tools/converter`` is schema-valid as well.
+    Only ``emotions`` and ``memories`` of ``size`` apply; the converter
+    derives associations from them. About a tenth of the memories have no
+    ``id`` and some share an ``event`` text, so id allocation and
+    ``related_memories`` rewriting take their slower paths too.
+    """
+    rng = random.Random(seed)
+    emotion_ids = _emotion_ids(max(size.emotions, 1))
+    memories = []
+    for i in range(max(size.memories, 1)):
+        event = _content(rng, i) if i % 20 else _content(rng, i - i % 40)
+        memory = {
+            "event": event,
+            "period": f"{rng.randint(5, 40)}歳",
+            "emotions": rng.sample(emotion_ids, min(2, len(emotion_ids))),
+            "triggers": rng.sample(_TOPICS, 2),
+            "importance": rng.randint(0, 100),
+        }
+        if i % 10:
+            memory["id"] = f"legacy_{i:06d}"
+        if i and rng.random() < 0.3:
+            memory["related_memories"] = [f"legacy_{rng.randrange(i):06d}"]
+        memories.append(memory)
+    return {
+        "personal_info": {"name": f"レガシー合成ペルソナ{seed}", "age": rng.randint(18, 80)},
+        "background": "ベンチマーク用に生成されたレガシー形式の合成ペルソナ。",
+        "personality": {
+            "traits": {
+                trait: round(rng.random(), 2)
+                for trait in ("openness", "conscientiousness", "extraversion", "agreeableness", "neuroticism")
+            },
+        },
+        "state": {e: rng.randint(0, 100) for e in emotion_ids},
+        "memory_trace": {"memories": memories},
+        "cognitive_profile": {
+            "narrative": "平均的な認知能力。",
+            "test_results": [
+                {
+                    "test_name": "WAIS-IV",
+                    "scores": {"VCI": rng.randint(70, 130), "WMI": rng.randint(70, 130), "FSIQ": rng.randint(70, 130)},
+                }
+            ],
+        },
+        # 変換されない節もそのまま引き継がれ、変換結果が検証を通るようにする
+        "dialogue_instructions": {"direct_description": "落ち着いた口調で話す。"},
+        "non_dialogue_metadata": {
+            "clinical_data": {"primary_diagnosis": {"icd_11": "6A70", "severity": "moderate"}},
+            "administrative": {"version": PROFILE_VERSION, "file_id": f"synthetic_legacy_{seed}"},
+        },
+    }
+
+
+def dump_persona(profile: Dict) -> str:
+    return yaml.dump(profile, Dumper=YAML_DUMPER, allow_unicode=True, sort_keys=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic UPPS persona")
+    parser.add_argument("--tier", choices=sorted(SIZE_TIERS), help="Size tier (overridden by explicit counts)")
+    for name in asdict(PersonaSize()):
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--legacy", action="store_true", help="Generate the legacy format for the converter")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    size = asdict(SIZE_TIERS[args.tier] if args.tier else PersonaSize())
+    for name in size:
+        if getattr(args, name) is not None:
+            size[name] = getattr(args, name)
+    generate = generate_legacy_persona if args.legacy else generate_persona
+    text = dump_persona(generate(PersonaSize(**size), args.seed))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == "__main__":
+    main()
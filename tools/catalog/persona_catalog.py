@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""UPPS persona catalog.
+
+Builds a local SQLite catalog of a persona library (by default
+``persona_lib``) and answers queries such as "all ICD-11 6A20 personas with
+a fear baseline above 60" without parsing any YAML.
+
+The catalog is updated incrementally: a file whose modification time and
+size are unchanged is skipped without being read, and a file whose content
+hash is unchanged is not parsed again. Files that disappeared from the tree
+are removed from the catalog.
+
+使用方法:
+  python persona_catalog.py index [ライブラリのパス]
+  python persona_catalog.py query --icd11 6A20 --emotion "fear>60"
+
+必要なパッケージ:
+  - pyyaml
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import yaml
+
+# libyamlが利用可能な場合はCローダーを使用する
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+DEFAULT_CATALOG_PATH = ".upps-catalog.sqlite"
+PROFILE_SUFFIXES = (".yaml", ".yml")
+
+# 2: パスを絶対パスに正規化して保存する
+CATALOG_FORMAT = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    is_persona INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS personas (
+    path TEXT PRIMARY KEY REFERENCES files(path) ON DELETE CASCADE,
+    name TEXT,
+    age INTEGER,
+    age_text TEXT,
+    gender TEXT,
+    icd_11 TEXT,
+    dsm_5_tr TEXT,
+    diagnosis TEXT,
+    severity TEXT,
+    template_ref TEXT,
+    version TEXT
+);
+CREATE INDEX IF NOT EXISTS personas_icd_11 ON personas (icd_11);
+CREATE INDEX IF NOT EXISTS personas_dsm_5_tr ON personas (dsm_5_tr);
+CREATE INDEX IF NOT EXISTS personas_age ON personas (age);
+CREATE TABLE IF NOT EXISTS emotions (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    emotion_id TEXT NOT NULL,
+    baseline INTEGER,
+    PRIMARY KEY (path, emotion_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS emotions_baseline ON emotions (emotion_id, baseline);
+CREATE TABLE IF NOT EXISTS cognitive (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    ability TEXT NOT NULL,
+    level INTEGER,
+    PRIMARY KEY (path, ability)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cognitive_level ON cognitive (ability, level);
+"""
+
+_OPERATORS = {">": ">", ">=": ">=", "<": "<", "<=": "<=", "=": "=", "==": "="}
+_FILTER_PATTERN = re.compile(r"^\s*([\w-]+)\s*(>=|<=|==|=|>|<)\s*(-?\d+)\s*$")
+
+
+@dataclass
+class CatalogEntry:
+    """One persona in the catalog."""
+
+    path: str
+    name: str | None
+    age: int | None
+    age_text: str | None
+    gender: str | None
+    icd_11: str | None
+    dsm_5_tr: str | None
+    diagnosis: str | None
+    severity: str | None
+    template_ref: str | None
+    version: str | None
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+@dataclass
+class RefreshStats:
+    scanned: int = 0
+    parsed: int = 0
+    unchanged: int = 0
+    removed: int = 0
+
+
+def parse_filter(expression: str) -> Tuple[str, str, int]:
+    """Parse ``"fear>60"`` into ``("fear", ">", 60)``."""
+    match = _FILTER_PATTERN.match(expression)
+    if not match:
+        raise ValueError(f"条件の形式が不正です（例: fear>60）: {expression}")
+    key, operator, value = match.groups()
+    return key, _OPERATORS[operator], int(value)
+
+
+def _parse_age(value) -> int | None:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        match = re.search(r"\d+", value)
+        if match:
+            return int(match.group())
+    return None
+
+
+def _section(data: Dict, *keys: str) -> Dict:
+    for key in keys:
+        data = data.get(key) if isinstance(data, dict) else None
+    return data if isinstance(data, dict) else {}
+
+
+def _text(value) -> str | None:
+    return None if value is None else str(value)
+
+
+def extract_entry(path: str, profile: Dict) -> Tuple[CatalogEntry, Dict[str, int], Dict[str, int]]:
+    """Return the catalog row, emotion baselines and cognitive levels of a profile."""
+    info = _section(profile, "personal_info")
+    diagnosis = _section(profile, "non_dialogue_metadata", "clinical_data", "primary_diagnosis")
+    instructions = _section(profile, "dialogue_instructions")
+    administrative = _section(profile, "non_dialogue_metadata", "administrative")
+    entry = CatalogEntry(
+        path=path,
+        name=_text(info.get("name")),
+        age=_parse_age(info.get("age")),
+        age_text=_text(info.get("age")),
+        gender=_text(info.get("gender")),
+        icd_11=_text(diagnosis.get("icd_11")),
+        dsm_5_tr=_text(diagnosis.get("dsm_5_tr")),
+        diagnosis=_text(diagnosis.get("name_jp") or diagnosis.get("name")),
+        severity=_text(diagnosis.get("severity")),
+        template_ref=_text(instructions.get("template_ref")),
+        version=_text(administrative.get("version")),
+    )
+
+    emotions: Dict[str, int] = {}
+    emotion_system = _section(profile, "emotion_system")
+    for group in ("emotions", "additional_emotions", "compound_emotions"):
+        for emotion_id, emotion in _section(emotion_system, group).items():
+            if isinstance(emotion, dict) and isinstance(emotion.get("baseline"), int):
+                emotions[str(emotion_id)] = emotion["baseline"]
+
+    cognitive: Dict[str, int] = {}
+    cognitive_system = _section(profile, "cognitive_system")
+    for ability, data in _section(cognitive_system, "abilities").items():
+        if isinstance(data, dict) and isinstance(data.get("level"), int):
+            cognitive[str(ability)] = data["level"]
+    general = _section(cognitive_system, "general_ability")
+    if isinstance(general.get("level"), int):
+        cognitive["general_ability"] = general["level"]
+    return entry, emotions, cognitive
+
+
+def iter_profile_files(roots: Sequence[str | Path]) -> Iterable[Path]:
+    for root in roots:
+        root = Path(root)
+        if root.is_file():
+            yield root
+            continue
+        for path in sorted(root.rglob("*")):
+            if path.suffix in PROFILE_SUFFIXES and path.is_file():
+                yield path
+
+
+class PersonaCatalog:
+    """SQLite catalog of persona files."""
+
+    def __init__(self, db_path: str | Path = DEFAULT_CATALOG_PATH) -> None:
+        self.db_path = str(db_path)
+        self._conn = sqlite3.connect(self.db_path)
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'format'").fetchone()
+        if row is None or int(row[0]) != CATALOG_FORMAT:
+            with self._conn:
+                self._conn.execute("DELETE FROM files")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('format', ?)",
+                    (str(CATALOG_FORMAT),),
+                )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "PersonaCatalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def refresh(self, roots: Sequence[str | Path]) -> RefreshStats:
+        """Bring the catalog up to date with the files under ``roots``.
+
+        Only files whose modification time or size changed are read, and only
+        those whose content hash changed are parsed. Catalogued files under
+        ``roots`` that no longer exist are removed. Paths are stored resolved,
+        so different spellings of the same root share their entries.
+        """
+        roots = [Path(root).resolve() for root in roots]
+        stats = RefreshStats()
+        known = {
+            path: (sha, mtime, size)
+            for path, sha, mtime, size in self._conn.execute(
+                "SELECT path, sha256, mtime_ns, size FROM files"
+            )
+        }
+        seen = set()
+        with self._conn:
+            for file_path in iter_profile_files(roots):
+                stats.scanned += 1
+                path = str(file_path)
+                seen.add(path)
+                stat = file_path.stat()
+                previous = known.get(path)
+                if previous and previous[1] == stat.st_mtime_ns and previous[2] == stat.st_size:
+                    stats.unchanged += 1
+                    continue
+                data = file_path.read_bytes()
+                sha = hashlib.sha256(data).hexdigest()
+                if previous and previous[0] == sha:
+                    self._conn.execute(
+                        "UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?",
+                        (stat.st_mtime_ns, stat.st_size, path),
+                    )
+                    stats.unchanged += 1
+                    continue
+                stats.parsed += 1
+                self._store(path, sha, stat, data)
+
+            for path in known:
+                if path not in seen and any(Path(path).is_relative_to(root) for root in roots):
+                    self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                    stats.removed += 1
+        return stats
+
+    def _store(self, path: str, sha: str, stat: os.stat_result, data: bytes) -> None:
+        conn = self._conn
+        conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        try:
+            profile = yaml.load(data, Loader=YAML_LOADER)
+        except yaml.YAMLError:
+            profile = None
+        is_persona = isinstance(profile, dict) and isinstance(profile.get("personal_info"), dict)
+        conn.execute(
+            "INSERT INTO files (path, sha256, mtime_ns, size, is_persona) VALUES (?, ?, ?, ?, ?)",
+            (path, sha, stat.st_mtime_ns, stat.st_size, int(is_persona)),
+        )
+        if not is_persona:
+            return
+        entry, emotions, cognitive = extract_entry(path, profile)
+        row = entry.to_dict()
+        conn.execute(
+            f"INSERT INTO personas ({', '.join(row)}) VALUES ({', '.join('?' for _ in row)})",
+            tuple(row.values()),
+        )
+        conn.executemany(
+            "INSERT INTO emotions (path, emotion_id, baseline) VALUES (?, ?, ?)",
+            [(path, emotion_id, baseline) for emotion_id, baseline in emotions.items()],
+        )
+        conn.executemany(
+            "INSERT INTO cognitive (path, ability, level) VALUES (?, ?, ?)",
+            [(path, ability, level) for ability, level in cognitive.items()],
+        )
+
+    def find(
+        self,
+        icd_11: str | None = None,
+        dsm_5_tr: str | None = None,
+        severity: str | None = None,
+        min_age: int | None = None,
+        max_age: int | None = None,
+        template_ref: str | None = None,
+        emotions: Sequence[Tuple[str, str, int]] = (),
+        cognitive: Sequence[Tuple[str, str, int]] = (),
+    ) -> List[CatalogEntry]:
+        """Return the personas matching every given condition.
+
+        ``icd_11`` and ``dsm_5_tr`` match as prefixes (``6A20`` also matches
+        ``6A20.0``). ``emotions`` and ``cognitive`` take ``(id, operator,
+        value)`` tuples compared against emotion baselines and ability levels.
+        """
+        clauses: List[str] = []
+        params: List = []
+        if icd_11:
+            clauses.append("p.icd_11 LIKE ? || '%'")
+            params.append(icd_11)
+        if dsm_5_tr:
+            clauses.append("p.dsm_5_tr LIKE ? || '%'")
+            params.append(dsm_5_tr)
+        if severity:
+            clauses.append("p.severity = ?")
+            params.append(severity)
+        if min_age is not None:
+            clauses.append("p.age >= ?")
+            params.append(min_age)
+        if max_age is not None:
+            clauses.append("p.age <= ?")
+            params.append(max_age)
+        if template_ref:
+            clauses.append("p.template_ref = ?")
+            params.append(template_ref)
+        for emotion_id, operator, value in emotions:
+            clauses.append(
+                "EXISTS (SELECT 1 FROM emotions e WHERE e.path = p.path"
+                f" AND e.emotion_id = ? AND e.baseline {_OPERATORS[operator]} ?)"
+            )
+            params.extend((emotion_id, value))
+        for ability, operator, value in cognitive:
+            clauses.append(
+                "EXISTS (SELECT 1 FROM cognitive c WHERE c.path = p.path"
+                f" AND c.ability = ? AND c.level {_OPERATORS[operator]} ?)"
+            )
+            params.extend((ability, value))
+        sql = "SELECT * FROM personas p"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY p.path"
+        return [CatalogEntry(*row) for row in self._conn.execute(sql, params)]
+
+    def emotion_baselines(self, path: str | Path) -> Dict[str, int]:
+        return dict(
+            self._conn.execute(
+                "SELECT emotion_id, baseline FROM emotions WHERE path = ? ORDER BY emotion_id",
+                (str(Path(path).resolve()),),
+            )
+        )
+
+
+def _default_library() -> str:
+    return str(Path(__file__).resolve().parents[2] / "persona_lib")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="UPPS Persona Catalog")
+    parser.add_argument(
+        "--db",
+        default=DEFAULT_CATALOG_PATH,
+        help=f"Catalog database (default: {DEFAULT_CATALOG_PATH})",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser("index", help="Build or update the catalog")
+    index_parser.add_argument("roots", nargs="*", help="Library directories (default: persona_lib)")
+
+    query_parser = subparsers.add_parser("query", help="Query the catalog")
+    query_parser.add_argument("--root", action="append", help="Library directory to refresh before querying (default: persona_lib)")
+    query_parser.add_argument("--no-refresh", action="store_true", help="Query the catalog as is")
+    query_parser.add_argument("--icd11", help="ICD-11 code (prefix match)")
+    query_parser.add_argument("--dsm5", help="DSM-5-TR code (prefix match)")
+    query_parser.add_argument("--severity", help="Severity of the primary diagnosis")
+    query_parser.add_argument("--min-age", type=int)
+    query_parser.add_argument("--max-age", type=int)
+    query_parser.add_argument("--template", help="dialogue_instructions.template_ref")
+    query_parser.add_argument("--emotion", action="append", default=[], help='Emotion baseline condition, e.g. "fear>60"')
+    query_parser.add_argument("--cognitive", action="append", default=[], help='Ability level condition, e.g. "working_memory<40"')
+    query_parser.add_argument("--format", choices=["human", "json"], default="human")
+
+    args = parser.parse_args()
+
+    with PersonaCatalog(args.db) as catalog:
+        if args.command == "index":
+            roots = args.roots or [_default_library()]
+            start = time.perf_counter()
+            stats = catalog.refresh(roots)
+            elapsed = time.perf_counter() - start
+            print(
+                f"✅ カタログを更新しました: {stats.scanned}件を確認 / "
+                f"{stats.parsed}件を解析 / {stats.unchanged}件は変更なし / "
+                f"{stats.removed}件を削除（{elapsed:.2f}秒）"
+            )
+            return
+
+        try:
+            emotions = [parse_filter(expression) for expression in args.emotion]
+            cognitive = [parse_filter(expression) for expression in args.cognitive]
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(2)
+        if not args.no_refresh:
+            catalog.refresh(args.root or [_default_library()])
+        entries = catalog.find(
+            icd_11=args.icd11,
+            dsm_5_tr=args.dsm5,
+            severity=args.severity,
+            min_age=args.min_age,
+            max_age=args.max_age,
+            template_ref=args.template,
+            emotions=emotions,
+            cognitive=cognitive,
+        )
+        if args.format == "json":
+            json.dump([entry.to_dict() for entry in entries], sys.stdout, ensure_ascii=False, indent=2)
+            sys.stdout.write("\n")
+            return
+        for entry in entries:
+            diagnosis = " ".join(part for part in (entry.icd_11, entry.diagnosis) if part)
+            print(f"{entry.path}  {entry.name or ''}  {entry.age_text or ''}  {diagnosis}")
+        print(f"{len(entries)}件")
+
+
+if __name__ == "__main__":
+    main()
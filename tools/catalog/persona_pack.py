@@ -0,0 +1,575 @@
+#!/usr/bin/env python3
+"""UPPS persona pack.
+
+Compiles a persona library (by default ``persona_lib``) into a single
+binary bundle that services memory-map at start-up instead of parsing
+every YAML file:
+
+- profiles are validated like ``upps_validator.py`` does and merged over
+  their ``template_ref`` template (``TemplateRegistry.materialize``) at
+  build time, so a packed persona is ready to use,
+- every string (keys included) is stored once in an interned string pool,
+- every top-level section of every persona is a separately encoded blob
+  located through an offset table; identical sections (e.g. taken over
+  from a shared template) are stored once.
+
+``PersonaPack`` opens a bundle by reading only the header and the persona
+table. ``PersonaPack.persona()`` returns a read-only mapping that decodes a
+section the first time it is accessed, and a string the first time a
+decoded section uses it, so resident memory grows with the personas and
+sections actually in use.
+
+File layout (little-endian)::
+
+    header | section blobs | string pool | persona table | metadata (JSON)
+
+使用方法:
+  python persona_pack.py build [ライブラリのパス] -o .upps-personas.upack
+  python persona_pack.py list .upps-personas.upack
+  python persona_pack.py show .upps-personas.upack original_characters/arto_magius.yaml --section emotion_system
+
+必要なパッケージ:
+  - pyyaml
+  - jsonschema
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import weakref
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import yaml
+
+from persona_catalog import _default_library, iter_profile_files
+
+# 検証とテンプレートの解決は検証ツールのモジュールを使用する
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "validator"))
+
+from template_registry import TemplateNotFoundError, TemplateRegistry, default_registry  # noqa: E402
+from validator_utils import (  # noqa: E402
+    CheckResult,
+    all_passed,
+    check_references,
+    check_schema,
+    load_schema,
+    load_yaml,
+)
+
+DEFAULT_PACK_PATH = ".upps-personas.upack"
+
+PACK_MAGIC = b"UPPSPACK"
+PACK_FORMAT = 1
+
+# magic, format, 文字列数, ペルソナ数, 文字列プール・ペルソナ表・メタデータの位置, メタデータの長さ
+_HEADER = struct.Struct("<8sIIIQQQQ")
+# ペルソナ名の文字列番号, セクション表の位置, セクション数
+_PERSONA = struct.Struct("<IQI")
+# セクション名の文字列番号, ブロブの位置, ブロブの長さ
+_SECTION = struct.Struct("<IQQ")
+_OFFSET = struct.Struct("<Q")
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+
+# 値の種類を表すタグ
+_NONE, _TRUE, _FALSE, _INT, _FLOAT, _STR, _LIST, _DICT, _BIGINT, _DATE, _DATETIME = range(11)
+
+_I64_MIN, _I64_MAX = -(2**63), 2**63 - 1
+
+
+class PackFormatError(ValueError):
+    """Raised when a file is not a persona pack of a supported format."""
+
+
+class _PackWriter:
+    """Encode values into section blobs that share one string pool."""
+
+    def __init__(self) -> None:
+        self.strings: Dict[str, int] = {}
+
+    def string(self, value: str) -> int:
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def encode(self, value: Any, out: bytearray) -> None:
+        # boolはintのサブクラスのため先に判定する
+        if value is None:
+            out.append(_NONE)
+        elif value is True:
+            out.append(_TRUE)
+        elif value is False:
+            out.append(_FALSE)
+        elif isinstance(value, str):
+            out.append(_STR)
+            out += _U32.pack(self.string(value))
+        elif isinstance(value, int):
+            if _I64_MIN <= value <= _I64_MAX:
+                out.append(_INT)
+                out += _I64.pack(value)
+            else:
+                out.append(_BIGINT)
+                out += _U32.pack(self.string(str(value)))
+        elif isinstance(value, float):
+            out.append(_FLOAT)
+            out += _F64.pack(value)
+        elif isinstance(value, dict):
+            out.append(_DICT)
+            out += _U32.pack(len(value))
+            for key, item in value.items():
+                self.encode(key, out)
+                self.encode(item, out)
+        elif isinstance(value, (list, tuple)):
+            out.append(_LIST)
+            out += _U32.pack(len(value))
+            for item in value:
+                self.encode(item, out)
+        elif isinstance(value, datetime.datetime):
+            out.append(_DATETIME)
+            out += _U32.pack(self.string(value.isoformat()))
+        elif isinstance(value, datetime.date):
+            out.append(_DATE)
+            out += _U32.pack(self.string(value.isoformat()))
+        else:
+            raise TypeError(f"パックに格納できない値です: {type(value).__name__}")
+
+
+def write_pack(output: str | Path, personas: Iterable[Tuple[str, Dict]], meta: Dict | None = None) -> Dict:
+    """Write ``(name, profile)`` pairs to the pack ``output`` and return its metadata.
+
+    The file is written to a temporary file and replaced atomically, so a
+    service never maps a partially written pack.
+    """
+    output = Path(output)
+    writer = _PackWriter()
+    blobs: Dict[bytes, int] = {}
+    table: List[Tuple[int, List[Tuple[int, int, int]]]] = []
+    stats = {"personas": 0, "sections": 0, "shared_sections": 0}
+    tmp_path = output.with_name(f"{output.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(b"\0" * _HEADER.size)
+            position = _HEADER.size
+            for name, profile in sorted(personas, key=lambda item: item[0]):
+                sections = []
+                for key, value in profile.items():
+                    blob = bytearray()
+                    writer.encode(value, blob)
+                    blob = bytes(blob)
+                    offset = blobs.get(blob)
+                    if offset is None:
+                        offset = blobs[blob] = position
+                        f.write(blob)
+                        position += len(blob)
+                    else:
+                        stats["shared_sections"] += 1
+                    sections.append((writer.string(key), offset, len(blob)))
+                table.append((writer.string(name), sections))
+                stats["personas"] += 1
+                stats["sections"] += len(sections)
+
+            strings_offset = position
+            encoded = [value.encode("utf-8") for value in writer.strings]
+            offset = 0
+            for data in encoded:
+                f.write(_OFFSET.pack(offset))
+                offset += len(data)
+            f.write(_OFFSET.pack(offset))
+            for data in encoded:
+                f.write(data)
+            position = strings_offset + _OFFSET.size * (len(encoded) + 1) + offset
+
+            # セクション表をペルソナ表の直後にまとめて置く
+            table_offset = position
+            section_offset = table_offset + _PERSONA.size * len(table)
+            for name_index, sections in table:
+                f.write(_PERSONA.pack(name_index, section_offset, len(sections)))
+                section_offset += _SECTION.size * len(sections)
+            for _, sections in table:
+                for section in sections:
+                    f.write(_SECTION.pack(*section))
+
+            meta = dict(meta or {}, format=PACK_FORMAT, strings=len(encoded), **stats)
+            meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+            meta_offset = section_offset
+            f.write(meta_bytes)
+            f.seek(0)
+            f.write(
+                _HEADER.pack(
+                    PACK_MAGIC,
+                    PACK_FORMAT,
+                    len(encoded),
+                    len(table),
+                    strings_offset,
+                    table_offset,
+                    meta_offset,
+                    len(meta_bytes),
+                )
+            )
+        os.replace(tmp_path, output)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        raise
+    return meta
+
+
+class PackedPersona(Mapping):
+    """Read-only mapping of one packed persona; sections are decoded on first access.
+
+    Decoded sections are plain ``dict``/``list`` values shared by every
+    caller of this persona and must not be modified; use :meth:`to_dict`
+    for a profile that can be changed.
+    """
+
+    def __init__(self, pack: "PersonaPack", name: str, sections: Dict[str, Tuple[int, int]]) -> None:
+        self.pack = pack
+        self.name = name
+        self._sections = sections
+        self._decoded: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self._decoded[key]
+        except KeyError:
+            pass
+        offset, _ = self._sections[key]
+        value = self._decoded[key] = self.pack._decode(offset)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._sections)
+
+    def __len__(self) -> int:
+        return len(self._sections)
+
+    def __repr__(self) -> str:
+        return f"<PackedPersona {self.name!r} ({len(self._decoded)}/{len(self._sections)} sections decoded)>"
+
+    @property
+    def decoded_sections(self) -> List[str]:
+        return list(self._decoded)
+
+    def to_dict(self) -> Dict:
+        """Decode every section into a new profile dictionary."""
+        return {key: self.pack._decode(offset) for key, (offset, _) in self._sections.items()}
+
+
+class PersonaPack:
+    """Memory-mapped persona pack."""
+
+    def __init__(self, path: str | Path = DEFAULT_PACK_PATH) -> None:
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # 空のファイル
+                raise PackFormatError(f"{self.path} はペルソナパックではありません")
+        try:
+            self._read_header()
+        except BaseException:
+            self._map.close()
+            raise
+        # 開いているペルソナ: 呼び出し側が参照しなくなれば解放される
+        self._open: "weakref.WeakValueDictionary[str, PackedPersona]" = weakref.WeakValueDictionary()
+
+    def _read_header(self) -> None:
+        buf = self._map
+        if len(buf) < _HEADER.size:
+            raise PackFormatError(f"{self.path} はペルソナパックではありません")
+        (
+            magic,
+            pack_format,
+            string_count,
+            persona_count,
+            self._strings_offset,
+            table_offset,
+            meta_offset,
+            meta_length,
+        ) = _HEADER.unpack_from(buf, 0)
+        if magic != PACK_MAGIC:
+            raise PackFormatError(f"{self.path} はペルソナパックではありません")
+        if pack_format != PACK_FORMAT:
+            raise PackFormatError(
+                f"{self.path} の形式（{pack_format}）には対応していません（対応形式: {PACK_FORMAT}）"
+            )
+        self._string_data = self._strings_offset + _OFFSET.size * (string_count + 1)
+        self._strings: List[str | None] = [None] * string_count
+        self._meta_range = (meta_offset, meta_length)
+        self._personas: Dict[str, Tuple[int, int]] = {}
+        for i in range(persona_count):
+            name_index, sections_offset, section_count = _PERSONA.unpack_from(
+                buf, table_offset + _PERSONA.size * i
+            )
+            self._personas[self._string(name_index)] = (sections_offset, section_count)
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> "PersonaPack":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._personas)
+
+    @property
+    def meta(self) -> Dict:
+        offset, length = self._meta_range
+        return json.loads(self._map[offset:offset + length].decode("utf-8"))
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._personas
+
+    def __len__(self) -> int:
+        return len(self._personas)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._personas)
+
+    def _string(self, index: int) -> str:
+        value = self._strings[index]
+        if value is None:
+            start, end = struct.unpack_from("<QQ", self._map, self._strings_offset + _OFFSET.size * index)
+            value = self._strings[index] = self._map[self._string_data + start:self._string_data + end].decode("utf-8")
+        return value
+
+    def persona(self, name: str) -> PackedPersona:
+        """Return the persona ``name`` without decoding any of its sections.
+
+        Raises ``KeyError`` if the pack does not contain ``name``.
+        """
+        persona = self._open.get(name)
+        if persona is not None:
+            return persona
+        sections_offset, section_count = self._personas[name]
+        sections = {}
+        for i in range(section_count):
+            key_index, offset, length = _SECTION.unpack_from(self._map, sections_offset + _SECTION.size * i)
+            sections[self._string(key_index)] = (offset, length)
+        persona = self._open[name] = PackedPersona(self, name, sections)
+        return persona
+
+    def load(self, name: str) -> Dict:
+        """Return the persona ``name`` as a newly decoded profile dictionary."""
+        return self.persona(name).to_dict()
+
+    def _decode(self, offset: int) -> Any:
+        buf = self._map
+        string = self._string
+        unpack_u32 = _U32.unpack_from
+        unpack_i64 = _I64.unpack_from
+        unpack_f64 = _F64.unpack_from
+
+        def decode(pos: int) -> Tuple[Any, int]:
+            tag = buf[pos]
+            pos += 1
+            if tag == _STR:
+                return string(unpack_u32(buf, pos)[0]), pos + 4
+            if tag == _DICT:
+                count = unpack_u32(buf, pos)[0]
+                pos += 4
+                value = {}
+                for _ in range(count):
+                    key, pos = decode(pos)
+                    value[key], pos = decode(pos)
+                return value, pos
+            if tag == _LIST:
+                count = unpack_u32(buf, pos)[0]
+                pos += 4
+                items = []
+                for _ in range(count):
+                    item, pos = decode(pos)
+                    items.append(item)
+                return items, pos
+            if tag == _INT:
+                return unpack_i64(buf, pos)[0], pos + 8
+            if tag == _FLOAT:
+                return unpack_f64(buf, pos)[0], pos + 8
+            if tag == _NONE:
+                return None, pos
+            if tag == _TRUE:
+                return True, pos
+            if tag == _FALSE:
+                return False, pos
+            text = string(unpack_u32(buf, pos)[0])
+            if tag == _BIGINT:
+                return int(text), pos + 4
+            if tag == _DATETIME:
+                return datetime.datetime.fromisoformat(text), pos + 4
+            if tag == _DATE:
+                return datetime.date.fromisoformat(text), pos + 4
+            raise PackFormatError(f"{self.path} の位置{pos - 1}に不明なタグ {tag} があります")
+
+        return decode(offset)[0]
+
+
+@dataclass
+class BuildResult:
+    """Profiles collected for a pack and those left out."""
+
+    personas: List[Tuple[str, Dict]] = field(default_factory=list)
+    invalid: List[Tuple[str, List[CheckResult]]] = field(default_factory=list)
+    skipped: int = 0
+
+
+def _failure(check_id: str, title: str, message: str) -> List[CheckResult]:
+    result = CheckResult(check_id, title)
+    result.error(f"{check_id}.error", "$", message)
+    return [result]
+
+
+def collect_personas(
+    roots: Sequence[str | Path],
+    schema: Dict | None,
+    registry: TemplateRegistry | None,
+    validate: bool = True,
+) -> BuildResult:
+    """Load, validate and materialize the persona profiles under ``roots``.
+
+    Personas are named by their path relative to the root they were found
+    under. Files that are not personas (no ``personal_info``) are skipped;
+    profiles that fail validation or reference an unknown template are
+    returned in ``invalid``.
+    """
+    build = BuildResult()
+    for root in roots:
+        root = Path(root)
+        for path in iter_profile_files([root]):
+            name = path.name if root.is_file() else path.relative_to(root).as_posix()
+            try:
+                profile = load_yaml(str(path))
+            except RuntimeError as e:
+                build.invalid.append((str(path), _failure("load", "YAML読み込み", str(e))))
+                continue
+            if not isinstance(profile, dict) or not isinstance(profile.get("personal_info"), dict):
+                build.skipped += 1
+                continue
+            if validate:
+                results = []
+                if schema is not None:
+                    results.append(check_schema(profile, schema))
+                results.extend(check_references(profile, registry))
+                if not all_passed(results):
+                    build.invalid.append((str(path), results))
+                    continue
+            if registry is not None:
+                try:
+                    profile = registry.materialize(profile, key=str(path))
+                except TemplateNotFoundError as e:
+                    build.invalid.append(
+                        (str(path), _failure("template", "テンプレート解決", f"テンプレート {e} が見つかりません"))
+                    )
+                    continue
+            build.personas.append((name, profile))
+    return build
+
+
+def _first_error(results: List[CheckResult]) -> str:
+    for result in results:
+        for finding in result.findings:
+            if finding.severity == "error":
+                return finding.message.splitlines()[0]
+    return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="UPPS Persona Pack")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Compile a persona library into a pack")
+    build_parser.add_argument("roots", nargs="*", help="Library directories (default: persona_lib)")
+    build_parser.add_argument("-o", "--output", default=DEFAULT_PACK_PATH, help=f"Pack file (default: {DEFAULT_PACK_PATH})")
+    build_parser.add_argument("--schema", help="Path to UPPS schema file. Can also be set via UPPS_SCHEMA_PATH.")
+    build_parser.add_argument("--no-validate", action="store_true", help="Pack profiles without validating them")
+    build_parser.add_argument("--skip-invalid", action="store_true", help="Leave out profiles that fail validation instead of aborting")
+
+    list_parser = subparsers.add_parser("list", help="List the personas of a pack")
+    list_parser.add_argument("pack", nargs="?", default=DEFAULT_PACK_PATH)
+
+    show_parser = subparsers.add_parser("show", help="Print a packed persona as YAML")
+    show_parser.add_argument("pack")
+    show_parser.add_argument("name")
+    show_parser.add_argument("--section", help="Print only this top-level section")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        schema = None
+        if not args.no_validate:
+            try:
+                schema, _ = load_schema(args.schema)
+            except Exception as e:
+                print(f"❌ スキーマの読み込みに失敗しました: {e}", file=sys.stderr)
+                sys.exit(2)
+        roots = args.roots or [_default_library()]
+        build = collect_personas(roots, schema, default_registry(), validate=not args.no_validate)
+        for path, results in build.invalid:
+            print(f"❌ {path}: {_first_error(results)}", file=sys.stderr)
+        if build.invalid and not args.skip_invalid:
+            print(
+                f"❌ {len(build.invalid)}件のプロファイルが検証に失敗したため、パックを作成しませんでした"
+                "（--skip-invalid で除外して作成）",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+        meta = write_pack(
+            args.output,
+            build.personas,
+            {"created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"), "validated": not args.no_validate},
+        )
+        elapsed = time.perf_counter() - start
+        print(
+            f"✅ パックを作成しました: {args.output}（ペルソナ{meta['personas']}件 / "
+            f"文字列{meta['strings']}件 / 共有セクション{meta['shared_sections']}件 / "
+            f"{os.path.getsize(args.output) / 1024:.1f} KiB / {elapsed:.2f}秒）"
+        )
+        if build.invalid:
+            print(f"⚠️ 検証に失敗した{len(build.invalid)}件を除外しました")
+        return
+
+    try:
+        pack = PersonaPack(args.pack)
+    except (OSError, PackFormatError) as e:
+        print(f"❌ パックを開けませんでした: {e}", file=sys.stderr)
+        sys.exit(2)
+    with pack:
+        if args.command == "list":
+            for name in pack.names:
+                print(name)
+            print(f"{len(pack)}件")
+            return
+        if args.name not in pack:
+            print(f"❌ ペルソナ '{args.name}' はパックに含まれていません", file=sys.stderr)
+            sys.exit(1)
+        persona = pack.persona(args.name)
+        if args.section:
+            if args.section not in persona:
+                print(f"❌ セクション '{args.section}' がありません", file=sys.stderr)
+                sys.exit(1)
+            value = {args.section: persona[args.section]}
+        else:
+            value = persona.to_dict()
+        yaml.safe_dump(value, sys.stdout, allow_unicode=True, sort_keys=False)
+
+
+if __name__ == "__main__":
+    main()
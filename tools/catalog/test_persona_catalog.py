@@ -0,0 +1,171 @@
+"""Tests for incremental refreshes and queries of the persona catalog."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+from persona_catalog import PersonaCatalog, parse_filter
+
+HERE = Path(__file__).resolve().parent
+LIBRARY = HERE.parents[1] / "persona_lib"
+
+
+def persona(name, icd_11, fear):
+    return {
+        "personal_info": {"name": name, "age": "30歳"},
+        "emotion_system": {"emotions": {"fear": {"baseline": fear}}},
+        "non_dialogue_metadata": {"clinical_data": {"primary_diagnosis": {"icd_11": icd_11}}},
+    }
+
+
+def write(path, profile):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    previous = path.stat() if path.exists() else None
+    path.write_text(yaml.safe_dump(profile, allow_unicode=True), encoding="utf-8")
+    if previous is not None:
+        # 同じ時刻刻みで書き換えてもmtimeが変わるようにする
+        mtime = max(path.stat().st_mtime_ns, previous.st_mtime_ns) + 1_000_000_000
+        os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "lib"
+    write(root / "a.yaml", persona("A", "6B00", 70))
+    write(root / "sub" / "b.yaml", persona("B", "6A20.0", 40))
+    (root / "notes.yaml").write_text("- not a persona\n", encoding="utf-8")
+    return root
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    with PersonaCatalog(tmp_path / "catalog.sqlite") as catalog:
+        yield catalog
+
+
+def names(entries):
+    return [entry.name for entry in entries]
+
+
+def test_second_refresh_reads_nothing(catalog, library):
+    first = catalog.refresh([library])
+    assert (first.scanned, first.parsed, first.unchanged, first.removed) == (3, 3, 0, 0)
+    second = catalog.refresh([library])
+    assert (second.scanned, second.parsed, second.unchanged, second.removed) == (3, 0, 3, 0)
+
+
+def test_changed_file_is_parsed_again(catalog, library):
+    catalog.refresh([library])
+    write(library / "a.yaml", persona("A", "6B00", 20))
+    stats = catalog.refresh([library])
+    assert (stats.parsed, stats.unchanged) == (1, 2)
+    assert catalog.emotion_baselines(str(library / "a.yaml")) == {"fear": 20}
+    assert names(catalog.find(emotions=[parse_filter("fear>60")])) == []
+
+
+def test_touched_file_with_the_same_content_is_not_parsed(catalog, library):
+    catalog.refresh([library])
+    path = library / "a.yaml"
+    mtime = path.stat().st_mtime_ns + 1_000_000_000
+    os.utime(path, ns=(mtime, mtime))
+    stats = catalog.refresh([library])
+    assert (stats.parsed, stats.unchanged) == (0, 3)
+    # 更新したmtimeを記録するので、次の更新では読み込みもしない
+    assert catalog.refresh([library]).unchanged == 3
+
+
+def test_removed_files_leave_the_catalog(catalog, library):
+    catalog.refresh([library])
+    (library / "sub" / "b.yaml").unlink()
+    stats = catalog.refresh([library])
+    assert stats.removed == 1
+    assert names(catalog.find()) == ["A"]
+    assert catalog.emotion_baselines(str(library / "sub" / "b.yaml")) == {}
+
+
+def test_refreshing_another_root_keeps_existing_entries(catalog, library, tmp_path):
+    other = tmp_path / "other"
+    write(other / "c.yaml", persona("C", "6A20", 90))
+    catalog.refresh([library])
+    stats = catalog.refresh([other])
+    assert stats.removed == 0
+    assert names(catalog.find()) == ["A", "B", "C"]
+
+
+def test_new_file_is_added_on_refresh(catalog, library):
+    catalog.refresh([library])
+    write(library / "sub" / "c.yaml", persona("C", "6A20", 90))
+    stats = catalog.refresh([library])
+    assert (stats.scanned, stats.parsed) == (4, 1)
+    assert names(catalog.find(icd_11="6A20")) == ["B", "C"]
+
+
+def test_queries_match_after_incremental_refreshes(catalog, library, tmp_path):
+    catalog.refresh([library])
+    write(library / "a.yaml", persona("A", "6A20", 65))
+    write(library / "sub" / "b.yaml", persona("B", "6B00", 40))
+    catalog.refresh([library])
+
+    with PersonaCatalog(tmp_path / "fresh.sqlite") as fresh:
+        fresh.refresh([library])
+        for query in (
+            {},
+            {"icd_11": "6A20"},
+            {"icd_11": "6B00"},
+            {"emotions": [parse_filter("fear>60")]},
+            {"min_age": 30, "max_age": 30},
+        ):
+            assert catalog.find(**query) == fresh.find(**query)
+
+
+def test_catalog_of_the_persona_library(catalog):
+    catalog.refresh([LIBRARY])
+    entries = catalog.find()
+    assert entries
+    assert all(entry.path.startswith(str(LIBRARY)) for entry in entries)
+    assert catalog.refresh([LIBRARY]).parsed == 0
+
+
+def test_spellings_of_the_same_root_share_entries(catalog, library, tmp_path, monkeypatch):
+    catalog.refresh([library])
+    monkeypatch.chdir(tmp_path)
+    for spelling in ("lib", "./lib/", "lib/sub/.."):
+        stats = catalog.refresh([spelling])
+        assert (stats.parsed, stats.unchanged, stats.removed) == (0, 3, 0)
+    assert names(catalog.find()) == ["A", "B"]
+    (library / "sub" / "b.yaml").unlink()
+    assert catalog.refresh(["lib"]).removed == 1
+    assert catalog.emotion_baselines("lib/a.yaml") == {"fear": 70}
+
+
+def test_query_after_indexing_a_relative_root(tmp_path):
+    db = tmp_path / "catalog.sqlite"
+
+    def run(*args):
+        completed = subprocess.run(
+            [sys.executable, str(HERE / "persona_catalog.py"), "--db", str(db), *args],
+            cwd=LIBRARY.parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return completed.stdout.splitlines()
+
+    run("index", "persona_lib")
+    # queryは絶対パスの既定ライブラリを更新するが、同じファイルとして扱う
+    assert "0件を解析" in run("index", str(LIBRARY))[0]
+    lines = run("query", "--icd11", "6A20")
+    with PersonaCatalog(db) as catalog:
+        expected = len(catalog.find(icd_11="6A20"))
+    assert lines[-1] == f"{expected}件"
+    assert len(set(lines[:-1])) == expected
+
+
+@pytest.mark.parametrize("expression", ["fear", "fear>high", ">60", "fear=>60"])
+def test_malformed_filter_is_rejected(expression):
+    with pytest.raises(ValueError):
+        parse_filter(expression)
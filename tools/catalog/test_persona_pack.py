@@ -0,0 +1,139 @@
+"""Tests for building, memory-mapping and decoding persona packs."""
+
+import datetime
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+from persona_catalog import _default_library
+from persona_pack import PackFormatError, PersonaPack, collect_personas, write_pack
+from template_registry import default_registry
+from validator_utils import load_schema
+
+HERE = Path(__file__).resolve().parent
+
+VALUES = {
+    "none": None,
+    "bools": [True, False],
+    "ints": [0, -1, 2**63 - 1, -(2**63)],
+    "big": [2**63, -(2**63) - 1, 10**30],
+    "float": [0.5, -1e300, float("inf")],
+    "strings": ["", "日本語", "emoji 🎹", "a" * 1000],
+    "nested": {"a": {"b": [{"c": 1}, [], {}]}, "": "empty key"},
+    "date": datetime.date(2025, 1, 15),
+    "datetime": datetime.datetime(2025, 1, 15, 10, 30, tzinfo=datetime.timezone.utc),
+}
+
+
+def test_values_round_trip(tmp_path):
+    path = tmp_path / "values.upack"
+    meta = write_pack(path, [("values", VALUES)], {"label": "テスト"})
+    assert meta["label"] == "テスト"
+    with PersonaPack(path) as pack:
+        assert pack.meta == meta
+        assert pack.load("values") == VALUES
+        for key in ("bools", "ints", "big"):
+            assert [type(v) for v in pack.load("values")[key]] == [type(v) for v in VALUES[key]]
+
+
+def test_sections_are_decoded_on_first_access(tmp_path):
+    path = tmp_path / "lazy.upack"
+    write_pack(path, [("p", {"a": {"x": 1}, "b": [1, 2], "c": "text"})])
+    with PersonaPack(path) as pack:
+        persona = pack.persona("p")
+        assert list(persona) == ["a", "b", "c"]
+        assert persona.decoded_sections == []
+        assert persona["b"] == [1, 2]
+        assert persona.decoded_sections == ["b"]
+        assert persona["b"] is persona["b"]
+        assert pack.persona("p") is persona
+        # to_dictは共有されない新しい辞書を返す
+        profile = persona.to_dict()
+        profile["a"]["x"] = 2
+        assert persona["a"] == {"x": 1}
+
+
+def test_identical_sections_are_stored_once(tmp_path):
+    shared = {"baseline": list(range(100))}
+    meta = write_pack(
+        tmp_path / "shared.upack",
+        [("p1", {"emotion_system": shared, "name": "1"}), ("p2", {"emotion_system": dict(shared), "name": "2"})],
+    )
+    assert (meta["personas"], meta["sections"], meta["shared_sections"]) == (2, 4, 1)
+
+
+def test_persona_library_round_trips(tmp_path):
+    schema, _ = load_schema()
+    registry = default_registry()
+    build = collect_personas([_default_library()], schema, registry)
+    assert build.personas
+    assert build.invalid == []
+    path = tmp_path / "library.upack"
+    meta = write_pack(path, build.personas)
+
+    with PersonaPack(path) as pack:
+        assert pack.names == sorted(name for name, _ in build.personas)
+        assert meta["personas"] == len(pack)
+        for name, profile in build.personas:
+            assert pack.load(name) == profile
+            assert dict(pack.persona(name)) == profile
+
+
+def test_rewritten_pack_replaces_the_file(tmp_path):
+    path = tmp_path / "pack.upack"
+    write_pack(path, [("p", {"v": 1})])
+    write_pack(path, [("p", {"v": 2}), ("q", {})])
+    with PersonaPack(path) as pack:
+        assert pack.names == ["p", "q"]
+        assert pack.load("p") == {"v": 2}
+        assert pack.load("q") == {}
+    assert [p.name for p in tmp_path.iterdir()] == ["pack.upack"]
+
+
+@pytest.mark.parametrize("content", [b"", b"not a pack", b"UPPSPACK" + b"\0" * 100])
+def test_other_files_are_rejected(tmp_path, content):
+    path = tmp_path / "broken.upack"
+    path.write_bytes(content)
+    with pytest.raises(PackFormatError):
+        PersonaPack(path)
+
+
+def test_unknown_persona_raises_key_error(tmp_path):
+    path = tmp_path / "pack.upack"
+    write_pack(path, [("p", {})])
+    with PersonaPack(path) as pack:
+        assert "q" not in pack
+        with pytest.raises(KeyError):
+            pack.persona("q")
+
+
+def test_build_and_show_from_the_command_line(tmp_path):
+    library = tmp_path / "lib"
+    library.mkdir()
+    source = Path(_default_library()) / "rachel_bladerunner.yaml"
+    (library / "rachel.yaml").write_text(source.read_text(encoding="utf-8"), encoding="utf-8")
+    (library / "broken.yaml").write_text("personal_info: {name: 1}\n", encoding="utf-8")
+    output = tmp_path / "out.upack"
+
+    def run(*args):
+        return subprocess.run(
+            [sys.executable, str(HERE / "persona_pack.py"), *args],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+
+    completed = run("build", str(library), "-o", str(output))
+    assert completed.returncode == 1
+    assert not output.exists()
+
+    completed = run("build", str(library), "-o", str(output), "--skip-invalid")
+    assert completed.returncode == 0, completed.stderr
+    completed = run("show", str(output), "rachel.yaml", "--section", "personal_info")
+    assert completed.returncode == 0
+    with open(source, "r", encoding="utf-8") as f:
+        expected = yaml.safe_load(f)["personal_info"]
+    assert yaml.safe_load(completed.stdout) == {"personal_info": expected}
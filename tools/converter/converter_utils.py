@@ -0,0 +1,778 @@
+#!/usr/bin/env python3
+"""
+UPPS Converter ユーティリティ
+
+レガシー形式のUPPSプロファイルを拡張モデル形式に変換する関数群です。
+ファイル入出力や標準出力への表示は行わず、変換後のプロファイルと
+各ステップの結果をまとめた ConversionReport を返します。
+
+  from converter_utils import convert_profile
+  profile, report = convert_profile(legacy_profile)
+
+必要なパッケージ:
+  - pyyaml
+"""
+
+import hashlib
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import yaml
+
+# libyamlが利用可能な場合はCローダー・Cダンパーを使用する
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+STATUS_CONVERTED = 'converted'
+STATUS_SKIPPED = 'skipped'
+
+
+@dataclass
+class ConversionStep:
+    """変換ステップ1つ分の結果"""
+
+    step_id: str
+    title: str
+    status: str
+    message: str
+    count: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            'step': self.step_id,
+            'title': self.title,
+            'status': self.status,
+            'message': self.message,
+        }
+        if self.count is not None:
+            data['count'] = self.count
+        return data
+
+
+@dataclass
+class ConversionReport:
+    """変換処理全体の結果"""
+
+    steps: List[ConversionStep] = field(default_factory=list)
+    # レガシー形式の記憶の参照（ID・出来事の文字列）-> 変換後の記憶ID
+    memory_id_map: Dict[str, str] = field(default_factory=dict)
+    # 解決できなかった関連記憶の参照
+    unresolved_references: List[str] = field(default_factory=list)
+
+    def converted(self, step_id: str, title: str, message: str, count: Optional[int] = None) -> None:
+        self.steps.append(ConversionStep(step_id, title, STATUS_CONVERTED, message, count))
+
+    def skipped(self, step_id: str, title: str, message: str) -> None:
+        self.steps.append(ConversionStep(step_id, title, STATUS_SKIPPED, message))
+
+    @property
+    def changed(self) -> bool:
+        return any(step.status == STATUS_CONVERTED for step in self.steps)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'changed': self.changed,
+            'steps': [step.to_dict() for step in self.steps],
+            'memory_id_map': dict(self.memory_id_map),
+            'unresolved_references': list(self.unresolved_references),
+        }
+
+
+def format_step(step: ConversionStep) -> str:
+    """ステップの結果を表示用の1行に整形する"""
+    mark = '✅' if step.status == STATUS_CONVERTED else '⚠️'
+    return f"{mark} {step.message}"
+
+
+def load_yaml(file_path: str) -> Dict:
+    """YAMLファイルを読み込む（失敗時はRuntimeErrorを送出）"""
+    try:
+        with open(file_path, 'rb') as file:
+            return yaml.load(file, Loader=YAML_LOADER)
+    except Exception as e:
+        raise RuntimeError(f"YAMLファイルの読み込みに失敗しました: {e}")
+
+
+def dump_yaml(data: Dict) -> str:
+    """プロファイルをYAML文字列に変換する"""
+    return yaml.dump(
+        data,
+        Dumper=YAML_DUMPER,
+        allow_unicode=True,
+        sort_keys=False,
+        default_flow_style=False,
+    )
+
+
+def save_yaml(file_path: str, data: Dict) -> None:
+    """YAMLファイルに保存する
+
+    一時ファイルに書き込んでから置き換えるため、途中で失敗しても
+    不完全なファイルが残ることはありません。失敗時はRuntimeErrorを送出します。
+    """
+    path = Path(file_path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(dump_yaml(data))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        raise RuntimeError(f"YAMLファイルの保存に失敗しました: {e}")
+
+
+def extended_output_path(profile_path: str) -> str:
+    """変換結果の保存先（*_extended.yaml）を返す"""
+    output_path = profile_path.replace('.yaml', '_extended.yaml')
+    if output_path == profile_path:
+        output_path = os.path.splitext(profile_path)[0] + '_extended.yaml'
+    return output_path
+
+
+def slugify(text: str) -> str:
+    """文字列をスラッグ化（URL friendly IDに変換）する"""
+    # 英数字以外を削除し、スペースをアンダースコアに置換
+    slug = re.sub(r'[^\w\s]', '', text.lower())
+    slug = re.sub(r'\s+', '_', slug.strip())
+    # 先頭が数字の場合は'id_'を付ける
+    if slug and slug[0].isdigit():
+        slug = 'id_' + slug
+    return slug[:30]  # 30文字までに制限
+
+
+class IdAllocator:
+    """一意なIDを割り当てる
+
+    基になるIDが未使用であればそのまま使い、衝突した場合はキー（出来事の
+    文字列など）のハッシュから求めた8桁の接尾辞を付加します。接尾辞は入力の
+    内容だけで決まるため、同じ入力からは常に同じIDが割り当てられます。
+    """
+
+    def __init__(self, used: Optional[Set[str]] = None) -> None:
+        self.used = set(used or ())
+
+    def allocate(self, base: str, key: str) -> str:
+        if base not in self.used:
+            self.used.add(base)
+            return base
+        attempt = 0
+        while True:
+            digest = hashlib.blake2b(f"{key}\0{attempt}".encode('utf-8'), digest_size=4).hexdigest()
+            candidate = f"{base}_{digest}"
+            if candidate not in self.used:
+                self.used.add(candidate)
+                return candidate
+            attempt += 1
+
+
+EMOTION_DESCRIPTIONS = {
+    "joy": "喜び、幸福感",
+    "happiness": "幸福感、満足感",
+    "happy": "幸福感、満足感",
+    "sadness": "悲しみ、失望感",
+    "sad": "悲しみ、失望感",
+    "anger": "怒り、いらだち",
+    "angry": "怒り、いらだち",
+    "fear": "恐れ、不安",
+    "fearful": "恐れ、不安",
+    "afraid": "恐れ、不安",
+    "disgust": "嫌悪、不快感",
+    "disgusted": "嫌悪、不快感",
+    "surprise": "驚き、意外性への反応",
+    "surprised": "驚き、意外性への反応",
+    "calm": "落ち着き、平静さ",
+    "excited": "興奮、高揚感",
+    "anxious": "不安、心配",
+    "anxiety": "不安、心配",
+    "tired": "疲労感、倦怠感",
+    "fatigue": "疲労感、消耗",
+    "curious": "好奇心、興味",
+    "curiosity": "好奇心、知的探究心",
+    "proud": "誇り、達成感",
+    "pride": "誇り、プライド",
+    "ashamed": "恥じらい、羞恥心",
+    "shame": "恥辱感、罪悪感",
+    "guilty": "罪悪感、自責の念",
+    "guilt": "罪の意識、後悔",
+    "jealous": "嫉妬、羨望",
+    "jealousy": "嫉妬心、羨望",
+    "love": "愛情、親愛の情",
+    "hate": "憎しみ、敵意",
+    "nostalgic": "懐かしさ、郷愁",
+    "nostalgia": "郷愁、過去への思慕",
+    "confused": "混乱、当惑",
+    "confusion": "混乱、理解の欠如",
+    "grateful": "感謝の気持ち、謝意",
+    "gratitude": "感謝の念、恩義",
+    "hopeful": "希望、期待感",
+    "hope": "希望、期待",
+    "disappointed": "失望、落胆",
+    "disappointment": "失望感、期待外れ",
+    "satisfied": "満足感、充足感",
+    "satisfaction": "満足、充足",
+    "frustrated": "欲求不満、いらだち",
+    "frustration": "欲求不満、挫折感"
+}
+
+
+def get_emotion_description(emotion: str) -> str:
+    """感情名から説明文を生成する"""
+    return EMOTION_DESCRIPTIONS.get(emotion.lower(), f"{emotion}の感情")
+
+
+def convert_state_to_emotion_system(profile: Dict, report: ConversionReport) -> Dict:
+    """stateをemotion_systemとcurrent_emotion_stateに変換（profileを直接更新）"""
+    step, title = 'state', 'stateの変換'
+
+    # stateがあるか確認
+    if 'state' not in profile:
+        report.skipped(step, title, "stateフィールドが見つかりません")
+        return profile
+
+    # current_emotion_stateが既に存在するか確認
+    if 'current_emotion_state' in profile:
+        report.skipped(step, title, "current_emotion_stateフィールドが既に存在します。変換をスキップします")
+        return profile
+
+    # stateをcurrent_emotion_stateにコピー
+    profile['current_emotion_state'] = profile['state'].copy()
+
+    # emotion_systemが既に存在するか確認
+    if 'emotion_system' in profile:
+        report.skipped(step, title, "emotion_systemフィールドが既に存在します。既存の定義を使用します")
+        return profile
+
+    # stateからemotion_systemを作成
+    emotions = {}
+    for emotion, value in profile['state'].items():
+        emotions[emotion] = {
+            "baseline": value,
+            "description": get_emotion_description(emotion)
+        }
+
+    # 基本的なEkman感情が含まれていなければ追加
+    ekman_emotions = {
+        "joy": "喜び、幸福感",
+        "sadness": "悲しみ、失望感",
+        "anger": "怒り、いらだち",
+        "fear": "恐れ、不安",
+        "disgust": "嫌悪、不快感",
+        "surprise": "驚き、意外性への反応"
+    }
+    # 基本感情に対応するレガシー形式の感情名
+    legacy_names = {
+        "joy": "happy",
+        "sadness": "sad",
+        "anger": "angry",
+        "fear": "fearful",
+        "disgust": "disgusted",
+        "surprise": "surprised"
+    }
+
+    for emotion, description in ekman_emotions.items():
+        if emotion not in emotions:
+            # 既存の感情からbaselineを推測
+            legacy = legacy_names[emotion]
+            if legacy in profile['state']:
+                baseline = profile['state'][legacy]
+            else:
+                # デフォルト値
+                baseline = 50 if emotion == 'joy' else 30
+
+            emotions[emotion] = {
+                "baseline": baseline,
+                "description": description
+            }
+
+    # emotion_systemの作成
+    profile['emotion_system'] = {
+        "model": "Ekman",
+        "emotions": emotions
+    }
+
+    report.converted(step, title, "stateをemotion_systemとcurrent_emotion_stateに変換しました")
+    return profile
+
+
+POSITIVE_EMOTIONS = {'joy', 'happy', 'happiness', 'calm', 'excited', 'curious', 'proud', 'love', 'grateful', 'hopeful', 'satisfied'}
+NEGATIVE_EMOTIONS = {'sadness', 'sad', 'anger', 'angry', 'fear', 'fearful', 'afraid', 'disgust', 'disgusted', 'anxious', 'tired', 'ashamed', 'guilty', 'jealous', 'hate', 'confused', 'disappointed', 'frustrated'}
+
+
+def convert_memory_trace_to_memory_system(profile: Dict, report: ConversionReport) -> Dict:
+    """memory_traceをmemory_systemに変換（profileを直接更新）"""
+    step, title = 'memory_trace', 'memory_traceの変換'
+
+    # memory_traceがあるか確認
+    if 'memory_trace' not in profile:
+        report.skipped(step, title, "memory_traceフィールドが見つかりません")
+        return profile
+
+    # memory_systemが既に存在するか確認
+    if 'memory_system' in profile:
+        report.skipped(step, title, "memory_systemフィールドが既に存在します。変換をスキップします")
+        return profile
+
+    # memory_systemの作成
+    memory_system = {"memories": []}
+
+    allocator = IdAllocator()
+    id_map = report.memory_id_map
+    legacy_related = []
+
+    for i, memory in enumerate(profile['memory_trace'].get('memories', [])):
+        # memory_idの生成（既存のIDがあれば優先し、衝突時はハッシュ接尾辞で一意にする）
+        event = memory.get('event') or ''
+        legacy_id = memory.get('id')
+        slug = slugify(event) if event else ''
+        base = legacy_id or slug or f"memory_{i+1}"
+        memory_id = allocator.allocate(base, event or base)
+
+        # 旧ID・出来事の文字列・旧方式のスラッグから新IDを引けるようにする（先勝ち）
+        for reference in (legacy_id, event, slug, f"memory_{i+1}"):
+            if reference:
+                id_map.setdefault(reference, memory_id)
+
+        # 新しい記憶オブジェクトの作成
+        new_memory = {
+            "id": memory_id,
+            "type": "episodic",  # デフォルトタイプ
+            "content": memory.get('event', '')
+        }
+
+        # 期間情報があれば追加
+        if 'period' in memory:
+            new_memory["period"] = memory['period']
+
+        # 感情情報があれば変換
+        if 'emotions' in memory:
+            new_memory["associated_emotions"] = list(memory['emotions'])
+
+            # 感情的価値の判定（ポジティブかネガティブか）
+            pos_count = sum(1 for e in memory['emotions'] if e.lower() in POSITIVE_EMOTIONS)
+            neg_count = sum(1 for e in memory['emotions'] if e.lower() in NEGATIVE_EMOTIONS)
+
+            if pos_count > neg_count:
+                new_memory["emotional_valence"] = "positive"
+            elif neg_count > pos_count:
+                new_memory["emotional_valence"] = "negative"
+            elif pos_count > 0 and neg_count > 0:
+                new_memory["emotional_valence"] = "mixed"
+            else:
+                new_memory["emotional_valence"] = "neutral"
+
+        # 重要度があれば追加
+        if 'importance' in memory:
+            new_memory["importance"] = memory['importance']
+
+        # 関連記憶は全記憶のIDが確定してから書き換える
+        if memory.get('related_memories'):
+            legacy_related.append((new_memory, memory['related_memories']))
+
+        memory_system['memories'].append(new_memory)
+
+    # 関連記憶の参照を新しいIDに書き換える
+    for new_memory, references in legacy_related:
+        related = []
+        for reference in references:
+            target = id_map.get(reference)
+            if target is None:
+                report.unresolved_references.append(reference)
+            elif target != new_memory['id'] and target not in related:
+                related.append(target)
+        if related:
+            new_memory['related_memories'] = related
+
+    profile['memory_system'] = memory_system
+    count = len(memory_system['memories'])
+    message = f"memory_traceを{count}件の記憶を持つmemory_systemに変換しました"
+    if report.unresolved_references:
+        message += f"（解決できない関連記憶の参照{len(report.unresolved_references)}件を除外）"
+    report.converted(step, title, message, count)
+    return profile
+
+
+def convert_cognitive_profile_to_cognitive_system(profile: Dict, report: ConversionReport) -> Dict:
+    """cognitive_profileをcognitive_systemに変換（profileを直接更新）"""
+    step, title = 'cognitive_profile', 'cognitive_profileの変換'
+
+    # cognitive_profileがあるか確認
+    if 'cognitive_profile' not in profile:
+        report.skipped(step, title, "cognitive_profileフィールドが見つかりません")
+        return profile
+
+    # cognitive_systemが既に存在するか確認
+    if 'cognitive_system' in profile:
+        report.skipped(step, title, "cognitive_systemフィールドが既に存在します。変換をスキップします")
+        return profile
+
+    # デフォルトのcognitive_systemを作成
+    cognitive_system = {
+        "model": "WAIS-IV",
+        "abilities": {
+            "verbal_comprehension": {"level": 50},
+            "perceptual_reasoning": {"level": 50},
+            "working_memory": {"level": 50},
+            "processing_speed": {"level": 50}
+        },
+        "general_ability": {"level": 50}
+    }
+
+    # 説明文があれば追加
+    if 'narrative' in profile['cognitive_profile']:
+        cognitive_system['general_ability']['description'] = profile['cognitive_profile']['narrative']
+
+    # 検査結果があれば処理
+    if 'test_results' in profile['cognitive_profile']:
+        for test in profile['cognitive_profile']['test_results']:
+            if 'test_name' in test and 'scores' in test:
+                # WAISタイプの検査結果を探す
+                if any(wais in test['test_name'].upper() for wais in ['WAIS', 'WISC', 'IQ']):
+                    scores = test['scores']
+
+                    # スコアを対応する能力に変換
+                    for score_name, value in scores.items():
+                        score_name_lower = score_name.lower()
+
+                        # 適切な変換先を決定
+                        if any(verbal in score_name_lower for verbal in ['vci', 'verbal', 'comprehension', 'vocabulary']):
+                            cognitive_system['abilities']['verbal_comprehension']['level'] = min(100, int(value))
+
+                        elif any(perceptual in score_name_lower for perceptual in ['pri', 'psi', 'perceptual', 'reasoning', 'visual', 'spatial']):
+                            cognitive_system['abilities']['perceptual_reasoning']['level'] = min(100, int(value))
+
+                        elif any(memory in score_name_lower for memory in ['wmi', 'working', 'memory']):
+                            cognitive_system['abilities']['working_memory']['level'] = min(100, int(value))
+
+                        elif any(speed in score_name_lower for speed in ['psi', 'processing', 'speed']):
+                            cognitive_system['abilities']['processing_speed']['level'] = min(100, int(value))
+
+                        elif any(general in score_name_lower for general in ['fsiq', 'full', 'global', 'general', 'iq']):
+                            cognitive_system['general_ability']['level'] = min(100, int(value))
+
+    # 平均値の計算
+    abilities = cognitive_system['abilities']
+    ability_levels = [ability['level'] for ability in abilities.values()]
+    average_level = sum(ability_levels) // len(ability_levels)
+
+    # general_abilityが設定されていなければ、平均を設定
+    if cognitive_system['general_ability']['level'] == 50:
+        cognitive_system['general_ability']['level'] = average_level
+
+    # 各能力に説明を追加
+    descriptions = {
+        "verbal_comprehension": "言語的概念の理解と表現能力",
+        "perceptual_reasoning": "視覚的・空間的情報の処理と分析能力",
+        "working_memory": "情報の短期的保持と操作能力",
+        "processing_speed": "単純な視覚情報の迅速な処理能力"
+    }
+
+    for ability, desc in descriptions.items():
+        if 'description' not in cognitive_system['abilities'][ability]:
+            cognitive_system['abilities'][ability]['description'] = desc
+
+    profile['cognitive_system'] = cognitive_system
+    report.converted(step, title, "cognitive_profileをcognitive_systemに変換しました")
+    return profile
+
+
+# 関連性生成時の既定値
+MEMORY_TO_EMOTION_STRENGTH = 70
+EMOTION_TO_MEMORY_STRENGTH = 65
+EMOTION_TO_MEMORY_THRESHOLD = 60
+TOPIC_TO_MEMORY_STRENGTH = 75
+TOPIC_KEYWORD_LIMIT = 5
+
+# 英単語のストップワード
+TOPIC_STOPWORDS = {
+    'this', 'that', 'these', 'those', 'when', 'where', 'which', 'while', 'with',
+    'would', 'could', 'should', 'have', 'been', 'from', 'there', 'their', 'they',
+    'were', 'what', 'about', 'into', 'than', 'then', 'them', 'very', 'also', 'just',
+    'only', 'some', 'such', 'after', 'before', 'again', 'will', 'your', 'more',
+}
+
+# 話題語の候補: 2文字以上の漢字列・カタカナ列、4文字以上の英数字列
+# （ひらがなは助詞・活用語尾が大半のため候補にしない）
+TOPIC_TOKEN_PATTERN = re.compile(r'[\u4e00-\u9fff\u3400-\u4dbf々〆ヶ]{2,}|[\u30a1-\u30faー]{2,}|[a-z0-9]{4,}')
+
+
+def tokenize_topics(text: str) -> List[str]:
+    """記憶内容から話題語の候補を抽出する（日本語・英語の両方に対応）"""
+    normalized = unicodedata.normalize('NFKC', text).lower()
+    return [
+        token for token in TOPIC_TOKEN_PATTERN.findall(normalized)
+        if token not in TOPIC_STOPWORDS and not token.isdigit()
+    ]
+
+
+def extract_topic_keywords(texts: List[str], limit: int = TOPIC_KEYWORD_LIMIT) -> List[List[str]]:
+    """各文書の話題語をTF-IDFの高い順に最大limit個ずつ返す
+
+    文書頻度は全文書について一度だけ集計するため、処理時間は全文書の
+    トークン数に比例します。同点の場合は文書内での出現順を優先します。
+    """
+    tokenized = [tokenize_topics(text) for text in texts]
+    document_frequency = Counter()
+    for tokens in tokenized:
+        document_frequency.update(set(tokens))
+
+    total = len(tokenized)
+    keywords = []
+    for tokens in tokenized:
+        term_frequency = Counter(tokens)
+        first_position = {}
+        for position, token in enumerate(tokens):
+            first_position.setdefault(token, position)
+        ranked = sorted(
+            term_frequency,
+            key=lambda token: (
+                -term_frequency[token] * (math.log((1 + total) / (1 + document_frequency[token])) + 1),
+                first_position[token],
+            ),
+        )
+        keywords.append(ranked[:limit])
+    return keywords
+
+
+def create_association_system(profile: Dict, report: ConversionReport) -> Dict:
+    """memory_systemとemotion_systemから基本的なassociation_systemを作成（profileを直接更新）
+
+    記憶ごとに、関連する感情との双方向の関連と、記憶内容の話題語を
+    トリガーとする外部関連を生成します。同一のトリガーとレスポンスの
+    組は1件にまとめ、各関連性には IdAllocator で一意なIDを割り当てます。
+    """
+    step, title = 'association_system', 'association_systemの作成'
+
+    # 必要なシステムが揃っているか確認
+    if 'memory_system' not in profile or 'emotion_system' not in profile:
+        report.skipped(step, title, "memory_systemまたはemotion_systemがありません。association_systemの作成をスキップします")
+        return profile
+
+    # association_systemが既に存在するか確認
+    if 'association_system' in profile:
+        report.skipped(step, title, "association_systemフィールドが既に存在します。作成をスキップします")
+        return profile
+
+    memories = [memory for memory in profile['memory_system'].get('memories', []) if 'id' in memory]
+    emotion_ids = set(profile['emotion_system'].get('emotions', {}))
+    emotion_ids.update(profile['emotion_system'].get('additional_emotions', {}))
+
+    if not memories or not emotion_ids:
+        report.skipped(step, title, "メモリまたは感情のIDが見つかりません。association_systemの作成をスキップします")
+        return profile
+
+    topic_keywords = extract_topic_keywords([memory.get('content') or '' for memory in memories])
+
+    associations = []
+    seen = set()
+    allocator = IdAllocator()
+
+    def add(association_id: str, key: Tuple, trigger: Dict, response: Dict) -> None:
+        if key in seen:
+            return
+        seen.add(key)
+        associations.append({
+            "id": allocator.allocate(association_id, repr(key)),
+            "trigger": trigger,
+            "response": response,
+        })
+
+    for memory, keywords in zip(memories, topic_keywords):
+        memory_id = memory['id']
+
+        # 関連する感情があれば処理
+        for emotion in memory.get('associated_emotions') or []:
+            if emotion not in emotion_ids:
+                continue
+            # 記憶→感情の関連
+            add(
+                f"{memory_id}_{emotion}_response",
+                ('memory', memory_id, 'emotion', emotion),
+                {"type": "memory", "id": memory_id},
+                {"type": "emotion", "id": emotion, "association_strength": MEMORY_TO_EMOTION_STRENGTH},
+            )
+            # 感情→記憶の関連（閾値付き）
+            add(
+                f"{emotion}_{memory_id}_recall",
+                ('emotion', emotion, 'memory', memory_id),
+                {"type": "emotion", "id": emotion, "threshold": EMOTION_TO_MEMORY_THRESHOLD},
+                {"type": "memory", "id": memory_id, "association_strength": EMOTION_TO_MEMORY_STRENGTH},
+            )
+
+        # 外部トリガー（記憶内容の話題語）→記憶の関連
+        if keywords:
+            add(
+                f"{memory_id}_topic_recall",
+                ('external', tuple(keywords), 'memory', memory_id),
+                {"type": "external", "category": "topics", "items": keywords},
+                {"type": "memory", "id": memory_id, "association_strength": TOPIC_TO_MEMORY_STRENGTH},
+            )
+
+    # 少なくとも一つの関連が作成されていれば追加
+    if associations:
+        profile['association_system'] = {
+            "associations": associations
+        }
+        count = len(associations)
+        report.converted(step, title, f"{count}件の関連を持つassociation_systemを作成しました", count)
+    else:
+        report.skipped(step, title, "関連を作成できませんでした。association_systemの作成をスキップします")
+
+    return profile
+
+
+# 変換ステップ（実行順）
+CONVERSION_STEPS = (
+    convert_state_to_emotion_system,
+    convert_memory_trace_to_memory_system,
+    convert_cognitive_profile_to_cognitive_system,
+    create_association_system,
+)
+
+
+def _is_list_of(value: Any, item_type: type) -> bool:
+    return isinstance(value, list) and all(isinstance(item, item_type) for item in value)
+
+
+def _is_score(value: Any) -> bool:
+    """int() で検査スコアとして読める値か（数値または数字の文字列）"""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    return isinstance(value, str) and value.strip().lstrip('+-').isdigit()
+
+
+def check_legacy_structure(profile: Any) -> List[str]:
+    """変換ステップが読み取るセクションの型を検査し、問題点の一覧を返す
+
+    レガシー形式のセクション（state・memory_trace・cognitive_profile）と、
+    関連性の作成で参照する既存のセクションが対象です。問題がなければ空のリストを返します。
+    """
+    if not isinstance(profile, dict):
+        return ["トップレベルがマッピングではありません"]
+
+    problems = []
+
+    def mapping(path: str, value: Any) -> bool:
+        if isinstance(value, dict):
+            return True
+        problems.append(f"{path} がマッピングではありません")
+        return False
+
+    if 'state' in profile and mapping('state', profile['state']):
+        if not all(isinstance(emotion, str) for emotion in profile['state']):
+            problems.append("state のキー（感情名）が文字列ではありません")
+
+    if 'memory_trace' in profile and mapping('memory_trace', profile['memory_trace']):
+        memories = profile['memory_trace'].get('memories', [])
+        if not _is_list_of(memories, dict):
+            problems.append("memory_trace.memories がマッピングのリストではありません")
+        else:
+            for i, memory in enumerate(memories):
+                path = f"memory_trace.memories[{i}]"
+                if not isinstance(memory.get('event') or '', str):
+                    problems.append(f"{path}.event が文字列ではありません")
+                if isinstance(memory.get('id'), (dict, list)):
+                    problems.append(f"{path}.id がスカラー値ではありません")
+                if 'emotions' in memory and not _is_list_of(memory['emotions'], str):
+                    problems.append(f"{path}.emotions が文字列のリストではありません")
+                related = memory.get('related_memories')
+                if related and not (
+                    isinstance(related, list)
+                    and not any(isinstance(reference, (dict, list)) for reference in related)
+                ):
+                    problems.append(f"{path}.related_memories がスカラー値のリストではありません")
+
+    if 'cognitive_profile' in profile and mapping('cognitive_profile', profile['cognitive_profile']):
+        tests = profile['cognitive_profile'].get('test_results', [])
+        if not _is_list_of(tests, dict):
+            problems.append("cognitive_profile.test_results がマッピングのリストではありません")
+        else:
+            for i, test in enumerate(tests):
+                if 'test_name' in test and not isinstance(test['test_name'], str):
+                    problems.append(f"cognitive_profile.test_results[{i}].test_name が文字列ではありません")
+                if 'scores' in test and not (
+                    isinstance(test['scores'], dict)
+                    and all(isinstance(name, str) for name in test['scores'])
+                    and all(_is_score(value) for value in test['scores'].values())
+                ):
+                    problems.append(f"cognitive_profile.test_results[{i}].scores が数値のマッピングではありません")
+
+    # 既存のセクションは関連性の作成で参照する
+    if 'memory_system' in profile and mapping('memory_system', profile['memory_system']):
+        if not _is_list_of(profile['memory_system'].get('memories', []), dict):
+            problems.append("memory_system.memories がマッピングのリストではありません")
+    if 'emotion_system' in profile and mapping('emotion_system', profile['emotion_system']):
+        for key in ('emotions', 'additional_emotions'):
+            mapping(f"emotion_system.{key}", profile['emotion_system'].get(key, {}))
+
+    return problems
+
+
+def convert_profile(profile: Dict, metrics: Any = None) -> Tuple[Dict, ConversionReport]:
+    """レガシー形式のプロファイルを拡張モデル形式に変換する
+
+    変換の前に check_legacy_structure で入力の形式を検査し、不正な場合は
+    RuntimeError を送出します。
+    入力のプロファイルは変更されません（トップレベルをコピーしてから変換します）。
+    変換後のプロファイルと ConversionReport を返します。
+    metrics（tools/validator/instrumentation.py の Metrics など、stage() を持つ
+    オブジェクト）を渡すと、各ステップを convert.<関数名> として計測します。
+    """
+    problems = check_legacy_structure(profile)
+    if problems:
+        raise RuntimeError("プロファイルの形式が不正です（" + "、".join(problems) + "）")
+    converted = dict(profile)
+    report = ConversionReport()
+    for convert in CONVERSION_STEPS:
+        if metrics is None:
+            converted = convert(converted, report)
+        else:
+            with metrics.stage(f"convert.{convert.__name__}"):
+                converted = convert(converted, report)
+    return converted, report
+
+
+def summarize_profile(profile: Dict) -> List[str]:
+    """変換後のプロファイルの概要を表示用の行として返す"""
+    lines = []
+    if 'emotion_system' in profile:
+        emotions_count = len(profile['emotion_system'].get('emotions', {}))
+        additional_count = len(profile['emotion_system'].get('additional_emotions', {}))
+        lines.append(f"- emotion_system: {emotions_count}個の基本感情と{additional_count}個の追加感情")
+
+    if 'memory_system' in profile:
+        memories_count = len(profile['memory_system'].get('memories', []))
+        lines.append(f"- memory_system: {memories_count}個の記憶")
+
+    if 'association_system' in profile:
+        associations_count = len(profile['association_system'].get('associations', []))
+        lines.append(f"- association_system: {associations_count}個の関連性")
+
+    if 'cognitive_system' in profile:
+        lines.append("- cognitive_system: 4つの能力と全体的な能力レベル")
+    return lines
+
+
+def convert_file(profile_path: str, output_path: Optional[str] = None) -> Tuple[str, str, ConversionReport]:
+    """プロファイルファイルを変換して保存する
+
+    出力先を省略した場合は *_extended.yaml に保存します。
+    (入力パス, 出力パス, ConversionReport) を返します。
+    """
+    profile = load_yaml(profile_path)
+    converted, report = convert_profile(profile)
+    if output_path is None:
+        output_path = extended_output_path(profile_path)
+    save_yaml(output_path, converted)
+    return profile_path, output_path, report
@@ -0,0 +1,180 @@
+"""Tests for topic extraction, association generation and id allocation in the converter."""
+
+import copy
+
+from converter_utils import (
+    ConversionReport,
+    IdAllocator,
+    convert_profile,
+    create_association_system,
+    extract_topic_keywords,
+    tokenize_topics,
+)
+
+
+def profile_with(memories, emotions=("fear", "joy")):
+    return {
+        "emotion_system": {"emotions": {e: {"baseline": 50} for e in emotions}},
+        "memory_system": {"memories": memories},
+    }
+
+
+def test_japanese_topics_are_kanji_and_katakana_runs():
+    # ひらがなと1文字の漢字は候補にしない
+    assert tokenize_topics("子供の頃、ピアノ教室で先生に褒められた") == ["子供", "ピアノ", "教室", "先生"]
+    # 全角英数字は正規化し、短い英単語・ストップワード・数字だけの語は除外する
+    assert tokenize_topics("ＰＩＡＮＯ lesson with the teacher at 2024") == ["piano", "lesson", "teacher"]
+
+
+def test_tfidf_prefers_terms_specific_to_a_memory():
+    texts = [
+        "学校で火事があり、先生が助けてくれた",
+        "学校の遠足でピアノを聴いた",
+        "学校の卒業式",
+    ]
+    keywords = extract_topic_keywords(texts, limit=2)
+    # 全文書に現れる「学校」より、その記憶にしかない語を優先する
+    assert keywords[0] == ["火事", "先生"]
+    assert keywords[1] == ["遠足", "ピアノ"]
+    assert keywords[2] == ["卒業式", "学校"]
+
+
+def test_tfidf_ties_keep_the_order_of_first_appearance():
+    assert extract_topic_keywords(["ピアノ 教室 先生", "海辺"], limit=5) == [["ピアノ", "教室", "先生"], ["海辺"]]
+    assert extract_topic_keywords(["の が を", ""]) == [[], []]
+
+
+def test_repeated_pairs_become_one_association():
+    memory = {"id": "fire", "content": "学校の火事", "associated_emotions": ["fear", "fear", "unknown"]}
+    profile = profile_with([memory])
+    create_association_system(profile, ConversionReport())
+    associations = profile["association_system"]["associations"]
+    pairs = [
+        (a["trigger"]["type"], a["trigger"].get("id"), a["response"]["type"], a["response"]["id"])
+        for a in associations
+    ]
+    assert pairs == [
+        ("memory", "fire", "emotion", "fear"),
+        ("emotion", "fear", "memory", "fire"),
+        ("external", None, "memory", "fire"),
+    ]
+    assert associations[2]["trigger"]["items"] == ["学校", "火事"]
+
+
+def test_association_ids_are_unique_and_deterministic():
+    memories = [
+        {"id": "fire", "content": "学校の火事", "associated_emotions": ["night_fear"]},
+        # どちらも "fire_night_fear_response" が候補になる
+        {"id": "fire_night", "content": "火事の夢", "associated_emotions": ["fear"]},
+    ]
+    emotions = ("fear", "night_fear")
+    first = profile_with([dict(m) for m in memories], emotions)
+    second = profile_with([dict(m) for m in memories], emotions)
+    create_association_system(first, ConversionReport())
+    create_association_system(second, ConversionReport())
+    ids = [a["id"] for a in first["association_system"]["associations"]]
+    assert ids == [a["id"] for a in second["association_system"]["associations"]]
+    assert len(ids) == len(set(ids))
+    assert ids[0] == "fire_night_fear_response"
+    assert ids.count("fire_night_fear_response") == 1
+    assert any(i.startswith("fire_night_fear_response_") for i in ids)
+
+
+def test_existing_association_system_is_kept():
+    profile = profile_with([{"id": "m", "content": "海", "associated_emotions": ["joy"]}])
+    profile["association_system"] = {"associations": []}
+    report = ConversionReport()
+    create_association_system(profile, report)
+    assert profile["association_system"] == {"associations": []}
+    assert [step.status for step in report.steps] == ["skipped"]
+
+
+def test_converted_legacy_profile_gets_topic_associations():
+    converted, _ = convert_profile(
+        {
+            "personal_info": {"name": "テスト"},
+            "state": {"fear": 40},
+            "memory_trace": {"memories": [{"id": "fire", "event": "小学校で火事に遭った", "emotions": ["fear"]}]},
+        }
+    )
+    topics = [a for a in converted["association_system"]["associations"] if a["trigger"]["type"] == "external"]
+    assert [a["trigger"]["items"] for a in topics] == [["小学校", "火事"]]
+
+
+
+def legacy_profile():
+    return {
+        "personal_info": {"name": "テスト"},
+        "state": {"happy": 60, "sad": 20},
+        "memory_trace": {
+            "memories": [
+                {"id": "beach", "event": "初めての海", "emotions": ["happy"], "related_memories": ["station"]},
+                {"id": "station", "event": "別れの駅", "emotions": ["sad"], "related_memories": ["beach", "nowhere"]},
+                # 同じIDと同じ出来事を持つ記憶
+                {"id": "beach", "event": "初めての海", "emotions": ["happy"]},
+                {"event": "Summer Festival", "emotions": ["happy"], "related_memories": ["beach"]},
+                {"event": "", "emotions": ["sad"]},
+            ]
+        },
+    }
+
+
+def test_unused_base_is_kept():
+    allocator = IdAllocator()
+    assert allocator.allocate("beach", "初めての海") == "beach"
+    assert allocator.allocate("station", "別れの駅") == "station"
+
+
+def test_collisions_get_a_suffix_derived_from_the_key():
+    first, second = IdAllocator(), IdAllocator()
+    ids = [first.allocate("beach", key) for key in ("a", "b", "c")]
+    assert ids == [second.allocate("beach", key) for key in ("a", "b", "c")]
+    assert ids[0] == "beach"
+    assert len(set(ids)) == 3
+    assert all(i.startswith("beach_") and len(i) == len("beach_") + 8 for i in ids[1:])
+
+
+def test_same_key_twice_still_yields_distinct_ids():
+    allocator = IdAllocator()
+    ids = [allocator.allocate("beach", "同じ出来事") for _ in range(5)]
+    assert len(set(ids)) == 5
+
+
+def test_used_ids_are_avoided():
+    allocator = IdAllocator({"beach"})
+    assert allocator.allocate("beach", "初めての海") != "beach"
+
+
+def test_conversion_is_deterministic_and_ids_are_unique():
+    first, first_report = convert_profile(legacy_profile())
+    second, _ = convert_profile(legacy_profile())
+    assert first == second
+
+    memories = first["memory_system"]["memories"]
+    ids = [memory["id"] for memory in memories]
+    assert len(ids) == len(set(ids))
+    assert ids[:2] == ["beach", "station"]
+    assert ids[2].startswith("beach_")
+    assert ids[3] == "summer_festival"
+    assert ids[4] == "memory_5"
+
+    association_ids = [a["id"] for a in first["association_system"]["associations"]]
+    assert len(association_ids) == len(set(association_ids))
+    assert first_report.unresolved_references == ["nowhere"]
+
+
+def test_related_memories_point_to_the_new_ids():
+    converted, report = convert_profile(legacy_profile())
+    memories = converted["memory_system"]["memories"]
+    assert memories[0]["related_memories"] == ["station"]
+    # 解決できない参照は除外し、旧IDの参照は最初に割り当てた記憶を指す
+    assert memories[1]["related_memories"] == ["beach"]
+    assert memories[3]["related_memories"] == ["beach"]
+    assert report.memory_id_map["初めての海"] == "beach"
+
+
+def test_input_profile_is_not_modified():
+    profile = legacy_profile()
+    original = copy.deepcopy(profile)
+    convert_profile(profile)
+    assert profile == original
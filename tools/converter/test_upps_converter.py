@@ -0,0 +1,94 @@
+"""Tests for batch conversion of malformed profiles and output path collisions."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+from converter_utils import check_legacy_structure, convert_profile
+
+CONVERTER = Path(__file__).resolve().parent / "upps-converter.py"
+
+VALID = {
+    "personal_info": {"name": "テスト"},
+    "state": {"happy": 60},
+    "memory_trace": {"memories": [{"id": "beach", "event": "初めての海", "emotions": ["happy"]}]},
+}
+
+MALFORMED = {
+    "top_level_list.yaml": "- 1\n- 2\n",
+    "memory_trace_list.yaml": "memory_trace: [1, 2]\n",
+    "state_list.yaml": "state: [1]\n",
+    "cognitive_profile_scalar.yaml": "cognitive_profile: 3\n",
+    "memory_not_mapping.yaml": "memory_trace:\n  memories: [1]\n",
+    "emotions_not_strings.yaml": "memory_trace:\n  memories:\n    - {event: 海, emotions: [1]}\n",
+    "scores_not_numbers.yaml": (
+        "cognitive_profile:\n  test_results:\n    - {test_name: WAIS, scores: {fsiq: high}}\n"
+    ),
+    "memory_system_scalar.yaml": "state: {happy: 60}\nmemory_system: 3\n",
+}
+
+
+def run(*args, cwd=None):
+    return subprocess.run(
+        [sys.executable, str(CONVERTER), *args],
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+        check=False,
+    )
+
+
+@pytest.mark.parametrize("text", MALFORMED.values(), ids=MALFORMED.keys())
+def test_malformed_profiles_raise_runtime_error(text):
+    profile = yaml.safe_load(text)
+    assert check_legacy_structure(profile)
+    with pytest.raises(RuntimeError, match="プロファイルの形式が不正です"):
+        convert_profile(profile)
+
+
+def test_valid_profile_has_no_structure_problems():
+    assert check_legacy_structure(VALID) == []
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_batch_reports_every_malformed_file_and_continues(tmp_path, jobs):
+    for name, text in MALFORMED.items():
+        (tmp_path / name).write_text(text, encoding="utf-8")
+    (tmp_path / "valid.yaml").write_text(yaml.safe_dump(VALID, allow_unicode=True), encoding="utf-8")
+
+    completed = run(str(tmp_path), "-j", jobs)
+    assert completed.returncode == 1
+    assert "Traceback" not in completed.stderr
+    for name in MALFORMED:
+        assert f"❌ {tmp_path / name}:" in completed.stdout
+    assert f"✅ {tmp_path / 'valid.yaml'}" in completed.stdout
+    assert (tmp_path / "valid_extended.yaml").is_file()
+    total = len(MALFORMED) + 1
+    assert f"{total}件中 1件成功 / {total - 1}件失敗" in completed.stdout
+
+
+def test_colliding_output_paths_are_rejected(tmp_path):
+    for directory in ("a", "b"):
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "x.yaml").write_text(yaml.safe_dump(VALID), encoding="utf-8")
+    out = tmp_path / "out"
+
+    completed = run("a/x.yaml", "b/x.yaml", "-o", str(out), cwd=tmp_path)
+    assert completed.returncode == 2
+    assert "出力先が同じです" in completed.stderr
+    assert not out.exists()
+
+
+def test_directory_output_keeps_relative_paths(tmp_path):
+    for directory in ("a", "b"):
+        (tmp_path / "src" / directory).mkdir(parents=True)
+        (tmp_path / "src" / directory / "x.yaml").write_text(yaml.safe_dump(VALID), encoding="utf-8")
+    out = tmp_path / "out"
+
+    completed = run(str(tmp_path / "src"), "-o", str(out), "-j", "1")
+    assert completed.returncode == 0, completed.stdout
+    assert (out / "a" / "x.yaml").is_file()
+    assert (out / "b" / "x.yaml").is_file()
@@ -645,10 +645,15 @@ class App {
         await this.fileHandler.loadFile();
     }
 
-    handleSaveFile() {
+    async handleSaveFile() {
         const personaName = this.personaData.getData().personal_info.name;
         const filename = personaName ? `${personaName.replace(/\s+/g, '_')}.yaml` : 'persona.yaml';
-        this.fileHandler.saveFile(filename);
+        try {
+            await this.fileHandler.saveFile(filename);
+        } catch (error) {
+            console.error('Failed to save persona:', error);
+            this.uiController.showNotification(`ファイルの保存に失敗しました: ${error.message}`, 'error');
+        }
     }
 
     handleMergeMedicalTemplate() {
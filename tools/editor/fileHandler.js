@@ -1,5 +1,5 @@
 import jsyaml from 'js-yaml';
-import { validatePersona } from './validator.js';
+import { validatePersonaWithServer } from './validator.js';
 
 export default class FileHandler {
     constructor(personaData, uiController) {
@@ -74,7 +74,7 @@ export default class FileHandler {
         }
     }
 
-    saveFile(filename = 'persona.yaml') {
+    async saveFile(filename = 'persona.yaml') {
         const yamlContent = this.personaData.toYAML();
         let profile;
         try {
@@ -84,7 +84,7 @@ export default class FileHandler {
             return;
         }
 
-        const result = validatePersona(profile);
+        const result = await validatePersonaWithServer(profile);
         if (!result.valid) {
             this.uiController.showNotification(result.errors.join('\n'), 'error');
             return;
@@ -71,3 +71,38 @@ export function validatePersona(profile) {
         errors
     };
 }
+
+// URL of tools/validator/validator_server.py, e.g. 'http://127.0.0.1:8765'.
+// When unset, only the reference checks of validatePersona() run.
+// Read on every call so that the URL can be set after this module is loaded.
+export function getValidatorUrl() {
+    return globalThis.UPPS_VALIDATOR_URL || null;
+}
+
+export async function validatePersonaWithServer(profile, url = getValidatorUrl()) {
+    if (!url) {
+        return validatePersona(profile);
+    }
+    try {
+        const response = await fetch(`${url.replace(/\/$/, '')}/validate`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(profile)
+        });
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const record = await response.json();
+        return {
+            valid: record.valid,
+            errors: record.findings
+                .filter(finding => finding.severity === 'error')
+                .map(finding => `${finding.path}: ${finding.message}`),
+            findings: record.findings
+        };
+    } catch (error) {
+        // fall back to the in-browser checks when the server is unreachable
+        console.warn('Validator server unavailable, falling back to local validation:', error);
+        return validatePersona(profile);
+    }
+}
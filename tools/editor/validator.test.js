@@ -0,0 +1,82 @@
+import { validatePersona, validatePersonaWithServer } from './validator.js';
+
+const profile = {
+    emotion_system: { emotions: { joy: { baseline: 50 } } },
+    current_emotion_state: { joy: 40, fear: 10 }
+};
+
+const serverRecord = {
+    valid: false,
+    findings: [
+        { severity: 'error', path: '$.memory_system', message: 'memory_systemはマッピングである必要があります' },
+        { severity: 'warning', path: '$.emotion_system', message: '使われていない感情があります' }
+    ]
+};
+
+describe('validatePersonaWithServer', () => {
+    const originalFetch = globalThis.fetch;
+    const originalWarn = console.warn;
+    let requests;
+
+    function stubFetch(respond) {
+        requests = [];
+        globalThis.fetch = async (url, options) => {
+            requests.push({ url, options });
+            return respond();
+        };
+    }
+
+    beforeEach(() => {
+        console.warn = () => {};
+        delete globalThis.UPPS_VALIDATOR_URL;
+    });
+
+    afterEach(() => {
+        globalThis.fetch = originalFetch;
+        console.warn = originalWarn;
+        delete globalThis.UPPS_VALIDATOR_URL;
+    });
+
+    test('runs the local checks when no server is configured', async () => {
+        stubFetch(() => { throw new Error('fetch should not be called'); });
+        const result = await validatePersonaWithServer(profile);
+        expect(requests).toHaveLength(0);
+        expect(result).toEqual(validatePersona(profile));
+        expect(result.valid).toBe(false);
+    });
+
+    test('posts the profile as JSON and maps the findings', async () => {
+        stubFetch(() => ({ ok: true, status: 200, json: async () => serverRecord }));
+        const result = await validatePersonaWithServer(profile, 'http://127.0.0.1:8765/');
+        expect(requests).toHaveLength(1);
+        expect(requests[0].url).toBe('http://127.0.0.1:8765/validate');
+        expect(requests[0].options.method).toBe('POST');
+        expect(JSON.parse(requests[0].options.body)).toEqual(profile);
+        expect(result).toEqual({
+            valid: false,
+            errors: ['$.memory_system: memory_systemはマッピングである必要があります'],
+            findings: serverRecord.findings
+        });
+    });
+
+    test('reads UPPS_VALIDATOR_URL at call time', async () => {
+        stubFetch(() => ({ ok: true, status: 200, json: async () => ({ valid: true, findings: [] }) }));
+        globalThis.UPPS_VALIDATOR_URL = 'http://localhost:9000';
+        const result = await validatePersonaWithServer(profile);
+        expect(requests[0].url).toBe('http://localhost:9000/validate');
+        expect(result.valid).toBe(true);
+    });
+
+    test('falls back to the local checks on an HTTP error', async () => {
+        stubFetch(() => ({ ok: false, status: 500, json: async () => ({}) }));
+        const result = await validatePersonaWithServer(profile, 'http://127.0.0.1:8765');
+        expect(requests).toHaveLength(1);
+        expect(result).toEqual(validatePersona(profile));
+    });
+
+    test('falls back to the local checks when the server is unreachable', async () => {
+        stubFetch(() => { throw new TypeError('Failed to fetch'); });
+        const result = await validatePersonaWithServer(profile, 'http://127.0.0.1:8765');
+        expect(result).toEqual(validatePersona(profile));
+    });
+});
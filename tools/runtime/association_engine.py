@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Association activation engine for UPPS profiles.
+
+``AssociationEngine`` compiles ``association_system.associations`` into
+indexes so that each dialogue turn only touches the associations whose
+triggers were actually affected:
+
+- emotion triggers and emotion conditions are kept per emotion id, sorted by
+  ``threshold``; an emotion update locates the crossed thresholds by binary
+  search,
+- memory triggers/conditions are indexed by memory id,
+- external triggers/conditions are indexed by (case-folded) item,
+- compound triggers keep one bit per condition; a candidate fires when the
+  satisfied bits cover all conditions (``AND``) or any condition (``OR``).
+
+Emotion triggers are edge-triggered: they fire when an update moves the
+emotion from below its threshold to at or above it. Memory and external
+triggers fire on every turn in which the memory is recalled or the item is
+observed.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set, Tuple
+
+# thresholdが省略された感情トリガー・条件に用いる閾値
+DEFAULT_EMOTION_THRESHOLD = 50
+
+
+@dataclass(frozen=True)
+class Activation:
+    """A fired association."""
+
+    association_id: str
+    index: int
+    strength: int
+    response: Dict
+
+
+@dataclass
+class _Compound:
+    index: int
+    operator: str
+    full_mask: int
+    # ビット -> (種類, id, 閾値)
+    conditions: Tuple[Tuple[str, str, int], ...]
+
+
+def _threshold(entry: Dict) -> int:
+    threshold = entry.get("threshold")
+    return DEFAULT_EMOTION_THRESHOLD if threshold is None else threshold
+
+
+def _fold(item: str) -> str:
+    return item.casefold()
+
+
+class AssociationEngine:
+    """Evaluate a profile's associations against emotion and recall updates."""
+
+    def __init__(self, associations: List[Dict], emotion_state: Dict[str, int] | None = None) -> None:
+        self.associations = associations
+        self.state: Dict[str, int] = dict(emotion_state or {})
+
+        # 感情ID -> 閾値の昇順リストと対応する関連性（単一トリガー）
+        self._emotion_thresholds: Dict[str, List[int]] = {}
+        self._emotion_targets: Dict[str, List[int]] = {}
+        self._memory_triggers: Dict[str, List[int]] = {}
+        self._external_triggers: Dict[str, List[int]] = {}
+
+        # 複合トリガー: 条件ごとの索引は (複合番号, ビット) を返す
+        self._compounds: List[_Compound] = []
+        self._emotion_condition_thresholds: Dict[str, List[int]] = {}
+        self._emotion_condition_targets: Dict[str, List[Tuple[int, int]]] = {}
+        self._memory_conditions: Dict[str, List[Tuple[int, int]]] = {}
+        self._external_conditions: Dict[str, List[Tuple[int, int]]] = {}
+
+        self._compile()
+
+    @classmethod
+    def from_profile(cls, profile: Dict) -> "AssociationEngine":
+        """Build an engine whose initial state is the profile's emotion state.
+
+        ``current_emotion_state`` takes precedence; emotions missing from it
+        start at their ``baseline``.
+        """
+        state: Dict[str, int] = {}
+        emotion_system = profile.get("emotion_system") or {}
+        for group in ("emotions", "additional_emotions", "compound_emotions"):
+            for emotion_id, info in (emotion_system.get(group) or {}).items():
+                if isinstance(info, dict) and "baseline" in info:
+                    state[emotion_id] = info["baseline"]
+        state.update(profile.get("current_emotion_state") or {})
+        associations = (profile.get("association_system") or {}).get("associations") or []
+        return cls(associations, state)
+
+    def _compile(self) -> None:
+        emotion_pairs: Dict[str, List[Tuple[int, int]]] = {}
+        condition_pairs: Dict[str, List[Tuple[int, Tuple[int, int]]]] = {}
+
+        for i, assoc in enumerate(self.associations):
+            trigger = assoc.get("trigger") or {}
+            if "operator" in trigger:
+                conditions = []
+                compound_index = len(self._compounds)
+                for bit, condition in enumerate(trigger.get("conditions") or []):
+                    kind = condition.get("type")
+                    slot = (compound_index, bit)
+                    if kind == "emotion" and "id" in condition:
+                        threshold = _threshold(condition)
+                        condition_pairs.setdefault(condition["id"], []).append((threshold, slot))
+                        conditions.append(("emotion", condition["id"], threshold))
+                    elif kind == "memory" and "id" in condition:
+                        self._memory_conditions.setdefault(condition["id"], []).append(slot)
+                        conditions.append(("memory", condition["id"], 0))
+                    elif kind == "external":
+                        for item in condition.get("items") or []:
+                            self._external_conditions.setdefault(_fold(item), []).append(slot)
+                        conditions.append(("external", condition.get("category", ""), 0))
+                    else:
+                        conditions.append(("unknown", "", 0))
+                self._compounds.append(
+                    _Compound(
+                        i,
+                        trigger["operator"],
+                        (1 << len(conditions)) - 1,
+                        tuple(conditions),
+                    )
+                )
+                continue
+
+            kind = trigger.get("type")
+            if kind == "emotion" and "id" in trigger:
+                emotion_pairs.setdefault(trigger["id"], []).append((_threshold(trigger), i))
+            elif kind == "memory" and "id" in trigger:
+                self._memory_triggers.setdefault(trigger["id"], []).append(i)
+            elif kind == "external":
+                for item in trigger.get("items") or []:
+                    self._external_triggers.setdefault(_fold(item), []).append(i)
+
+        for emotion_id, pairs in emotion_pairs.items():
+            pairs.sort()
+            self._emotion_thresholds[emotion_id] = [t for t, _ in pairs]
+            self._emotion_targets[emotion_id] = [i for _, i in pairs]
+        for emotion_id, pairs in condition_pairs.items():
+            pairs.sort()
+            self._emotion_condition_thresholds[emotion_id] = [t for t, _ in pairs]
+            self._emotion_condition_targets[emotion_id] = [slot for _, slot in pairs]
+
+    @staticmethod
+    def _crossed(thresholds: List[int], old: int, new: int) -> Tuple[int, int]:
+        """Return the index range of thresholds in ``(old, new]``."""
+        return bisect_right(thresholds, old), bisect_right(thresholds, new)
+
+    def update(
+        self,
+        emotion_changes: Dict[str, int] | None = None,
+        recalled_memories: Iterable[str] = (),
+        external_items: Iterable[str] = (),
+        limit: int | None = None,
+    ) -> List[Activation]:
+        """Apply an emotion update and return the fired associations.
+
+        ``emotion_changes`` maps emotion ids to their new values. Results are
+        ordered by ``association_strength`` (strongest first), then by
+        definition order, and truncated to ``limit`` if given.
+        """
+        fired: Set[int] = set()
+        compound_hits: Dict[int, int] = {}
+
+        for emotion_id, new in (emotion_changes or {}).items():
+            old = self.state.get(emotion_id, 0)
+            self.state[emotion_id] = new
+            if new <= old:
+                continue
+            thresholds = self._emotion_thresholds.get(emotion_id)
+            if thresholds:
+                lo, hi = self._crossed(thresholds, old, new)
+                fired.update(self._emotion_targets[emotion_id][lo:hi])
+            thresholds = self._emotion_condition_thresholds.get(emotion_id)
+            if thresholds:
+                lo, hi = self._crossed(thresholds, old, new)
+                for compound_index, _ in self._emotion_condition_targets[emotion_id][lo:hi]:
+                    compound_hits.setdefault(compound_index, 0)
+
+        recalled = set(recalled_memories)
+        for memory_id in recalled:
+            fired.update(self._memory_triggers.get(memory_id, ()))
+            for compound_index, bit in self._memory_conditions.get(memory_id, ()):
+                compound_hits[compound_index] = compound_hits.get(compound_index, 0) | (1 << bit)
+
+        for item in {_fold(item) for item in external_items}:
+            fired.update(self._external_triggers.get(item, ()))
+            for compound_index, bit in self._external_conditions.get(item, ()):
+                compound_hits[compound_index] = compound_hits.get(compound_index, 0) | (1 << bit)
+
+        for compound_index, event_mask in compound_hits.items():
+            compound = self._compounds[compound_index]
+            mask = event_mask
+            for bit, (kind, target, threshold) in enumerate(compound.conditions):
+                if kind == "emotion" and self.state.get(target, 0) >= threshold:
+                    mask |= 1 << bit
+            if compound.operator == "AND":
+                satisfied = mask == compound.full_mask
+            else:
+                satisfied = mask != 0
+            if satisfied:
+                fired.add(compound.index)
+
+        activations = []
+        for i in fired:
+            response = self.associations[i].get("response") or {}
+            activations.append(
+                Activation(
+                    self.associations[i].get("id", f"association_{i}"),
+                    i,
+                    response.get("association_strength", 0),
+                    response,
+                )
+            )
+        activations.sort(key=lambda a: (-a.strength, a.index))
+        if limit is not None:
+            del activations[limit:]
+        return activations
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""Append-only store for ``change_tracking`` events.
+
+``ChangeStore`` keeps baseline and association-strength changes of many
+personas in a SQLite database in WAL mode instead of rewriting the profile
+YAML after every change:
+
+- each change is appended as one event row; the running cumulative change
+  per target is kept in a small ``totals`` table, so an append reads and
+  writes a constant number of rows,
+- the cumulative limits of the schema (±50 for emotion baselines, ±100 for
+  association strengths) are enforced at append time,
+- every ``snapshot_interval`` events the persona's totals are snapshotted;
+  the state at an earlier event is rebuilt from the nearest snapshot plus
+  the events after it,
+- ``materialize`` renders the events back into the ``change_tracking``
+  section of the profile.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+KIND_EMOTION = "emotion"
+KIND_ASSOCIATION = "association"
+
+# upps_schema.yaml の change_tracking における cumulative_change の範囲
+CUMULATIVE_LIMITS = {
+    KIND_EMOTION: 50,
+    KIND_ASSOCIATION: 100,
+}
+
+_SECTIONS = {
+    KIND_EMOTION: ("emotion_baseline_changes", "emotion_id"),
+    KIND_ASSOCIATION: ("association_strength_changes", "association_id"),
+}
+
+DEFAULT_SNAPSHOT_INTERVAL = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS personas (
+    persona TEXT PRIMARY KEY,
+    last_seq INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    persona TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    target TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    log TEXT,
+    PRIMARY KEY (persona, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_target ON events (persona, kind, target, seq);
+CREATE TABLE IF NOT EXISTS totals (
+    persona TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    target TEXT NOT NULL,
+    cumulative INTEGER NOT NULL,
+    first_seq INTEGER NOT NULL,
+    PRIMARY KEY (persona, kind, target)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS snapshots (
+    persona TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    totals TEXT NOT NULL,
+    PRIMARY KEY (persona, seq)
+) WITHOUT ROWID;
+"""
+
+
+class ChangeLimitError(ValueError):
+    """Raised when an append would exceed a cumulative change limit."""
+
+
+def _timestamp() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def format_log(amount: int, event: str, recorded_at: str | None = None) -> str:
+    """Render one ``change_log`` entry, e.g. ``2025-01-15T10:30:00Z -2 exposure``."""
+    return f"{recorded_at or _timestamp()} {amount:+d} {event}".rstrip()
+
+
+class ChangeStore:
+    """Per-persona append-only log of ``change_tracking`` events."""
+
+    def __init__(self, path: str, snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL) -> None:
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "ChangeStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _append(self, persona: str, kind: str, target: str, amount: int, log: str | None) -> int:
+        if kind not in CUMULATIVE_LIMITS:
+            raise ValueError(f"未知の変化種別です: {kind}")
+        conn = self._conn
+        row = conn.execute(
+            "SELECT cumulative FROM totals WHERE persona = ? AND kind = ? AND target = ?",
+            (persona, kind, target),
+        ).fetchone()
+        cumulative = (row[0] if row else 0) + amount
+        limit = CUMULATIVE_LIMITS[kind]
+        if abs(cumulative) > limit:
+            raise ChangeLimitError(
+                f"'{target}' の累積変化量が上限（±{limit}）を超えます: {cumulative}"
+            )
+        seq_row = conn.execute(
+            "SELECT last_seq FROM personas WHERE persona = ?", (persona,)
+        ).fetchone()
+        seq = (seq_row[0] if seq_row else 0) + 1
+        conn.execute(
+            "INSERT OR REPLACE INTO personas (persona, last_seq) VALUES (?, ?)", (persona, seq)
+        )
+        conn.execute(
+            "INSERT INTO events (persona, seq, kind, target, amount, log) VALUES (?, ?, ?, ?, ?, ?)",
+            (persona, seq, kind, target, amount, log),
+        )
+        if row:
+            conn.execute(
+                "UPDATE totals SET cumulative = ? WHERE persona = ? AND kind = ? AND target = ?",
+                (cumulative, persona, kind, target),
+            )
+        else:
+            conn.execute(
+                "INSERT INTO totals (persona, kind, target, cumulative, first_seq) VALUES (?, ?, ?, ?, ?)",
+                (persona, kind, target, cumulative, seq),
+            )
+        if seq % self.snapshot_interval == 0:
+            self._snapshot(persona, seq)
+        return seq
+
+    def append(
+        self,
+        persona: str,
+        kind: str,
+        target: str,
+        amount: int,
+        event: str = "",
+        recorded_at: str | None = None,
+    ) -> int:
+        """Append one change and return its sequence number.
+
+        ``kind`` is ``"emotion"`` (baseline change of an emotion id) or
+        ``"association"`` (strength change of an association id). Raises
+        ``ChangeLimitError`` without writing anything if the cumulative
+        change would leave the allowed range.
+        """
+        with self._transaction():
+            return self._append(persona, kind, target, amount, format_log(amount, event, recorded_at))
+
+    def append_many(self, persona: str, changes: List[Tuple[str, str, int, str]]) -> int:
+        """Append ``(kind, target, amount, event)`` tuples in one transaction.
+
+        Either all changes are stored or, if any exceeds a limit, none are.
+        Returns the sequence number of the last change.
+        """
+        seq = 0
+        recorded_at = _timestamp()
+        with self._transaction():
+            for kind, target, amount, event in changes:
+                seq = self._append(persona, kind, target, amount, format_log(amount, event, recorded_at))
+        return seq
+
+    def import_change_tracking(self, persona: str, change_tracking: Dict) -> None:
+        """Seed the log of ``persona`` from an existing ``change_tracking`` section.
+
+        The existing ``change_log`` strings are kept verbatim; the cumulative
+        change is recorded as one event without a log entry.
+        """
+        with self._transaction():
+            for kind, (section, id_key) in _SECTIONS.items():
+                for entry in change_tracking.get(section) or []:
+                    target = entry[id_key]
+                    for log in entry.get("change_log") or []:
+                        self._append(persona, kind, target, 0, log)
+                    self._append(persona, kind, target, entry.get("cumulative_change", 0), None)
+
+    def _transaction(self):
+        return _Transaction(self._conn)
+
+    def _snapshot(self, persona: str, seq: int) -> None:
+        totals = self._conn.execute(
+            "SELECT kind, target, cumulative, first_seq FROM totals WHERE persona = ?", (persona,)
+        ).fetchall()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO snapshots (persona, seq, totals) VALUES (?, ?, ?)",
+            (persona, seq, json.dumps(totals, ensure_ascii=False)),
+        )
+
+    def last_seq(self, persona: str) -> int:
+        row = self._conn.execute(
+            "SELECT last_seq FROM personas WHERE persona = ?", (persona,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def cumulative(self, persona: str, kind: str, target: str) -> int:
+        row = self._conn.execute(
+            "SELECT cumulative FROM totals WHERE persona = ? AND kind = ? AND target = ?",
+            (persona, kind, target),
+        ).fetchone()
+        return row[0] if row else 0
+
+    def totals(self, persona: str, upto: int | None = None) -> Dict[Tuple[str, str], Tuple[int, int]]:
+        """Return ``{(kind, target): (cumulative, first_seq)}`` after event ``upto``.
+
+        Without ``upto`` the current totals are read directly; otherwise the
+        nearest snapshot at or before ``upto`` is replayed forward.
+        """
+        conn = self._conn
+        if upto is None or upto >= self.last_seq(persona):
+            rows = conn.execute(
+                "SELECT kind, target, cumulative, first_seq FROM totals WHERE persona = ?",
+                (persona,),
+            )
+            return {(kind, target): (cum, first) for kind, target, cum, first in rows}
+
+        state: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        start = 0
+        snapshot = conn.execute(
+            "SELECT seq, totals FROM snapshots WHERE persona = ? AND seq <= ? ORDER BY seq DESC LIMIT 1",
+            (persona, upto),
+        ).fetchone()
+        if snapshot:
+            start = snapshot[0]
+            for kind, target, cum, first in json.loads(snapshot[1]):
+                state[(kind, target)] = (cum, first)
+        for seq, kind, target, amount in conn.execute(
+            "SELECT seq, kind, target, amount FROM events WHERE persona = ? AND seq > ? AND seq <= ? ORDER BY seq",
+            (persona, start, upto),
+        ):
+            cum, first = state.get((kind, target), (0, seq))
+            state[(kind, target)] = (cum + amount, first)
+        return state
+
+    def materialize(self, persona: str, upto: int | None = None, log_limit: int | None = None) -> Dict:
+        """Render the events of ``persona`` as a ``change_tracking`` section.
+
+        ``upto`` selects the state after that sequence number. ``log_limit``
+        keeps only the most recent entries of each ``change_log``.
+        """
+        state = self.totals(persona, upto)
+        bound = self.last_seq(persona) if upto is None else upto
+        logs: Dict[Tuple[str, str], List[str]] = {}
+        if log_limit is None:
+            rows = self._conn.execute(
+                "SELECT kind, target, log FROM events WHERE persona = ? AND seq <= ? AND log IS NOT NULL ORDER BY seq",
+                (persona, bound),
+            )
+        else:
+            rows = self._conn.execute(
+                """
+                SELECT kind, target, log FROM (
+                    SELECT kind, target, log, seq,
+                           ROW_NUMBER() OVER (PARTITION BY kind, target ORDER BY seq DESC) AS n
+                    FROM events WHERE persona = ? AND seq <= ? AND log IS NOT NULL
+                ) WHERE n <= ? ORDER BY seq
+                """,
+                (persona, bound, log_limit),
+            )
+        for kind, target, log in rows:
+            logs.setdefault((kind, target), []).append(log)
+
+        change_tracking: Dict[str, List[Dict]] = {}
+        for (kind, target), (cum, _) in sorted(state.items(), key=lambda item: item[1][1]):
+            section, id_key = _SECTIONS[kind]
+            entry = {id_key: target, "cumulative_change": cum}
+            if (kind, target) in logs:
+                entry["change_log"] = logs[(kind, target)]
+            change_tracking.setdefault(section, []).append(entry)
+        return change_tracking
+
+
+class _Transaction:
+    """``BEGIN IMMEDIATE`` … ``COMMIT``/``ROLLBACK`` around a block."""
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    def __enter__(self) -> None:
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""Vectorised emotion state for many personas.
+
+``EmotionStateStore`` packs the emotion values of many personas into one
+NumPy matrix (one row per persona, one column per emotion id) so that time
+steps can be applied to every persona at once: decay toward baseline, delta
+application, clamping to 0-100 and threshold evaluation.
+
+Column assignment is stable: an emotion id keeps its column for the lifetime
+of the store and new ids are appended. ``emotions``, ``additional_emotions``
+and ``compound_emotions`` all get columns; compound emotions are derived as
+the mean of their ``components`` after every operation. A compound id must
+have the same components in every persona that defines it.
+
+必要なパッケージ:
+  - numpy
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Hashable, Iterable, List, Sequence
+
+import numpy as np
+
+EMOTION_MIN = 0
+EMOTION_MAX = 100
+
+_INITIAL_ROWS = 16
+
+
+class EmotionStateStore:
+    """Emotion values and baselines of many personas in dense matrices."""
+
+    def __init__(self, dtype=np.float32) -> None:
+        self.dtype = dtype
+        self.emotion_ids: List[str] = []
+        self.columns: Dict[str, int] = {}
+        self.persona_keys: List[Hashable] = []
+        self.rows: Dict[Hashable, int] = {}
+        self._values = np.zeros((_INITIAL_ROWS, 0), dtype=dtype)
+        self._baselines = np.zeros((_INITIAL_ROWS, 0), dtype=dtype)
+        self._defined = np.zeros((_INITIAL_ROWS, 0), dtype=bool)
+        # 複合感情ID -> 構成感情のID
+        self._compound_components: Dict[str, tuple] = {}
+        self._compound_weights = np.zeros((0, 0), dtype=dtype)
+        self._compound_columns = np.zeros(0, dtype=np.intp)
+
+    @property
+    def size(self) -> int:
+        return len(self.persona_keys)
+
+    @property
+    def values(self) -> np.ndarray:
+        """Current values, shape ``(personas, emotions)``."""
+        return self._values[: self.size]
+
+    @property
+    def baselines(self) -> np.ndarray:
+        return self._baselines[: self.size]
+
+    @property
+    def defined(self) -> np.ndarray:
+        """Whether each persona defines each emotion."""
+        return self._defined[: self.size]
+
+    def column(self, emotion_id: str) -> int:
+        """Return the column of ``emotion_id``, adding it if needed."""
+        col = self.columns.get(emotion_id)
+        if col is not None:
+            return col
+        col = len(self.emotion_ids)
+        self.emotion_ids.append(emotion_id)
+        self.columns[emotion_id] = col
+        rows = self._values.shape[0]
+        pad = np.zeros((rows, 1), dtype=self.dtype)
+        self._values = np.hstack([self._values, pad])
+        self._baselines = np.hstack([self._baselines, pad])
+        self._defined = np.hstack([self._defined, np.zeros((rows, 1), dtype=bool)])
+        weights = np.zeros((col + 1, col + 1), dtype=self.dtype)
+        weights[:col, :col] = self._compound_weights
+        self._compound_weights = weights
+        return col
+
+    def _ensure_rows(self, count: int) -> None:
+        capacity = self._values.shape[0]
+        if count <= capacity:
+            return
+        new_capacity = max(count, capacity * 2)
+        for name in ("_values", "_baselines", "_defined"):
+            old = getattr(self, name)
+            grown = np.zeros((new_capacity, old.shape[1]), dtype=old.dtype)
+            grown[:capacity] = old
+            setattr(self, name, grown)
+
+    def _register_compound(self, emotion_id: str, components: Sequence[str]) -> None:
+        key = tuple(components)
+        known = self._compound_components.get(emotion_id)
+        if known is not None:
+            if known != key:
+                raise ValueError(
+                    f"複合感情 '{emotion_id}' の構成感情がペルソナ間で一致しません: {known} != {key}"
+                )
+            return
+        col = self.column(emotion_id)
+        component_cols = [self.column(c) for c in components]
+        self._compound_components[emotion_id] = key
+        for c in component_cols:
+            self._compound_weights[c, col] += 1.0 / len(component_cols)
+        self._compound_columns = np.array(
+            [self.columns[e] for e in self._compound_components], dtype=np.intp
+        )
+
+    def add_persona(self, key: Hashable, profile: Dict) -> int:
+        """Add a persona from its profile and return its row.
+
+        Values come from ``current_emotion_state`` and fall back to the
+        emotion's ``baseline``.
+        """
+        if key in self.rows:
+            raise KeyError(f"ペルソナ '{key}' は既に登録されています")
+        emotion_system = profile.get("emotion_system") or {}
+        entries: Dict[str, float] = {}
+        compounds: Dict[str, Dict] = {}
+        for group in ("emotions", "additional_emotions"):
+            for emotion_id, info in (emotion_system.get(group) or {}).items():
+                entries[emotion_id] = (info or {}).get("baseline", 0)
+                self.column(emotion_id)
+        for emotion_id, info in (emotion_system.get("compound_emotions") or {}).items():
+            compounds[emotion_id] = info or {}
+            self._register_compound(emotion_id, compounds[emotion_id].get("components") or [])
+
+        row = self.size
+        self._ensure_rows(row + 1)
+        self.persona_keys.append(key)
+        self.rows[key] = row
+        self._values[row] = 0
+        self._baselines[row] = 0
+        self._defined[row] = False
+
+        current = profile.get("current_emotion_state") or {}
+        for emotion_id, baseline in entries.items():
+            col = self.columns[emotion_id]
+            self._baselines[row, col] = baseline
+            self._values[row, col] = current.get(emotion_id, baseline)
+            self._defined[row, col] = True
+        for emotion_id, info in compounds.items():
+            col = self.columns[emotion_id]
+            self._defined[row, col] = True
+            if "baseline" in info:
+                self._baselines[row, col] = info["baseline"]
+            else:
+                comps = [self.columns[c] for c in info.get("components") or []]
+                if comps:
+                    self._baselines[row, col] = self._baselines[row, comps].mean()
+        self._finish(slice(row, row + 1))
+        return row
+
+    def _finish(self, rows=slice(None)) -> None:
+        """Clamp values and re-derive compound emotions for ``rows``."""
+        values = self._values[: self.size][rows]
+        defined = self._defined[: self.size][rows]
+        np.clip(values, EMOTION_MIN, EMOTION_MAX, out=values)
+        if self._compound_columns.size:
+            cols = self._compound_columns
+            derived = values @ self._compound_weights[:, cols]
+            values[:, cols] = np.where(defined[:, cols], derived, values[:, cols])
+        values[~defined] = 0
+        self._values[: self.size][rows] = values
+
+    def _select(self, personas: Iterable[Hashable] | None):
+        if personas is None:
+            return slice(None)
+        return np.array([self.rows[key] for key in personas], dtype=np.intp)
+
+    def decay(self, rate, personas: Iterable[Hashable] | None = None) -> None:
+        """Move values toward baseline by ``rate`` (0-1).
+
+        ``rate`` may be a scalar or an array with one rate per emotion column.
+        """
+        rows = self._select(personas)
+        values = self.values[rows]
+        values += (self.baselines[rows] - values) * np.asarray(rate, dtype=self.dtype)
+        self._values[: self.size][rows] = values
+        self._finish(rows)
+
+    def apply_deltas(self, deltas: np.ndarray, personas: Iterable[Hashable] | None = None) -> None:
+        """Add a delta matrix (``(rows, emotions)``) to the selected personas."""
+        rows = self._select(personas)
+        self._values[: self.size][rows] += np.asarray(deltas, dtype=self.dtype)
+        self._finish(rows)
+
+    def apply_delta_map(self, deltas: Dict[Hashable, Dict[str, float]]) -> None:
+        """Apply sparse deltas given as ``{persona: {emotion_id: delta}}``."""
+        if not deltas:
+            return
+        rows, cols, amounts = [], [], []
+        for key, changes in deltas.items():
+            row = self.rows[key]
+            for emotion_id, amount in changes.items():
+                col = self.columns.get(emotion_id)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+                    amounts.append(amount)
+        np.add.at(self._values, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), amounts)
+        self._finish(np.unique(np.array(rows, dtype=np.intp)))
+
+    def delta_matrix(self, personas: Iterable[Hashable] | None = None) -> np.ndarray:
+        """Return a zero matrix shaped for :meth:`apply_deltas`."""
+        count = self.size if personas is None else len(list(personas))
+        return np.zeros((count, len(self.emotion_ids)), dtype=self.dtype)
+
+    def above(self, thresholds: Dict[str, float]) -> np.ndarray:
+        """Return a bool matrix ``(personas, len(thresholds))``.
+
+        Each column tells whether the persona defines the emotion and its
+        value is at or above the threshold, in the order of ``thresholds``.
+        """
+        cols = np.array([self.columns[e] for e in thresholds], dtype=np.intp)
+        limits = np.array(list(thresholds.values()), dtype=self.dtype)
+        return (self.values[:, cols] >= limits) & self.defined[:, cols]
+
+    def state(self, key: Hashable) -> Dict[str, int]:
+        """Return a persona's values as a ``current_emotion_state`` dict."""
+        row = self.rows[key]
+        return {
+            emotion_id: int(round(float(self._values[row, col])))
+            for emotion_id, col in self.columns.items()
+            if self._defined[row, col]
+        }
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Indexed memory retrieval for prompt building.
+
+``MemoryIndex`` keeps ``memory_system.memories`` in posting lists ordered by
+``importance`` (highest first):
+
+- one list per associated emotion, per ``emotional_valence`` and per
+  ``type``, plus one over all memories,
+- an optional inverted text index over ``content`` (ASCII words and
+  character unigrams and bigrams of Japanese text).
+
+``top_k`` walks the relevant lists with a k-way merge and stops as soon as
+``k`` memories (or the token budget) are collected, so a query touches only
+the memories it returns plus the ones filtered out on the way, not the
+whole list.
+"""
+
+from __future__ import annotations
+
+import heapq
+import re
+import unicodedata
+from bisect import insort
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+# importanceが省略された記憶の重要度
+DEFAULT_IMPORTANCE = 50
+# 基準値からこの値以上高い感情を「高まっている」とみなす
+ELEVATION_MARGIN = 10
+# baselineが定義されていない感情の基準値
+DEFAULT_BASELINE = 50
+
+_ASCII_WORD = re.compile(r"[a-z0-9]+")
+_NON_ASCII_RUN = re.compile(r"[^\x00-\x7f\s、。，．・「」『』（）！？]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the prompt tokens of ``text``.
+
+    Non-ASCII characters (Japanese) count as one token each and ASCII text
+    as one token per four characters.
+    """
+    non_ascii = sum(1 for ch in text if not ch.isascii())
+    ascii_chars = len(text) - non_ascii
+    return non_ascii + (ascii_chars + 3) // 4
+
+
+def text_terms(text: str) -> Set[str]:
+    """Return the index terms of ``text``: ASCII words and Japanese unigrams and bigrams."""
+    normalized = unicodedata.normalize("NFKC", text).casefold()
+    terms = set(_ASCII_WORD.findall(normalized))
+    for run in _NON_ASCII_RUN.findall(normalized):
+        # 1文字の検索語（「猫」など）にも一致するよう、単一の文字も索引に含める
+        terms.update(run)
+        terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def query_terms(text: str) -> Set[str]:
+    """Return the terms a query must match: ASCII words and Japanese bigrams.
+
+    A Japanese run of a single character is looked up as a unigram.
+    """
+    normalized = unicodedata.normalize("NFKC", text).casefold()
+    terms = set(_ASCII_WORD.findall(normalized))
+    for run in _NON_ASCII_RUN.findall(normalized):
+        if len(run) == 1:
+            terms.add(run)
+        terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+class MemoryIndex:
+    """Importance-ordered posting lists over a profile's memories."""
+
+    def __init__(
+        self,
+        memories: List[Dict],
+        baselines: Dict[str, int] | None = None,
+        text_index: bool = False,
+    ) -> None:
+        self.memories: List[Dict] = []
+        self.baselines: Dict[str, int] = dict(baselines or {})
+        self.tokens: List[int] = []
+        # 投稿リストの要素は (-importance, 記憶番号) の昇順
+        self._all: List[Tuple[int, int]] = []
+        self._by_emotion: Dict[str, List[Tuple[int, int]]] = {}
+        self._by_valence: Dict[str, List[Tuple[int, int]]] = {}
+        self._by_type: Dict[str, List[Tuple[int, int]]] = {}
+        self._text: Dict[str, Set[int]] | None = {} if text_index else None
+        for memory in memories:
+            self._add(memory, append=True)
+        for postings in (self._all, *self._by_emotion.values(), *self._by_valence.values(), *self._by_type.values()):
+            postings.sort()
+
+    @classmethod
+    def from_profile(cls, profile: Dict, text_index: bool = False) -> "MemoryIndex":
+        baselines: Dict[str, int] = {}
+        emotion_system = profile.get("emotion_system") or {}
+        for group in ("emotions", "additional_emotions", "compound_emotions"):
+            for emotion_id, info in (emotion_system.get(group) or {}).items():
+                if isinstance(info, dict) and "baseline" in info:
+                    baselines[emotion_id] = info["baseline"]
+        memories = (profile.get("memory_system") or {}).get("memories") or []
+        return cls(memories, baselines, text_index)
+
+    def __len__(self) -> int:
+        return len(self.memories)
+
+    def add(self, memory: Dict) -> int:
+        """Index one more memory and return its position."""
+        return self._add(memory, append=False)
+
+    def _add(self, memory: Dict, append: bool) -> int:
+        # 初期構築時は末尾に追加して最後に一度だけ整列する
+        insert = list.append if append else insort
+        position = len(self.memories)
+        self.memories.append(memory)
+        self.tokens.append(estimate_tokens(memory.get("content") or ""))
+        importance = memory.get("importance")
+        key = (-(DEFAULT_IMPORTANCE if importance is None else importance), position)
+        insert(self._all, key)
+        for emotion_id in set(memory.get("associated_emotions") or ()):
+            insert(self._by_emotion.setdefault(emotion_id, []), key)
+        if memory.get("emotional_valence"):
+            insert(self._by_valence.setdefault(memory["emotional_valence"], []), key)
+        if memory.get("type"):
+            insert(self._by_type.setdefault(memory["type"], []), key)
+        if self._text is not None:
+            self._index_text(position)
+        return position
+
+    def _index_text(self, position: int) -> None:
+        for term in text_terms(self.memories[position].get("content") or ""):
+            self._text.setdefault(term, set()).add(position)
+
+    def _ensure_text_index(self) -> Dict[str, Set[int]]:
+        if self._text is None:
+            self._text = {}
+            for position in range(len(self.memories)):
+                self._index_text(position)
+        return self._text
+
+    def search(self, query: str) -> Set[int]:
+        """Return the positions of memories whose content contains every term of ``query``.
+
+        Japanese queries match on character bigrams, so a hit is a candidate
+        rather than a guaranteed substring match. The text index is built on
+        first use if it was not requested up front.
+        """
+        index = self._ensure_text_index()
+        terms = query_terms(query)
+        if not terms:
+            return set()
+        postings = sorted((index.get(term, set()) for term in terms), key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result &= posting
+            if not result:
+                break
+        return result
+
+    def elevated_emotions(self, state: Dict[str, int], margin: int = ELEVATION_MARGIN) -> List[str]:
+        """Return emotions at least ``margin`` above their baseline, highest rise first."""
+        rises = [
+            (value - self.baselines.get(emotion_id, DEFAULT_BASELINE), emotion_id)
+            for emotion_id, value in state.items()
+            if value - self.baselines.get(emotion_id, DEFAULT_BASELINE) >= margin
+        ]
+        rises.sort(key=lambda item: (-item[0], item[1]))
+        return [emotion_id for _, emotion_id in rises]
+
+    @staticmethod
+    def _merge(lists: List[List[Tuple[int, int]]]) -> Iterator[int]:
+        last = None
+        for _, position in heapq.merge(*lists):
+            if position != last:
+                last = position
+                yield position
+
+    def top_k(
+        self,
+        k: int | None = None,
+        emotions: Iterable[str] | None = None,
+        valence: str | Iterable[str] | None = None,
+        memory_type: str | Iterable[str] | None = None,
+        query: str | None = None,
+        token_budget: int | None = None,
+    ) -> List[Dict]:
+        """Return the most important memories matching every given filter.
+
+        ``emotions`` selects memories associated with any of the given
+        emotion ids. With ``token_budget``, memories that no longer fit are
+        skipped and smaller ones further down may still be included.
+        """
+        valences = {valence} if isinstance(valence, str) else set(valence or ())
+        types = {memory_type} if isinstance(memory_type, str) else set(memory_type or ())
+        matches = self.search(query) if query else None
+
+        # 最も絞り込める投稿リストを走査し、残りの条件は記憶ごとに確認する
+        if emotions is not None:
+            lists = [self._by_emotion[e] for e in dict.fromkeys(emotions) if e in self._by_emotion]
+            candidates = self._merge(lists)
+        elif valences:
+            candidates = self._merge([self._by_valence.get(v, []) for v in valences])
+        elif types:
+            candidates = self._merge([self._by_type.get(t, []) for t in types])
+        else:
+            candidates = (position for _, position in self._all)
+
+        selected: List[Dict] = []
+        remaining = token_budget
+        for position in candidates:
+            if k is not None and len(selected) >= k:
+                break
+            memory = self.memories[position]
+            if valences and memory.get("emotional_valence") not in valences:
+                continue
+            if types and memory.get("type") not in types:
+                continue
+            if matches is not None and position not in matches:
+                continue
+            if remaining is not None:
+                if self.tokens[position] > remaining:
+                    continue
+                remaining -= self.tokens[position]
+            selected.append(memory)
+            if remaining == 0:
+                break
+        return selected
+
+    def for_state(
+        self,
+        state: Dict[str, int],
+        k: int | None = None,
+        token_budget: int | None = None,
+        margin: int = ELEVATION_MARGIN,
+    ) -> List[Dict]:
+        """The most important memories tied to the currently elevated emotions."""
+        emotions = self.elevated_emotions(state, margin)
+        if not emotions:
+            return []
+        return self.top_k(k, emotions=emotions, token_budget=token_budget)
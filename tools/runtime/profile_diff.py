@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""Structural diff and patch of UPPS profile versions.
+
+``diff_profiles`` compares two versions of a profile as trees instead of
+as YAML text:
+
+- a subtree that is the very same object in both versions is skipped
+  without being walked, so versions produced by :func:`apply_patch` (which
+  shares everything it does not change) are compared in time proportional
+  to the patch,
+- list items are compared by a digest of their contents, computed at most
+  once per item; only items whose digests differ are walked, so a changed
+  memory costs one walk of that memory,
+- lists whose items all carry a unique string ``id`` (memories,
+  associations, ...) are matched by ``id`` rather than by position, so
+  inserting one memory does not show up as a change of every later one,
+- other lists are compared position by position.
+
+The result is a compact list of operations (a patch) that only mentions
+what changed. Paths are lists of keys, list positions and, in lists
+matched by ``id``, item ids::
+
+    {"op": "set", "path": ["memory_system", "memories", "fire_incident", "importance"], "value": 80}
+    {"op": "delete", "path": ["personality", "description"]}
+    {"op": "remove", "path": ["association_system", "associations"], "ids": ["a_12"]}
+    {"op": "insert", "path": ["memory_system", "memories"], "items": [[3, {...}]]}
+    {"op": "truncate", "path": ["personal_info", "aliases"], "length": 2}
+    {"op": "order", "path": ["memory_system", "memories"], "ids": [...]}
+
+``apply_patch`` applies a patch copy-on-write: only the containers on the
+changed paths are copied and everything else is shared with the input, so
+diffing the result against its input again is proportional to the patch.
+``change_entries`` turns the emotion baseline and association strength
+changes of a patch into ``(kind, target, amount, event)`` tuples for
+``ChangeStore.append_many``, and ``apply_to_change_tracking`` merges them
+into a ``change_tracking`` section.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import pickle
+from typing import Any, Dict, Iterator, List, Tuple
+
+from change_store import KIND_ASSOCIATION, KIND_EMOTION, ChangeStore
+
+Path = List[Any]
+Patch = List[Dict[str, Any]]
+
+# 基準値の変化を change_tracking に記録する感情の定義
+EMOTION_SECTIONS = ("emotions", "additional_emotions")
+
+_MISSING = object()
+
+
+class PatchError(ValueError):
+    """Raised when a patch does not fit the profile it is applied to."""
+
+
+def subtree_digest(value: Any) -> bytes:
+    """Return a digest identifying the contents of ``value``."""
+    return hashlib.blake2b(
+        pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), digest_size=16
+    ).digest()
+
+
+def _id_keys(items: List) -> List[str] | None:
+    """Return the ids of ``items`` if every item is a mapping with a unique string ``id``."""
+    ids = []
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("id"), str):
+            return None
+        ids.append(item["id"])
+    return ids if len(set(ids)) == len(ids) else None
+
+
+class _Differ:
+    """Walk two trees and collect the operations turning one into the other."""
+
+    def __init__(self) -> None:
+        self.ops: Patch = []
+        # id(オブジェクト) -> (オブジェクト, ダイジェスト)（比較中は両方の版が生存している）
+        self._digests: Dict[int, Tuple[Any, bytes]] = {}
+
+    def digest(self, value: Any) -> bytes:
+        cached = self._digests.get(id(value))
+        if cached is not None and cached[0] is value:
+            return cached[1]
+        digest = subtree_digest(value)
+        self._digests[id(value)] = (value, digest)
+        return digest
+
+    def same(self, old: Any, new: Any) -> bool:
+        if old is new:
+            return True
+        if not isinstance(old, (dict, list)) or not isinstance(new, (dict, list)):
+            return type(old) is type(new) and old == new
+        return self.digest(old) == self.digest(new)
+
+    def diff(self, path: Path, old: Any, new: Any) -> None:
+        if old is new:
+            return
+        if isinstance(old, dict) and isinstance(new, dict):
+            # 辞書はダイジェストを求めずに降りる（祖先ごとに部分木全体を直列化しないため）
+            self.diff_dict(path, old, new)
+        elif isinstance(old, list) and isinstance(new, list):
+            old_ids, new_ids = _id_keys(old), _id_keys(new)
+            if old_ids is not None and new_ids is not None and (old or new):
+                self.diff_id_list(path, old, new, old_ids, new_ids)
+            else:
+                self.diff_list(path, old, new)
+        elif not self.same(old, new):
+            self.ops.append({"op": "set", "path": path, "value": new})
+
+    def diff_dict(self, path: Path, old: Dict, new: Dict) -> None:
+        for key, value in old.items():
+            if key not in new:
+                self.ops.append({"op": "delete", "path": path + [key]})
+            else:
+                self.diff(path + [key], value, new[key])
+        for key, value in new.items():
+            if key not in old:
+                self.ops.append({"op": "set", "path": path + [key], "value": value})
+
+    def diff_list(self, path: Path, old: List, new: List) -> None:
+        for i in range(min(len(old), len(new))):
+            if not self.same(old[i], new[i]):
+                self.diff(path + [i], old[i], new[i])
+        if len(new) < len(old):
+            self.ops.append({"op": "truncate", "path": path, "length": len(new)})
+        elif len(new) > len(old):
+            self.ops.append(
+                {"op": "insert", "path": path, "items": [[i, new[i]] for i in range(len(old), len(new))]}
+            )
+
+    def diff_id_list(
+        self, path: Path, old: List, new: List, old_ids: List[str], new_ids: List[str]
+    ) -> None:
+        new_positions = {item_id: i for i, item_id in enumerate(new_ids)}
+        old_positions = {item_id: i for i, item_id in enumerate(old_ids)}
+        removed = [item_id for item_id in old_ids if item_id not in new_positions]
+        if removed:
+            self.ops.append({"op": "remove", "path": path, "ids": removed})
+        for i, item_id in enumerate(old_ids):
+            j = new_positions.get(item_id)
+            if j is not None and not self.same(old[i], new[j]):
+                self.diff(path + [item_id], old[i], new[j])
+        added = [[j, new[j]] for j, item_id in enumerate(new_ids) if item_id not in old_positions]
+        if added:
+            self.ops.append({"op": "insert", "path": path, "items": added})
+        # 残った項目の相対順が変わらなければ、追加位置への挿入だけで新しい順序になる
+        survivors = [item_id for item_id in old_ids if item_id in new_positions]
+        kept_order = [item_id for item_id in new_ids if item_id in old_positions]
+        if survivors != kept_order:
+            self.ops.append({"op": "order", "path": path, "ids": list(new_ids)})
+
+
+def diff_profiles(old: Dict, new: Dict) -> Patch:
+    """Return the patch that turns profile ``old`` into ``new``."""
+    differ = _Differ()
+    differ.diff([], old, new)
+    return differ.ops
+
+
+class _Patcher:
+    """Apply operations copy-on-write, copying each container at most once."""
+
+    def __init__(self, root: Any) -> None:
+        self._copied: Dict[int, Any] = {}
+        self.root = self._own(root)
+        # id(リスト) -> {項目のid: 位置}
+        self._id_index: Dict[int, Dict[str, int]] = {}
+
+    def _own(self, container: Any) -> Any:
+        if id(container) in self._copied and self._copied[id(container)] is container:
+            return container
+        if isinstance(container, dict):
+            copy = dict(container)
+        elif isinstance(container, list):
+            copy = list(container)
+        else:
+            raise PatchError(f"辞書またはリストではない値の中は変更できません: {container!r}")
+        self._copied[id(copy)] = copy
+        return copy
+
+    def _position(self, items: List, segment: Any) -> int:
+        if isinstance(segment, int) and not isinstance(segment, bool):
+            if not 0 <= segment < len(items):
+                raise PatchError(f"リストの範囲外の位置です: {segment}")
+            return segment
+        positions = self._id_index.get(id(items))
+        if positions is None:
+            positions = {
+                item.get("id"): i for i, item in enumerate(items) if isinstance(item, dict)
+            }
+            self._id_index[id(items)] = positions
+        if segment not in positions:
+            raise PatchError(f"id '{segment}' の項目が見つかりません")
+        return positions[segment]
+
+    def _child(self, container: Any, segment: Any, path: Path) -> Any:
+        if isinstance(container, dict):
+            if segment not in container:
+                raise PatchError(f"パス {path} が見つかりません")
+            key = segment
+        elif isinstance(container, list):
+            key = self._position(container, segment)
+        else:
+            raise PatchError(f"パス {path} が見つかりません")
+        child = self._own(container[key])
+        container[key] = child
+        return child
+
+    def container(self, path: Path) -> Any:
+        """Return the (copied) container at ``path``, copying every container on the way."""
+        node = self.root
+        for depth, segment in enumerate(path):
+            node = self._child(node, segment, path[: depth + 1])
+        return node
+
+    def _changed(self, items: List) -> None:
+        self._id_index.pop(id(items), None)
+
+    def apply(self, op: Dict) -> None:
+        kind = op.get("op")
+        path = list(op.get("path", []))
+        if kind in ("set", "delete"):
+            if not path:
+                if kind == "set":
+                    self.root = op["value"]
+                    return
+                raise PatchError("ルートは削除できません")
+            parent = self.container(path[:-1])
+            segment = path[-1]
+            if isinstance(parent, dict):
+                if kind == "set":
+                    parent[segment] = op["value"]
+                elif segment in parent:
+                    del parent[segment]
+                else:
+                    raise PatchError(f"パス {path} が見つかりません")
+            elif kind == "set":
+                parent[self._position(parent, segment)] = op["value"]
+            else:
+                del parent[self._position(parent, segment)]
+                self._changed(parent)
+            return
+        items = self.container(path)
+        if not isinstance(items, list):
+            raise PatchError(f"パス {path} はリストではありません")
+        if kind == "remove":
+            removed = set(op["ids"])
+            items[:] = [
+                item for item in items if not (isinstance(item, dict) and item.get("id") in removed)
+            ]
+        elif kind == "insert":
+            for index, item in op["items"]:
+                items.insert(index, item)
+        elif kind == "truncate":
+            del items[op["length"]:]
+        elif kind == "order":
+            by_id = {item.get("id"): item for item in items if isinstance(item, dict)}
+            if set(by_id) != set(op["ids"]) or len(items) != len(op["ids"]):
+                raise PatchError(f"パス {path} の項目が並べ替え後のidと一致しません")
+            items[:] = [by_id[item_id] for item_id in op["ids"]]
+        else:
+            raise PatchError(f"未知の操作です: {kind}")
+        self._changed(items)
+
+
+def apply_patch(profile: Dict, patch: Patch) -> Dict:
+    """Return ``profile`` with ``patch`` applied; ``profile`` itself is not modified.
+
+    Containers that the patch does not touch are shared with ``profile``.
+    Raises ``PatchError`` if a path does not exist.
+    """
+    patcher = _Patcher(profile)
+    for op in patch:
+        patcher.apply(op)
+    return patcher.root
+
+
+def _lookup(profile: Any, path: Path) -> Any:
+    node = profile
+    for segment in path:
+        if isinstance(node, dict):
+            node = node.get(segment, _MISSING)
+        elif isinstance(node, list):
+            if isinstance(segment, int):
+                node = node[segment] if 0 <= segment < len(node) else _MISSING
+            else:
+                node = next(
+                    (item for item in node if isinstance(item, dict) and item.get("id") == segment),
+                    _MISSING,
+                )
+        else:
+            return _MISSING
+        if node is _MISSING:
+            return _MISSING
+    return node
+
+
+def _changed_targets(patch: Patch) -> Iterator[Tuple[str, Path]]:
+    """Yield ``(kind, path of the emotion/association)`` touched by ``patch``."""
+    for op in patch:
+        path = op.get("path", [])
+        if op.get("op") not in ("set", "delete") or len(path) < 2:
+            continue
+        if path[0] == "emotion_system" and path[1] in EMOTION_SECTIONS and len(path) >= 3:
+            yield KIND_EMOTION, path[:3]
+        elif path[:2] == ["association_system", "associations"] and len(path) >= 3:
+            yield KIND_ASSOCIATION, path[:3]
+
+
+def change_entries(old: Dict, new: Dict, patch: Patch, event: str = "") -> List[Tuple[str, str, int, str]]:
+    """Return the ``change_tracking`` changes made by ``patch`` (``old`` -> ``new``).
+
+    An emotion whose ``baseline`` or an association whose
+    ``response.association_strength`` differs between the versions gives
+    one ``(kind, target, amount, event)`` tuple. Added and removed
+    emotions/associations are not changes of an existing value and are
+    left out.
+    """
+    changes = []
+    seen = set()
+    for kind, path in _changed_targets(patch):
+        key = (kind, tuple(path))
+        if key in seen:
+            continue
+        seen.add(key)
+        before, after = _lookup(old, path), _lookup(new, path)
+        if not isinstance(before, dict) or not isinstance(after, dict):
+            continue
+        if kind == KIND_EMOTION:
+            target = path[2]
+            old_value, new_value = before.get("baseline"), after.get("baseline")
+        else:
+            target = after.get("id", path[2])
+            old_value = (before.get("response") or {}).get("association_strength")
+            new_value = (after.get("response") or {}).get("association_strength")
+        if isinstance(old_value, int) and isinstance(new_value, int) and old_value != new_value:
+            changes.append((kind, target, new_value - old_value, event))
+    return changes
+
+
+def apply_to_change_tracking(
+    change_tracking: Dict | None, changes: List[Tuple[str, str, int, str]]
+) -> Dict:
+    """Return ``change_tracking`` with ``changes`` appended.
+
+    The existing entries and logs are kept; the cumulative limits of the
+    schema are enforced by ``ChangeStore`` (``ChangeLimitError``).
+    """
+    persona = "profile"
+    with ChangeStore(":memory:") as store:
+        store.import_change_tracking(persona, change_tracking or {})
+        if changes:
+            store.append_many(persona, changes)
+        return store.materialize(persona)
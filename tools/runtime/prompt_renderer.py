@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""Incremental system-prompt renderer for UPPS personas.
+
+``PromptRenderer`` compiles a prompt template from ``prompting/templates``
+or ``prompting/providers`` into ordered segments:
+
+1. the template text before the persona YAML,
+2. one YAML segment per static profile section (``personal_info``,
+   ``background``, ``personality``, ``emotion_system``, ``memory_system``,
+   ``cognitive_system``, ``association_system``, ``dialogue_instructions``
+   and any other dialogue section), in a fixed order,
+3. the template text after the persona YAML (execution rules),
+4. a final dynamic segment with ``current_emotion_state`` and
+   ``session_context``.
+
+Static segments are rendered once per profile version and reused; only the
+dynamic segment is rendered on every turn. A profile version is recognised
+either by a caller-supplied key or by the identity of its static section
+objects, so looking it up costs the same for any profile size. Versions
+made by ``profile_diff.apply_patch`` replace exactly the sections they
+change and are picked up without a key. Because everything that changes
+between turns comes last and the static part is byte-identical across
+turns, provider-side prompt prefix caching keeps hitting.
+
+``non_dialogue_metadata`` and ``change_tracking`` are not referenced during
+dialogue and are left out. The sample opening question at the end of a
+template is dropped; the caller supplies the real user turn.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Hashable, List, Tuple
+
+import yaml
+
+# libyamlが利用可能な場合はCダンパーを使用する
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+PROMPTING_DIR = Path(__file__).resolve().parents[2] / "prompting"
+
+# テンプレート名 -> prompting/ からの相対パス
+TEMPLATES = {
+    "basic": "templates/basic_template.md",
+    "standard": "templates/standard_template.md",
+    "openai": "providers/openai_gpt_template.md",
+    "anthropic": "providers/anthropic_claude_template.md",
+    "google": "providers/google_gemini_template.md",
+    "meta": "providers/meta_llama_template.md",
+}
+
+# 静的セクションの出力順（ここにないセクションは後ろに名前順で並べる）
+STATIC_SECTIONS = (
+    "personal_info",
+    "background",
+    "personality",
+    "values",
+    "likes",
+    "dislikes",
+    "emotion_system",
+    "memory_system",
+    "cognitive_system",
+    "association_system",
+    "dialogue_instructions",
+)
+DYNAMIC_SECTIONS = ("current_emotion_state", "session_context")
+# 対話では参照しないセクション
+EXCLUDED_SECTIONS = ("non_dialogue_metadata", "change_tracking")
+
+# 静的セグメントを保持するプロファイルの件数
+STATIC_CACHE_SIZE = 128
+
+ROLE_SYSTEM = "system"
+ROLE_USER = "user"
+
+_BLOCK_PATTERN = re.compile(r"^````[^\n]*\n(.*?)^````", re.S | re.M)
+_YAML_FENCE_PATTERN = re.compile(r"^```yaml\n.*?^```[ \t]*\n?", re.S | re.M)
+_PLACEHOLDER_MARKERS = ("[ペルソナデータをここに挿入]", "ここにUPPSペルソナ")
+# テンプレート末尾の例示用の最初の発話
+_OPENING_PATTERN = re.compile(r"^(## 初期対話|人間:|<user>|\*\*初回質問\*\*|こんにちは)", re.M)
+
+
+@dataclass(frozen=True)
+class Segment:
+    """One ordered piece of a rendered prompt."""
+
+    name: str
+    role: str
+    text: str
+    static: bool
+
+
+@dataclass
+class RenderedPrompt:
+    segments: List[Segment]
+
+    @property
+    def static_prefix(self) -> str:
+        """Concatenated text of the leading static segments."""
+        parts = []
+        for segment in self.segments:
+            if not segment.static:
+                break
+            parts.append(segment.text)
+        return "".join(parts)
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Join the segments into chat messages, one per role, in order."""
+        messages: List[Dict[str, str]] = []
+        for segment in self.segments:
+            if messages and messages[-1]["role"] == segment.role:
+                messages[-1]["content"] += segment.text
+            else:
+                messages.append({"role": segment.role, "content": segment.text})
+        for message in messages:
+            message["content"] = message["content"].strip() + "\n"
+        return messages
+
+    @property
+    def text(self) -> str:
+        return "\n".join(message["content"] for message in self.messages())
+
+
+def dump_section(name: str, value, sort_keys: bool = False) -> str:
+    return yaml.dump(
+        {name: value},
+        Dumper=YAML_DUMPER,
+        allow_unicode=True,
+        sort_keys=sort_keys,
+        default_flow_style=False,
+    )
+
+
+@dataclass(frozen=True)
+class _StaticEntry:
+    head: List[Segment]
+    tail: List[Segment]
+    # キーを省略した場合の識別に使ったセクションのオブジェクト（idの再利用を防ぐため保持する）
+    sections: Tuple = ()
+
+
+@dataclass(frozen=True)
+class _Block:
+    role: str
+    prefix: str
+    suffix: str
+    has_persona: bool
+
+
+def _strip_opening(text: str) -> str:
+    match = _OPENING_PATTERN.search(text)
+    if match is None:
+        return text
+    head = text[: match.start()].rstrip()
+    if head.endswith("---"):
+        head = head[:-3].rstrip()
+    return head + "\n"
+
+
+def parse_template(source: str) -> List[_Block]:
+    """Split a template document into message blocks around the persona YAML."""
+    bodies = _BLOCK_PATTERN.findall(source)
+    if not bodies:
+        raise ValueError("テンプレートに ```` で囲まれたプロンプトが見つかりません")
+    persona_index, persona_match = None, None
+    for index, body in enumerate(bodies):
+        for match in _YAML_FENCE_PATTERN.finditer(body):
+            if any(marker in match.group() for marker in _PLACEHOLDER_MARKERS):
+                persona_index, persona_match = index, match
+                break
+        if persona_match:
+            break
+    if persona_match is None:
+        # プレースホルダーがない場合は最初のYAML例をペルソナとみなす
+        for index, body in enumerate(bodies):
+            persona_match = _YAML_FENCE_PATTERN.search(body)
+            if persona_match:
+                persona_index = index
+                break
+    if persona_match is None:
+        raise ValueError("テンプレートにペルソナを挿入するYAMLブロックが見つかりません")
+
+    blocks = []
+    for index, body in enumerate(bodies):
+        role = ROLE_USER if len(bodies) > 1 and index > 0 else ROLE_SYSTEM
+        if index == persona_index:
+            prefix = body[: persona_match.start()]
+            suffix = _strip_opening(body[persona_match.end():])
+            blocks.append(_Block(role, prefix, suffix, True))
+        else:
+            blocks.append(_Block(role, _strip_opening(body), "", False))
+    return blocks
+
+
+class PromptRenderer:
+    """Render profiles against one prompt template, caching static segments."""
+
+    def __init__(self, template: str | Path, cache_size: int = STATIC_CACHE_SIZE) -> None:
+        """``template`` is a name from ``TEMPLATES`` or a path to a template file."""
+        if str(template) in TEMPLATES:
+            path = PROMPTING_DIR / TEMPLATES[str(template)]
+        else:
+            path = Path(template)
+        self.template_path = path
+        self.blocks = parse_template(path.read_text(encoding="utf-8"))
+        self.cache_size = cache_size
+        self._static: "OrderedDict[Hashable, _StaticEntry]" = OrderedDict()
+        self._persona_role = next(block.role for block in self.blocks if block.has_persona)
+
+    @staticmethod
+    def static_sections(profile: Dict) -> List[str]:
+        excluded = set(DYNAMIC_SECTIONS) | set(EXCLUDED_SECTIONS)
+        ordered = [name for name in STATIC_SECTIONS if name in profile]
+        extra = sorted(name for name in profile if name not in excluded and name not in STATIC_SECTIONS)
+        return ordered + extra
+
+    def _compile_static(self, profile: Dict) -> Tuple[List[Segment], List[Segment]]:
+        """Return the static segments before and after the dynamic segment."""
+        head: List[Segment] = []
+        tail: List[Segment] = []
+        after_persona = False
+        for block in self.blocks:
+            target = tail if after_persona and block.role != self._persona_role else head
+            if block.prefix:
+                target.append(Segment("template", block.role, block.prefix, True))
+            if block.has_persona:
+                target.append(Segment("persona_start", block.role, "```yaml\n", True))
+                for name in self.static_sections(profile):
+                    target.append(Segment(name, block.role, dump_section(name, profile[name]), True))
+                target.append(Segment("persona_end", block.role, "```\n", True))
+                after_persona = True
+            if block.suffix:
+                target.append(Segment("template", block.role, block.suffix, True))
+        return head, tail
+
+    def render_dynamic(self, profile: Dict) -> Segment:
+        """Render ``current_emotion_state`` and ``session_context``."""
+        parts = [
+            dump_section(name, profile[name], sort_keys=True)
+            for name in DYNAMIC_SECTIONS
+            if profile.get(name) is not None
+        ]
+        text = "\n## 現在の状態\n\n```yaml\n" + "".join(parts) + "```\n" if parts else ""
+        return Segment("dynamic_state", self._persona_role, text, False)
+
+    def render(self, profile: Dict, key: Hashable | None = None) -> RenderedPrompt:
+        """Render ``profile``; static segments are reused for the same version.
+
+        ``key`` identifies the static content of the profile (e.g. persona id
+        and file hash). Without it, the version is identified by the static
+        section objects themselves: a section replaced by a new object is a
+        new version, but a section changed in place is not noticed until
+        :meth:`invalidate` is called.
+        """
+        names = self.static_sections(profile)
+        sections: Tuple = ()
+        if key is None:
+            sections = tuple(profile[name] for name in names)
+            key = ("sections", tuple(names), tuple(map(id, sections)))
+        cached = self._static.get(key)
+        if cached is not None and all(a is b for a, b in zip(cached.sections, sections)):
+            self._static.move_to_end(key)
+        else:
+            cached = _StaticEntry(*self._compile_static(profile), sections)
+            self._static[key] = cached
+            if len(self._static) > self.cache_size:
+                self._static.popitem(last=False)
+        return RenderedPrompt(cached.head + [self.render_dynamic(profile)] + cached.tail)
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """Forget the static segments of ``key``, or of every profile if omitted.
+
+        Needed after a static section of a profile was modified in place.
+        """
+        if key is None:
+            self._static.clear()
+        else:
+            self._static.pop(key, None)
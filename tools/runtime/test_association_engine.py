@@ -0,0 +1,145 @@
+"""Tests for the association activation engine."""
+
+from pathlib import Path
+
+import yaml
+
+from association_engine import DEFAULT_EMOTION_THRESHOLD, AssociationEngine
+
+PERSONA = Path(__file__).resolve().parents[2] / "persona_lib" / "rachel_bladerunner.yaml"
+
+
+def association(assoc_id, trigger, strength=50):
+    return {
+        "id": assoc_id,
+        "trigger": trigger,
+        "response": {"type": "memory", "id": "m1", "association_strength": strength},
+    }
+
+
+def emotion(emotion_id, threshold=None):
+    trigger = {"type": "emotion", "id": emotion_id}
+    if threshold is not None:
+        trigger["threshold"] = threshold
+    return trigger
+
+
+def fired(activations):
+    return [a.association_id for a in activations]
+
+
+def test_emotion_trigger_fires_once_when_the_threshold_is_crossed():
+    engine = AssociationEngine([association("fear70", emotion("fear", 70))], {"fear": 40})
+    assert fired(engine.update({"fear": 69})) == []
+    assert fired(engine.update({"fear": 70})) == ["fear70"]
+    # 閾値以上に留まる間は再発火しない
+    assert fired(engine.update({"fear": 90})) == []
+    assert fired(engine.update({"fear": 75})) == []
+
+
+def test_emotion_trigger_rearms_after_falling_back_below_the_threshold():
+    engine = AssociationEngine([association("fear70", emotion("fear", 70))], {"fear": 40})
+    assert fired(engine.update({"fear": 80})) == ["fear70"]
+    assert fired(engine.update({"fear": 70})) == []
+    assert fired(engine.update({"fear": 50})) == []
+    assert fired(engine.update({"fear": 71})) == ["fear70"]
+
+
+def test_one_update_fires_every_crossed_threshold():
+    engine = AssociationEngine(
+        [
+            association("t30", emotion("fear", 30)),
+            association("t60", emotion("fear", 60)),
+            association("t90", emotion("fear", 90)),
+            association("default", emotion("fear")),
+        ],
+        {"fear": 30},
+    )
+    assert set(fired(engine.update({"fear": 60}))) == {"t60", "default"}
+    assert DEFAULT_EMOTION_THRESHOLD == 50
+
+
+def test_memory_and_external_triggers_fire_every_turn():
+    engine = AssociationEngine(
+        [
+            association("memory", {"type": "memory", "id": "fire"}),
+            association("external", {"type": "external", "items": ["Rain"]}),
+        ]
+    )
+    for _ in range(2):
+        assert set(fired(engine.update(recalled_memories=["fire"], external_items=["rain"]))) == {
+            "memory",
+            "external",
+        }
+    assert fired(engine.update(recalled_memories=["other"], external_items=["snow"])) == []
+
+
+def compound(assoc_id, operator, *conditions, strength=50):
+    return association(assoc_id, {"operator": operator, "conditions": list(conditions)}, strength)
+
+
+def test_and_compound_requires_every_condition():
+    engine = AssociationEngine(
+        [
+            compound(
+                "and",
+                "AND",
+                {"type": "emotion", "id": "fear", "threshold": 60},
+                {"type": "memory", "id": "fire"},
+                {"type": "external", "items": ["smoke"]},
+            )
+        ],
+        {"fear": 20},
+    )
+    assert fired(engine.update({"fear": 70})) == []
+    assert fired(engine.update(recalled_memories=["fire"])) == []
+    # 感情条件は現在値で判定し、記憶・外部条件は同じターンの観測で満たす
+    assert fired(engine.update(recalled_memories=["fire"], external_items=["SMOKE"])) == ["and"]
+    engine.update({"fear": 10})
+    assert fired(engine.update(recalled_memories=["fire"], external_items=["smoke"])) == []
+
+
+def test_or_compound_fires_on_any_condition():
+    engine = AssociationEngine(
+        [
+            compound(
+                "or",
+                "OR",
+                {"type": "emotion", "id": "fear", "threshold": 60},
+                {"type": "memory", "id": "fire"},
+            )
+        ],
+        {"fear": 20},
+    )
+    assert fired(engine.update({"fear": 70})) == ["or"]
+    assert fired(engine.update({"fear": 80})) == []
+    assert fired(engine.update(recalled_memories=["fire"])) == ["or"]
+    assert fired(engine.update(recalled_memories=["other"])) == []
+
+
+def test_activations_are_ranked_by_strength_then_definition_order():
+    engine = AssociationEngine(
+        [
+            association("weak", {"type": "memory", "id": "m"}, 10),
+            association("strong_b", {"type": "memory", "id": "m"}, 90),
+            association("strong_a", {"type": "memory", "id": "m"}, 90),
+            association("middle", {"type": "memory", "id": "m"}, 50),
+        ]
+    )
+    assert fired(engine.update(recalled_memories=["m"])) == ["strong_b", "strong_a", "middle", "weak"]
+    assert fired(engine.update(recalled_memories=["m"], limit=2)) == ["strong_b", "strong_a"]
+
+
+def test_from_profile_starts_from_the_current_emotion_state():
+    with open(PERSONA, "r", encoding="utf-8") as f:
+        profile = yaml.safe_load(f)
+    profile["current_emotion_state"] = {"joy": 5}
+    engine = AssociationEngine.from_profile(profile)
+    assert engine.state["joy"] == 5
+    baselines = {
+        emotion_id: info["baseline"]
+        for emotion_id, info in profile["emotion_system"]["emotions"].items()
+        if emotion_id != "joy"
+    }
+    assert {k: engine.state[k] for k in baselines} == baselines
+    assert len(engine.associations) == len(profile["association_system"]["associations"])
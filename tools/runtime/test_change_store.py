@@ -0,0 +1,108 @@
+"""Tests for the append-only change_tracking store."""
+
+import pytest
+
+from change_store import KIND_ASSOCIATION, KIND_EMOTION, ChangeLimitError, ChangeStore
+
+T = "2025-01-15T10:30:00Z"
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ChangeStore(str(tmp_path / "changes.sqlite"), snapshot_interval=4) as store:
+        yield store
+
+
+def test_emotion_baseline_limit_is_plus_minus_50(store):
+    store.append("p", KIND_EMOTION, "fear", 30, recorded_at=T)
+    store.append("p", KIND_EMOTION, "fear", 20, recorded_at=T)
+    assert store.cumulative("p", KIND_EMOTION, "fear") == 50
+    with pytest.raises(ChangeLimitError):
+        store.append("p", KIND_EMOTION, "fear", 1, recorded_at=T)
+    store.append("p", KIND_EMOTION, "joy", -50, recorded_at=T)
+    with pytest.raises(ChangeLimitError):
+        store.append("p", KIND_EMOTION, "joy", -1, recorded_at=T)
+    # 上限を超えた追記は記録されない
+    assert store.last_seq("p") == 3
+    assert store.cumulative("p", KIND_EMOTION, "fear") == 50
+
+
+def test_association_strength_limit_is_plus_minus_100(store):
+    store.append("p", KIND_ASSOCIATION, "a1", 100, recorded_at=T)
+    with pytest.raises(ChangeLimitError):
+        store.append("p", KIND_ASSOCIATION, "a1", 1, recorded_at=T)
+    store.append("p", KIND_ASSOCIATION, "a1", -200, recorded_at=T)
+    assert store.cumulative("p", KIND_ASSOCIATION, "a1") == -100
+    with pytest.raises(ChangeLimitError):
+        store.append("p", KIND_ASSOCIATION, "a2", -101, recorded_at=T)
+
+
+def test_limits_are_per_persona_and_target(store):
+    store.append("p", KIND_EMOTION, "fear", 50, recorded_at=T)
+    store.append("q", KIND_EMOTION, "fear", 50, recorded_at=T)
+    store.append("p", KIND_EMOTION, "joy", 50, recorded_at=T)
+    assert store.last_seq("p") == 2
+    assert store.last_seq("q") == 1
+
+
+def test_append_many_rolls_back_every_change_on_a_limit_error(store):
+    store.append("p", KIND_EMOTION, "fear", 10, recorded_at=T)
+    with pytest.raises(ChangeLimitError):
+        store.append_many(
+            "p",
+            [
+                (KIND_EMOTION, "joy", 5, "first"),
+                (KIND_ASSOCIATION, "a1", 40, "second"),
+                (KIND_EMOTION, "fear", 41, "too much"),
+            ],
+        )
+    assert store.last_seq("p") == 1
+    assert store.totals("p") == {(KIND_EMOTION, "fear"): (10, 1)}
+    assert len(store.materialize("p")["emotion_baseline_changes"][0]["change_log"]) == 1
+
+
+def test_unknown_kind_is_rejected_without_writing(store):
+    with pytest.raises(ValueError):
+        store.append("p", "memory", "m1", 1)
+    assert store.last_seq("p") == 0
+
+
+def test_history_is_rebuilt_from_snapshots(store):
+    amounts = [5, -3, 7, 2, -4, 6, 1, -2, 3]
+    for amount in amounts:
+        store.append("p", KIND_EMOTION, "fear", amount, "event", recorded_at=T)
+    for upto in range(1, len(amounts) + 1):
+        assert store.totals("p", upto)[(KIND_EMOTION, "fear")] == (sum(amounts[:upto]), 1)
+
+
+def test_materialize_renders_change_tracking(store):
+    store.append("p", KIND_EMOTION, "fear", -2, "exposure", recorded_at=T)
+    store.append("p", KIND_ASSOCIATION, "a1", 10, "practice", recorded_at=T)
+    store.append("p", KIND_EMOTION, "fear", -3, "exposure", recorded_at=T)
+
+    assert store.materialize("p") == {
+        "emotion_baseline_changes": [
+            {
+                "emotion_id": "fear",
+                "cumulative_change": -5,
+                "change_log": [f"{T} -2 exposure", f"{T} -3 exposure"],
+            }
+        ],
+        "association_strength_changes": [
+            {"association_id": "a1", "cumulative_change": 10, "change_log": [f"{T} +10 practice"]}
+        ],
+    }
+    limited = store.materialize("p", log_limit=1)
+    assert limited["emotion_baseline_changes"][0]["change_log"] == [f"{T} -3 exposure"]
+    assert store.materialize("p", upto=1)["emotion_baseline_changes"][0]["cumulative_change"] == -2
+
+
+def test_import_round_trips_an_existing_section(store):
+    section = {
+        "emotion_baseline_changes": [
+            {"emotion_id": "fear", "cumulative_change": -10, "change_log": [f"{T} -10 therapy"]}
+        ],
+        "association_strength_changes": [{"association_id": "a1", "cumulative_change": 20}],
+    }
+    store.import_change_tracking("p", section)
+    assert store.materialize("p") == section
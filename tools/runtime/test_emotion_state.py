@@ -0,0 +1,100 @@
+"""Tests for the vectorised emotion state store."""
+
+import numpy as np
+import pytest
+
+from emotion_state import EmotionStateStore
+
+
+def profile(baselines, current=None, compounds=None):
+    emotion_system = {"emotions": {e: {"baseline": b} for e, b in baselines.items()}}
+    if compounds:
+        emotion_system["compound_emotions"] = compounds
+    data = {"emotion_system": emotion_system}
+    if current:
+        data["current_emotion_state"] = current
+    return data
+
+
+@pytest.fixture
+def store():
+    store = EmotionStateStore()
+    store.add_persona("a", profile({"fear": 20, "joy": 60}, {"fear": 80}))
+    store.add_persona("b", profile({"fear": 50, "sadness": 40}))
+    return store
+
+
+def test_values_start_from_the_current_state_or_the_baseline(store):
+    assert store.state("a") == {"fear": 80, "joy": 60}
+    assert store.state("b") == {"fear": 50, "sadness": 40}
+    assert store.emotion_ids == ["fear", "joy", "sadness"]
+
+
+def test_decay_moves_values_toward_the_baseline(store):
+    store.decay(0.5)
+    assert store.state("a") == {"fear": 50, "joy": 60}
+    store.decay(1.0)
+    assert store.state("a")["fear"] == 20
+    # 感情列ごとの減衰率
+    store.apply_delta_map({"a": {"fear": 40, "joy": 20}})
+    store.decay(np.array([0.0, 1.0, 0.0], dtype=np.float32), personas=["a"])
+    assert store.state("a") == {"fear": 60, "joy": 60}
+
+
+def test_decay_of_selected_personas_leaves_the_others(store):
+    store.apply_delta_map({"b": {"fear": 30}})
+    store.decay(1.0, personas=["a"])
+    assert store.state("a")["fear"] == 20
+    assert store.state("b")["fear"] == 80
+
+
+def test_values_are_clamped_to_0_100(store):
+    store.apply_delta_map({"a": {"fear": 500, "joy": -500}})
+    assert store.state("a") == {"fear": 100, "joy": 0}
+    deltas = store.delta_matrix()
+    deltas[:, store.columns["sadness"]] = 1000
+    store.apply_deltas(deltas)
+    assert store.state("b")["sadness"] == 100
+    assert float(store.values.max()) <= 100
+    assert float(store.values.min()) >= 0
+
+
+def test_undefined_emotions_stay_zero_and_hidden(store):
+    store.apply_delta_map({"a": {"sadness": 50}})
+    assert "sadness" not in store.state("a")
+    assert store.values[store.rows["a"], store.columns["sadness"]] == 0
+
+
+def test_compound_emotions_are_the_mean_of_their_components():
+    store = EmotionStateStore()
+    compounds = {"anxiety": {"components": ["fear", "sadness"]}}
+    store.add_persona("a", profile({"fear": 20, "sadness": 40}, {"fear": 80}, compounds))
+    assert store.state("a") == {"fear": 80, "sadness": 40, "anxiety": 60}
+    assert store.baselines[0, store.columns["anxiety"]] == 30
+    store.apply_delta_map({"a": {"sadness": 20}})
+    assert store.state("a")["anxiety"] == 70
+    store.decay(1.0)
+    assert store.state("a")["anxiety"] == 30
+
+
+def test_compound_components_must_agree_between_personas():
+    store = EmotionStateStore()
+    store.add_persona("a", profile({"fear": 1, "joy": 1}, compounds={"mixed": {"components": ["fear", "joy"]}}))
+    with pytest.raises(ValueError):
+        store.add_persona("b", profile({"fear": 1}, compounds={"mixed": {"components": ["fear"]}}))
+
+
+def test_above_checks_thresholds_for_defined_emotions(store):
+    crossed = store.above({"fear": 60, "sadness": 40})
+    assert crossed.shape == (2, 2)
+    assert crossed.tolist() == [[True, False], [False, True]]
+
+
+def test_store_grows_beyond_its_initial_capacity():
+    store = EmotionStateStore()
+    for i in range(40):
+        store.add_persona(i, profile({"fear": i}))
+    assert store.size == 40
+    assert store.state(39) == {"fear": 39}
+    with pytest.raises(KeyError):
+        store.add_persona(0, profile({"fear": 1}))
@@ -0,0 +1,86 @@
+"""Tests for importance-ordered memory retrieval and text search."""
+
+import random
+
+import pytest
+
+from memory_index import MemoryIndex, estimate_tokens
+
+MEMORIES = [
+    {"id": "cat", "content": "猫と遊んだ", "importance": 60, "associated_emotions": ["joy"], "type": "episodic"},
+    {"id": "sea", "content": "海辺を歩いた", "importance": 90, "associated_emotions": ["joy", "calm"]},
+    {"id": "fire", "content": "The big fire at the old school", "importance": 80, "associated_emotions": ["fear"]},
+    {"id": "rain", "content": "雨の日、猫を拾った", "associated_emotions": ["sadness"], "emotional_valence": "negative"},
+]
+
+
+def ids(memories):
+    return [memory["id"] for memory in memories]
+
+
+@pytest.fixture
+def index():
+    return MemoryIndex(MEMORIES, {"joy": 40, "fear": 30})
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("猫", {"cat", "rain"}),
+        ("海", {"sea"}),
+        ("ｆｉｒｅ", {"fire"}),
+        ("猫 雨", {"rain"}),
+        ("海辺", {"sea"}),
+        ("猫と", {"cat"}),
+        ("犬", set()),
+        ("、", set()),
+    ],
+)
+def test_search_matches_one_character_and_longer_queries(index, query, expected):
+    assert {MEMORIES[i]["id"] for i in index.search(query)} == expected
+
+
+def test_top_k_returns_the_most_important_matches_first(index):
+    assert ids(index.top_k()) == ["sea", "fire", "cat", "rain"]
+    assert ids(index.top_k(2, emotions=["joy", "sadness"])) == ["sea", "cat"]
+    assert ids(index.top_k(emotions=["joy"], query="猫")) == ["cat"]
+    assert ids(index.top_k(valence="negative")) == ["rain"]
+    assert ids(index.top_k(memory_type="episodic")) == ["cat"]
+    assert index.top_k(emotions=["unknown"]) == []
+
+
+def test_token_budget_skips_memories_that_do_not_fit(index):
+    budget = estimate_tokens(MEMORIES[1]["content"]) + estimate_tokens(MEMORIES[0]["content"])
+    assert ids(index.top_k(token_budget=budget)) == ["sea", "cat"]
+
+
+def test_for_state_uses_the_elevated_emotions(index):
+    assert index.elevated_emotions({"joy": 45, "fear": 70, "sadness": 60}) == ["fear", "sadness"]
+    assert ids(index.for_state({"fear": 70, "sadness": 60})) == ["fire", "rain"]
+    assert index.for_state({"joy": 40}) == []
+
+
+def test_added_memories_keep_the_importance_order(index):
+    index.add({"id": "late", "content": "猫の夢", "importance": 95, "associated_emotions": ["joy"]})
+    assert ids(index.top_k(1, emotions=["joy"])) == ["late"]
+    assert {MEMORIES[i]["id"] if i < len(MEMORIES) else "late" for i in index.search("猫")} == {"cat", "rain", "late"}
+
+
+def test_top_k_agrees_with_a_full_sort():
+    rng = random.Random(0)
+    emotions = ["joy", "fear", "calm", "sadness"]
+    memories = [
+        {"id": f"m{i}", "importance": rng.randint(0, 100), "associated_emotions": rng.sample(emotions, 2)}
+        for i in range(200)
+    ]
+    index = MemoryIndex(memories)
+    for _ in range(20):
+        selected = rng.sample(emotions, 2)
+        k = rng.randint(1, 30)
+        expected = sorted(
+            (m for m in memories if set(m["associated_emotions"]) & set(selected)),
+            key=lambda m: -m["importance"],
+        )
+        assert [m["importance"] for m in index.top_k(k, emotions=selected)] == [
+            m["importance"] for m in expected[:k]
+        ]
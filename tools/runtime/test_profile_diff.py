@@ -0,0 +1,176 @@
+"""Tests for structural profile diffs and copy-on-write patches."""
+
+import copy
+import random
+from pathlib import Path
+
+import pytest
+import yaml
+
+from change_store import KIND_ASSOCIATION, KIND_EMOTION
+from profile_diff import (
+    PatchError,
+    apply_patch,
+    apply_to_change_tracking,
+    change_entries,
+    diff_profiles,
+)
+
+PERSONA = Path(__file__).resolve().parents[2] / "persona_lib" / "rachel_bladerunner.yaml"
+
+
+def base_profile():
+    with open(PERSONA, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def edits():
+    def memories(profile):
+        return profile["memory_system"]["memories"]
+
+    def insert_memory(profile):
+        memory = copy.deepcopy(memories(profile)[0])
+        memory["id"] = "new_memory"
+        memories(profile).insert(1, memory)
+
+    def reorder(profile):
+        memories(profile).reverse()
+
+    def remove_and_edit(profile):
+        del memories(profile)[0]
+        memories(profile)[-1]["importance"] = 1
+
+    def nested(profile):
+        profile["personal_info"]["aliases"] = ["a", "b", "c"]
+        profile["personal_info"].pop("occupation", None)
+        profile["new_section"] = {"x": [1, 2]}
+
+    return {
+        "unchanged": lambda profile: None,
+        "scalar": lambda profile: memories(profile)[0].__setitem__("importance", 80),
+        "insert-memory": insert_memory,
+        "reorder": reorder,
+        "remove-and-edit": remove_and_edit,
+        "nested": nested,
+        "type-change": lambda profile: profile["personal_info"].__setitem__("age", "unknown"),
+    }
+
+
+EDITS = edits()
+
+
+@pytest.mark.parametrize("edit", EDITS.values(), ids=EDITS.keys())
+def test_patch_round_trips(edit):
+    old = base_profile()
+    snapshot = copy.deepcopy(old)
+    new = base_profile()
+    edit(new)
+
+    patch = diff_profiles(old, new)
+    patched = apply_patch(old, patch)
+    assert patched == new
+    # 元の版は変更されない
+    assert old == snapshot
+    # 反映後の版との差分は空
+    assert diff_profiles(patched, new) == []
+
+
+def test_unchanged_profile_gives_an_empty_patch():
+    assert diff_profiles(base_profile(), base_profile()) == []
+
+
+def test_id_lists_are_matched_by_id():
+    old = base_profile()
+    new = base_profile()
+    memory = copy.deepcopy(new["memory_system"]["memories"][0])
+    memory["id"] = "new_memory"
+    new["memory_system"]["memories"].insert(0, memory)
+
+    assert diff_profiles(old, new) == [
+        {"op": "insert", "path": ["memory_system", "memories"], "items": [[0, memory]]}
+    ]
+
+
+def test_positional_lists_are_truncated_and_extended():
+    old = base_profile()
+    old["personal_info"]["aliases"] = ["a", "b", "c"]
+    shorter = copy.deepcopy(old)
+    shorter["personal_info"]["aliases"] = ["a", "x"]
+    longer = copy.deepcopy(old)
+    longer["personal_info"]["aliases"].append("d")
+
+    assert diff_profiles(old, shorter) == [
+        {"op": "set", "path": ["personal_info", "aliases", 1], "value": "x"},
+        {"op": "truncate", "path": ["personal_info", "aliases"], "length": 2},
+    ]
+    assert diff_profiles(old, longer) == [
+        {"op": "insert", "path": ["personal_info", "aliases"], "items": [[3, "d"]]}
+    ]
+    assert apply_patch(old, diff_profiles(old, shorter)) == shorter
+    assert apply_patch(old, diff_profiles(old, longer)) == longer
+
+
+def test_patched_version_shares_untouched_subtrees():
+    old = base_profile()
+    patch = [{"op": "set", "path": ["personal_info", "name"], "value": "変更"}]
+    new = apply_patch(old, patch)
+    assert new["personal_info"] is not old["personal_info"]
+    assert new["memory_system"] is old["memory_system"]
+    assert diff_profiles(old, new) == patch
+
+
+def test_chained_patches_round_trip():
+    rng = random.Random(0)
+    versions = [base_profile()]
+    for step in range(20):
+        new = copy.deepcopy(versions[-1])
+        memory = rng.choice(new["memory_system"]["memories"])
+        memory["importance"] = rng.randint(0, 100)
+        if step % 5 == 0:
+            new["memory_system"]["memories"].reverse()
+        versions.append(new)
+
+    current = versions[0]
+    for new in versions[1:]:
+        current = apply_patch(current, diff_profiles(current, new))
+        assert current == new
+
+
+@pytest.mark.parametrize(
+    "op",
+    [
+        {"op": "set", "path": ["missing", "name"], "value": 1},
+        {"op": "delete", "path": ["personal_info", "missing"]},
+        {"op": "set", "path": ["memory_system", "memories", "missing", "importance"], "value": 1},
+        {"op": "insert", "path": ["personal_info"], "items": [[0, 1]]},
+        {"op": "order", "path": ["memory_system", "memories"], "ids": ["a"]},
+        {"op": "move", "path": []},
+    ],
+)
+def test_patch_that_does_not_fit_raises_patch_error(op):
+    old = base_profile()
+    snapshot = copy.deepcopy(old)
+    with pytest.raises(PatchError):
+        apply_patch(old, [op])
+    assert old == snapshot
+
+
+def test_change_entries_track_baseline_and_strength_changes():
+    old = base_profile()
+    new = base_profile()
+    emotion = next(iter(new["emotion_system"]["emotions"]))
+    new["emotion_system"]["emotions"][emotion]["baseline"] += 5
+    association = new["association_system"]["associations"][0]
+    association["response"]["association_strength"] -= 10
+
+    patch = diff_profiles(old, new)
+    assert sorted(change_entries(old, new, patch, "update")) == sorted(
+        [
+            (KIND_EMOTION, emotion, 5, "update"),
+            (KIND_ASSOCIATION, association["id"], -10, "update"),
+        ]
+    )
+
+    tracking = apply_to_change_tracking(None, change_entries(old, new, patch, "update"))
+    assert tracking["emotion_baseline_changes"][0]["cumulative_change"] == 5
+    assert tracking["association_strength_changes"][0]["cumulative_change"] == -10
@@ -0,0 +1,122 @@
+"""Tests for static segment reuse and invalidation in the prompt renderer."""
+
+import copy
+from pathlib import Path
+
+import pytest
+import yaml
+
+import prompt_renderer
+from profile_diff import apply_patch, diff_profiles
+from prompt_renderer import TEMPLATES, PromptRenderer
+
+PERSONA = Path(__file__).resolve().parents[2] / "persona_lib" / "rachel_bladerunner.yaml"
+
+
+@pytest.fixture
+def profile():
+    with open(PERSONA, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    data["current_emotion_state"] = {"joy": 30}
+    return data
+
+
+@pytest.fixture
+def dumps(monkeypatch):
+    """Record the name of every section rendered to YAML."""
+    names = []
+    original = prompt_renderer.dump_section
+
+    def counting(name, value, sort_keys=False):
+        names.append(name)
+        return original(name, value, sort_keys)
+
+    monkeypatch.setattr(prompt_renderer, "dump_section", counting)
+    return names
+
+
+def next_turn(profile, **state):
+    turn = dict(profile)
+    turn["current_emotion_state"] = state
+    return turn
+
+
+def static_segments(prompt):
+    return [segment for segment in prompt.segments if segment.static]
+
+
+@pytest.mark.parametrize("template", sorted(TEMPLATES))
+def test_incremental_render_matches_a_full_render(template, profile):
+    renderer = PromptRenderer(template)
+    renderer.render(profile)
+    turn = next_turn(profile, joy=80, fear=10)
+    edited = apply_patch(turn, [{"op": "set", "path": ["personal_info", "name"], "value": "レイチェル・T"}])
+    for version in (turn, edited):
+        assert renderer.render(version).text == PromptRenderer(template).render(version).text
+    prompt = renderer.render(edited)
+    assert "レイチェル・T" in prompt.static_prefix
+    assert "fear: 10" in prompt.text
+    assert "non_dialogue_metadata" not in [segment.name for segment in prompt.segments]
+
+
+def test_static_segments_are_reused_between_turns(profile, dumps):
+    renderer = PromptRenderer("anthropic")
+    first = renderer.render(profile)
+    rendered = len(dumps)
+    second = renderer.render(next_turn(profile, joy=90))
+    assert all(a is b for a, b in zip(static_segments(first), static_segments(second)))
+    assert first.static_prefix == second.static_prefix
+    # 2ターン目は動的セクションだけを描画する
+    assert dumps[rendered:] == ["current_emotion_state"]
+    dynamic = [segment.text for segment in (first.segments + second.segments) if not segment.static]
+    assert "joy: 30" in dynamic[0] and "joy: 90" in dynamic[1]
+
+
+def test_a_replaced_section_is_rendered_again(profile, dumps):
+    renderer = PromptRenderer("standard")
+    renderer.render(profile)
+    changed = copy.deepcopy(profile)
+    changed["personal_info"]["name"] = "レイチェル・タイレル"
+    version = apply_patch(profile, diff_profiles(profile, changed))
+    assert version["memory_system"] is profile["memory_system"]
+
+    del dumps[:]
+    prompt = renderer.render(version)
+    assert "personal_info" in dumps
+    assert "レイチェル・タイレル" in prompt.static_prefix
+    # 元の版の静的セグメントも残っている
+    assert "レイチェル・タイレル" not in renderer.render(profile).static_prefix
+
+
+def test_in_place_changes_need_invalidate(profile):
+    renderer = PromptRenderer("basic")
+    renderer.render(profile)
+    profile["personal_info"]["name"] = "変更後の名前"
+    assert "変更後の名前" not in renderer.render(profile).static_prefix
+    renderer.invalidate()
+    assert "変更後の名前" in renderer.render(profile).static_prefix
+
+
+def test_explicit_key_is_trusted_until_invalidated(profile):
+    renderer = PromptRenderer("openai")
+    renderer.render(profile, key=("rachel", 1))
+    changed = copy.deepcopy(profile)
+    changed["personal_info"]["name"] = "別人"
+    assert "別人" not in renderer.render(changed, key=("rachel", 1)).static_prefix
+    assert "別人" in renderer.render(changed, key=("rachel", 2)).static_prefix
+    renderer.invalidate(("rachel", 1))
+    assert "別人" in renderer.render(changed, key=("rachel", 1)).static_prefix
+
+
+def test_cache_keeps_the_most_recently_used_profiles(profile, dumps):
+    renderer = PromptRenderer("google", cache_size=2)
+    versions = [apply_patch(profile, [{"op": "set", "path": ["personal_info", "name"], "value": f"v{i}"}]) for i in range(3)]
+    renderer.render(versions[0])
+    renderer.render(versions[1])
+    renderer.render(versions[0])
+    renderer.render(versions[2])
+    del dumps[:]
+    renderer.render(versions[0])
+    assert dumps == ["current_emotion_state"]
+    renderer.render(versions[1])
+    assert "personal_info" in dumps
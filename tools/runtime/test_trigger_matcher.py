@@ -0,0 +1,134 @@
+"""Tests for the Aho–Corasick external trigger matcher."""
+
+import random
+
+import pytest
+
+from trigger_matcher import AhoCorasick, TriggerMatcher, cached_matcher, normalize_text
+
+
+def external(assoc_id, *items):
+    return {
+        "id": assoc_id,
+        "trigger": {"type": "external", "items": list(items)},
+        "response": {"type": "memory", "id": "m1"},
+    }
+
+
+def compound(assoc_id, *conditions):
+    return {
+        "id": assoc_id,
+        "trigger": {"operator": "AND", "conditions": list(conditions)},
+        "response": {"type": "memory", "id": "m1"},
+    }
+
+
+def naive_matches(patterns, text):
+    return {
+        (start, start + len(pattern), pid)
+        for pid, pattern in enumerate(patterns)
+        for start in range(len(text) - len(pattern) + 1)
+        if text.startswith(pattern, start)
+    }
+
+
+def ascii_word(ch):
+    return ch.isascii() and (ch.isalnum() or ch == "_")
+
+
+def test_overlapping_patterns_are_all_reported():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    assert set(automaton.iter_matches("ushers")) == {(1, 4, 1), (2, 4, 0), (2, 6, 3)}
+
+
+def test_automaton_agrees_with_a_naive_scan():
+    rng = random.Random(0)
+    for _ in range(200):
+        patterns = list({"".join(rng.choices("abあい", k=rng.randint(1, 4))) for _ in range(rng.randint(1, 8))})
+        text = "".join(rng.choices("abあい", k=rng.randint(0, 30)))
+        assert set(AhoCorasick(patterns).iter_matches(text)) == naive_matches(patterns, text)
+
+
+def test_width_and_case_are_normalised():
+    matcher = TriggerMatcher([external("a1", "Ｂｌａｄｅ Ｒｕｎｎｅｒ"), external("a2", "ｶﾒﾗ")])
+    result = matcher.match("昨日 blade runner を見て、カメラを買った")
+    assert result.associations == {0, 1}
+    assert result.items == {"Ｂｌａｄｅ Ｒｕｎｎｅｒ", "ｶﾒﾗ"}
+    assert normalize_text("ＡＢＣ") == "abc"
+
+
+@pytest.mark.parametrize(
+    "utterance, matched",
+    [
+        ("I like art.", True),
+        ("ART!", True),
+        ("art_class", False),
+        ("Let's start", False),
+        ("artist", False),
+        ("美術はart", True),
+    ],
+)
+def test_ascii_items_match_only_at_word_boundaries(utterance, matched):
+    matcher = TriggerMatcher([external("a1", "art")])
+    assert (matcher.match(utterance).associations == {0}) is matched
+
+
+def test_japanese_items_match_inside_words():
+    matcher = TriggerMatcher([external("a1", "海")])
+    assert matcher.match("海辺を歩いた").associations == {0}
+    assert matcher.match("山に登った").associations == set()
+
+
+def test_compound_external_conditions_are_reported_per_condition():
+    matcher = TriggerMatcher(
+        [
+            compound(
+                "a1",
+                {"type": "emotion", "id": "fear", "threshold": 50},
+                {"type": "external", "items": ["雨"]},
+                {"type": "external", "items": ["雨", "雷"]},
+            ),
+            external("a2", "雨"),
+        ]
+    )
+    result = matcher.match("雨が降っている")
+    assert result.associations == {1}
+    assert result.conditions == {(0, 1), (0, 2)}
+    assert matcher.match("雷が鳴った").conditions == {(0, 2)}
+
+
+def test_duplicate_and_empty_items_share_one_pattern():
+    matcher = TriggerMatcher([external("a1", "雨", " ", ""), external("a2", "雨", "ＲＡＩＮ", "rain")])
+    assert matcher.pattern_count == 2
+    assert matcher.match("rain").items == {"ＲＡＩＮ", "rain"}
+
+
+def test_matcher_agrees_with_a_naive_item_scan():
+    rng = random.Random(1)
+    words = ["art", "start", "海", "海辺", "rain", "雨", "ab", "b"]
+    for _ in range(100):
+        associations = [external(f"a{i}", *rng.sample(words, 2)) for i in range(4)]
+        utterance = " ".join(rng.choices(words + ["x", "の"], k=6))
+        matcher = TriggerMatcher(associations)
+        expected = set()
+        for i, assoc in enumerate(associations):
+            for item in assoc["trigger"]["items"]:
+                for start, end, _ in naive_matches([item], utterance):
+                    before = utterance[start - 1] if start else " "
+                    after = utterance[end] if end < len(utterance) else " "
+                    if ascii_word(item[0]) and ascii_word(before):
+                        continue
+                    if ascii_word(item[-1]) and ascii_word(after):
+                        continue
+                    expected.add(i)
+        assert matcher.match(utterance).associations == expected
+
+
+def test_cached_matcher_is_rebuilt_for_a_new_key():
+    profile = {"association_system": {"associations": [external("a1", "雨")]}}
+    first = cached_matcher(("test", "v1"), profile)
+    assert cached_matcher(("test", "v1"), profile) is first
+    profile["association_system"]["associations"].append(external("a2", "雷"))
+    second = cached_matcher(("test", "v2"), profile)
+    assert second is not first
+    assert second.match("雷").associations == {1}
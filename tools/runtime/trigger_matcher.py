@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Multi-pattern matcher for external association triggers.
+
+``TriggerMatcher`` collects the ``items`` of every external trigger and
+external compound condition in a profile and compiles them into a single
+Aho–Corasick automaton. An utterance is scanned once, in time linear in its
+length plus the number of matches, regardless of how many trigger items the
+profile defines.
+
+Text and items are normalised with NFKC and case-folded, so full-width and
+half-width forms match each other. Items that begin or end with an ASCII
+letter or digit only match at ASCII word boundaries ("art" does not match in
+"start"); other items, such as Japanese keywords, match anywhere.
+"""
+
+from __future__ import annotations
+
+import unicodedata
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Set, Tuple
+
+# プロファイルごとのマッチャーを保持する件数
+MATCHER_CACHE_SIZE = 64
+
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and (ch.isalnum() or ch == "_")
+
+
+class AhoCorasick:
+    """Aho–Corasick automaton over a fixed set of patterns."""
+
+    def __init__(self, patterns: List[str]) -> None:
+        self.patterns = patterns
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            self._insert(pattern, pattern_id)
+        self._build_links()
+
+    def _insert(self, pattern: str, pattern_id: int) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(pattern_id)
+
+    def _build_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child].extend(self._out[self._fail[child]])
+
+    def iter_matches(self, text: str):
+        """Yield ``(start, end, pattern_id)`` for every occurrence in ``text``."""
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pattern_id in out[node]:
+                end = pos + 1
+                yield end - len(patterns[pattern_id]), end, pattern_id
+
+
+@dataclass
+class MatchResult:
+    """External trigger items found in an utterance."""
+
+    items: Set[str] = field(default_factory=set)
+    associations: Set[int] = field(default_factory=set)
+    conditions: Set[Tuple[int, int]] = field(default_factory=set)
+
+
+class TriggerMatcher:
+    """Match utterances against every external trigger of a profile."""
+
+    def __init__(self, associations: List[Dict]) -> None:
+        self.associations = associations
+        patterns: Dict[str, int] = {}
+        # パターン番号 -> 元の項目文字列の集合
+        self._items: List[Set[str]] = []
+        # パターン番号 -> 単一トリガーの関連性番号 / 複合条件の (関連性番号, 条件番号)
+        self._triggers: List[List[int]] = []
+        self._conditions: List[List[Tuple[int, int]]] = []
+
+        def pattern_id(item: str) -> int | None:
+            normalized = normalize_text(item).strip()
+            if not normalized:
+                return None
+            if normalized not in patterns:
+                patterns[normalized] = len(patterns)
+                self._items.append(set())
+                self._triggers.append([])
+                self._conditions.append([])
+            pid = patterns[normalized]
+            self._items[pid].add(item)
+            return pid
+
+        for i, assoc in enumerate(associations):
+            trigger = assoc.get("trigger") or {}
+            if trigger.get("type") == "external":
+                for item in trigger.get("items") or []:
+                    pid = pattern_id(item)
+                    if pid is not None:
+                        self._triggers[pid].append(i)
+            for j, condition in enumerate(trigger.get("conditions") or []):
+                if condition.get("type") == "external":
+                    for item in condition.get("items") or []:
+                        pid = pattern_id(item)
+                        if pid is not None:
+                            self._conditions[pid].append((i, j))
+
+        self._pattern_list = list(patterns)
+        self._word_start = [bool(p) and _is_word_char(p[0]) for p in self._pattern_list]
+        self._word_end = [bool(p) and _is_word_char(p[-1]) for p in self._pattern_list]
+        self._automaton = AhoCorasick(self._pattern_list)
+
+    @classmethod
+    def from_profile(cls, profile: Dict) -> "TriggerMatcher":
+        return cls((profile.get("association_system") or {}).get("associations") or [])
+
+    @property
+    def pattern_count(self) -> int:
+        return len(self._pattern_list)
+
+    def match(self, utterance: str) -> MatchResult:
+        """Scan ``utterance`` once and return the matched items and associations."""
+        text = normalize_text(utterance)
+        result = MatchResult()
+        seen: Set[int] = set()
+        for start, end, pid in self._automaton.iter_matches(text):
+            if pid in seen:
+                continue
+            if self._word_start[pid] and start > 0 and _is_word_char(text[start - 1]):
+                continue
+            if self._word_end[pid] and end < len(text) and _is_word_char(text[end]):
+                continue
+            seen.add(pid)
+            result.items.update(self._items[pid])
+            result.associations.update(self._triggers[pid])
+            result.conditions.update(self._conditions[pid])
+        return result
+
+
+_MATCHER_CACHE: "OrderedDict[Hashable, TriggerMatcher]" = OrderedDict()
+
+
+def cached_matcher(key: Hashable, profile: Dict) -> TriggerMatcher:
+    """Return the matcher for ``profile``, building it only on first use.
+
+    ``key`` identifies the profile version, e.g. its path and content hash.
+    The least recently used matchers are evicted beyond
+    ``MATCHER_CACHE_SIZE`` entries.
+    """
+    matcher = _MATCHER_CACHE.get(key)
+    if matcher is not None:
+        _MATCHER_CACHE.move_to_end(key)
+        return matcher
+    matcher = TriggerMatcher.from_profile(profile)
+    _MATCHER_CACHE[key] = matcher
+    if len(_MATCHER_CACHE) > MATCHER_CACHE_SIZE:
+        _MATCHER_CACHE.popitem(last=False)
+    return matcher
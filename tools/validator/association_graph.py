@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""Graph analysis of ``association_system.associations``.
+
+Every association is an edge from each memory or emotion that can trigger
+it (the trigger itself, or every condition of a compound trigger) to the
+memory or emotion of its response. ``AssociationGraph`` collects those
+edges one association at a time (so the streaming validator can feed it
+without keeping the associations) and ``check_association_graph`` reports:
+
+- runaway loops: cycles whose loop gain (the product of their edge gains)
+  is at least ``RUNAWAY_LOOP_GAIN``, so an activation comes back around
+  undiminished. The gain of an edge is ``association_strength / 100``
+  scaled by ``(100 - threshold) / 100`` for emotion triggers (memory
+  triggers fire on every recall, so their threshold is 0). For each
+  strongly connected component the cycle with the largest loop gain is
+  found as the shortest cycle under ``-log(gain)`` edge weights,
+- fan-out hotspots: memories or emotions that trigger at least
+  ``FANOUT_LIMIT`` associations and ``FANOUT_SHARE`` of all associations
+  of the profile, so one activation fires many responses at once,
+- memories that no chain of associations starting from an emotion or an
+  external trigger can activate, and emotions used by no association.
+
+Each condition of an ``AND`` trigger is treated as if it could fire the
+association on its own. This over-approximates activation, which is the
+safe direction for loop detection. Strongly connected components are
+computed with an iterative Tarjan's algorithm, so the analysis is linear in
+the number of associations and does not recurse on deep chains.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+from typing import Callable, Dict, List, Set, Tuple
+
+from validator_utils import CheckResult, ProfileIndex, json_path
+
+# thresholdが省略された感情トリガー・条件に用いる閾値（tools/runtime/association_engine.pyと同じ）
+DEFAULT_EMOTION_THRESHOLD = 50
+# ループゲインがこの値以上の循環を暴走ループとして報告する
+RUNAWAY_LOOP_GAIN = 1.0
+# 1つの記憶・感情がトリガーとなる関連性の件数の目安（プロファイルの規模に応じて引き上げる）
+FANOUT_LIMIT = 50
+# 全関連性に占める割合の目安
+FANOUT_SHARE = 0.1
+# 一覧として表示するIDの上限
+MAX_LISTED_IDS = 10
+
+_KIND_LABELS = {"memory": "記憶", "emotion": "感情"}
+
+Node = Tuple[str, str]
+
+
+def edge_gain(strength, threshold) -> float:
+    """Return how readily an edge propagates activation (0.0 - 1.0)."""
+    if not isinstance(strength, (int, float)) or isinstance(strength, bool):
+        strength = 0
+    if not isinstance(threshold, (int, float)) or isinstance(threshold, bool):
+        threshold = DEFAULT_EMOTION_THRESHOLD
+    strength = min(max(strength, 0), 100)
+    threshold = min(max(threshold, 0), 100)
+    return strength / 100 * (100 - threshold) / 100
+
+
+def strongly_connected_components(adjacency: List[List[int]]) -> List[List[int]]:
+    """Return the strongly connected components of a graph (iterative Tarjan).
+
+    ``adjacency[v]`` lists the successors of node ``v``. Components are
+    returned in reverse topological order.
+    """
+    count = len(adjacency)
+    order = [-1] * count
+    low = [0] * count
+    on_stack = [False] * count
+    stack: List[int] = []
+    components: List[List[int]] = []
+    counter = 0
+    for root in range(count):
+        if order[root] != -1:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, 0)]
+        while work:
+            v, pos = work[-1]
+            successors = adjacency[v]
+            if pos < len(successors):
+                work[-1] = (v, pos + 1)
+                w = successors[pos]
+                if order[w] == -1:
+                    order[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, 0))
+                elif on_stack[w] and order[w] < low[v]:
+                    low[v] = order[w]
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[v] < low[parent]:
+                    low[parent] = low[v]
+            if low[v] == order[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component.append(w)
+                    if w == v:
+                        break
+                components.append(component)
+    return components
+
+
+class AssociationGraph:
+    """Memory/emotion nodes and association edges of one profile."""
+
+    def __init__(self) -> None:
+        self.node_numbers: Dict[Node, int] = {}
+        self.nodes: List[Node] = []
+        # 辺ごとの始点・終点・関連性の位置・ゲイン
+        self.sources: List[int] = []
+        self.targets: List[int] = []
+        self.associations: List[int] = []
+        self.gains: List[float] = []
+        # 外部トリガーで直接活性化される応答
+        self.entry_nodes: Set[int] = set()
+        # 記憶ID -> memory_system.memories内の位置（最初の出現）
+        self.memory_positions: Dict[str, int] = {}
+        self.association_count = 0
+
+    def node(self, kind: str, node_id: str) -> int:
+        key = (kind, node_id)
+        number = self.node_numbers.get(key)
+        if number is None:
+            number = self.node_numbers[key] = len(self.nodes)
+            self.nodes.append(key)
+        return number
+
+    def add_memory(self, i: int, memory: Dict) -> None:
+        """Record the position of the ``i``-th entry of ``memory_system.memories``."""
+        memory_id = memory.get("id")
+        if isinstance(memory_id, str):
+            self.memory_positions.setdefault(memory_id, i)
+
+    def add_association(self, i: int, assoc: Dict) -> None:
+        """Add the edges of the ``i``-th entry of ``association_system.associations``."""
+        self.association_count = max(self.association_count, i + 1)
+        response = assoc.get("response")
+        trigger = assoc.get("trigger")
+        if not isinstance(response, dict) or not isinstance(trigger, dict):
+            return
+        kind = response.get("type")
+        if kind not in _KIND_LABELS or not isinstance(response.get("id"), str):
+            return
+        target = self.node(kind, response["id"])
+        strength = response.get("association_strength", 0)
+        if "operator" in trigger:
+            conditions = trigger.get("conditions")
+            sources = [c for c in conditions if isinstance(c, dict)] if isinstance(conditions, list) else []
+        else:
+            sources = [trigger]
+        for source in sources:
+            source_kind = source.get("type")
+            if source_kind == "external":
+                self.entry_nodes.add(target)
+            elif source_kind in _KIND_LABELS and isinstance(source.get("id"), str):
+                threshold = source.get("threshold") if source_kind == "emotion" else 0
+                self.sources.append(self.node(source_kind, source["id"]))
+                self.targets.append(target)
+                self.associations.append(i)
+                self.gains.append(edge_gain(strength, threshold))
+
+    @classmethod
+    def from_profile(cls, profile: Dict) -> "AssociationGraph":
+        graph = cls()
+        memory_system = profile.get("memory_system") or {}
+        for i, memory in enumerate(memory_system.get("memories", []) or []):
+            if isinstance(memory, dict):
+                graph.add_memory(i, memory)
+        association_system = profile.get("association_system") or {}
+        for i, assoc in enumerate(association_system.get("associations", []) or []):
+            if isinstance(assoc, dict):
+                graph.add_association(i, assoc)
+        return graph
+
+    def adjacency(
+        self, min_gain: float = 0.0, defined: Callable[[Node], bool] | None = None
+    ) -> List[List[int]]:
+        """Return ``node -> [edge, ...]`` for edges with at least ``min_gain``.
+
+        Edges touching a node for which ``defined`` returns False (an
+        undefined id, reported by the reference checks) are left out.
+        """
+        valid = [True] * len(self.nodes)
+        if defined is not None:
+            valid = [defined(node) for node in self.nodes]
+        adjacency: List[List[int]] = [[] for _ in self.nodes]
+        for edge, (source, target) in enumerate(zip(self.sources, self.targets)):
+            if self.gains[edge] >= min_gain and valid[source] and valid[target]:
+                adjacency[source].append(edge)
+        return adjacency
+
+    def runaway_cycles(
+        self, min_loop_gain: float = RUNAWAY_LOOP_GAIN, defined: Callable[[Node], bool] | None = None
+    ) -> List[Tuple[List[int], float, int]]:
+        """Return ``(edges, loop gain, component size)`` for each runaway loop.
+
+        Each strongly connected component contributes its cycle with the
+        largest loop gain if that gain is at least ``min_loop_gain``. Edge
+        gains never exceed 1, so such a cycle only uses edges whose gain is
+        at least ``min_loop_gain`` and the others are dropped up front.
+        """
+        edges_of = [
+            [edge for edge in edges if self.gains[edge] > 0]
+            for edges in self.adjacency(min_loop_gain, defined)
+        ]
+        successors = [[self.targets[edge] for edge in edges] for edges in edges_of]
+        cycles = []
+        for component in strongly_connected_components(successors):
+            if len(component) == 1 and component[0] not in successors[component[0]]:
+                continue
+            edges, loop_gain = self.strongest_cycle(component, edges_of)
+            # 対数の和から戻した値の丸め誤差を許容する
+            if loop_gain >= min_loop_gain * (1 - 1e-9):
+                cycles.append((edges, loop_gain, len(component)))
+        return cycles
+
+    def strongest_cycle(
+        self, component: List[int], edges_of: List[List[int]]
+    ) -> Tuple[List[int], float]:
+        """Return the cycle of ``component`` with the largest loop gain.
+
+        With ``-log(gain)`` as edge weights the strongest cycle is the
+        shortest one. The weights are non-negative, so the shortest cycle
+        through each node is found with Dijkstra's algorithm, after which the
+        node is removed: every cycle is found from its first node.
+        """
+        members = set(component)
+        best_weight = math.inf
+        best_cycle: List[int] = []
+        for start in sorted(component):
+            distance = {start: 0.0}
+            reached_by: Dict[int, int] = {}
+            done: Set[int] = set()
+            heap = [(0.0, start)]
+            while heap:
+                weight, node = heapq.heappop(heap)
+                if node in done:
+                    continue
+                # これより長い経路からは最短の循環が得られない
+                if weight >= best_weight:
+                    break
+                done.add(node)
+                for edge in edges_of[node]:
+                    target = self.targets[edge]
+                    if target not in members:
+                        continue
+                    total = weight - math.log(self.gains[edge])
+                    if target == start:
+                        if total < best_weight:
+                            best_weight = total
+                            best_cycle = self._path(start, node, reached_by) + [edge]
+                    elif total < distance.get(target, math.inf):
+                        distance[target] = total
+                        reached_by[target] = edge
+                        heapq.heappush(heap, (total, target))
+            members.discard(start)
+        return best_cycle, math.exp(-best_weight)
+
+    def _path(self, start: int, node: int, reached_by: Dict[int, int]) -> List[int]:
+        path = []
+        while node != start:
+            edge = reached_by[node]
+            path.append(edge)
+            node = self.sources[edge]
+        path.reverse()
+        return path
+
+    def reachable(self, edges_of: List[List[int]]) -> List[bool]:
+        """Return which nodes an emotion or an external trigger can activate.
+
+        ``edges_of`` is an :meth:`adjacency` of the edges to follow.
+        """
+        seen = [False] * len(self.nodes)
+        queue = [
+            node
+            for node, (kind, _) in enumerate(self.nodes)
+            if kind == "emotion" or node in self.entry_nodes
+        ]
+        for node in queue:
+            seen[node] = True
+        while queue:
+            node = queue.pop()
+            for edge in edges_of[node]:
+                target = self.targets[edge]
+                if not seen[target]:
+                    seen[target] = True
+                    queue.append(target)
+        return seen
+
+    def describe(self, node: int) -> str:
+        kind, node_id = self.nodes[node]
+        return f"{kind}:{node_id}"
+
+
+def _listed(ids: List[str]) -> str:
+    text = "、".join(f"'{node_id}'" for node_id in ids[:MAX_LISTED_IDS])
+    if len(ids) > MAX_LISTED_IDS:
+        text += f" ほか{len(ids) - MAX_LISTED_IDS}件"
+    return text
+
+
+def fanout_limit(association_count: int) -> int:
+    """Return the fan-out hotspot limit for a profile with ``association_count`` associations."""
+    return max(FANOUT_LIMIT, math.ceil(association_count * FANOUT_SHARE))
+
+
+def check_association_graph(
+    profile: Dict,
+    index: ProfileIndex | None = None,
+    graph: AssociationGraph | None = None,
+    max_fanout: int | None = None,
+) -> CheckResult:
+    """Report runaway loops, fan-out hotspots and unreachable memories/emotions.
+
+    ``max_fanout`` overrides the fan-out limit derived from the number of
+    associations by :func:`fanout_limit`.
+    """
+    result = CheckResult("association_graph", "関連グラフの分析")
+    if "association_system" not in profile:
+        return result.skip(
+            json_path("association_system"),
+            "association_systemフィールドが見つかりません。関連グラフの分析をスキップします",
+        )
+    if index is None:
+        index = ProfileIndex.from_profile(profile)
+    if graph is None:
+        graph = AssociationGraph.from_profile(profile)
+
+    def defined(node: Node) -> bool:
+        return index.has_target(*node)
+
+    for edges, loop_gain, size in graph.runaway_cycles(defined=defined):
+        first = min(graph.associations[edge] for edge in edges)
+        shown = edges[:MAX_LISTED_IDS]
+        chain = " → ".join(graph.describe(graph.sources[edge]) for edge in shown)
+        chain += f" → {graph.describe(graph.sources[edges[0]])}" if len(edges) == len(shown) else " → …"
+        numbers = ", ".join(f"#{graph.associations[edge] + 1}" for edge in shown)
+        if len(edges) > len(shown):
+            numbers += f" ほか{len(edges) - len(shown)}件"
+        result.warning(
+            "association_graph.runaway_cycle",
+            json_path("association_system", "associations", first),
+            f"関連性 {numbers} が減衰しない循環を形成しており、活性化が止まらない可能性があります: "
+            f"{chain}（ループゲイン {loop_gain:.2f}、循環に関わる記憶・感情 {size}件）",
+        )
+
+    if max_fanout is None:
+        max_fanout = fanout_limit(graph.association_count)
+    edges_of = graph.adjacency(0.0, defined)
+    fanout: Dict[int, Set[int]] = {}
+    for edges in edges_of:
+        for edge in edges:
+            fanout.setdefault(graph.sources[edge], set()).add(graph.associations[edge])
+    for node, associations in fanout.items():
+        if len(associations) >= max_fanout:
+            kind, node_id = graph.nodes[node]
+            result.warning(
+                "association_graph.fanout_hotspot",
+                json_path("association_system", "associations", min(associations)),
+                f"{_KIND_LABELS[kind]} '{node_id}' をトリガーとする関連性が{len(associations)}件あり、"
+                f"1回の活性化で多数の応答が発火します（目安: {max_fanout}件未満）",
+            )
+
+    reachable = graph.reachable(edges_of)
+    unreachable = []
+    for memory_id in index.memory_id_counts:
+        node = graph.node_numbers.get(("memory", memory_id))
+        if node is None or not reachable[node]:
+            unreachable.append(memory_id)
+    if unreachable:
+        first = min(graph.memory_positions.get(memory_id, 0) for memory_id in unreachable)
+        result.info(
+            "association_graph.unreachable_memory",
+            json_path("memory_system", "memories", first),
+            f"感情や外部トリガーからの関連性では活性化されない記憶が{len(unreachable)}件あります: {_listed(unreachable)}",
+        )
+    unused = sorted(emotion_id for emotion_id in index.emotion_ids if ("emotion", emotion_id) not in graph.node_numbers)
+    if unused:
+        result.info(
+            "association_graph.unused_emotion",
+            json_path("emotion_system"),
+            f"どの関連性にも使われていない感情が{len(unused)}件あります: {_listed(unused)}",
+        )
+    return result
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Stage timers, item counters and peak-RSS sampling for the UPPS tools.
+
+Code that wants to be measured asks for the active collector with
+:func:`current_metrics` and wraps its work in ``stage()``::
+
+    metrics = current_metrics()
+    with metrics.stage("schema"):
+        ...
+    metrics.count("memories", len(memories))
+
+By default the active collector is a :class:`NullMetrics` whose methods do
+nothing, so instrumented code pays (almost) nothing unless a CLI enabled
+profiling with :func:`enable_metrics`. A :class:`Metrics` records wall and
+CPU time and the number of calls per stage, arbitrary counters and the
+process's peak RSS sampled at the end of every stage. Collected metrics can
+be merged across worker processes, printed as a breakdown, or exported as
+JSON or as a Prometheus textfile for the node exporter's textfile collector.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROMETHEUS_PREFIX = "upps"
+PROMETHEUS_SUFFIXES = (".prom",)
+
+# ru_maxrssの単位: macOSはバイト、Linuxはキロバイト
+_RSS_DIVISOR = 1024 if sys.platform == "darwin" else 1
+
+
+def peak_rss_kb() -> int:
+    """Return the peak resident set size of this process in KiB (0 if unknown)."""
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // _RSS_DIVISOR
+
+
+@dataclass
+class StageStats:
+    """Accumulated time of one stage."""
+
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    # ステージ終了時点のピークRSS（どのステージでピークが伸びたかを示す）
+    peak_rss_kb: int = 0
+
+    def merge(self, other: "StageStats") -> None:
+        self.calls += other.calls
+        self.wall_seconds += other.wall_seconds
+        self.cpu_seconds += other.cpu_seconds
+        self.peak_rss_kb = max(self.peak_rss_kb, other.peak_rss_kb)
+
+
+class NullMetrics:
+    """Collector used when profiling is disabled; every method is a no-op."""
+
+    enabled = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        yield
+
+    def count(self, name: str, amount: int = 1) -> None:
+        pass
+
+
+@dataclass
+class Metrics:
+    """Stage timings, counters and peak RSS of one tool run."""
+
+    tool: str
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+    peak_rss_kb: int = 0
+    wall_seconds: float = 0.0
+    enabled = True
+
+    def __post_init__(self) -> None:
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as stage ``name``; nested stages are timed independently."""
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats()
+            stats.calls += 1
+            stats.wall_seconds += time.perf_counter() - wall
+            stats.cpu_seconds += time.process_time() - cpu
+            stats.peak_rss_kb = max(stats.peak_rss_kb, peak_rss_kb())
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def finish(self) -> None:
+        """Record the total wall time and the final peak RSS."""
+        self.wall_seconds = time.perf_counter() - self._started
+        self.peak_rss_kb = max(self.peak_rss_kb, peak_rss_kb())
+
+    def to_dict(self) -> Dict:
+        return {
+            "tool": self.tool,
+            "wall_seconds": self.wall_seconds,
+            "peak_rss_kb": self.peak_rss_kb,
+            "stages": {name: asdict(stats) for name, stats in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def snapshot(self) -> Dict:
+        """Return the data collected so far, to be merged by another process."""
+        self.peak_rss_kb = max(self.peak_rss_kb, peak_rss_kb())
+        return self.to_dict()
+
+    def merge(self, data: Dict) -> None:
+        """Add a :meth:`snapshot` taken in a worker process."""
+        for name, stats in data.get("stages", {}).items():
+            self.stages.setdefault(name, StageStats()).merge(StageStats(**stats))
+        for name, amount in data.get("counters", {}).items():
+            self.count(name, amount)
+        self.peak_rss_kb = max(self.peak_rss_kb, data.get("peak_rss_kb", 0))
+
+    def reset(self) -> None:
+        self.stages.clear()
+        self.counters.clear()
+
+    def format_breakdown(self) -> str:
+        """Render the stages (slowest first) and counters for human output."""
+        lines = [f"【計測結果: {self.tool}】"]
+        # ステージは入れ子になるため、割合は合計ではなく全体の実時間に対して求める
+        total = self.wall_seconds or sum(stats.wall_seconds for stats in self.stages.values()) or 1.0
+        width = max([len("stage"), *map(len, self.stages)]) + 2
+        lines.append(f"{'stage':<{width}}{'calls':>8}{'wall':>12}{'cpu':>12}{'share':>8}")
+        for name, stats in sorted(self.stages.items(), key=lambda item: -item[1].wall_seconds):
+            lines.append(
+                f"{name:<{width}}{stats.calls:>8}{stats.wall_seconds * 1000:>10.1f}ms"
+                f"{stats.cpu_seconds * 1000:>10.1f}ms{stats.wall_seconds / total:>8.1%}"
+            )
+        if self.counters:
+            lines.append("件数:")
+            for name, amount in sorted(self.counters.items()):
+                lines.append(f"  {name}: {amount}")
+        lines.append(f"全体の実時間: {self.wall_seconds * 1000:.1f}ms")
+        if self.peak_rss_kb:
+            lines.append(f"ピークRSS: {self.peak_rss_kb / 1024:.1f} MiB")
+        return "\n".join(lines)
+
+    def to_prometheus(self, timestamp: float | None = None) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        tool = _label(self.tool)
+        p = PROMETHEUS_PREFIX
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+
+        family("stage_wall_seconds", "gauge", "Wall-clock time spent in each stage of the last run.")
+        for name, stats in sorted(self.stages.items()):
+            lines.append(f'{p}_stage_wall_seconds{{tool="{tool}",stage="{_label(name)}"}} {stats.wall_seconds:.6f}')
+        family("stage_cpu_seconds", "gauge", "CPU time spent in each stage of the last run.")
+        for name, stats in sorted(self.stages.items()):
+            lines.append(f'{p}_stage_cpu_seconds{{tool="{tool}",stage="{_label(name)}"}} {stats.cpu_seconds:.6f}')
+        family("stage_calls", "gauge", "Number of times each stage ran in the last run.")
+        for name, stats in sorted(self.stages.items()):
+            lines.append(f'{p}_stage_calls{{tool="{tool}",stage="{_label(name)}"}} {stats.calls}')
+        family("items", "gauge", "Number of items processed in the last run.")
+        for name, amount in sorted(self.counters.items()):
+            lines.append(f'{p}_items{{tool="{tool}",item="{_label(name)}"}} {amount}')
+        family("run_wall_seconds", "gauge", "Total wall-clock time of the last run.")
+        lines.append(f'{p}_run_wall_seconds{{tool="{tool}"}} {self.wall_seconds:.6f}')
+        family("peak_rss_bytes", "gauge", "Peak resident set size of the last run.")
+        lines.append(f'{p}_peak_rss_bytes{{tool="{tool}"}} {self.peak_rss_kb * 1024}')
+        family("last_run_timestamp_seconds", "gauge", "Unix time at which the last run finished.")
+        lines.append(f'{p}_last_run_timestamp_seconds{{tool="{tool}"}} {timestamp or time.time():.0f}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str | Path) -> None:
+        """Write the metrics to ``path``: a Prometheus textfile for ``*.prom``, JSON otherwise.
+
+        The file is replaced atomically so the textfile collector never
+        reads a partially written file.
+        """
+        path = Path(path)
+        if path.suffix in PROMETHEUS_SUFFIXES:
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.to_dict(), ensure_ascii=False, indent=2) + "\n"
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            raise
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_NULL_METRICS = NullMetrics()
+_active: Metrics | NullMetrics = _NULL_METRICS
+
+
+def current_metrics() -> Metrics | NullMetrics:
+    """Return the active collector (a no-op one unless profiling is enabled)."""
+    return _active
+
+
+def enable_metrics(tool: str) -> Metrics:
+    """Start collecting metrics in this process and return the collector."""
+    global _active
+    if not isinstance(_active, Metrics):
+        _active = Metrics(tool)
+    return _active
+
+
+def disable_metrics() -> None:
+    global _active
+    _active = _NULL_METRICS
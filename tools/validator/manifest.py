@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Validation manifest for incremental runs of the UPPS validator.
+
+The manifest records, for every validated profile, the hash of its contents
+together with the check results. A profile is re-validated only when its
+content hash or the selected checks differ from the recorded entry. The
+manifest header stores the schema hash and the validator version; if either
+changes, every entry is discarded so the whole library is validated again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List
+
+from validator_utils import (
+    EXPECTED_PROFILE_VERSION,
+    CheckResult,
+    file_sha256,
+)
+from template_registry import default_registry
+
+MANIFEST_FORMAT = 1
+DEFAULT_MANIFEST_PATH = ".upps-validator-manifest.json"
+
+# 検証結果を左右するモジュール（これらの内容が変わると全件を再検証する）
+VALIDATION_MODULES = (
+    "validator_utils.py",
+    "association_graph.py",
+    "stream_validator.py",
+    "section_cache.py",
+    "template_registry.py",
+    "upps_validator.py",
+    "instrumentation.py",
+)
+
+
+def validator_version() -> str:
+    """Identify the validation logic in use.
+
+    Combines ``EXPECTED_PROFILE_VERSION`` with a hash of every module on the
+    validation path (``VALIDATION_MODULES``) and the set of known templates,
+    so that edits to the checks or added and removed templates invalidate
+    earlier results.
+    """
+    digest = hashlib.sha256(EXPECTED_PROFILE_VERSION.encode("utf-8"))
+    module_dir = Path(__file__).resolve().parent
+    for name in VALIDATION_MODULES:
+        digest.update(name.encode("utf-8"))
+        digest.update(file_sha256(str(module_dir / name)).encode("ascii"))
+    registry = default_registry()
+    if registry is not None:
+        digest.update(registry.fingerprint.encode("ascii"))
+    return digest.hexdigest()
+
+
+class ValidationManifest:
+    """Persisted ``path -> (content hash, checks, results)`` mapping."""
+
+    def __init__(self, path: str | Path, schema_hash: str | None, version: str) -> None:
+        self.path = Path(path)
+        self.schema_hash = schema_hash
+        self.version = version
+        self.entries: Dict[str, Dict] = {}
+        self.invalidated = False
+
+    @classmethod
+    def load(
+        cls, path: str | Path, schema_hash: str | None, version: str | None = None
+    ) -> "ValidationManifest":
+        """Load the manifest, dropping it if the schema or validator changed."""
+        manifest = cls(path, schema_hash, version or validator_version())
+        try:
+            with open(manifest.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+        if (
+            data.get("format") == MANIFEST_FORMAT
+            and data.get("schema_hash") == schema_hash
+            and data.get("validator_version") == manifest.version
+        ):
+            manifest.entries = data.get("entries", {})
+        else:
+            manifest.invalidated = bool(data.get("entries"))
+        return manifest
+
+    @staticmethod
+    def _key(profile_path: str) -> str:
+        return str(Path(profile_path).resolve())
+
+    def lookup(
+        self, profile_path: str, content_hash: str, checks: List[str]
+    ) -> List[CheckResult] | None:
+        """Return recorded results if the profile and checks are unchanged."""
+        entry = self.entries.get(self._key(profile_path))
+        if not entry or entry.get("sha256") != content_hash or entry.get("checks") != checks:
+            return None
+        return [CheckResult.from_dict(r) for r in entry.get("results", [])]
+
+    def record(
+        self,
+        profile_path: str,
+        content_hash: str,
+        checks: List[str],
+        results: List[CheckResult],
+    ) -> None:
+        self.entries[self._key(profile_path)] = {
+            "sha256": content_hash,
+            "checks": checks,
+            "results": [r.to_dict() for r in results],
+        }
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        data = {
+            "format": MANIFEST_FORMAT,
+            "schema_hash": self.schema_hash,
+            "validator_version": self.version,
+            "entries": self.entries,
+        }
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
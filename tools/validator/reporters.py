@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Output renderers for the UPPS validator CLI.
+
+A reporter receives the check results of each profile as soon as they are
+available. ``HumanReporter`` reproduces the classic emoji-decorated output,
+``NDJSONReporter`` streams one JSON record per finding and per profile, and
+``JSONReporter`` collects everything into a single JSON document.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from typing import Dict, List, TextIO
+
+from validator_utils import CheckResult, all_passed, format_result
+
+
+class Reporter:
+    """Base class for validator reporters."""
+
+    def __init__(self, stream: TextIO | None = None) -> None:
+        self.stream = stream or sys.stdout
+        self.total = 0
+        self.failed = 0
+        self.reused = 0
+
+    def start(self, schema_path: str | None, profile_count: int) -> None:
+        pass
+
+    def profile(
+        self, profile_path: str, results: List[CheckResult], cached: bool = False
+    ) -> None:
+        """Report one profile. ``cached`` marks results reused from a manifest."""
+        self.total += 1
+        if cached:
+            self.reused += 1
+        if not all_passed(results):
+            self.failed += 1
+
+    def finish(self) -> None:
+        pass
+
+
+class HumanReporter(Reporter):
+    """Classic human-readable output."""
+
+    def __init__(self, stream: TextIO | None = None) -> None:
+        super().__init__(stream)
+        self.batch = False
+        self.failed_paths: List[str] = []
+
+    def _print(self, text: str = "") -> None:
+        print(text, file=self.stream)
+
+    def start(self, schema_path: str | None, profile_count: int) -> None:
+        self.batch = profile_count > 1
+        if schema_path:
+            self._print(f"スキーマ: {schema_path}")
+
+    def profile(
+        self, profile_path: str, results: List[CheckResult], cached: bool = False
+    ) -> None:
+        super().profile(profile_path, results, cached)
+        if self.batch:
+            suffix = "（変更なし・前回の結果）" if cached else ""
+            self._print(f"\n=== {profile_path} ==={suffix}")
+        for result in results:
+            self._print(format_result(result))
+        if not all_passed(results):
+            self.failed_paths.append(profile_path)
+
+    def finish(self) -> None:
+        if self.batch:
+            self._print("\n" + "=" * 50)
+            self._print(
+                f"検証結果: {self.total}件中 "
+                f"{self.total - self.failed}件合格 / {self.failed}件失敗"
+            )
+            if self.reused:
+                self._print(f"（うち{self.reused}件は変更がないため前回の結果を再利用）")
+            for path in self.failed_paths:
+                self._print(f"  ❌ {path}")
+        if not self.failed:
+            self._print("✅ すべての検証に合格しました！")
+        else:
+            self._print("⚠️ 一部の検証で問題が見つかりました。上記の警告を確認してください。")
+
+
+def _profile_record(
+    profile_path: str, results: List[CheckResult], cached: bool = False
+) -> Dict:
+    counts = {"error": 0, "warning": 0, "info": 0}
+    for result in results:
+        for finding in result.findings:
+            counts[finding.severity] = counts.get(finding.severity, 0) + 1
+    return {
+        "type": "profile",
+        "profile": profile_path,
+        "valid": all_passed(results),
+        "cached": cached,
+        "errors": counts["error"],
+        "warnings": counts["warning"],
+        "checks": {
+            result.check_id: "skipped" if result.skipped else ("passed" if result.passed else "failed")
+            for result in results
+        },
+    }
+
+
+def profile_document(
+    profile_path: str, results: List[CheckResult], cached: bool = False
+) -> Dict:
+    """Return the JSON record of one profile including all of its findings."""
+    record = _profile_record(profile_path, results, cached)
+    del record["type"]
+    record["findings"] = [
+        dict(check=result.check_id, **finding.to_dict())
+        for result in results
+        for finding in result.findings
+    ]
+    return record
+
+
+class NDJSONReporter(Reporter):
+    """Stream one JSON object per line, flushing after every profile.
+
+    Records are ``finding`` (one per finding), ``profile`` (one per profile,
+    after its findings) and a final ``summary``. Nothing is retained between
+    profiles, so memory use does not grow with the number of profiles.
+    """
+
+    def _emit(self, record: Dict) -> None:
+        self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def start(self, schema_path: str | None, profile_count: int) -> None:
+        self._emit({"type": "start", "schema": schema_path, "profiles": profile_count})
+        self.stream.flush()
+
+    def profile(
+        self, profile_path: str, results: List[CheckResult], cached: bool = False
+    ) -> None:
+        super().profile(profile_path, results, cached)
+        for result in results:
+            for finding in result.findings:
+                record = {"type": "finding", "profile": profile_path, "check": result.check_id}
+                record.update(finding.to_dict())
+                self._emit(record)
+        self._emit(_profile_record(profile_path, results, cached))
+        self.stream.flush()
+
+    def finish(self) -> None:
+        self._emit(
+            {
+                "type": "summary",
+                "profiles": self.total,
+                "passed": self.total - self.failed,
+                "failed": self.failed,
+                "reused": self.reused,
+            }
+        )
+        self.stream.flush()
+
+
+class JSONReporter(Reporter):
+    """Write a single JSON document once all profiles are validated."""
+
+    def __init__(self, stream: TextIO | None = None) -> None:
+        super().__init__(stream)
+        self.schema_path: str | None = None
+        self.profiles: List[Dict] = []
+
+    def start(self, schema_path: str | None, profile_count: int) -> None:
+        self.schema_path = schema_path
+
+    def profile(
+        self, profile_path: str, results: List[CheckResult], cached: bool = False
+    ) -> None:
+        super().profile(profile_path, results, cached)
+        self.profiles.append(profile_document(profile_path, results, cached))
+
+    def finish(self) -> None:
+        json.dump(
+            {
+                "schema": self.schema_path,
+                "summary": {
+                    "profiles": self.total,
+                    "passed": self.total - self.failed,
+                    "failed": self.failed,
+                    "reused": self.reused,
+                },
+                "profiles": self.profiles,
+            },
+            self.stream,
+            ensure_ascii=False,
+            indent=2,
+        )
+        self.stream.write("\n")
+
+
+REPORTERS = {
+    "human": HumanReporter,
+    "ndjson": NDJSONReporter,
+    "json": JSONReporter,
+}
+
+
+def create_reporter(name: str, stream: TextIO | None = None) -> Reporter:
+    return REPORTERS[name](stream)
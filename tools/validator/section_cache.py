@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Section-level validation cache for repeatedly validated profiles.
+
+The UPPS schema consists of independent top-level sections. ``SectionValidator``
+hashes every top-level section of a profile, validates a section against its
+sub-schema only when its hash differs from the previous call, and re-runs a
+reference check only when one of the sections it reads has changed. It is
+meant for long-lived callers such as editors that validate the same large
+profile after every save.
+
+Sections are validated by the root schema's validator (so the same draft and
+``$ref`` resolution apply) and the raw errors are cached; the reported finding
+is picked by ``best_match`` over all of them, exactly as ``check_schema`` does
+for the whole document.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import pickle
+from typing import Dict, List, Set
+
+import jsonschema
+from jsonschema.exceptions import ValidationError
+
+from validator_utils import (
+    REFERENCE_CHECKS,
+    CheckContext,
+    CheckResult,
+    check_structure,
+    get_schema_validator,
+    run_reference_checks,
+)
+
+_MISSING = object()
+
+
+def section_hash(value) -> str:
+    """Return a digest of a section's content."""
+    return hashlib.blake2b(
+        pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), digest_size=16
+    ).hexdigest()
+
+
+def _changed_sections(hashes: Dict[str, str], previous: Dict[str, str]) -> Set[str]:
+    return {
+        name
+        for name in set(hashes) | set(previous)
+        if hashes.get(name, _MISSING) != previous.get(name, _MISSING)
+    }
+
+
+class SectionValidator:
+    """Validate a profile section by section, reusing unchanged results."""
+
+    def __init__(self, schema: Dict) -> None:
+        self.schema = schema
+        properties = schema.get("properties", {})
+        # トップレベルの構造（必須キー・未知のキー）のみを検証するスキーマ
+        self._shell_schema = {
+            key: value
+            for key, value in schema.items()
+            if key not in ("properties", "validation_rules")
+        }
+        self._shell_schema["properties"] = {name: {} for name in properties}
+        self._section_schemas = properties
+        self._schema_hashes: Dict[str, str] = {}
+        self._reference_hashes: Dict[str, str] = {}
+        self._section_errors: Dict[str, List[ValidationError]] = {}
+        self._check_results: Dict[str, CheckResult] = {}
+        self._structure: CheckResult | None = None
+        self.last_changed: Set[str] = set()
+        self.last_rerun: List[str] = []
+
+    def _validate_section(self, name: str, value) -> List[ValidationError]:
+        """Return the errors the root validator reports under ``properties/<name>``."""
+        sub_schema = self._section_schemas.get(name)
+        if sub_schema is None:
+            return []
+        # ルートのバリデータでdescendし、全体検証と同じドラフト・$ref解決・パスのエラーを得る
+        validator = get_schema_validator(self.schema)
+        errors = list(validator.descend(value, sub_schema, path=name, schema_path=name))
+        for error in errors:
+            error.schema_path.appendleft("properties")
+        return errors
+
+    def _shell_errors(self, profile: Dict):
+        validator = get_schema_validator(self._shell_schema)
+        for error in validator.iter_errors(profile):
+            # 詳細（str(error)）に表示されるスキーマを全体検証と同じルートスキーマにする
+            if error.schema is validator.schema:
+                error.schema = self.schema
+            yield error
+
+    def validate(
+        self, profile: Dict, run_schema: bool = True, run_reference: bool = True
+    ) -> List[CheckResult]:
+        """Validate ``profile``, re-checking only sections that changed.
+
+        Returns the same list of results as a full validation: one ``schema``
+        result (the best match among the errors of every section and of the
+        top-level structure) followed by the reference checks. ``last_changed`` and ``last_rerun`` describe what
+        was actually re-validated.
+        """
+        hashes = {name: section_hash(value) for name, value in profile.items()}
+        self.last_changed = set()
+        self.last_rerun = []
+        results: List[CheckResult] = []
+
+        if run_schema:
+            changed = _changed_sections(hashes, self._schema_hashes)
+            self.last_changed |= changed
+            for name in changed:
+                if name in hashes:
+                    self._section_errors[name] = self._validate_section(name, profile[name])
+                else:
+                    self._section_errors.pop(name, None)
+            schema_result = CheckResult("schema", "スキーマ検証")
+            # check_schemaと同じく、文書全体で最も関連性の高いエラーを1件だけ報告する
+            error = jsonschema.exceptions.best_match(
+                itertools.chain(
+                    self._shell_errors(profile),
+                    *(self._section_errors.get(name, ()) for name in self._section_schemas),
+                )
+            )
+            if error is not None:
+                schema_result.error(
+                    f"schema.{error.validator}",
+                    error.json_path,
+                    f"スキーマ検証: 失敗: {error.message}",
+                    detail=str(error),
+                )
+            results.append(schema_result)
+            self._schema_hashes = hashes
+
+        if run_reference:
+            changed = _changed_sections(hashes, self._reference_hashes)
+            self.last_changed |= changed
+            if self._structure is None or changed:
+                self._structure = check_structure(profile)
+            if not self._structure.passed:
+                # 構造が不正な間は参照チェックを行わず、直った時点ですべて再実行する
+                self._check_results.clear()
+                self._reference_hashes = hashes
+                results.append(self._structure)
+                return results
+            stale = [
+                check
+                for check in REFERENCE_CHECKS
+                if check.check_id not in self._check_results or changed.intersection(check.sections)
+            ]
+            # ProfileIndexは索引を使うチェックを再実行するときだけ作られる
+            rerun = run_reference_checks(CheckContext(profile), stale)
+            for check, result in zip(stale, rerun):
+                self._check_results[check.check_id] = result
+            self.last_rerun = [check.check_id for check in stale]
+            results.extend(self._check_results[check.check_id] for check in REFERENCE_CHECKS)
+            self._reference_hashes = hashes
+
+        return results
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""Streaming validation of very large UPPS profiles.
+
+``load_yaml()`` builds the whole document before any check runs. For
+profiles with huge ``memory_system.memories`` or
+``association_system.associations`` lists that means holding every item in
+memory at once. ``check_profile_streaming`` instead walks the YAML event
+stream:
+
+- each item of those two lists is constructed on its own, validated
+  against the item sub-schema, added to a :class:`ProfileIndex` (ids and
+  references only) and an :class:`AssociationGraph` (edges only) and then
+  discarded,
+- every other section is small and is loaded normally into a skeleton
+  profile in which the two lists are left empty.
+
+The schema check validates the skeleton against the schema with the item
+lists relaxed, checks ``minItems``/``maxItems`` against the item counts and
+reports one finding per invalid item. The reference checks run on the
+skeleton and the streamed index and report the same findings as a full
+validation.
+"""
+
+from __future__ import annotations
+
+import copy
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import jsonschema
+import yaml
+from yaml.composer import Composer
+from yaml.constructor import SafeConstructor
+from yaml.events import (
+    MappingEndEvent,
+    MappingStartEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+)
+from yaml.resolver import Resolver
+
+from association_graph import AssociationGraph
+from instrumentation import current_metrics
+from validator_utils import (
+    YAML_LOADER,
+    CheckContext,
+    CheckResult,
+    ProfileIndex,
+    check_structure,
+    check_structure_item,
+    collect_emotion_ids,
+    get_schema_validator,
+    json_path,
+    run_reference_checks,
+    schema_hash,
+)
+
+# 項目ごとに読み込むリスト: セクション名 -> リストのキー
+STREAMED_LISTS = {
+    "memory_system": "memories",
+    "association_system": "associations",
+}
+
+
+@dataclass
+class StreamedProfile:
+    """What :meth:`StreamingValidator.load_skeleton` collected from a profile.
+
+    ``skeleton`` is the profile with the streamed lists emptied (``None`` if
+    the document is not a mapping), ``index`` and ``graph`` cover the
+    streamed items, ``item_result`` holds the findings of the per-item
+    schema check, ``structure_items`` the per-item structure findings of
+    each streamed section and ``counts`` the number of items of each
+    streamed list.
+    """
+
+    skeleton: Dict | None = None
+    index: ProfileIndex = field(default_factory=ProfileIndex)
+    graph: AssociationGraph = field(default_factory=AssociationGraph)
+    item_result: CheckResult = field(default_factory=lambda: CheckResult("schema", "スキーマ検証"))
+    structure_items: Dict[str, CheckResult] = field(default_factory=dict)
+    counts: Dict[str, int] = field(default_factory=dict)
+
+
+class _EventBuilder(Composer, SafeConstructor, Resolver):
+    """Build Python objects for single nodes from an existing event stream.
+
+    The events come from ``parser`` (the libyaml ``CSafeLoader`` when
+    available); composing and constructing use the same rules as
+    ``yaml.safe_load``.
+    """
+
+    def __init__(self, parser) -> None:
+        Composer.__init__(self)
+        SafeConstructor.__init__(self)
+        Resolver.__init__(self)
+        self.check_event = parser.check_event
+        self.peek_event = parser.peek_event
+        self.get_event = parser.get_event
+
+    def load_node(self):
+        """Construct the node starting at the next event and return its value."""
+        return self.construct_document(self.compose_node(None, None))
+
+
+def _relaxed_schema(schema: Dict) -> Dict:
+    """Copy ``schema`` with the streamed lists accepting any array."""
+    relaxed = copy.copy(schema)
+    properties = dict(schema.get("properties", {}))
+    for section, list_key in STREAMED_LISTS.items():
+        section_schema = properties.get(section)
+        if not isinstance(section_schema, dict):
+            continue
+        section_schema = dict(section_schema)
+        section_properties = dict(section_schema.get("properties", {}))
+        if list_key in section_properties:
+            section_properties[list_key] = {"type": "array"}
+        section_schema["properties"] = section_properties
+        properties[section] = section_schema
+    relaxed["properties"] = properties
+    return relaxed
+
+
+def _list_schema(schema: Dict, section: str) -> Dict:
+    return (
+        schema.get("properties", {})
+        .get(section, {})
+        .get("properties", {})
+        .get(STREAMED_LISTS[section], {})
+    )
+
+
+class StreamingValidator:
+    """Validate profiles from the YAML event stream against one schema."""
+
+    def __init__(self, schema: Dict | None) -> None:
+        self.schema = schema
+        if schema is not None:
+            self._validator = get_schema_validator(schema)
+            self._relaxed_validator = get_schema_validator(_relaxed_schema(schema))
+            self._list_schemas = {section: _list_schema(schema, section) for section in STREAMED_LISTS}
+
+    def _list_errors(self, instance, section: str, *index: int):
+        """Errors of a streamed list (or of one item) under the root schema's validator.
+
+        The sub-schema is validated with the root validator, so the root's
+        draft and ``$ref`` resolution apply, and the paths of the errors are
+        made absolute as in a full validation.
+        """
+        list_key = STREAMED_LISTS[section]
+        schema = self._list_schemas[section]
+        schema_path = ["properties", section, "properties", list_key]
+        if index:
+            schema = schema["items"]
+            schema_path.append("items")
+        for error in self._validator.descend(instance, schema):
+            error.path.extendleft(reversed((section, list_key, *index)))
+            error.schema_path.extendleft(reversed(schema_path))
+            yield error
+
+    def _check_item(self, result: CheckResult, section: str, i: int, item) -> None:
+        if self._list_schemas[section].get("items") is None:
+            return
+        error = jsonschema.exceptions.best_match(self._list_errors(item, section, i))
+        if error is not None:
+            result.error(
+                f"schema.{error.validator}",
+                error.json_path,
+                f"スキーマ検証: 失敗: {error.message}",
+                detail=str(error),
+            )
+
+    def _check_list_size(self, result: CheckResult, section: str, count: int) -> None:
+        list_schema = self._list_schemas[section]
+        path = json_path(section, STREAMED_LISTS[section])
+        minimum = list_schema.get("minItems")
+        maximum = list_schema.get("maxItems")
+        if minimum is not None and count < minimum:
+            result.error(
+                "schema.minItems",
+                path,
+                f"スキーマ検証: 失敗: {path} には{minimum}件以上の項目が必要です（{count}件）",
+            )
+        if maximum is not None and count > maximum:
+            result.error(
+                "schema.maxItems",
+                path,
+                f"スキーマ検証: 失敗: {path} の項目は{maximum}件以下である必要があります（{count}件）",
+            )
+
+    def _stream_list(
+        self, builder: _EventBuilder, section: str, streamed: StreamedProfile, run_schema: bool
+    ) -> int:
+        builder.get_event()  # SequenceStartEvent
+        index, graph = streamed.index, streamed.graph
+        structure = streamed.structure_items[section] = CheckResult("structure", "構造検証")
+        count = 0
+        while not builder.check_event(SequenceEndEvent):
+            item = builder.load_node()
+            if run_schema:
+                self._check_item(streamed.item_result, section, count, item)
+            problems = len(structure.findings)
+            check_structure_item(structure, section, count, item)
+            # 構造が不正な項目は索引化しない（構造検証が失敗すれば参照チェックは行われない）
+            if len(structure.findings) == problems:
+                if section == "memory_system":
+                    index.add_memory(count, item)
+                    graph.add_memory(count, item)
+                else:
+                    index.add_association(count, item)
+                    graph.add_association(count, item)
+            count += 1
+        builder.get_event()
+        return count
+
+    def _stream_section(
+        self, builder: _EventBuilder, section: str, streamed: StreamedProfile, run_schema: bool
+    ) -> Dict:
+        builder.get_event()  # MappingStartEvent
+        value: Dict = {}
+        while not builder.check_event(MappingEndEvent):
+            key = builder.load_node()
+            if key == STREAMED_LISTS[section] and builder.check_event(SequenceStartEvent):
+                streamed.counts[section] = self._stream_list(builder, section, streamed, run_schema)
+                value[key] = []
+            else:
+                value[key] = builder.load_node()
+        builder.get_event()
+        return value
+
+    def load_skeleton(self, stream, run_schema: bool = True) -> StreamedProfile:
+        """Read a profile, streaming the large lists.
+
+        The returned ``skeleton`` is ``None`` if the document is not a
+        mapping; the index and graph then cover nothing.
+        """
+        parser = YAML_LOADER(stream)
+        streamed = StreamedProfile()
+        try:
+            builder = _EventBuilder(parser)
+            builder.get_event()  # StreamStartEvent
+            if not builder.check_event(yaml.DocumentStartEvent):
+                return streamed
+            builder.get_event()
+            if not builder.check_event(MappingStartEvent):
+                return streamed
+            builder.get_event()
+            skeleton: Dict = {}
+            while not builder.check_event(MappingEndEvent):
+                key = builder.load_node()
+                if key in STREAMED_LISTS and builder.check_event(MappingStartEvent):
+                    skeleton[key] = self._stream_section(builder, key, streamed, run_schema)
+                else:
+                    skeleton[key] = builder.load_node()
+            builder.get_event()
+            builder.get_event()  # DocumentEndEvent
+            if not builder.check_event(yaml.StreamEndEvent):
+                raise yaml.composer.ComposerError(
+                    "expected a single document in the stream",
+                    None,
+                    "but found another document",
+                    builder.peek_event().start_mark,
+                )
+        finally:
+            parser.dispose()
+        streamed.skeleton = skeleton
+        streamed.index.emotion_ids = collect_emotion_ids(skeleton)
+        streamed.index.add_current_emotion_state(skeleton.get("current_emotion_state"))
+        return streamed
+
+    def check_schema(
+        self, skeleton: Dict, item_result: CheckResult, counts: Dict[str, int]
+    ) -> CheckResult:
+        result = CheckResult("schema", "スキーマ検証")
+        error = jsonschema.exceptions.best_match(
+            self._relaxed_validator.iter_errors(skeleton)
+        )
+        if error is not None:
+            result.error(
+                f"schema.{error.validator}",
+                error.json_path,
+                f"スキーマ検証: 失敗: {error.message}",
+                detail=str(error),
+            )
+        for section, list_key in STREAMED_LISTS.items():
+            if section in counts:
+                self._check_list_size(result, section, counts[section])
+                continue
+            # エイリアスなどで項目ごとに読み込まれなかったリストは元のスキーマで検証する
+            value = skeleton.get(section)
+            if error is None and isinstance(value, dict) and isinstance(value.get(list_key), list):
+                list_error = jsonschema.exceptions.best_match(
+                    self._list_errors(value[list_key], section)
+                )
+                if list_error is not None:
+                    result.error(
+                        f"schema.{list_error.validator}",
+                        list_error.json_path,
+                        f"スキーマ検証: 失敗: {list_error.message}",
+                        detail=str(list_error),
+                    )
+        result.findings.extend(item_result.findings)
+        return result
+
+    def validate_file(
+        self, profile_path: str, run_schema: bool = True, run_reference: bool = True
+    ) -> List[CheckResult]:
+        """Validate ``profile_path`` without loading the streamed lists at once."""
+        metrics = current_metrics()
+        try:
+            # 項目ごとのスキーマ検証は読み込みと同時に行われるため、このステージに含まれる
+            with metrics.stage("stream.parse"), open(profile_path, "rb") as f:
+                streamed = self.load_skeleton(f, run_schema)
+        except Exception as e:
+            raise RuntimeError(f"YAMLファイルの読み込みに失敗しました: {e}")
+        skeleton, index, graph = streamed.skeleton, streamed.index, streamed.graph
+        if skeleton is None:
+            raise RuntimeError("YAMLファイルの読み込みに失敗しました: プロファイルがマッピングではありません")
+        metrics.count("memories", index.memories_scanned)
+        metrics.count("associations", index.associations_scanned)
+        metrics.count("conditions", index.conditions_scanned)
+
+        results: List[CheckResult] = []
+        if run_schema:
+            with metrics.stage("schema"):
+                results.append(self.check_schema(skeleton, streamed.item_result, streamed.counts))
+        if run_reference:
+            with metrics.stage("reference.structure"):
+                structure = check_structure(skeleton, streamed.structure_items)
+            if not structure.passed:
+                results.append(structure)
+                return results
+            results.extend(run_reference_checks(CheckContext(skeleton, index, graph=graph)))
+        return results
+
+
+# スキーマごとのStreamingValidator: id(schema) -> (schema, validator)
+_STREAMING_VALIDATORS: Dict[str | None, StreamingValidator] = {}
+
+
+def get_streaming_validator(schema: Dict | None) -> StreamingValidator:
+    """Return the ``StreamingValidator`` for ``schema``, built once per schema content."""
+    # get_schema_validatorと同じくschema_hashをキーにする（id()は解放後に再利用されうる）
+    key = None if schema is None else schema_hash(schema)
+    validator = _STREAMING_VALIDATORS.get(key)
+    if validator is None:
+        validator = StreamingValidator(schema)
+        _STREAMING_VALIDATORS[key] = validator
+    return validator
+
+
+def check_profile_streaming(
+    profile_path: str,
+    schema: Dict | None,
+    run_schema: bool = True,
+    run_reference: bool = True,
+) -> List[CheckResult]:
+    return get_streaming_validator(schema).validate_file(profile_path, run_schema, run_reference)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Registry of symptom expression templates referenced by ``template_ref``.
+
+``TemplateRegistry`` indexes a templates directory (by default
+``persona_lib/medical/templates``) once: names come from ``index.json`` and
+from the file names of ``*.yaml`` templates, so resolving a
+``dialogue_instructions.template_ref`` is a dictionary lookup and no
+template is parsed until it is first used.
+
+``materialize`` builds the effective persona by deep-merging the template
+and the profile with the same rules as ``utils/deepMerge.js`` (mappings are
+merged recursively, lists and scalars of the profile replace those of the
+template). Merged results are kept in an LRU cache because the same few
+templates are shared by many personas.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Hashable, List, Tuple
+
+from validator_utils import load_yaml
+
+# 統合済みプロファイルを保持する件数
+MERGE_CACHE_SIZE = 256
+
+TEMPLATE_SUFFIXES = (".yaml", ".yml")
+
+
+class TemplateNotFoundError(KeyError):
+    """Raised when a ``template_ref`` does not name a known template."""
+
+
+def deep_merge(target, source):
+    """Merge ``source`` into a copy of ``target`` like ``utils/deepMerge.js``.
+
+    Nested mappings present in both are merged recursively; any other value
+    of ``source`` (lists included) replaces the one in ``target``. Values
+    taken over unchanged are shared with the inputs, not copied.
+    """
+    if not isinstance(target, dict) or not isinstance(source, dict):
+        return source
+    output = dict(target)
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            output[key] = deep_merge(target[key], value)
+        else:
+            output[key] = value
+    return output
+
+
+def profile_digest(profile: Dict) -> str:
+    """Return a digest identifying the contents of ``profile``."""
+    return hashlib.blake2b(
+        pickle.dumps(profile, protocol=pickle.HIGHEST_PROTOCOL), digest_size=16
+    ).hexdigest()
+
+
+def template_ref(profile: Dict) -> str | None:
+    instructions = profile.get("dialogue_instructions")
+    if not isinstance(instructions, dict):
+        return None
+    ref = instructions.get("template_ref")
+    return ref if isinstance(ref, str) else None
+
+
+class TemplateRegistry:
+    """Name -> template file index with lazily loaded templates."""
+
+    def __init__(self, templates_dir: str | Path, cache_size: int = MERGE_CACHE_SIZE) -> None:
+        self.templates_dir = Path(templates_dir)
+        self.cache_size = cache_size
+        self.paths: Dict[str, Path] = {}
+        self._templates: Dict[str, Dict] = {}
+        self._merged: "OrderedDict[Tuple[str, Hashable], Dict]" = OrderedDict()
+        self._build_index()
+
+    def _build_index(self) -> None:
+        index_file = self.templates_dir / "index.json"
+        if index_file.is_file():
+            with open(index_file, "r", encoding="utf-8") as f:
+                for entry in json.load(f).get("templates", []):
+                    self.paths[entry["name"]] = self.templates_dir / entry["path"]
+        for path in sorted(self.templates_dir.rglob("*")):
+            if path.suffix in TEMPLATE_SUFFIXES and path.is_file():
+                self.paths.setdefault(path.stem, path)
+
+    @property
+    def names(self) -> List[str]:
+        return sorted(self.paths)
+
+    @property
+    def fingerprint(self) -> str:
+        """Digest of the indexed names, used to invalidate cached results."""
+        return hashlib.sha256("\n".join(self.names).encode("utf-8")).hexdigest()
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.paths
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def resolve(self, name: str) -> Dict:
+        """Return the parsed template ``name``; it is parsed only once.
+
+        The returned mapping is shared and must not be modified.
+        """
+        template = self._templates.get(name)
+        if template is not None:
+            return template
+        path = self.paths.get(name)
+        if path is None:
+            raise TemplateNotFoundError(name)
+        template = load_yaml(str(path)) or {}
+        self._templates[name] = template
+        return template
+
+    def materialize(self, profile: Dict, key: Hashable | None = None) -> Dict:
+        """Return the profile merged over its template.
+
+        Profiles without ``template_ref`` are returned unchanged; an unknown
+        reference raises ``TemplateNotFoundError``. ``key`` identifies the
+        profile version (e.g. path and content hash); if omitted, a digest of
+        the profile is used. The result is shared between callers that pass
+        the same key and must not be modified.
+        """
+        name = template_ref(profile)
+        if name is None:
+            return profile
+        cache_key = (name, profile_digest(profile) if key is None else key)
+        merged = self._merged.get(cache_key)
+        if merged is not None:
+            self._merged.move_to_end(cache_key)
+            return merged
+        merged = deep_merge(self.resolve(name), profile)
+        self._merged[cache_key] = merged
+        if len(self._merged) > self.cache_size:
+            self._merged.popitem(last=False)
+        return merged
+
+
+_DEFAULT_REGISTRIES: Dict[str, TemplateRegistry] = {}
+
+
+def find_templates_dir() -> Path | None:
+    """Locate the templates directory.
+
+    ``UPPS_TEMPLATES_DIR`` takes precedence; otherwise the repository's
+    ``persona_lib/medical/templates`` relative to this file is used.
+    """
+    env_dir = os.environ.get("UPPS_TEMPLATES_DIR")
+    if env_dir:
+        return Path(env_dir) if Path(env_dir).is_dir() else None
+    candidate = Path(__file__).resolve().parents[2] / "persona_lib" / "medical" / "templates"
+    return candidate if candidate.is_dir() else None
+
+
+def default_registry() -> TemplateRegistry | None:
+    """Return the registry for :func:`find_templates_dir`, built once per process."""
+    templates_dir = find_templates_dir()
+    if templates_dir is None:
+        return None
+    key = str(templates_dir.resolve())
+    registry = _DEFAULT_REGISTRIES.get(key)
+    if registry is None:
+        registry = _DEFAULT_REGISTRIES[key] = TemplateRegistry(templates_dir)
+    return registry
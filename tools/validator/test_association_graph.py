@@ -0,0 +1,139 @@
+"""Tests for runaway loop, fan-out and reachability analysis of associations."""
+
+import pytest
+
+from association_graph import (
+    AssociationGraph,
+    check_association_graph,
+    edge_gain,
+    fanout_limit,
+    strongly_connected_components,
+)
+from validator_utils import format_result
+
+
+def link(source, target, strength, kind="memory", threshold=None):
+    trigger = {"type": kind, "id": source}
+    if threshold is not None:
+        trigger["threshold"] = threshold
+    return {"trigger": trigger, "response": {"type": "memory", "id": target, "association_strength": strength}}
+
+
+def profile(associations, memories=("a", "b", "c"), emotions=("fear",)):
+    return {
+        "emotion_system": {"emotions": {e: {"baseline": 50} for e in emotions}},
+        "memory_system": {"memories": [{"id": m} for m in memories]},
+        "association_system": {"associations": associations},
+    }
+
+
+def rule_ids(result):
+    return [finding.rule_id for finding in result.findings]
+
+
+def test_strongly_connected_components_in_reverse_topological_order():
+    components = strongly_connected_components([[1], [2], [0, 3], [], [4]])
+    assert [sorted(c) for c in components] == [[3], [0, 1, 2], [4]]
+
+
+def test_strongly_connected_components_do_not_recurse_on_long_chains():
+    count = 20000
+    adjacency = [[i + 1] for i in range(count - 1)] + [[0]]
+    assert [len(c) for c in strongly_connected_components(adjacency)] == [count]
+
+
+@pytest.mark.parametrize(
+    "strength, threshold, gain",
+    [(80, 50, 0.4), (100, 0, 1.0), (80, None, 0.4), (150, -10, 1.0), (True, 0, 0.0), ("90", 0, 0.0)],
+)
+def test_edge_gain(strength, threshold, gain):
+    assert edge_gain(strength, threshold) == pytest.approx(gain)
+
+
+def test_strongest_cycle_is_not_the_greedy_one():
+    associations = [
+        link("a", "b", 100),  # 最もゲインの高い辺をたどると a → b → a（0.5）になる
+        link("b", "a", 50),
+        link("a", "c", 90),
+        link("c", "a", 90),
+    ]
+    graph = AssociationGraph.from_profile(profile(associations))
+    cycles = graph.runaway_cycles(min_loop_gain=0.5)
+    assert len(cycles) == 1
+    edges, loop_gain, size = cycles[0]
+    assert loop_gain == pytest.approx(0.81)
+    assert sorted(graph.associations[edge] for edge in edges) == [2, 3]
+    assert size == 3
+    assert graph.runaway_cycles(min_loop_gain=0.9) == []
+
+
+def test_only_loops_that_do_not_decay_are_reported():
+    decaying = [link("a", "b", 90), link("b", "a", 90), link("fear", "c", 100, "emotion", 10), link("c", "c", 95)]
+    result = check_association_graph(profile(decaying))
+    assert "association_graph.runaway_cycle" not in rule_ids(result)
+
+    runaway = decaying + [link("b", "c", 100), link("c", "b", 100)]
+    result = check_association_graph(profile(runaway))
+    assert rule_ids(result).count("association_graph.runaway_cycle") == 1
+    finding = next(f for f in result.findings if f.rule_id == "association_graph.runaway_cycle")
+    assert finding.path == "$.association_system.associations[4]"
+    assert "memory:b → memory:c → memory:b" in finding.message
+    assert "ループゲイン 1.00" in finding.message
+    assert "循環に関わる記憶・感情 2件" in finding.message
+
+
+def test_emotion_trigger_with_zero_threshold_can_close_a_loop():
+    associations = [
+        link("fear", "a", 100, "emotion", 0),
+        {"trigger": {"type": "memory", "id": "a"}, "response": {"type": "emotion", "id": "fear", "association_strength": 100}},
+    ]
+    result = check_association_graph(profile(associations))
+    assert "association_graph.runaway_cycle" in rule_ids(result)
+
+
+def test_loops_through_undefined_ids_are_left_to_the_reference_checks():
+    result = check_association_graph(profile([link("a", "ghost", 100), link("ghost", "a", 100)]))
+    assert "association_graph.runaway_cycle" not in rule_ids(result)
+
+
+def test_fanout_limit_scales_with_the_number_of_associations():
+    assert fanout_limit(0) == 50
+    assert fanout_limit(500) == 50
+    assert fanout_limit(2500) == 250
+
+
+def test_fanout_hotspot():
+    memories = [f"m{i}" for i in range(60)]
+    associations = [link("fear", m, 50, "emotion") for m in memories]
+    result = check_association_graph(profile(associations, memories))
+    assert rule_ids(result) == ["association_graph.fanout_hotspot"]
+    assert "感情 'fear' をトリガーとする関連性が60件" in result.findings[0].message
+    assert "目安: 50件未満" in result.findings[0].message
+
+    assert check_association_graph(profile(associations, memories), max_fanout=61).findings == []
+
+    # 関連性の多いプロファイルでは、全体に占める割合が小さければ報告しない
+    chain = [link(memories[i], memories[i + 1], 50) for i in range(59)] * 10
+    result = check_association_graph(profile(associations + chain, memories))
+    assert "association_graph.fanout_hotspot" not in rule_ids(result)
+
+
+def test_unreachable_memories_and_unused_emotions_are_info():
+    associations = [link("fear", "a", 50, "emotion"), link("a", "b", 50)]
+    result = check_association_graph(profile(associations, emotions=("fear", "joy")))
+    assert result.passed
+    assert [(f.rule_id, f.severity) for f in result.findings] == [
+        ("association_graph.unreachable_memory", "info"),
+        ("association_graph.unused_emotion", "info"),
+    ]
+    assert "'c'" in result.findings[0].message
+    assert result.findings[0].path == "$.memory_system.memories[2]"
+    lines = format_result(result).splitlines()
+    assert all(line.startswith("ℹ️ ") for line in lines[:2])
+    assert lines[-1] == "✅ 関連グラフの分析: 成功"
+
+
+def test_missing_association_system_is_skipped():
+    result = check_association_graph({"memory_system": {"memories": []}})
+    assert result.skipped
+    assert format_result(result).startswith("⚠️ association_systemフィールドが見つかりません")
@@ -0,0 +1,162 @@
+"""Tests for stage timers, metric merging and metric export."""
+
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import instrumentation
+from instrumentation import Metrics, NullMetrics, current_metrics, disable_metrics, enable_metrics
+
+HERE = Path(__file__).resolve().parent
+PERSONA = HERE.parents[1] / "persona_lib" / "rachel_bladerunner.yaml"
+
+
+@pytest.fixture(autouse=True)
+def no_active_metrics():
+    disable_metrics()
+    yield
+    disable_metrics()
+
+
+def worker_snapshot(stages, counters, peak):
+    return {
+        "tool": "worker",
+        "wall_seconds": 9.0,
+        "peak_rss_kb": peak,
+        "stages": {
+            name: {"calls": calls, "wall_seconds": wall, "cpu_seconds": wall / 2, "peak_rss_kb": peak}
+            for name, (calls, wall) in stages.items()
+        },
+        "counters": counters,
+    }
+
+
+def test_stage_records_calls_and_time():
+    metrics = Metrics("test")
+    for _ in range(3):
+        with metrics.stage("load"):
+            pass
+    with pytest.raises(RuntimeError):
+        with metrics.stage("schema"):
+            raise RuntimeError
+    metrics.count("memories", 5)
+    metrics.count("memories")
+    assert metrics.stages["load"].calls == 3
+    # 例外で抜けたステージも計測する
+    assert metrics.stages["schema"].calls == 1
+    assert metrics.counters == {"memories": 6}
+
+
+def test_merge_adds_worker_snapshots():
+    metrics = Metrics("upps_validator")
+    with metrics.stage("load"):
+        pass
+    own_wall = metrics.stages["load"].wall_seconds
+    metrics.merge(worker_snapshot({"load": (2, 1.0), "schema": (2, 3.0)}, {"profiles": 2}, 10))
+    metrics.merge(worker_snapshot({"schema": (1, 0.5)}, {"profiles": 1, "memories": 7}, 40))
+
+    assert metrics.stages["load"].calls == 3
+    assert metrics.stages["load"].wall_seconds == pytest.approx(own_wall + 1.0)
+    assert (metrics.stages["schema"].calls, metrics.stages["schema"].wall_seconds) == (3, 3.5)
+    assert metrics.stages["schema"].cpu_seconds == pytest.approx(1.75)
+    assert metrics.stages["schema"].peak_rss_kb == 40
+    assert metrics.counters == {"profiles": 3, "memories": 7}
+    assert metrics.peak_rss_kb >= 40
+    # ワーカーの実時間は親の実時間に加えない
+    assert metrics.wall_seconds == 0.0
+
+
+def test_snapshot_round_trips_through_json():
+    worker = Metrics("worker")
+    with worker.stage("schema"):
+        pass
+    worker.count("profiles")
+    parent = Metrics("parent")
+    parent.merge(json.loads(json.dumps(worker.snapshot())))
+    assert parent.stages == worker.stages
+    assert parent.counters == worker.counters
+
+
+def test_breakdown_shares_are_relative_to_the_run(monkeypatch):
+    clock = iter([0.0, 1.0, 1.5, 3.5, 4.0, 10.0])
+    monkeypatch.setattr(instrumentation.time, "perf_counter", lambda: next(clock))
+    metrics = Metrics("test")
+    with metrics.stage("reference.structure"):
+        with metrics.stage("reference.index"):
+            pass
+    metrics.finish()
+    shares = {line.split()[0]: line.split()[-1] for line in metrics.format_breakdown().splitlines()[2:4]}
+    # 入れ子のステージの時間を二重に数えず、全体の実時間に対する割合を示す
+    assert shares == {"reference.structure": "30.0%", "reference.index": "20.0%"}
+
+
+def test_prometheus_textfile_format():
+    metrics = Metrics('up"ps')
+    metrics.merge(worker_snapshot({"load": (2, 1.5)}, {"memories": 3}, 2048))
+    metrics.finish()
+    text = metrics.to_prometheus(timestamp=1700000000)
+
+    families = re.findall(r"^# TYPE (\S+) gauge$", text, re.M)
+    assert families == [
+        "upps_stage_wall_seconds",
+        "upps_stage_cpu_seconds",
+        "upps_stage_calls",
+        "upps_items",
+        "upps_run_wall_seconds",
+        "upps_peak_rss_bytes",
+        "upps_last_run_timestamp_seconds",
+    ]
+    assert 'upps_stage_wall_seconds{tool="up\\"ps",stage="load"} 1.500000' in text
+    assert 'upps_stage_calls{tool="up\\"ps",stage="load"} 2' in text
+    assert 'upps_items{tool="up\\"ps",item="memories"} 3' in text
+    assert 'upps_last_run_timestamp_seconds{tool="up\\"ps"} 1700000000' in text
+    for line in text.splitlines():
+        assert line.startswith("# ") or re.fullmatch(r'upps_\w+\{[^}]*\} -?[\d.]+', line)
+    assert text.endswith("\n")
+
+
+def test_write_picks_the_format_from_the_suffix(tmp_path):
+    metrics = Metrics("test")
+    metrics.count("profiles", 2)
+    metrics.write(tmp_path / "metrics.prom")
+    metrics.write(tmp_path / "metrics.json")
+    assert "upps_items" in (tmp_path / "metrics.prom").read_text(encoding="utf-8")
+    assert json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))["counters"] == {"profiles": 2}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["metrics.json", "metrics.prom"]
+
+
+def test_null_metrics_are_active_by_default_and_do_nothing():
+    metrics = current_metrics()
+    assert isinstance(metrics, NullMetrics)
+    assert not metrics.enabled
+    with metrics.stage("load"):
+        metrics.count("profiles")
+    assert not hasattr(metrics, "stages")
+    assert instrumentation._active is metrics
+
+
+def test_enable_metrics_returns_one_collector_per_process():
+    metrics = enable_metrics("test")
+    assert current_metrics() is metrics
+    assert enable_metrics("other") is metrics
+    disable_metrics()
+    assert isinstance(current_metrics(), NullMetrics)
+
+
+def test_validator_exports_a_prometheus_textfile(tmp_path):
+    output = tmp_path / "validator.prom"
+    completed = subprocess.run(
+        [sys.executable, str(HERE / "upps_validator.py"), str(PERSONA), "--metrics-file", str(output)],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    assert completed.returncode == 0, completed.stderr
+    text = output.read_text(encoding="utf-8")
+    assert 'upps_items{tool="validator",item="profiles"} 1' in text
+    assert 'stage="load"' in text
+    assert 'stage="schema"' in text
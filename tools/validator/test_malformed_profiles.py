@@ -0,0 +1,119 @@
+"""Tests that malformed profiles become findings instead of aborting a run."""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+from section_cache import SectionValidator
+from upps_validator import validate_profile_file
+from validator_utils import check_references, check_structure, load_schema
+
+HERE = Path(__file__).resolve().parent
+PERSONA = HERE.parents[1] / "persona_lib" / "rachel_bladerunner.yaml"
+SCHEMA, _ = load_schema()
+
+MALFORMED = {
+    "memory_system_list": ("memory_system: [1, 2]\n", "structure.not_mapping", "$.memory_system"),
+    "memories_mapping": ("memory_system: {memories: {a: 1}}\n", "structure.not_list", "$.memory_system.memories"),
+    "memory_item_scalar": ("memory_system: {memories: [1]}\n", "structure.not_mapping", "$.memory_system.memories[0]"),
+    "unhashable_id": ("memory_system: {memories: [{id: [1, 2]}]}\n", "structure.not_scalar", "$.memory_system.memories[0].id"),
+    "emotions_null": ("emotion_system: {emotions: null}\n", "structure.not_mapping", "$.emotion_system.emotions"),
+    "trigger_list": (
+        "association_system: {associations: [{id: a, trigger: [1], response: {type: memory, id: m}}]}\n",
+        "structure.not_mapping",
+        "$.association_system.associations[0].trigger",
+    ),
+    "conditions_scalar": (
+        "association_system: {associations: [{id: a, trigger: {operator: AND, conditions: 3}}]}\n",
+        "structure.not_list",
+        "$.association_system.associations[0].trigger.conditions",
+    ),
+}
+
+
+def base_profile():
+    with open(PERSONA, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def malformed_profile(text):
+    profile = base_profile()
+    profile.update(yaml.safe_load(text))
+    return profile
+
+
+@pytest.mark.parametrize("case", MALFORMED.values(), ids=MALFORMED.keys())
+def test_structure_check_reports_the_broken_value(case):
+    text, rule_id, path = case
+    result = check_structure(malformed_profile(text))
+    assert not result.passed
+    assert (rule_id, path) in [(f.rule_id, f.path) for f in result.findings]
+
+
+@pytest.mark.parametrize("case", MALFORMED.values(), ids=MALFORMED.keys())
+def test_reference_checks_stop_at_the_structure_check(case):
+    results = check_references(malformed_profile(case[0]))
+    assert [r.check_id for r in results] == ["structure"]
+
+
+@pytest.mark.parametrize("case", MALFORMED.values(), ids=MALFORMED.keys())
+def test_full_stream_and_section_cache_agree(tmp_path, case):
+    profile = malformed_profile(case[0])
+    path = tmp_path / "persona.yaml"
+    path.write_text(yaml.safe_dump(profile, allow_unicode=True, sort_keys=False), encoding="utf-8")
+
+    _, full = validate_profile_file(str(path), False, True, SCHEMA)
+    _, streamed = validate_profile_file(str(path), False, True, SCHEMA, stream=True)
+    validator = SectionValidator(SCHEMA)
+    validator.validate(base_profile(), run_schema=False)
+    cached = validator.validate(profile, run_schema=False)
+
+    expected = [r.to_dict() for r in full]
+    assert [r.check_id for r in full] == ["structure"]
+    assert [r.to_dict() for r in streamed] == expected
+    assert [r.to_dict() for r in cached] == expected
+
+
+def test_section_cache_reruns_every_check_once_the_structure_is_fixed():
+    validator = SectionValidator(SCHEMA)
+    profile = base_profile()
+    before = [r.to_dict() for r in validator.validate(profile, run_schema=False)]
+    validator.validate(malformed_profile(MALFORMED["memory_system_list"][0]), run_schema=False)
+    after = [r.to_dict() for r in validator.validate(profile, run_schema=False)]
+    assert after == before
+
+
+def test_non_mapping_profile_is_a_load_error(tmp_path):
+    path = tmp_path / "list.yaml"
+    path.write_text("- 1\n- 2\n", encoding="utf-8")
+    for stream in (False, True):
+        _, results = validate_profile_file(str(path), True, True, SCHEMA, stream=stream)
+        assert [r.check_id for r in results] == ["load"]
+        assert not results[0].passed
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_batch_reports_every_profile(tmp_path, jobs):
+    (tmp_path / "a_list.yaml").write_text("- 1\n", encoding="utf-8")
+    (tmp_path / "b_memory_system.yaml").write_text(
+        yaml.safe_dump(malformed_profile("memory_system: [1, 2]\n"), allow_unicode=True),
+        encoding="utf-8",
+    )
+    (tmp_path / "c_valid.yaml").write_text(PERSONA.read_text(encoding="utf-8"), encoding="utf-8")
+
+    completed = subprocess.run(
+        [sys.executable, str(HERE / "upps_validator.py"), str(tmp_path), "-j", jobs, "--format", "json"],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    assert "Traceback" not in completed.stderr
+    profiles = {Path(p["profile"]).name: p for p in json.loads(completed.stdout)["profiles"]}
+    assert set(profiles) == {"a_list.yaml", "b_memory_system.yaml", "c_valid.yaml"}
+    assert list(profiles["a_list.yaml"]["checks"]) == ["load"]
+    assert profiles["b_memory_system.yaml"]["checks"]["structure"] == "failed"
+    assert all("internal" not in p["checks"] for p in profiles.values())
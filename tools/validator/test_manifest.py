@@ -0,0 +1,97 @@
+"""Tests for the incremental validation manifest."""
+
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import manifest
+from manifest import VALIDATION_MODULES, ValidationManifest, validator_version
+from validator_utils import CheckResult
+
+HERE = Path(__file__).resolve().parent
+PERSONA = HERE.parents[1] / "persona_lib" / "rachel_bladerunner.yaml"
+
+
+def results():
+    result = CheckResult("memory_references", "記憶参照の検証")
+    result.error("memory_references.duplicate_id", "$.memory_system.memories", "重複")
+    return [result]
+
+
+def saved_manifest(tmp_path, schema_hash="schema-1", version="v1"):
+    path = tmp_path / "manifest.json"
+    store = ValidationManifest(path, schema_hash, version)
+    store.record("persona.yaml", "hash-1", ["schema", "reference"], results())
+    store.save()
+    return path
+
+
+def test_round_trip_and_lookup(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = saved_manifest(tmp_path)
+    store = ValidationManifest.load(path, "schema-1", "v1")
+    assert not store.invalidated
+    hit = store.lookup("persona.yaml", "hash-1", ["schema", "reference"])
+    assert [r.to_dict() for r in hit] == [r.to_dict() for r in results()]
+
+
+def test_changed_content_or_checks_miss(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = ValidationManifest.load(saved_manifest(tmp_path), "schema-1", "v1")
+    assert store.lookup("persona.yaml", "hash-2", ["schema", "reference"]) is None
+    assert store.lookup("persona.yaml", "hash-1", ["schema"]) is None
+    assert store.lookup("persona.yaml", "hash-1", ["schema", "reference", "stream"]) is None
+    assert store.lookup("other.yaml", "hash-1", ["schema", "reference"]) is None
+
+
+def test_schema_or_validator_change_drops_every_entry(tmp_path):
+    path = saved_manifest(tmp_path)
+    for schema_hash, version in (("schema-2", "v1"), ("schema-1", "v2")):
+        store = ValidationManifest.load(path, schema_hash, version)
+        assert store.invalidated
+        assert store.entries == {}
+
+
+def test_validator_version_covers_every_validation_module(tmp_path, monkeypatch):
+    for name in VALIDATION_MODULES:
+        shutil.copy(HERE / name, tmp_path / name)
+    monkeypatch.setattr(manifest, "__file__", str(tmp_path / "manifest.py"))
+    before = validator_version()
+    assert validator_version() == before
+    for name in VALIDATION_MODULES:
+        module = tmp_path / name
+        original = module.read_bytes()
+        module.write_bytes(original + b"\n# changed\n")
+        assert validator_version() != before, name
+        module.write_bytes(original)
+    assert validator_version() == before
+
+
+def run_incremental(tmp_path, *options):
+    output = subprocess.run(
+        [
+            sys.executable,
+            str(HERE / "upps_validator.py"),
+            str(PERSONA),
+            "--incremental",
+            "--manifest",
+            str(tmp_path / "manifest.json"),
+            "--format",
+            "json",
+            *options,
+        ],
+        capture_output=True,
+        text=True,
+        check=False,
+    ).stdout
+    return [profile["cached"] for profile in json.loads(output)["profiles"]]
+
+
+def test_cli_reuses_results_until_the_load_mode_changes(tmp_path):
+    assert run_incremental(tmp_path) == [False]
+    assert run_incremental(tmp_path) == [True]
+    assert run_incremental(tmp_path, "--stream") == [False]
+    assert run_incremental(tmp_path, "--stream") == [True]
+    assert run_incremental(tmp_path) == [False]
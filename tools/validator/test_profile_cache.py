@@ -0,0 +1,106 @@
+"""Tests for the on-disk cache of parsed profiles."""
+
+import datetime
+import os
+import pickle
+
+import pytest
+import yaml
+
+import validator_utils
+from validator_utils import load_yaml
+
+PROFILE = """\
+personal_info:
+  name: テスト
+  birthday: 1990-04-01
+memory_system:
+  memories:
+    - id: first_day
+      importance: 80
+"""
+EXPECTED = yaml.safe_load(PROFILE)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    path = tmp_path / "cache"
+    monkeypatch.setenv("UPPS_CACHE_DIR", str(path))
+    monkeypatch.delenv("UPPS_NO_CACHE", raising=False)
+    return path
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Count how often YAML is actually parsed."""
+    calls = []
+    original = yaml.load
+
+    def counting(stream, Loader):
+        calls.append(stream)
+        return original(stream, Loader=Loader)
+
+    monkeypatch.setattr(validator_utils.yaml, "load", counting)
+    return calls
+
+
+@pytest.fixture
+def profile_path(tmp_path):
+    path = tmp_path / "profile.yaml"
+    path.write_text(PROFILE, encoding="utf-8")
+    return path
+
+
+def cache_files(cache_dir):
+    return sorted((cache_dir / "profiles").glob("*.pickle"))
+
+
+def test_unchanged_file_is_read_from_the_cache(cache_dir, parses, profile_path):
+    first = load_yaml(str(profile_path), use_cache=True)
+    second = load_yaml(str(profile_path), use_cache=True)
+    assert len(parses) == 1
+    assert first == second == EXPECTED
+    # YAMLの日付などJSONにない型もそのまま復元する
+    assert second["personal_info"]["birthday"] == datetime.date(1990, 4, 1)
+    [entry] = cache_files(cache_dir)
+    assert entry.stat().st_mode & 0o777 == 0o600
+
+
+def test_changed_content_is_parsed_again(cache_dir, parses, profile_path):
+    load_yaml(str(profile_path), use_cache=True)
+    profile_path.write_text(PROFILE.replace("80", "20"), encoding="utf-8")
+    changed = load_yaml(str(profile_path), use_cache=True)
+    assert changed["memory_system"]["memories"][0]["importance"] == 20
+    assert len(parses) == 2
+    assert len(cache_files(cache_dir)) == 2
+
+
+def test_cache_writable_by_others_is_not_trusted(cache_dir, parses, profile_path):
+    load_yaml(str(profile_path), use_cache=True)
+    [entry] = cache_files(cache_dir)
+    entry.write_bytes(pickle.dumps({"injected": True}))
+    os.chmod(entry, 0o666)
+    assert load_yaml(str(profile_path), use_cache=True) == EXPECTED
+    assert len(parses) == 2
+    # 信頼できないエントリは書き直される
+    assert entry.stat().st_mode & 0o777 == 0o600
+    assert load_yaml(str(profile_path), use_cache=True) == EXPECTED
+    assert len(parses) == 2
+
+
+def test_broken_cache_entry_is_replaced(cache_dir, parses, profile_path):
+    load_yaml(str(profile_path), use_cache=True)
+    [entry] = cache_files(cache_dir)
+    entry.write_bytes(b"")
+    assert load_yaml(str(profile_path), use_cache=True)["personal_info"]["name"] == "テスト"
+    assert len(parses) == 2
+
+
+def test_cache_is_off_by_default_and_with_upps_no_cache(cache_dir, parses, profile_path, monkeypatch):
+    load_yaml(str(profile_path))
+    assert not (cache_dir / "profiles").exists()
+    monkeypatch.setenv("UPPS_NO_CACHE", "1")
+    load_yaml(str(profile_path), use_cache=True)
+    load_yaml(str(profile_path), use_cache=True)
+    assert len(parses) == 3
+    assert not (cache_dir / "profiles").exists()
@@ -0,0 +1,109 @@
+"""Tests for the single-pass ProfileIndex and the reference checks built on it."""
+
+import copy
+
+from validator_utils import (
+    ProfileIndex,
+    check_association_references,
+    check_emotion_references,
+    check_memory_references,
+)
+
+PROFILE = {
+    "current_emotion_state": {"joy": 40, "fear": 20},
+    "emotion_system": {
+        "emotions": {"joy": {"baseline": 50}, "fear": {"baseline": 30}},
+        "additional_emotions": {"nostalgia": {"baseline": 20}},
+    },
+    "memory_system": {
+        "memories": [
+            {"id": "first_day", "associated_emotions": ["joy", "nostalgia"]},
+            {"id": "accident", "associated_emotions": ["fear"]},
+        ]
+    },
+    "association_system": {
+        "associations": [
+            {
+                "id": "fear_accident",
+                "trigger": {"type": "emotion", "id": "fear"},
+                "response": {"type": "memory", "id": "accident"},
+            },
+            {
+                "id": "joy_and_first_day",
+                "trigger": {
+                    "operator": "AND",
+                    "conditions": [
+                        {"type": "emotion", "id": "joy"},
+                        {"type": "memory", "id": "first_day"},
+                    ],
+                },
+                "response": {"type": "emotion", "id": "nostalgia"},
+            },
+        ]
+    },
+}
+
+
+def rule_ids(result):
+    return [finding.rule_id for finding in result.findings]
+
+
+def test_collects_ids_and_references_in_one_pass():
+    index = ProfileIndex.from_profile(PROFILE)
+    assert index.emotion_ids == {"joy", "fear", "nostalgia"}
+    assert index.memory_ids == {"first_day", "accident"}
+    assert index.association_id_counts == {"fear_accident": 1, "joy_and_first_day": 1}
+    assert index.memories_scanned == 2
+    assert index.associations_scanned == 2
+    assert index.conditions_scanned == 2
+    sources = [ref.source for ref in index.referrers[("memory", "first_day")]]
+    assert sources == ["association_condition"]
+    paths = [ref.path for ref in index.referrers[("emotion", "fear")]]
+    assert paths == [
+        "$.current_emotion_state.fear",
+        "$.memory_system.memories[1].associated_emotions[0]",
+        "$.association_system.associations[0].trigger.id",
+    ]
+
+
+def test_valid_profile_has_no_reference_errors():
+    index = ProfileIndex.from_profile(PROFILE)
+    assert check_emotion_references(PROFILE, index).passed
+    assert check_memory_references(PROFILE, index).findings == []
+    assert check_association_references(PROFILE, index).findings == []
+
+
+def test_duplicate_memory_ids_are_reported_once_with_count():
+    profile = copy.deepcopy(PROFILE)
+    memories = profile["memory_system"]["memories"]
+    memories.append({"id": "accident"})
+    memories.append({"id": "accident"})
+
+    index = ProfileIndex.from_profile(profile)
+    assert index.memory_id_counts["accident"] == 3
+
+    result = check_memory_references(profile, index)
+    assert rule_ids(result) == ["memory_references.duplicate_id"]
+    assert result.findings[0].path == "$.memory_system.memories"
+    assert "'accident'" in result.findings[0].message
+    assert "3回" in result.findings[0].message
+
+
+def test_duplicate_association_ids_are_reported():
+    profile = copy.deepcopy(PROFILE)
+    associations = profile["association_system"]["associations"]
+    associations.append(copy.deepcopy(associations[0]))
+
+    result = check_association_references(profile, ProfileIndex.from_profile(profile))
+    assert rule_ids(result) == ["association_references.duplicate_id"]
+    assert "'fear_accident'" in result.findings[0].message
+
+
+def test_index_and_recomputed_checks_agree():
+    profile = copy.deepcopy(PROFILE)
+    profile["memory_system"]["memories"].append({"id": "first_day"})
+    profile["association_system"]["associations"][0]["response"]["id"] = "missing"
+
+    index = ProfileIndex.from_profile(profile)
+    for check in (check_emotion_references, check_memory_references, check_association_references):
+        assert check(profile, index).to_dict() == check(profile).to_dict()
@@ -0,0 +1,188 @@
+"""Tests that fix the record schema of the machine-readable reporters."""
+
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from reporters import HumanReporter, JSONReporter, NDJSONReporter, create_reporter
+from validator_utils import CheckResult
+
+HERE = Path(__file__).resolve().parent
+PERSONA = HERE.parents[1] / "persona_lib" / "rachel_bladerunner.yaml"
+
+
+class CountingStream(io.StringIO):
+    """StringIO that records how much had been written at each flush."""
+
+    def __init__(self):
+        super().__init__()
+        self.flushed_at = []
+
+    def flush(self):
+        self.flushed_at.append(len(self.getvalue()))
+        super().flush()
+
+
+def passing():
+    return [CheckResult("version", "バージョン検証")]
+
+
+def failing():
+    result = CheckResult("references", "参照整合性")
+    result.error("references.undefined_memory", "$.memory_system.memories[0]", "未定義の記憶です", "詳細")
+    result.warning("references.unused", "$.emotion_system", "未使用の感情です")
+    skipped = CheckResult("schema", "スキーマ検証").skip("$", "スキーマがないためスキップ")
+    return [result, skipped]
+
+
+def run_reporter(reporter):
+    reporter.start("schema.json", 2)
+    reporter.profile("a.yaml", passing())
+    reporter.profile("b.yaml", failing())
+    reporter.finish()
+
+
+def test_ndjson_record_sequence_and_fields():
+    stream = CountingStream()
+    run_reporter(NDJSONReporter(stream))
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    assert [r["type"] for r in records] == ["start", "profile", "finding", "finding", "finding", "profile", "summary"]
+    start, profile_a, error, warning, skip, profile_b, summary = records
+    assert start == {"type": "start", "schema": "schema.json", "profiles": 2}
+    assert profile_a == {
+        "type": "profile",
+        "profile": "a.yaml",
+        "valid": True,
+        "cached": False,
+        "errors": 0,
+        "warnings": 0,
+        "checks": {"version": "passed"},
+    }
+    assert error == {
+        "type": "finding",
+        "profile": "b.yaml",
+        "check": "references",
+        "rule_id": "references.undefined_memory",
+        "severity": "error",
+        "path": "$.memory_system.memories[0]",
+        "message": "未定義の記憶です",
+        "detail": "詳細",
+    }
+    # detailのない所見にはdetailキーを含めない
+    assert set(warning) == {"type", "profile", "check", "rule_id", "severity", "path", "message"}
+    assert (skip["rule_id"], skip["severity"]) == ("schema.skipped", "info")
+    assert profile_b == {
+        "type": "profile",
+        "profile": "b.yaml",
+        "valid": False,
+        "cached": False,
+        "errors": 1,
+        "warnings": 1,
+        "checks": {"references": "failed", "schema": "skipped"},
+    }
+    assert summary == {"type": "summary", "profiles": 2, "passed": 1, "failed": 1, "reused": 0}
+
+
+def test_ndjson_flushes_after_every_profile():
+    stream = CountingStream()
+    reporter = NDJSONReporter(stream)
+    reporter.start(None, 2)
+    reporter.profile("a.yaml", passing())
+    after_a = len(stream.getvalue())
+    reporter.profile("b.yaml", failing())
+    after_b = len(stream.getvalue())
+    reporter.finish()
+    assert after_a in stream.flushed_at
+    assert after_b in stream.flushed_at
+    assert stream.flushed_at[-1] == len(stream.getvalue())
+
+
+def test_json_document_shape():
+    stream = io.StringIO()
+    run_reporter(JSONReporter(stream))
+    document = json.loads(stream.getvalue())
+
+    assert set(document) == {"schema", "summary", "profiles"}
+    assert document["schema"] == "schema.json"
+    assert document["summary"] == {"profiles": 2, "passed": 1, "failed": 1, "reused": 0}
+    a, b = document["profiles"]
+    assert a == {
+        "profile": "a.yaml",
+        "valid": True,
+        "cached": False,
+        "errors": 0,
+        "warnings": 0,
+        "checks": {"version": "passed"},
+        "findings": [],
+    }
+    assert [(f["check"], f["rule_id"], f["severity"]) for f in b["findings"]] == [
+        ("references", "references.undefined_memory", "error"),
+        ("references", "references.unused", "warning"),
+        ("schema", "schema.skipped", "info"),
+    ]
+
+
+def test_cached_profiles_are_marked_and_counted():
+    stream = io.StringIO()
+    reporter = NDJSONReporter(stream)
+    reporter.start(None, 2)
+    reporter.profile("a.yaml", passing(), cached=True)
+    reporter.profile("b.yaml", failing())
+    reporter.finish()
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [r["cached"] for r in records if r["type"] == "profile"] == [True, False]
+    assert records[-1]["reused"] == 1
+
+    stream = io.StringIO()
+    reporter = HumanReporter(stream)
+    reporter.start(None, 2)
+    reporter.profile("a.yaml", passing(), cached=True)
+    reporter.finish()
+    assert "=== a.yaml ===（変更なし・前回の結果）" in stream.getvalue()
+    assert "うち1件は変更がないため前回の結果を再利用" in stream.getvalue()
+
+
+def test_human_output_summarises_a_batch():
+    stream = io.StringIO()
+    run_reporter(HumanReporter(stream))
+    output = stream.getvalue()
+    assert "=== a.yaml ===" in output
+    assert "✅ バージョン検証: 成功" in output
+    assert "❌ 未定義の記憶です" in output
+    assert "検証結果: 2件中 1件合格 / 1件失敗" in output
+    assert "  ❌ b.yaml" in output
+
+
+@pytest.mark.parametrize("name, cls", [("human", HumanReporter), ("ndjson", NDJSONReporter), ("json", JSONReporter)])
+def test_create_reporter(name, cls):
+    assert isinstance(create_reporter(name, io.StringIO()), cls)
+
+
+def test_cli_streams_ndjson(tmp_path):
+    invalid = tmp_path / "invalid.yaml"
+    invalid.write_text("personal_info: {name: x}\n", encoding="utf-8")
+    completed = subprocess.run(
+        [sys.executable, str(HERE / "upps_validator.py"), str(PERSONA), str(invalid), "--format", "ndjson", "-j", "1"],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    assert completed.returncode == 1
+    records = [json.loads(line) for line in completed.stdout.splitlines()]
+    assert records[0]["type"] == "start"
+    assert records[-1] == {"type": "summary", "profiles": 2, "passed": 1, "failed": 1, "reused": 0}
+    profiles = [r for r in records if r["type"] == "profile"]
+    assert [(Path(r["profile"]).name, r["valid"]) for r in profiles] == [
+        ("rachel_bladerunner.yaml", True),
+        ("invalid.yaml", False),
+    ]
+    # 各プロファイルの所見はそのprofileレコードより前に出力される
+    for i, record in enumerate(records[1:-1], start=1):
+        if record["type"] == "finding":
+            following = next(r for r in records[i:] if r["type"] == "profile")
+            assert following["profile"] == record["profile"]
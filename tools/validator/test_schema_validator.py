@@ -0,0 +1,61 @@
+"""Tests for the compiled schema validator cache."""
+
+import copy
+import gc
+import os
+
+import jsonschema
+import pytest
+
+from validator_utils import file_sha256, get_schema_validator, load_schema, schema_hash
+
+SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "object",
+    "properties": {"name": {"type": "string"}},
+    "required": ["name"],
+}
+
+
+def test_validator_is_compiled_once_per_schema_content():
+    first = get_schema_validator(SCHEMA)
+    assert get_schema_validator(SCHEMA) is first
+    assert get_schema_validator(copy.deepcopy(SCHEMA)) is first
+    other = dict(SCHEMA, required=[])
+    assert get_schema_validator(other) is not first
+    assert get_schema_validator(other).is_valid({})
+    assert not first.is_valid({})
+
+
+def test_a_new_schema_never_gets_the_validator_of_a_freed_one():
+    for i in range(50):
+        schema = {"type": "object", "required": [f"field_{i}"]}
+        validator = get_schema_validator(schema)
+        assert validator.is_valid({f"field_{i}": 1})
+        assert not validator.is_valid({})
+        del schema, validator
+        gc.collect()
+
+
+def test_invalid_schema_is_rejected_every_time():
+    for _ in range(2):
+        with pytest.raises(jsonschema.exceptions.SchemaError):
+            get_schema_validator({"type": "no_such_type"})
+
+
+def test_loaded_schema_is_keyed_by_its_file_hash(tmp_path, monkeypatch):
+    monkeypatch.setenv("UPPS_CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "upps_schema.yaml"
+    path.write_text("type: object\nrequired: [name]\n", encoding="utf-8")
+    schema, _ = load_schema(str(path))
+    assert schema_hash(schema) == f"file:{file_sha256(path)}"
+    validator = get_schema_validator(schema)
+    assert get_schema_validator(load_schema(str(path))[0]) is validator
+
+    path.write_text("type: object\n", encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    changed, _ = load_schema(str(path))
+    assert schema_hash(changed) == f"file:{file_sha256(path)}"
+    assert get_schema_validator(changed).is_valid({})
+    assert not validator.is_valid({})
@@ -0,0 +1,109 @@
+"""Tests that the section-level cache reports exactly what a full validation does."""
+
+import copy
+from pathlib import Path
+
+import pytest
+import yaml
+
+from section_cache import SectionValidator
+from upps_validator import check_profile
+from validator_utils import REFERENCE_CHECKS, check_references, check_schema, load_schema
+
+PERSONA = Path(__file__).resolve().parents[2] / "persona_lib" / "rachel_bladerunner.yaml"
+SCHEMA, _ = load_schema()
+
+
+def base_profile():
+    with open(PERSONA, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def edits():
+    def set_value(*path, value):
+        def apply(profile):
+            node = profile
+            for key in path[:-1]:
+                node = node[key]
+            node[path[-1]] = value
+        return apply
+
+    def delete(*path):
+        def apply(profile):
+            node = profile
+            for key in path[:-1]:
+                node = node[key]
+            del node[path[-1]]
+        return apply
+
+    return {
+        "unchanged": lambda profile: None,
+        "item-type": set_value("memory_system", "memories", 1, "importance", value="high"),
+        "two-sections": lambda profile: (
+            set_value("memory_system", "memories", 0, "importance", value=200)(profile),
+            set_value("personality", "traits", "openness", value=3)(profile),
+        ),
+        "missing-required": delete("personal_info", "name"),
+        "top-level-required": delete("background"),
+        "unknown-section": set_value("unknown_section", value={}),
+        "dangling-reference": set_value(
+            "association_system", "associations", 0, "response", "id", value="missing"
+        ),
+    }
+
+
+EDITS = edits()
+
+
+@pytest.mark.parametrize("edit", EDITS.values(), ids=EDITS.keys())
+def test_cached_results_match_a_full_validation(edit):
+    validator = SectionValidator(SCHEMA)
+    validator.validate(base_profile())
+    profile = base_profile()
+    edit(profile)
+
+    expected = check_profile(profile, SCHEMA, True, True)
+    actual = validator.validate(copy.deepcopy(profile))
+    assert [r.to_dict() for r in actual] == [r.to_dict() for r in expected]
+    # スキーマ違反は文書全体で1件だけ報告する（詳細もcheck_schemaと同一）
+    schema = check_schema(profile, SCHEMA)
+    assert [(f.rule_id, f.path, f.detail) for f in actual[0].findings] == [
+        (f.rule_id, f.path, f.detail) for f in schema.findings
+    ]
+
+
+def test_only_changed_sections_and_dependent_checks_are_rerun():
+    validator = SectionValidator(SCHEMA)
+    profile = base_profile()
+    validator.validate(profile)
+    validator.validate(profile)
+    assert validator.last_changed == set()
+    assert validator.last_rerun == []
+
+    profile["dialogue_instructions"]["direct_description"] = "変更"
+    validator.validate(profile)
+    assert validator.last_changed == {"dialogue_instructions"}
+    assert validator.last_rerun == ["dialogue_instructions"]
+
+
+@pytest.mark.parametrize("section", ["memory_system", "non_dialogue_metadata", "current_emotion_state"])
+def test_rerun_checks_follow_the_reference_check_registry(section):
+    validator = SectionValidator(SCHEMA)
+    profile = base_profile()
+    results = validator.validate(profile, run_schema=False)
+    assert [r.check_id for r in results] == [r.check_id for r in check_references(profile)]
+    assert [r.check_id for r in results] == [check.check_id for check in REFERENCE_CHECKS]
+
+    profile[section] = copy.deepcopy(profile[section])
+    profile[section]["_edited"] = True
+    validator.validate(profile, run_schema=False)
+    assert validator.last_rerun == [check.check_id for check in REFERENCE_CHECKS if section in check.sections]
+
+
+def test_sections_use_the_root_schema_draft():
+    validator = SectionValidator(SCHEMA)
+    profile = base_profile()
+    profile["memory_system"]["memories"][0]["importance"] = "high"
+    finding, = validator.validate(profile, run_reference=False)[0].findings
+    assert finding.path == "$.memory_system.memories[0].importance"
+    assert "schema['properties']['memory_system']" in finding.detail
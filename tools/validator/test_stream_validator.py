@@ -0,0 +1,110 @@
+"""Tests that --stream reports the same results as a full validation."""
+
+import copy
+from pathlib import Path
+
+import pytest
+import yaml
+
+from stream_validator import get_streaming_validator
+from upps_validator import validate_profile_file
+from validator_utils import load_schema
+
+PERSONA_LIB = Path(__file__).resolve().parents[2] / "persona_lib"
+SCHEMA, _ = load_schema()
+
+
+def load_persona(name="rachel_bladerunner.yaml"):
+    with open(PERSONA_LIB / name, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def write(tmp_path, profile, text=None):
+    path = tmp_path / "persona.yaml"
+    if text is None:
+        text = yaml.safe_dump(profile, allow_unicode=True, sort_keys=False)
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def validate_both(path):
+    _, full = validate_profile_file(path, True, True, SCHEMA)
+    _, streamed = validate_profile_file(path, True, True, SCHEMA, stream=True)
+    return full, streamed
+
+
+def summary(results, schema_findings=True):
+    return [
+        (
+            result.check_id,
+            result.passed,
+            [
+                (f.rule_id, f.path, f.message)
+                for f in result.findings
+                if schema_findings or result.check_id != "schema"
+            ],
+        )
+        for result in results
+    ]
+
+
+@pytest.mark.parametrize(
+    "path",
+    sorted(str(p.relative_to(PERSONA_LIB)) for p in PERSONA_LIB.rglob("*.yaml")),
+)
+def test_persona_library_matches_full_validation(path):
+    full, streamed = validate_both(str(PERSONA_LIB / path))
+    # スキーマ違反は項目ごとに報告されるため件数は異なりうるが、合否と参照チェックは一致する
+    assert summary(streamed, schema_findings=False) == summary(full, schema_findings=False)
+
+
+def test_invalid_item_is_reported_like_full_validation(tmp_path):
+    profile = load_persona()
+    profile["memory_system"]["memories"][1]["importance"] = "high"
+    full, streamed = validate_both(write(tmp_path, profile))
+
+    assert summary(streamed) == summary(full)
+    full_finding, = full[0].findings
+    stream_finding, = streamed[0].findings
+    assert stream_finding.path == "$.memory_system.memories[1].importance"
+    # 詳細にはルートスキーマからのパスが含まれる（ルートのバリデータで検証している）
+    assert stream_finding.detail == full_finding.detail
+    assert "schema['properties']['memory_system']" in stream_finding.detail
+
+
+@pytest.mark.parametrize(
+    "mutate",
+    [
+        lambda p: p["memory_system"]["memories"].append({"id": p["memory_system"]["memories"][0]["id"]}),
+        lambda p: p["association_system"]["associations"][0]["response"].update(id="missing_memory"),
+        lambda p: p["memory_system"]["memories"].append([1, 2]),
+        lambda p: p["association_system"]["associations"][0].update(trigger={"type": ["emotion"]}),
+        lambda p: p.update(memory_system=[1, 2]),
+        lambda p: p["emotion_system"].update(emotions=None),
+    ],
+    ids=[
+        "duplicate-memory",
+        "dangling-reference",
+        "item-not-mapping",
+        "unhashable-type",
+        "section-not-mapping",
+        "null-emotions",
+    ],
+)
+def test_reference_and_structure_findings_match(tmp_path, mutate):
+    profile = copy.deepcopy(load_persona())
+    mutate(profile)
+    full, streamed = validate_both(write(tmp_path, profile))
+    assert "internal" not in [r.check_id for r in full + streamed]
+    assert summary(streamed, schema_findings=False) == summary(full, schema_findings=False)
+
+
+def test_streaming_validator_is_built_once_per_schema_content():
+    schema, _ = load_schema()
+    assert get_streaming_validator(schema) is get_streaming_validator(load_schema()[0])
+    validator = get_streaming_validator(copy.deepcopy(schema))
+    assert get_streaming_validator(copy.deepcopy(schema)) is validator
+    assert get_streaming_validator(None) is get_streaming_validator(None)
+    other = copy.deepcopy(schema)
+    other["required"] = []
+    assert get_streaming_validator(other) is not validator
@@ -0,0 +1,171 @@
+"""Tests for template resolution, merging and template_ref checks."""
+
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+import yaml
+
+from template_registry import (
+    TemplateNotFoundError,
+    TemplateRegistry,
+    deep_merge,
+    default_registry,
+    find_templates_dir,
+)
+from validator_utils import check_dialogue_instructions
+
+REPO = Path(__file__).resolve().parents[2]
+
+
+@pytest.fixture
+def templates_dir(tmp_path):
+    root = tmp_path / "templates"
+    (root / "sub").mkdir(parents=True)
+    (root / "sub" / "indexed_file.yaml").write_text("emotion_system: {fear: 70}\n", encoding="utf-8")
+    (root / "sub" / "plain.yaml").write_text("source: stem\n", encoding="utf-8")
+    (root / "other.yml").write_text("source: other\n", encoding="utf-8")
+    index = {
+        "templates": [
+            {"name": "indexed_v1.0", "path": "sub/indexed_file.yaml"},
+            # 索引の名前はファイル名より優先する
+            {"name": "plain", "path": "other.yml"},
+        ]
+    }
+    (root / "index.json").write_text(json.dumps(index), encoding="utf-8")
+    return root
+
+
+def profile(ref, **sections):
+    return {"dialogue_instructions": {"template_ref": ref}, **sections}
+
+
+def test_names_come_from_index_json_and_file_stems(templates_dir):
+    registry = TemplateRegistry(templates_dir)
+    assert registry.names == ["indexed_file", "indexed_v1.0", "other", "plain"]
+    assert registry.resolve("indexed_v1.0") == {"emotion_system": {"fear": 70}}
+    assert registry.resolve("indexed_file") == registry.resolve("indexed_v1.0")
+    assert registry.resolve("plain") == {"source": "other"}
+    with pytest.raises(TemplateNotFoundError):
+        registry.resolve("missing")
+
+
+def test_templates_are_parsed_once(templates_dir):
+    registry = TemplateRegistry(templates_dir)
+    first = registry.resolve("other")
+    (templates_dir / "other.yml").write_text("source: changed\n", encoding="utf-8")
+    assert registry.resolve("other") is first
+
+
+def test_repository_index_resolves_every_example():
+    registry = TemplateRegistry(REPO / "persona_lib" / "medical" / "templates")
+    for path in sorted((REPO / "persona_lib" / "medical" / "examples").glob("*.yaml")):
+        with open(path, "r", encoding="utf-8") as f:
+            ref = yaml.safe_load(f)["dialogue_instructions"]["template_ref"]
+        assert ref in registry, path.name
+        assert registry.resolve(ref)
+
+
+MERGE_CASES = [
+    ({}, {}),
+    ({"a": 1}, {"b": 2}),
+    ({"a": {"b": 1, "c": [1, 2]}}, {"a": {"c": [3], "d": None}, "e": "x"}),
+    ({"a": [1, {"b": 1}]}, {"a": [{"c": 2}]}),
+    ({"a": {"b": {"c": 1, "d": 2}}}, {"a": {"b": {"d": 3}}}),
+    ({"a": {"b": 1}}, {"a": 5}),
+    ({"a": {"b": 1}}, {"a": []}),
+]
+# deepMerge.js はテンプレート側がスカラーのキーに辞書を重ねると空の辞書を返すが、
+# Python版はプロファイルの辞書をそのまま採用する
+PYTHON_ONLY_CASES = [
+    ({"a": 1}, {"a": {"b": 2}}),
+    ({"a": None}, {"a": {"b": 2}}),
+]
+
+
+@pytest.mark.parametrize("target, source", MERGE_CASES + PYTHON_ONLY_CASES)
+def test_deep_merge_semantics(target, source):
+    merged = deep_merge(target, source)
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            assert merged[key] == deep_merge(target[key], value)
+        else:
+            assert merged[key] is value
+    for key in target.keys() - source.keys():
+        assert merged[key] is target[key]
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_deep_merge_matches_deep_merge_js():
+    script = (
+        f"import deepMerge from {json.dumps((REPO / 'utils' / 'deepMerge.js').as_uri())};"
+        "const cases = JSON.parse(process.argv[1]);"
+        "console.log(JSON.stringify(cases.map(([t, s]) => deepMerge(t, s))));"
+    )
+    completed = subprocess.run(
+        ["node", "--input-type=module", "-e", script, json.dumps(MERGE_CASES)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert json.loads(completed.stdout) == [deep_merge(t, s) for t, s in MERGE_CASES]
+
+
+def test_materialize_merges_the_profile_over_its_template(templates_dir):
+    registry = TemplateRegistry(templates_dir)
+    data = profile("indexed_v1.0", emotion_system={"joy": 10})
+    merged = registry.materialize(data)
+    assert merged["emotion_system"] == {"fear": 70, "joy": 10}
+    assert merged["dialogue_instructions"] is data["dialogue_instructions"]
+    assert registry.materialize({"personal_info": {}}) == {"personal_info": {}}
+    with pytest.raises(TemplateNotFoundError):
+        registry.materialize(profile("missing"))
+
+
+def test_materialize_cache_is_keyed_and_evicts_least_recently_used(templates_dir):
+    registry = TemplateRegistry(templates_dir, cache_size=2)
+    a, b, c = (profile("other", n=i) for i in range(3))
+    merged_a = registry.materialize(a)
+    assert registry.materialize(profile("other", n=0)) is merged_a
+    merged_b = registry.materialize(b)
+    # aを使うとbが最も古くなり、cの追加で追い出される
+    registry.materialize(a)
+    registry.materialize(c)
+    assert registry.materialize(a) is merged_a
+    assert registry.materialize(b) is not merged_b
+    # 明示したキーは内容より優先する
+    assert registry.materialize(c, key="v1") is registry.materialize(a, key="v1")
+
+
+def test_templates_dir_comes_from_the_environment(templates_dir, tmp_path, monkeypatch):
+    monkeypatch.setenv("UPPS_TEMPLATES_DIR", str(templates_dir))
+    assert find_templates_dir() == templates_dir
+    registry = default_registry()
+    assert "indexed_v1.0" in registry
+    assert default_registry() is registry
+
+    monkeypatch.setenv("UPPS_TEMPLATES_DIR", str(tmp_path / "missing"))
+    assert find_templates_dir() is None
+    assert default_registry() is None
+
+    monkeypatch.delenv("UPPS_TEMPLATES_DIR")
+    assert find_templates_dir() == REPO / "persona_lib" / "medical" / "templates"
+
+
+def test_unknown_template_ref_is_a_finding(templates_dir, tmp_path, monkeypatch):
+    registry = TemplateRegistry(templates_dir)
+    assert check_dialogue_instructions(profile("indexed_v1.0"), registry).passed
+    result = check_dialogue_instructions(profile("missing_v1.0"), registry)
+    assert [(f.rule_id, f.path) for f in result.findings] == [
+        ("dialogue_instructions.undefined_template", "$.dialogue_instructions.template_ref")
+    ]
+    assert not check_dialogue_instructions(profile(3), registry).passed
+
+    # 既定ではUPPS_TEMPLATES_DIRのテンプレートを参照し、見つからなければ存在を確認しない
+    monkeypatch.setenv("UPPS_TEMPLATES_DIR", str(templates_dir))
+    assert check_dialogue_instructions(profile("plain")).passed
+    assert not check_dialogue_instructions(profile("missing_v1.0")).passed
+    monkeypatch.setenv("UPPS_TEMPLATES_DIR", str(tmp_path / "missing"))
+    assert check_dialogue_instructions(profile("missing_v1.0")).passed
@@ -0,0 +1,114 @@
+"""Tests for the validation server's request handling, reloads and CORS policy."""
+
+import asyncio
+import json
+import os
+import shutil
+import signal
+from pathlib import Path
+
+import pytest
+
+from validator_server import DEFAULT_ALLOWED_ORIGINS, ValidatorServer, validate_payload
+
+TEMPLATES = Path(__file__).resolve().parents[2] / "persona_lib" / "medical" / "templates"
+
+
+@pytest.fixture
+def templates_dir(tmp_path, monkeypatch):
+    target = tmp_path / "templates"
+    shutil.copytree(TEMPLATES, target)
+    monkeypatch.setenv("UPPS_TEMPLATES_DIR", str(target))
+    return target
+
+
+@pytest.fixture
+def server(templates_dir):
+    server = ValidatorServer(jobs=1, reload_interval=0.05)
+    yield server
+    server.close()
+
+
+def post(server, body, content_type="application/yaml"):
+    status, _, payload = asyncio.run(server.dispatch("POST", "/validate", {"content-type": content_type}, body))
+    return status, json.loads(payload)
+
+
+@pytest.mark.parametrize(
+    "body",
+    [b"memory_system: [1, 2]\n", b"association_system: {associations: [{trigger: [1]}]}\n"],
+)
+def test_malformed_profile_is_a_finding_not_a_server_error(server, body):
+    status, record = post(server, body)
+    assert status == 200
+    assert record["valid"] is False
+    assert record["checks"]["structure"] == "failed"
+
+
+def test_non_mapping_body_is_a_load_finding(server):
+    status, record = post(server, b"[1, 2]", "application/json")
+    assert status == 200
+    assert record["checks"] == {"load": "failed"}
+
+
+def test_unexpected_exception_is_reported_as_internal_error(monkeypatch):
+    import validator_server
+
+    def broken(*args):
+        raise KeyError("boom")
+
+    monkeypatch.setattr(validator_server, "check_profile", broken)
+    record = validate_payload(b"personal_info: {name: x}\n", "", "<request>", True, True)
+    assert record["valid"] is False
+    assert [f["rule_id"] for f in record["findings"]] == ["internal.error"]
+
+
+def test_template_edit_in_a_subdirectory_changes_the_stamp(server, templates_dir):
+    template = next(p for p in sorted(templates_dir.rglob("*.yaml")) if p.parent != templates_dir)
+    before = server._source_stamp()
+    stat = template.stat()
+    template.write_text(template.read_text(encoding="utf-8") + "\n# edited\n", encoding="utf-8")
+    os.utime(template, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert server._source_stamp() != before
+
+
+def test_broken_pool_is_replaced_and_the_request_retried(server):
+    async def scenario():
+        status, _, _ = await server.dispatch("POST", "/validate", {}, b"personal_info: {name: x}\n")
+        assert status == 200
+        broken = server.executor
+        for pid in list(broken._processes):
+            os.kill(pid, signal.SIGKILL)
+        await asyncio.sleep(0.2)
+        status, _, payload = await server.dispatch("POST", "/validate", {}, b"personal_info: {name: x}\n")
+        return broken, status, json.loads(payload)
+
+    broken, status, record = asyncio.run(scenario())
+    assert status == 200
+    assert record["profile"] == "<request>"
+    assert "internal" not in record["checks"]
+    assert server.executor is not broken
+    assert server.metrics.counters["worker_restarts"] == 1
+
+
+def test_cors_is_limited_to_allowed_origins(templates_dir):
+    server = ValidatorServer(jobs=1)
+    try:
+        assert server.cors_origin(DEFAULT_ALLOWED_ORIGINS[0]) == DEFAULT_ALLOWED_ORIGINS[0]
+        assert server.cors_origin("http://evil.example") is None
+        assert server.cors_origin(None) is None
+    finally:
+        server.close()
+
+    server = ValidatorServer(jobs=1, allowed_origins=("http://localhost:3000/",))
+    try:
+        assert server.cors_origin("http://localhost:3000") == "http://localhost:3000"
+        assert server.cors_origin(DEFAULT_ALLOWED_ORIGINS[0]) is None
+    finally:
+        server.close()
+
+    server = ValidatorServer(jobs=1, allowed_origins=("*",))
+    try:
+        assert server.cors_origin("http://anything.example") == "*"
+    finally:
+        server.close()
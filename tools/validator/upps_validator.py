@@ -4,29 +4,309 @@
 This script validates UPPS persona profiles. By default it performs
 schema validation and reference integrity checks. Specific modes can be
 selected with command line flags.
+
+Several profiles, directories or glob patterns may be given at once. In that
+case the schema is loaded a single time and the profiles are validated in a
+process pool (see ``--jobs``), followed by an aggregate summary.
+
+Results are rendered by a reporter (see ``--format``): the default human
+output, NDJSON streamed per finding and profile, or a single JSON document.
+
+With ``--incremental`` a manifest of content hashes and results is kept and
+only profiles whose contents changed since the last run are validated again.
+``--watch`` re-validates a single profile whenever it is saved, re-checking
+only the top-level sections that changed.
+
+``--stream`` validates each profile from the YAML event stream, so the
+items of ``memory_system.memories`` and ``association_system.associations``
+are never all held in memory at once (see ``stream_validator.py``).
+
+``--profile`` prints where the time went (loading, the schema check, each
+reference check) together with item counts and the peak RSS, and
+``--metrics-file`` exports the same data as JSON or as a Prometheus textfile
+(see ``instrumentation.py``).
 """
 
 import argparse
-from typing import Dict
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
 
+from instrumentation import current_metrics, enable_metrics
+from manifest import DEFAULT_MANIFEST_PATH, ValidationManifest
+from reporters import REPORTERS, create_reporter
+from section_cache import SectionValidator
+from stream_validator import check_profile_streaming
 from validator_utils import (
+    CheckResult,
+    check_references,
+    check_schema,
+    file_sha256,
     load_yaml,
     load_schema,
+    unexpected_error_result,
     validate_schema,
     validate_references,
 )
 
+PROFILE_SUFFIXES = (".yaml", ".yml")
+
+# ワーカープロセスごとに一度だけ設定されるスキーマ
+_worker_schema: Dict | None = None
+
+
 def run_schema_validation(profile: Dict, schema_path: str | None) -> bool:
     schema, resolved_path = load_schema(schema_path)
     print(f"スキーマ: {resolved_path}")
     return validate_schema(profile, schema)
 
+
 def run_reference_validation(profile: Dict) -> bool:
     return validate_references(profile)
 
+
+def expand_profile_paths(targets: List[str]) -> List[str]:
+    """Expand files, directories and glob patterns into profile paths.
+
+    Directories are searched recursively for ``*.yaml``/``*.yml`` files.
+    Duplicates are dropped while keeping the first occurrence.
+    """
+    paths: List[str] = []
+    seen = set()
+
+    def add(path: Path) -> None:
+        key = str(path.resolve())
+        if key not in seen:
+            seen.add(key)
+            paths.append(str(path))
+
+    for target in targets:
+        path = Path(target)
+        if path.is_dir():
+            for candidate in sorted(path.rglob("*")):
+                if candidate.is_file() and candidate.suffix in PROFILE_SUFFIXES:
+                    add(candidate)
+        elif glob.has_magic(target):
+            for match in sorted(glob.glob(target, recursive=True)):
+                match_path = Path(match)
+                if match_path.is_file():
+                    add(match_path)
+        else:
+            add(path)
+    return paths
+
+
+def _init_worker(schema: Dict | None, profiling: bool = False) -> None:
+    global _worker_schema
+    _worker_schema = schema
+    if profiling:
+        enable_metrics("validator")
+
+
+def check_profile(
+    profile: Dict, schema: Dict | None, run_schema: bool, run_reference: bool
+) -> List[CheckResult]:
+    results: List[CheckResult] = []
+    if run_schema:
+        with current_metrics().stage("schema"):
+            results.append(check_schema(profile, schema))
+    if run_reference:
+        results.extend(check_references(profile))
+    return results
+
+
+def validate_profile_file(
+    profile_path: str,
+    run_schema: bool,
+    run_reference: bool,
+    schema: Dict | None = None,
+    use_cache: bool = False,
+    stream: bool = False,
+) -> Tuple[str, List[CheckResult]]:
+    """Validate a single profile file and return its check results.
+
+    ``schema`` defaults to the schema handed to the worker process at
+    start-up. A profile that cannot be loaded yields a single failed ``load``
+    result. With ``stream`` the profile is validated from the YAML event
+    stream instead of being loaded as a whole. Any other exception raised
+    while checking the profile is reported as a failed ``internal`` result,
+    so one malformed profile never aborts a batch.
+    """
+    if schema is None:
+        schema = _worker_schema
+    metrics = current_metrics()
+    metrics.count("profiles")
+    try:
+        if stream:
+            return profile_path, check_profile_streaming(
+                profile_path, schema, run_schema, run_reference
+            )
+        with metrics.stage("load"):
+            profile = load_yaml(profile_path, use_cache=use_cache)
+        if not isinstance(profile, dict):
+            raise RuntimeError("YAMLファイルの読み込みに失敗しました: プロファイルがマッピングではありません")
+        return profile_path, check_profile(profile, schema, run_schema, run_reference)
+    except RuntimeError as e:
+        result = CheckResult("load", "YAML読み込み")
+        result.error("load.error", "$", str(e))
+        return profile_path, [result]
+    except Exception as e:
+        return profile_path, [unexpected_error_result(e)]
+
+
+def _validate_profiled(*args) -> Tuple[str, List[CheckResult], Dict]:
+    """Run :func:`validate_profile_file` in a worker and return its metrics too."""
+    metrics = current_metrics()
+    metrics.reset()
+    path, results = validate_profile_file(*args)
+    return path, results, metrics.snapshot()
+
+
+def iter_results(
+    profile_paths: List[str],
+    schema: Dict | None,
+    run_schema: bool,
+    run_reference: bool,
+    jobs: int,
+    ordered: bool,
+    use_cache: bool = False,
+    stream: bool = False,
+) -> Iterator[Tuple[str, List[CheckResult]]]:
+    """Yield validation results, in input order or as they complete."""
+    if jobs <= 1 or len(profile_paths) <= 1:
+        for path in profile_paths:
+            yield validate_profile_file(
+                path, run_schema, run_reference, schema, use_cache, stream
+            )
+        return
+
+    # 計測中はワーカーごとの計測結果を親プロセスに集約する
+    metrics = current_metrics()
+    profiling = metrics.enabled
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_worker, initargs=(schema, profiling)
+    ) as executor:
+        futures = [
+            executor.submit(
+                _validate_profiled if profiling else validate_profile_file,
+                path,
+                run_schema,
+                run_reference,
+                None,
+                use_cache,
+                stream,
+            )
+            for path in profile_paths
+        ]
+        for future in futures if ordered else as_completed(futures):
+            result = future.result()
+            if profiling:
+                metrics.merge(result[2])
+            yield result[0], result[1]
+
+
+def iter_incremental_results(
+    profile_paths: List[str],
+    manifest: ValidationManifest,
+    checks: List[str],
+    fresh_results,
+    ordered: bool,
+) -> Iterator[Tuple[str, List[CheckResult], bool]]:
+    """Merge manifest hits with freshly computed results.
+
+    ``fresh_results`` is called with the profiles that need validation and
+    must yield ``(path, results)`` pairs. New results are recorded in the
+    manifest as they arrive. Yields ``(path, results, cached)``.
+    """
+    hashes: Dict[str, str | None] = {}
+    cached: Dict[str, List[CheckResult]] = {}
+    pending: List[str] = []
+    for path in profile_paths:
+        try:
+            hashes[path] = file_sha256(path)
+        except OSError:
+            hashes[path] = None
+        results = manifest.lookup(path, hashes[path], checks) if hashes[path] else None
+        if results is None:
+            pending.append(path)
+        else:
+            cached[path] = results
+
+    def record(path: str, results: List[CheckResult]) -> None:
+        if hashes[path]:
+            manifest.record(path, hashes[path], checks, results)
+
+    fresh = fresh_results(pending)
+    if not ordered:
+        for path, results in cached.items():
+            yield path, results, True
+        for path, results in fresh:
+            record(path, results)
+            yield path, results, False
+        return
+    for path in profile_paths:
+        if path in cached:
+            yield path, cached[path], True
+        else:
+            fresh_path, results = next(fresh)
+            record(fresh_path, results)
+            yield fresh_path, results, False
+
+
+def watch_profile(
+    profile_path: str,
+    schema: Dict | None,
+    schema_path: str | None,
+    run_schema: bool,
+    run_reference: bool,
+    format_name: str,
+    interval: float,
+) -> None:
+    """Re-validate ``profile_path`` every time its modification time changes."""
+    section_validator = SectionValidator(schema or {})
+    last_mtime = None
+    while True:
+        try:
+            mtime = os.stat(profile_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime != last_mtime:
+            last_mtime = mtime
+            try:
+                profile = load_yaml(profile_path)
+                if not isinstance(profile, dict):
+                    raise RuntimeError(
+                        "YAMLファイルの読み込みに失敗しました: プロファイルがマッピングではありません"
+                    )
+                results = section_validator.validate(profile, run_schema, run_reference)
+            except RuntimeError as e:
+                result = CheckResult("load", "YAML読み込み")
+                result.error("load.error", "$", str(e))
+                results = [result]
+            except Exception as e:
+                results = [unexpected_error_result(e)]
+            reporter = create_reporter(format_name)
+            if format_name == "human":
+                print(f"\n--- {time.strftime('%H:%M:%S')} {profile_path} ---")
+            reporter.start(schema_path, 1)
+            reporter.profile(profile_path, results)
+            reporter.finish()
+            sys.stdout.flush()
+        time.sleep(interval)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="UPPS Validator")
-    parser.add_argument("profile", help="Path to UPPS profile YAML")
+    parser.add_argument(
+        "profiles",
+        nargs="+",
+        metavar="profile",
+        help="Path to UPPS profile YAML, a directory or a glob pattern",
+    )
     parser.add_argument("--schema", action="store_true", help="Run only schema validation")
     parser.add_argument(
         "--reference",
@@ -38,24 +318,164 @@ def main() -> None:
         "--schema-path",
         help="Path to UPPS schema file. Can also be set via UPPS_SCHEMA_PATH.",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes for batch validation (default: CPU count)",
+    )
+    parser.add_argument(
+        "--order",
+        choices=["input", "completion"],
+        default="input",
+        help="Report profiles in input order or as soon as they finish",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(REPORTERS),
+        default="human",
+        help="Output format: human (default), ndjson (streamed) or json",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Cache parsed profiles on disk keyed by content hash",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Validate memories and associations item by item from the YAML event stream "
+        "to bound memory use on very large profiles",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print a per-stage timing breakdown, item counts and peak RSS to stderr",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="Write timings and counters to this file (Prometheus textfile for *.prom, JSON otherwise)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-validate profiles that changed since the last run",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=DEFAULT_MANIFEST_PATH,
+        help=f"Manifest file used by --incremental (default: {DEFAULT_MANIFEST_PATH})",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Re-validate a single profile whenever it changes (section-level cache)",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=0.5,
+        help="Polling interval in seconds for --watch (default: 0.5)",
+    )
 
     args = parser.parse_args()
 
     if not (args.schema or args.reference or args.all):
         args.all = True
+    run_schema = args.schema or args.all
+    run_reference = args.reference or args.all
+
+    metrics = enable_metrics("validator") if args.profile or args.metrics_file else None
+
+    profile_paths = expand_profile_paths(args.profiles)
+    if not profile_paths:
+        print("❌ 検証対象のプロファイルが見つかりません", file=sys.stderr)
+        sys.exit(2)
+
+    schema = None
+    resolved_path = None
+    if run_schema:
+        schema, resolved_path = load_schema(args.schema_path)
 
-    profile = load_yaml(args.profile)
+    if args.watch:
+        if len(profile_paths) != 1:
+            print("❌ --watchは単一のプロファイルにのみ使用できます", file=sys.stderr)
+            sys.exit(2)
+        try:
+            watch_profile(
+                profile_paths[0],
+                schema,
+                resolved_path,
+                run_schema,
+                run_reference,
+                args.format,
+                args.watch_interval,
+            )
+        except KeyboardInterrupt:
+            pass
+        return
 
-    success = True
-    if args.schema or args.all:
-        success = run_schema_validation(profile, args.schema_path) and success
-    if args.reference or args.all:
-        success = run_reference_validation(profile) and success
+    ordered = args.order == "input"
 
-    if success:
-        print("✅ すべての検証に合格しました！")
+    def fresh_results(paths: List[str]) -> Iterator[Tuple[str, List[CheckResult]]]:
+        return iter_results(
+            paths,
+            schema,
+            run_schema,
+            run_reference,
+            args.jobs,
+            ordered=ordered,
+            use_cache=args.cache,
+            stream=args.stream,
+        )
+
+    reporter = create_reporter(args.format)
+    reporter.start(resolved_path, len(profile_paths))
+    if args.incremental:
+        if resolved_path is None:
+            try:
+                resolved_path = load_schema(args.schema_path)[1]
+            except FileNotFoundError:
+                pass
+        schema_hash = file_sha256(resolved_path) if resolved_path else None
+        manifest = ValidationManifest.load(args.manifest, schema_hash)
+        # 検証内容に加えて読み込み方式も記録し、方式を変えた場合は再検証する
+        checks = [
+            name
+            for name, enabled in (
+                ("schema", run_schema),
+                ("reference", run_reference),
+                ("stream", args.stream),
+                ("cache", args.cache),
+            )
+            if enabled
+        ]
+        try:
+            for path, profile_results, cached in iter_incremental_results(
+                profile_paths, manifest, checks, fresh_results, ordered
+            ):
+                reporter.profile(path, profile_results, cached)
+        finally:
+            manifest.save()
     else:
-        print("⚠️ 一部の検証で問題が見つかりました。上記の警告を確認してください。")
+        for path, profile_results in fresh_results(profile_paths):
+            reporter.profile(path, profile_results)
+    reporter.finish()
+
+    if metrics is not None:
+        metrics.finish()
+        if args.profile:
+            print(metrics.format_breakdown(), file=sys.stderr)
+        if args.metrics_file:
+            try:
+                metrics.write(args.metrics_file)
+            except OSError as e:
+                print(f"❌ 計測結果を書き込めません: {e}", file=sys.stderr)
+
+    if reporter.failed:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""Long-running UPPS validation server.
+
+Running ``upps_validator.py`` for every edit pays for the interpreter start,
+the imports and the schema load each time. This server keeps them warm: the
+schema is compiled and the template registry indexed once per worker
+process, and profiles are validated on request over HTTP on localhost or on
+a Unix socket.
+
+Endpoints:
+
+- ``POST /validate`` -- the body is a profile as YAML or JSON (chosen by
+  ``Content-Type``; YAML is a superset of JSON, so YAML parsing is the
+  default). ``?checks=schema|reference|all`` selects the checks and
+  ``?name=`` the profile name echoed back. The response is the profile
+  record of ``--format json`` (``valid``, ``errors``, ``warnings``,
+  ``checks`` and ``findings``) plus ``schema`` and ``elapsed_ms``. The
+  multi-line ``detail`` of schema findings embeds the failing sub-schema
+  and is only included with ``?detail=1``.
+- ``GET /health`` -- schema path, number of reloads and requests served.
+- ``GET /metrics`` -- request counts and timings as a Prometheus textfile
+  (see ``instrumentation.py``).
+
+Requests are handled concurrently by asyncio; parsing and validation run
+in a process pool. The schema file and every file under the templates
+directory are polled and the pool is replaced when any of them changes, so
+edits to ``upps_schema.yaml`` apply without a restart. Requests already
+running on the old pool finish with the old schema. A schema that fails to
+load or is not a valid JSON Schema is reported and the previous one stays in
+use. If a worker dies, the pool is recreated and the request is retried
+once.
+
+Cross-origin requests are only allowed from the origins given with
+``--allow-origin`` (by default the editor served on localhost:8000).
+
+使用方法:
+  python validator_server.py [--host 127.0.0.1] [--port 8765] [-j ジョブ数]
+  python validator_server.py --socket /tmp/upps-validator.sock
+  python validator_server.py --allow-origin http://localhost:3000
+
+  curl --data-binary @persona.yaml http://127.0.0.1:8765/validate
+  curl --unix-socket /tmp/upps-validator.sock --data-binary @persona.yaml http://localhost/validate
+
+必要なパッケージ:
+  - pyyaml
+  - jsonschema
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import yaml
+
+from instrumentation import Metrics
+from reporters import profile_document
+from template_registry import TemplateRegistry, default_registry, find_templates_dir
+from upps_validator import check_profile
+from validator_utils import (
+    YAML_LOADER,
+    CheckResult,
+    get_schema_validator,
+    load_schema,
+    unexpected_error_result,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# 受け付けるリクエスト本文の上限
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_HEADERS = 100
+# スキーマ・テンプレートの変更を確認する間隔（秒）
+DEFAULT_RELOAD_INTERVAL = 1.0
+# ブラウザからの呼び出しを許可するオリジン（README記載のエディタの起動方法）
+DEFAULT_ALLOWED_ORIGINS = ("http://localhost:8000", "http://127.0.0.1:8000")
+
+CHECK_SELECTIONS = {
+    "all": (True, True),
+    "schema": (True, False),
+    "reference": (False, True),
+}
+
+STATUS_TEXT = {
+    200: "OK",
+    204: "No Content",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+_worker_schema: Dict | None = None
+
+
+class HTTPError(Exception):
+    """Raised while handling a request to answer with ``status``."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _init_worker(schema: Dict) -> None:
+    global _worker_schema
+    _worker_schema = schema
+    # 最初のリクエストを待たずにスキーマのコンパイルとテンプレートの索引作成を済ませる
+    get_schema_validator(schema)
+    default_registry()
+
+
+def parse_payload(body: bytes, content_type: str) -> Dict:
+    """Parse a request body as JSON or YAML; raise ``ValueError`` if it is not a mapping."""
+    try:
+        if "json" in content_type:
+            profile = json.loads(body)
+        else:
+            profile = yaml.load(body, Loader=YAML_LOADER)
+    except (ValueError, yaml.YAMLError) as e:
+        raise ValueError(f"プロファイルの解析に失敗しました: {e}")
+    if not isinstance(profile, dict):
+        raise ValueError("プロファイルの形式が不正です（トップレベルがマッピングではありません）")
+    return profile
+
+
+def validate_payload(
+    body: bytes,
+    content_type: str,
+    name: str,
+    run_schema: bool,
+    run_reference: bool,
+    include_detail: bool = False,
+) -> Dict:
+    """Parse and validate one request body in a worker; return the response record."""
+    started = time.perf_counter()
+    try:
+        profile = parse_payload(body, content_type)
+    except ValueError as e:
+        result = CheckResult("load", "YAML読み込み")
+        result.error("load.error", "$", str(e))
+        results: List[CheckResult] = [result]
+    else:
+        try:
+            results = check_profile(profile, _worker_schema, run_schema, run_reference)
+        except Exception as e:
+            # 想定外の例外も検証結果として返し、500にはしない
+            results = [unexpected_error_result(e)]
+    record = profile_document(name, results)
+    if not include_detail:
+        for finding in record["findings"]:
+            finding.pop("detail", None)
+    record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return record
+
+
+def _stat_stamp(path: Path | None) -> Tuple[int, int] | None:
+    if path is None:
+        return None
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _tree_stamp(root: Path | None) -> Tuple:
+    """Stamps of ``root`` and of every file and directory below it."""
+    if root is None:
+        return ()
+    stamps = [("", _stat_stamp(root))]
+    try:
+        for path in sorted(root.rglob("*")):
+            stamps.append((str(path.relative_to(root)), _stat_stamp(path)))
+    except OSError:
+        pass
+    return tuple(stamps)
+
+
+class ValidatorServer:
+    """HTTP front end that dispatches validation to a warm process pool."""
+
+    def __init__(
+        self,
+        schema_path: str | None = None,
+        jobs: int = 1,
+        reload_interval: float = DEFAULT_RELOAD_INTERVAL,
+        allowed_origins: Tuple[str, ...] = DEFAULT_ALLOWED_ORIGINS,
+    ) -> None:
+        self.schema_arg = schema_path
+        self.jobs = max(jobs, 1)
+        self.reload_interval = reload_interval
+        self.allowed_origins = tuple(origin.rstrip("/") for origin in allowed_origins)
+        self.metrics = Metrics("validator_server")
+        self.reloads = 0
+        self.started = time.time()
+        self.schema, self.schema_path = load_schema(schema_path)
+        get_schema_validator(self.schema)
+        self._load_templates()
+        self._stamp = self._source_stamp()
+        self.executor = self._create_executor()
+
+    def _load_templates(self) -> None:
+        self.templates_dir = find_templates_dir()
+        self.templates = TemplateRegistry(self.templates_dir) if self.templates_dir else None
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.jobs, initializer=_init_worker, initargs=(self.schema,)
+        )
+
+    def _source_stamp(self) -> Tuple:
+        """Modification stamps of the inputs that are kept warm in the workers."""
+        # サブディレクトリ内のテンプレートの編集も検出できるよう、ディレクトリ全体を確認する
+        return (_stat_stamp(Path(self.schema_path)), _tree_stamp(self.templates_dir))
+
+    def reload(self) -> bool:
+        """Reload the schema and replace the worker pool; keep the old one on failure."""
+        try:
+            schema, schema_path = load_schema(self.schema_arg)
+            get_schema_validator(schema)
+        except Exception as e:
+            # jsonschemaのSchemaErrorは不正な部分スキーマ全体を含むため、要約だけを表示する
+            message = getattr(e, "message", None) or e
+            print(f"❌ スキーマの再読み込みに失敗しました（以前のスキーマを使用します）: {message}", file=sys.stderr)
+            return False
+        self.schema, self.schema_path = schema, schema_path
+        self._load_templates()
+        old_executor, self.executor = self.executor, self._create_executor()
+        # 実行中のリクエストは古いワーカーで完了させる
+        old_executor.shutdown(wait=False)
+        self.reloads += 1
+        print(f"🔄 スキーマとテンプレートを再読み込みしました: {self.schema_path}", file=sys.stderr)
+        return True
+
+    async def watch_sources(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            stamp = self._source_stamp()
+            if stamp != self._stamp:
+                # 失敗した場合も同じ内容で再試行し続けないよう、確認した状態を記録する
+                self._stamp = stamp
+                self.reload()
+
+    def _replace_broken_executor(self, broken: ProcessPoolExecutor) -> None:
+        # 再読み込みなどで既に置き換えられている場合はそのまま使う
+        if self.executor is broken:
+            self.executor = self._create_executor()
+            self.metrics.count("worker_restarts")
+            print("⚠️ ワーカーが異常終了したため、ワーカーを作り直しました", file=sys.stderr)
+        broken.shutdown(wait=False)
+
+    async def validate(self, body: bytes, content_type: str, query: Dict[str, List[str]]) -> Dict:
+        checks = query.get("checks", ["all"])[-1]
+        if checks not in CHECK_SELECTIONS:
+            raise HTTPError(400, f"checksには {', '.join(CHECK_SELECTIONS)} のいずれかを指定してください")
+        run_schema, run_reference = CHECK_SELECTIONS[checks]
+        name = query.get("name", ["<request>"])[-1]
+        include_detail = query.get("detail", ["0"])[-1] not in ("0", "false", "")
+        loop = asyncio.get_running_loop()
+        arguments = (body, content_type, name, run_schema, run_reference, include_detail)
+        with self.metrics.stage("validate"):
+            # ワーカーが異常終了した場合はプールを作り直して一度だけ再試行する
+            for attempt in range(2):
+                executor = self.executor
+                try:
+                    record = await loop.run_in_executor(executor, validate_payload, *arguments)
+                    break
+                except BrokenProcessPool:
+                    self._replace_broken_executor(executor)
+                    if attempt:
+                        raise HTTPError(500, "検証ワーカーが異常終了しました")
+        self.metrics.count("profiles")
+        if not record["valid"]:
+            self.metrics.count("invalid_profiles")
+        record["schema"] = self.schema_path
+        return record
+
+    def health(self) -> Dict:
+        return {
+            "status": "ok",
+            "schema": self.schema_path,
+            "templates": len(self.templates) if self.templates is not None else 0,
+            "workers": self.jobs,
+            "reloads": self.reloads,
+            "requests": self.metrics.counters.get("requests", 0),
+            "uptime_seconds": round(time.time() - self.started, 3),
+        }
+
+    async def dispatch(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Tuple[int, str, bytes]:
+        """Route one request; return ``(status, content_type, body)``."""
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        if method == "OPTIONS":
+            return 204, "text/plain", b""
+        if url.path == "/validate":
+            if method != "POST":
+                raise HTTPError(405, "/validateにはPOSTでプロファイルを送信してください")
+            record = await self.validate(body, headers.get("content-type", ""), query)
+            return 200, "application/json", _json_bytes(record)
+        if url.path == "/health":
+            if method != "GET":
+                raise HTTPError(405, "/healthにはGETでアクセスしてください")
+            return 200, "application/json", _json_bytes(self.health())
+        if url.path == "/metrics":
+            if method != "GET":
+                raise HTTPError(405, "/metricsにはGETでアクセスしてください")
+            self.metrics.finish()
+            return 200, "text/plain; version=0.0.4", self.metrics.to_prometheus().encode("utf-8")
+        raise HTTPError(404, f"{url.path} は存在しません")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HTTPError as e:
+                    _write_response(writer, e.status, "application/json", _json_bytes({"error": e.message}), False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                origin = self.cors_origin(headers.get("origin"))
+                self.metrics.count("requests")
+                try:
+                    status, content_type, payload = await self.dispatch(method, target, headers, body)
+                except HTTPError as e:
+                    status, content_type, payload = e.status, "application/json", _json_bytes({"error": e.message})
+                except Exception as e:
+                    # ワーカーの異常終了などでもサーバー自体は動作を続ける
+                    self.metrics.count("server_errors")
+                    status, content_type, payload = 500, "application/json", _json_bytes({"error": str(e)})
+                _write_response(writer, status, content_type, payload, keep_alive, origin)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def cors_origin(self, origin: str | None) -> str | None:
+        """Return the ``Access-Control-Allow-Origin`` value for a request's ``Origin``."""
+        if "*" in self.allowed_origins:
+            return "*"
+        if origin and origin.rstrip("/") in self.allowed_origins:
+            return origin
+        return None
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes] | None:
+    """Read one HTTP/1.1 request; return ``None`` when the client closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "リクエスト行が不正です")
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HTTPError(400, "ヘッダーが多すぎます")
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError(411, "Content-Lengthを指定してください（chunked転送には対応していません）")
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPError(400, "Content-Lengthが不正です")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"リクエスト本文が上限（{MAX_BODY_BYTES}バイト）を超えています")
+    body = await reader.readexactly(length) if length > 0 else b""
+    return method.upper(), target, headers, body
+
+
+def _json_bytes(data: Dict) -> bytes:
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def _write_response(
+    writer: asyncio.StreamWriter,
+    status: int,
+    content_type: str,
+    body: bytes,
+    keep_alive: bool,
+    allow_origin: str | None = None,
+) -> None:
+    if content_type == "application/json":
+        content_type += "; charset=utf-8"
+    head = [
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+    ]
+    if allow_origin is not None:
+        # 許可したオリジンのエディタからのみブラウザ経由の呼び出しを認める
+        head += [
+            f"Access-Control-Allow-Origin: {allow_origin}",
+            "Access-Control-Allow-Methods: GET, POST, OPTIONS",
+            "Access-Control-Allow-Headers: Content-Type",
+        ]
+    head += [
+        "Vary: Origin",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+
+async def serve(server: ValidatorServer, host: str, port: int, socket_path: str | None) -> None:
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        listener = await asyncio.start_unix_server(server.handle_connection, path=socket_path)
+        address = f"unix:{socket_path}"
+    else:
+        listener = await asyncio.start_server(server.handle_connection, host, port)
+        address = f"http://{host}:{port}"
+    print(f"🚀 UPPS検証サーバーを起動しました: {address}", file=sys.stderr)
+    print(f"スキーマ: {server.schema_path}（ワーカー数: {server.jobs}）", file=sys.stderr)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    watcher = asyncio.create_task(server.watch_sources())
+    async with listener:
+        await stop.wait()
+    watcher.cancel()
+    if socket_path:
+        try:
+            os.unlink(socket_path)
+        except OSError:
+            pass
+    print("UPPS検証サーバーを停止しました", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="UPPS validation server")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--socket", help="Listen on this Unix socket instead of TCP")
+    parser.add_argument(
+        "--schema-path",
+        help="Path to UPPS schema file. Can also be set via UPPS_SCHEMA_PATH.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--reload-interval",
+        type=float,
+        default=DEFAULT_RELOAD_INTERVAL,
+        help="Seconds between checks for schema and template changes",
+    )
+    parser.add_argument(
+        "--allow-origin",
+        action="append",
+        metavar="ORIGIN",
+        help=(
+            "Origin allowed to call the server from a browser; repeatable, '*' allows any "
+            f"(default: {', '.join(DEFAULT_ALLOWED_ORIGINS)})"
+        ),
+    )
+    args = parser.parse_args()
+
+    try:
+        server = ValidatorServer(
+            args.schema_path,
+            args.jobs,
+            args.reload_interval,
+            tuple(args.allow_origin or DEFAULT_ALLOWED_ORIGINS),
+        )
+    except Exception as e:
+        print(f"❌ スキーマを読み込めません: {e}", file=sys.stderr)
+        sys.exit(2)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.socket))
+    except OSError as e:
+        print(f"❌ サーバーを起動できません: {e}", file=sys.stderr)
+        sys.exit(2)
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,235 @@
 #!/usr/bin/env python3
-"""Utility functions for UPPS validators."""
+"""Utility functions for UPPS validators.
+
+Each check exists in two forms: ``check_*`` returns a :class:`CheckResult`
+holding structured :class:`Finding` objects, and ``validate_*`` renders that
+result in the human-readable format and returns a bool.
+"""
 
 from __future__ import annotations
 
+import hashlib
+import json
 import os
+import pickle
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import Dict, Set, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
 
 import yaml
 import jsonschema
-from jsonschema import validate
+
+from instrumentation import current_metrics
 
 EXPECTED_PROFILE_VERSION = "2025.3 v1.0.0"
 
+# libyamlが利用可能な場合はCローダーを使用する
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
-def validate_version(profile: Dict, expected: str) -> bool:
+SEVERITY_ERROR = "error"
+SEVERITY_WARNING = "warning"
+SEVERITY_INFO = "info"
+
+# スキーマのプロセス内キャッシュ: 解決済みパス -> (mtime_ns, size, schema, ファイルのSHA-256)
+_SCHEMA_CACHE: Dict[str, Tuple[int, int, Dict, str]] = {}
+# コンパイル済みバリデータ: スキーマのハッシュ -> validator
+_VALIDATOR_CACHE: Dict[str, Any] = {}
+
+
+@dataclass
+class Finding:
+    """A single problem reported by a check.
+
+    ``path`` is a JSONPath-style location such as
+    ``$.association_system.associations[3].trigger.id``. ``detail`` carries
+    optional multi-line context for human output.
+    """
+
+    rule_id: str
+    severity: str
+    path: str
+    message: str
+    detail: str | None = None
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        if data["detail"] is None:
+            del data["detail"]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Finding":
+        return cls(
+            data["rule_id"],
+            data["severity"],
+            data["path"],
+            data["message"],
+            data.get("detail"),
+        )
+
+
+@dataclass
+class CheckResult:
+    """Outcome of one check: its findings and whether it was skipped."""
+
+    check_id: str
+    title: str
+    findings: List[Finding] = field(default_factory=list)
+    skipped: bool = False
+
+    @property
+    def passed(self) -> bool:
+        return not any(f.severity == SEVERITY_ERROR for f in self.findings)
+
+    def error(self, rule_id: str, path: str, message: str, detail: str | None = None) -> None:
+        self.findings.append(Finding(rule_id, SEVERITY_ERROR, path, message, detail))
+
+    def warning(self, rule_id: str, path: str, message: str) -> None:
+        self.findings.append(Finding(rule_id, SEVERITY_WARNING, path, message))
+
+    def info(self, rule_id: str, path: str, message: str) -> None:
+        self.findings.append(Finding(rule_id, SEVERITY_INFO, path, message))
+
+    def skip(self, path: str, message: str) -> "CheckResult":
+        self.skipped = True
+        self.findings.append(Finding(f"{self.check_id}.skipped", SEVERITY_INFO, path, message))
+        return self
+
+    def to_dict(self) -> Dict:
+        return {
+            "check_id": self.check_id,
+            "title": self.title,
+            "skipped": self.skipped,
+            "findings": [finding.to_dict() for finding in self.findings],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CheckResult":
+        return cls(
+            data["check_id"],
+            data["title"],
+            [Finding.from_dict(f) for f in data.get("findings", [])],
+            data.get("skipped", False),
+        )
+
+
+def json_path(*parts: str | int) -> str:
+    """Build a JSONPath-style string from keys and list indexes."""
+    path = "$"
+    for part in parts:
+        path += f"[{part}]" if isinstance(part, int) else f".{part}"
+    return path
+
+
+_SEVERITY_MARKS = {SEVERITY_ERROR: "❌", SEVERITY_WARNING: "⚠️", SEVERITY_INFO: "ℹ️"}
+
+
+def format_result(result: CheckResult) -> str:
+    """Render a check result in the human-readable CLI format."""
+    lines = []
+    for finding in result.findings:
+        mark = _SEVERITY_MARKS[finding.severity]
+        # スキップの通知は従来どおり警告として表示する
+        if finding.rule_id == f"{result.check_id}.skipped":
+            mark = "⚠️"
+        lines.append(f"{mark} {finding.message}")
+        if finding.detail:
+            lines.append(finding.detail)
+    if result.passed and not result.skipped:
+        lines.append(f"✅ {result.title}: 成功")
+    return "\n".join(lines)
+
+
+def print_result(result: CheckResult) -> bool:
+    """Print ``result`` in the human-readable format and return whether it passed."""
+    print(format_result(result))
+    return result.passed
+
+
+def check_version(profile: Dict, expected: str) -> CheckResult:
+    result = CheckResult("version", "バージョン検証")
+    path = json_path("non_dialogue_metadata", "administrative", "version")
     version = (
         profile.get("non_dialogue_metadata", {})
         .get("administrative", {})
         .get("version")
     )
     if version is None:
-        print(
-            "❌ バージョン検証: non_dialogue_metadata.administrative.version が見つかりません"
+        result.error(
+            "version.missing",
+            path,
+            "バージョン検証: non_dialogue_metadata.administrative.version が見つかりません",
         )
-        return False
-    if version != expected:
-        print(
-            f"❌ バージョン検証: プロファイルのバージョン '{version}' は期待される '{expected}' と一致しません"
+    elif version != expected:
+        result.error(
+            "version.mismatch",
+            path,
+            f"バージョン検証: プロファイルのバージョン '{version}' は期待される '{expected}' と一致しません",
         )
-        return False
-    print("✅ バージョン検証: 成功")
-    return True
+    return result
+
+
+def validate_version(profile: Dict, expected: str) -> bool:
+    return print_result(check_version(profile, expected))
 
 
-def load_yaml(file_path: str) -> Dict:
-    """Load YAML file and return dictionary."""
+def load_yaml(file_path: str, use_cache: bool = False) -> Dict:
+    """Load YAML file and return dictionary.
+
+    The C ``CSafeLoader`` is used when PyYAML was built with libyaml. With
+    ``use_cache`` the parsed document is also stored in the on-disk cache
+    keyed by the SHA-256 of the file contents, so unchanged files are not
+    parsed again on later runs. Cache entries are pickles, so an entry is
+    only read back if it belongs to the current user and nobody else can
+    write to it.
+    """
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            return yaml.safe_load(f)
+        with open(file_path, "rb") as f:
+            data = f.read()
+        if not use_cache:
+            return yaml.load(data, Loader=YAML_LOADER)
+        cache_dir = get_cache_dir()
+        if cache_dir is None:
+            return yaml.load(data, Loader=YAML_LOADER)
+        cache_file = cache_dir / "profiles" / f"{hashlib.sha256(data).hexdigest()}.pickle"
+        try:
+            with open(cache_file, "rb") as f:
+                if _is_private(os.fstat(f.fileno())):
+                    return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+        profile = yaml.load(data, Loader=YAML_LOADER)
+        _write_pickle_atomic(cache_file, profile)
+        return profile
     except Exception as e:
         raise RuntimeError(f"YAMLファイルの読み込みに失敗しました: {e}")
 
 
+def _is_private(stat: os.stat_result) -> bool:
+    """Return whether a file is owned by the current user and not writable by others."""
+    getuid = getattr(os, "getuid", None)
+    if getuid is not None and stat.st_uid != getuid():
+        return False
+    return not stat.st_mode & 0o022
+
+
+def _write_pickle_atomic(path: Path, data: Any) -> None:
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # 他のユーザーが書き換えたキャッシュは読み込まないため、所有者だけが書き込める権限で作成する
+        tmp_path.unlink(missing_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except (OSError, pickle.PicklingError):
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
+
 def load_schema(schema_path: str | None = None) -> Tuple[Dict, str]:
     """Load UPPS schema.
 
@@ -72,28 +259,166 @@ def load_schema(schema_path: str | None = None) -> Tuple[Dict, str]:
 
     for path in possible_paths:
         if path.exists():
-            return load_yaml(str(path)), str(path)
+            return _load_schema_file(path), str(path)
     raise FileNotFoundError("UPPSスキーマファイル(upps_schema.yaml)が見つかりません")
 
 
+def get_cache_dir() -> Path | None:
+    """Return the on-disk cache directory, or ``None`` if caching is disabled.
+
+    The location defaults to ``~/.cache/upps`` and can be changed with the
+    ``UPPS_CACHE_DIR`` environment variable. Setting ``UPPS_NO_CACHE`` disables
+    all on-disk caches.
+    """
+    if os.getenv("UPPS_NO_CACHE"):
+        return None
+    cache_dir = Path(os.getenv("UPPS_CACHE_DIR") or Path.home() / ".cache" / "upps")
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+    return cache_dir
+
+
+def file_sha256(file_path: str | Path) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path: Path, data: Dict) -> None:
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError):
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
+
+def _load_schema_file(path: Path) -> Dict:
+    """Load a schema file, reusing in-process and on-disk parsed copies.
+
+    The pre-parsed schema is stored as JSON keyed by the resolved path. It is
+    reused while the file's mtime and size are unchanged; if they differ but
+    the content hash still matches, the entry is refreshed instead of
+    re-parsing the YAML.
+    """
+    resolved = str(path.resolve())
+    stat = path.stat()
+    cached = _SCHEMA_CACHE.get(resolved)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    cache_dir = get_cache_dir()
+    cache_file = None
+    entry: Dict = {}
+    schema = None
+    sha256 = None
+    if cache_dir is not None:
+        key = hashlib.sha256(resolved.encode("utf-8")).hexdigest()[:32]
+        cache_file = cache_dir / f"schema-{key}.json"
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = {}
+        if entry.get("path") == resolved:
+            if (
+                entry.get("mtime_ns") == stat.st_mtime_ns
+                and entry.get("size") == stat.st_size
+            ):
+                schema = entry.get("schema")
+                sha256 = entry.get("sha256")
+            elif entry.get("sha256") == file_sha256(path):
+                schema = entry.get("schema")
+                sha256 = entry["sha256"]
+                entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                _write_json_atomic(cache_file, entry)
+
+    if schema is None or not isinstance(sha256, str):
+        schema = load_yaml(str(path))
+        sha256 = file_sha256(path)
+        if cache_file is not None:
+            _write_json_atomic(
+                cache_file,
+                {
+                    "path": resolved,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "sha256": sha256,
+                    "schema": schema,
+                },
+            )
+
+    _SCHEMA_CACHE[resolved] = (stat.st_mtime_ns, stat.st_size, schema, sha256)
+    return schema
+
+
+def schema_hash(schema: Dict) -> str:
+    """Return the hash that identifies ``schema`` for validator caching.
+
+    A schema loaded by :func:`load_schema` is identified by the SHA-256 of its
+    file, recorded when it was loaded; any other schema by the SHA-256 of its
+    canonical JSON form.
+    """
+    for _, _, loaded, sha256 in _SCHEMA_CACHE.values():
+        if loaded is schema:
+            return f"file:{sha256}"
+    text = json.dumps(schema, sort_keys=True, ensure_ascii=False, default=str)
+    return "json:" + hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def get_schema_validator(schema: Dict):
+    """Return a compiled validator for ``schema``.
+
+    The metaschema check and validator construction happen once per schema
+    content (see :func:`schema_hash`); later calls with the same schema, or
+    an equal copy of it, reuse the compiled validator.
+    """
+    key = schema_hash(schema)
+    validator = _VALIDATOR_CACHE.get(key)
+    if validator is None:
+        validator_cls = jsonschema.validators.validator_for(schema)
+        validator_cls.check_schema(schema)
+        validator = _VALIDATOR_CACHE[key] = validator_cls(schema)
+    return validator
+
+
+def check_schema(profile: Dict, schema: Dict) -> CheckResult:
+    """Validate profile against JSON schema, reporting the most relevant error."""
+    result = CheckResult("schema", "スキーマ検証")
+    validator = get_schema_validator(schema)
+    error = jsonschema.exceptions.best_match(validator.iter_errors(profile))
+    if error is not None:
+        result.error(
+            f"schema.{error.validator}",
+            error.json_path,
+            f"スキーマ検証: 失敗: {error.message}",
+            detail=str(error),
+        )
+    return result
+
+
 def validate_schema(profile: Dict, schema: Dict) -> bool:
     """Validate profile against JSON schema."""
-    try:
-        validate(instance=profile, schema=schema)
-        print("✅ スキーマ検証: 成功")
-        return True
-    except jsonschema.exceptions.ValidationError as e:
-        print(f"❌ スキーマ検証: 失敗\n{e}")
-        return False
+    return print_result(check_schema(profile, schema))
 
 
 def collect_emotion_ids(profile: Dict) -> Set[str]:
     ids: Set[str] = set()
-    if "emotion_system" in profile:
-        es = profile["emotion_system"]
-        ids.update(es.get("emotions", {}).keys())
-        ids.update(es.get("additional_emotions", {}).keys())
-        ids.update(es.get("compound_emotions", {}).keys())
+    es = profile.get("emotion_system")
+    if isinstance(es, dict):
+        for key in ("emotions", "additional_emotions", "compound_emotions"):
+            emotions = es.get(key)
+            if isinstance(emotions, dict):
+                ids.update(emotions.keys())
     return ids
 
 
@@ -106,249 +431,754 @@ def collect_memory_ids(profile: Dict) -> Set[str]:
     return ids
 
 
-def validate_emotion_references(profile: Dict) -> bool:
-    valid = True
-    if "emotion_system" not in profile:
-        print("⚠️ emotion_systemフィールドが見つかりません。感情参照検証をスキップします")
-        return True
-    emotion_ids = collect_emotion_ids(profile)
-    if "current_emotion_state" in profile:
-        for emotion_id in profile["current_emotion_state"].keys():
-            if emotion_id not in emotion_ids:
-                print(
-                    f"❌ current_emotion_stateで参照されている感情 '{emotion_id}' はemotion_systemで定義されていません"
-                )
-                valid = False
-    if "memory_system" in profile:
-        for i, memory in enumerate(profile["memory_system"].get("memories", [])):
-            if "associated_emotions" in memory:
-                for emotion_id in memory["associated_emotions"]:
-                    if emotion_id not in emotion_ids:
-                        mem_id = memory.get("id", f"memory_{i}")
-                        print(
-                            f"❌ 記憶ID '{mem_id}' の関連感情 '{emotion_id}' はemotion_systemで定義されていません"
-                        )
-                        valid = False
-    if valid:
-        print("✅ 感情参照の検証: 成功")
-    return valid
+@dataclass(frozen=True)
+class Reference:
+    """A reference from one part of a profile to an emotion or memory id.
 
+    ``source`` is one of ``current_emotion_state``, ``memory``,
+    ``association_trigger``, ``association_condition`` or
+    ``association_response``. ``association`` and ``condition`` are 0-based
+    positions, ``owner`` is the id (or fallback label) of the referring memory
+    and ``path`` is the JSONPath of the referencing value.
+    """
 
-def validate_memory_references(profile: Dict) -> bool:
-    valid = True
-    if "memory_system" not in profile:
-        print("⚠️ memory_systemフィールドが見つかりません。記憶参照検証をスキップします")
-        return True
-    id_counts: Dict[str, int] = {}
-    for memory in profile["memory_system"].get("memories", []):
+    kind: str
+    target: str
+    source: str
+    association: int | None = None
+    condition: int | None = None
+    owner: str | None = None
+    path: str = "$"
+
+
+@dataclass
+class ProfileIndex:
+    """Ids and references of a profile collected in a single traversal.
+
+    ``references`` groups references by the top-level section they appear in,
+    in document order. ``referrers`` is the reverse map from
+    ``(kind, target)`` to every reference pointing at it.
+    """
+
+    emotion_ids: Set[str] = field(default_factory=set)
+    memory_id_counts: Dict[str, int] = field(default_factory=dict)
+    association_id_counts: Dict[str, int] = field(default_factory=dict)
+    references: Dict[str, List[Reference]] = field(default_factory=dict)
+    referrers: Dict[Tuple[str, str], List[Reference]] = field(default_factory=dict)
+    # 走査した項目数（計測用）
+    memories_scanned: int = 0
+    associations_scanned: int = 0
+    conditions_scanned: int = 0
+
+    @property
+    def memory_ids(self) -> Set[str]:
+        return set(self.memory_id_counts)
+
+    def has_target(self, kind: str, target: str) -> bool:
+        if kind == "emotion":
+            return target in self.emotion_ids
+        return target in self.memory_id_counts
+
+    def add_reference(self, section: str, ref: Reference) -> None:
+        self.references.setdefault(section, []).append(ref)
+        self.referrers.setdefault((ref.kind, ref.target), []).append(ref)
+
+    def add_current_emotion_state(self, state: Dict | None) -> None:
+        if not isinstance(state, dict):
+            return
+        for emotion_id in state:
+            self.add_reference(
+                "current_emotion_state",
+                Reference(
+                    "emotion",
+                    emotion_id,
+                    "current_emotion_state",
+                    path=json_path("current_emotion_state", emotion_id),
+                ),
+            )
+
+    def add_memory(self, i: int, memory: Dict) -> None:
+        """Index the ``i``-th entry of ``memory_system.memories``.
+
+        Entries that are not mappings are skipped; ``check_structure``
+        reports them.
+        """
+        self.memories_scanned += 1
+        if not isinstance(memory, dict):
+            return
         mem_id = memory.get("id")
         if mem_id:
-            id_counts[mem_id] = id_counts.get(mem_id, 0) + 1
-    for mem_id, count in id_counts.items():
-        if count > 1:
-            print(f"❌ 記憶ID '{mem_id}' が複数回（{count}回）定義されています")
-            valid = False
-    if valid:
-        print("✅ 記憶参照の検証: 成功")
-    return valid
+            self.memory_id_counts[mem_id] = self.memory_id_counts.get(mem_id, 0) + 1
+        owner = memory.get("id", f"memory_{i}")
+        associated = memory.get("associated_emotions")
+        for k, emotion_id in enumerate(associated if isinstance(associated, list) else []):
+            self.add_reference(
+                "memory_system",
+                Reference(
+                    "emotion",
+                    emotion_id,
+                    "memory",
+                    owner=owner,
+                    path=json_path("memory_system", "memories", i, "associated_emotions", k),
+                ),
+            )
 
+    def add_association(self, i: int, assoc: Dict) -> None:
+        """Index the ``i``-th entry of ``association_system.associations``.
 
-def validate_association_references(profile: Dict) -> bool:
-    valid = True
-    if "association_system" not in profile:
-        print("⚠️ association_systemフィールドが見つかりません。関連性参照検証をスキップします")
-        return True
-    emotion_ids = collect_emotion_ids(profile)
-    memory_ids = collect_memory_ids(profile)
-    for i, assoc in enumerate(profile["association_system"].get("associations", [])):
-        trigger = assoc.get("trigger", {})
+        Entries, triggers, conditions and responses that are not mappings
+        are skipped; ``check_structure`` reports them.
+        """
+        self.associations_scanned += 1
+        if not isinstance(assoc, dict):
+            return
+        assoc_id = assoc.get("id")
+        if assoc_id:
+            self.association_id_counts[assoc_id] = (
+                self.association_id_counts.get(assoc_id, 0) + 1
+            )
+        trigger = _mapping(assoc.get("trigger"))
         if "type" in trigger:
-            if trigger["type"] == "memory" and "id" in trigger:
-                if trigger["id"] not in memory_ids:
-                    print(
-                        f"❌ 関連性 #{i+1}: トリガーが存在しない記憶ID '{trigger['id']}' を参照しています"
-                    )
-                    valid = False
-            elif trigger["type"] == "emotion" and "id" in trigger:
-                if trigger["id"] not in emotion_ids:
-                    print(
-                        f"❌ 関連性 #{i+1}: トリガーが存在しない感情ID '{trigger['id']}' を参照しています"
-                    )
-                    valid = False
+            if trigger["type"] in ("memory", "emotion") and "id" in trigger:
+                self.add_reference(
+                    "association_system",
+                    Reference(
+                        trigger["type"],
+                        trigger["id"],
+                        "association_trigger",
+                        i,
+                        path=json_path("association_system", "associations", i, "trigger", "id"),
+                    ),
+                )
         elif "operator" in trigger:
-            for j, condition in enumerate(trigger.get("conditions", [])):
-                if condition.get("type") == "memory" and "id" in condition:
-                    if condition["id"] not in memory_ids:
-                        print(
-                            f"❌ 関連性 #{i+1}, 条件 #{j+1}: 条件が存在しない記憶ID '{condition['id']}' を参照しています"
-                        )
-                        valid = False
-                elif condition.get("type") == "emotion" and "id" in condition:
-                    if condition["id"] not in emotion_ids:
-                        print(
-                            f"❌ 関連性 #{i+1}, 条件 #{j+1}: 条件が存在しない感情ID '{condition['id']}' を参照しています"
+            conditions = trigger.get("conditions")
+            for j, condition in enumerate(conditions if isinstance(conditions, list) else []):
+                self.conditions_scanned += 1
+                if isinstance(condition, dict) and condition.get("type") in ("memory", "emotion") and "id" in condition:
+                    self.add_reference(
+                        "association_system",
+                        Reference(
+                            condition["type"],
+                            condition["id"],
+                            "association_condition",
+                            i,
+                            j,
+                            path=json_path(
+                                "association_system",
+                                "associations",
+                                i,
+                                "trigger",
+                                "conditions",
+                                j,
+                                "id",
+                            ),
+                        ),
+                    )
+        response = _mapping(assoc.get("response"))
+        if response.get("type") in ("memory", "emotion") and "id" in response:
+            self.add_reference(
+                "association_system",
+                Reference(
+                    response["type"],
+                    response["id"],
+                    "association_response",
+                    i,
+                    path=json_path("association_system", "associations", i, "response", "id"),
+                ),
+            )
+
+    @classmethod
+    def from_profile(cls, profile: Dict) -> "ProfileIndex":
+        index = cls()
+        index.emotion_ids = collect_emotion_ids(profile)
+        index.add_current_emotion_state(profile.get("current_emotion_state"))
+        for i, memory in enumerate(_list(_mapping(profile.get("memory_system")).get("memories"))):
+            index.add_memory(i, memory)
+        for i, assoc in enumerate(
+            _list(_mapping(profile.get("association_system")).get("associations"))
+        ):
+            index.add_association(i, assoc)
+        return index
+
+
+def _mapping(value) -> Dict:
+    return value if isinstance(value, dict) else {}
+
+
+def _list(value) -> List:
+    return value if isinstance(value, list) else []
+
+
+# マッピングでなければならない値（参照チェックが辞書として読み取る）
+STRUCTURE_MAPPINGS: Tuple[Tuple[str, ...], ...] = (
+    ("personal_info",),
+    ("personality",),
+    ("current_emotion_state",),
+    ("emotion_system",),
+    ("emotion_system", "emotions"),
+    ("emotion_system", "additional_emotions"),
+    ("emotion_system", "compound_emotions"),
+    ("memory_system",),
+    ("association_system",),
+    ("cognitive_system",),
+    ("cognitive_system", "abilities"),
+    ("cognitive_system", "general_ability"),
+    ("dialogue_instructions",),
+    ("non_dialogue_metadata",),
+    ("non_dialogue_metadata", "administrative"),
+    ("non_dialogue_metadata", "clinical_data"),
+    ("non_dialogue_metadata", "clinical_data", "primary_diagnosis"),
+    ("change_tracking",),
+)
+# nullを「未指定」として扱うチェックがあるためnullを許す値
+_NULLABLE_MAPPINGS = {
+    ("non_dialogue_metadata", "clinical_data"),
+    ("non_dialogue_metadata", "clinical_data", "primary_diagnosis"),
+}
+# 値がすべてマッピングでなければならないマッピング
+STRUCTURE_MAPPING_VALUES: Tuple[Tuple[str, ...], ...] = (("cognitive_system", "abilities"),)
+# 項目がマッピングのリスト: セクション -> リストのキー
+STRUCTURE_LISTS = {
+    "memory_system": "memories",
+    "association_system": "associations",
+}
+
+
+def _dotted(*parts: str | int) -> str:
+    return json_path(*parts)[2:]
+
+
+def _check_scalar(result: CheckResult, value, *parts: str | int) -> None:
+    # idは辞書のキーとして索引化されるため、リストやマッピングは扱えない
+    if isinstance(value, (dict, list)):
+        result.error(
+            "structure.not_scalar",
+            json_path(*parts),
+            f"構造検証: {_dotted(*parts)}は文字列である必要があります",
+        )
+
+
+def _check_container(result: CheckResult, value, kind: type, *parts: str | int) -> bool:
+    if isinstance(value, kind):
+        return True
+    if kind is dict:
+        rule_id, label = "structure.not_mapping", "マッピング"
+    else:
+        rule_id, label = "structure.not_list", "リスト"
+    result.error(rule_id, json_path(*parts), f"構造検証: {_dotted(*parts)}は{label}である必要があります")
+    return False
+
+
+def check_structure_item(result: CheckResult, section: str, i: int, item) -> None:
+    """Report the parts of the ``i``-th item of a ``STRUCTURE_LISTS`` list with the wrong type."""
+    prefix = (section, STRUCTURE_LISTS[section], i)
+    if not _check_container(result, item, dict, *prefix):
+        return
+    if "id" in item:
+        _check_scalar(result, item["id"], *prefix, "id")
+    if section == "memory_system":
+        emotions = item.get("associated_emotions")
+        if emotions is not None and _check_container(
+            result, emotions, list, *prefix, "associated_emotions"
+        ):
+            for k, emotion_id in enumerate(emotions):
+                _check_scalar(result, emotion_id, *prefix, "associated_emotions", k)
+        return
+    for key in ("trigger", "response"):
+        if key in item and _check_container(result, item[key], dict, *prefix, key):
+            for field_name in ("type", "id"):
+                if field_name in item[key]:
+                    _check_scalar(result, item[key][field_name], *prefix, key, field_name)
+    trigger = item.get("trigger")
+    if isinstance(trigger, dict) and "conditions" in trigger:
+        conditions = trigger["conditions"]
+        if not _check_container(result, conditions, list, *prefix, "trigger", "conditions"):
+            return
+        for j, condition in enumerate(conditions):
+            if _check_container(result, condition, dict, *prefix, "trigger", "conditions", j):
+                for field_name in ("type", "id"):
+                    if field_name in condition:
+                        _check_scalar(
+                            result, condition[field_name], *prefix, "trigger", "conditions", j, field_name
                         )
-                        valid = False
-        response = assoc.get("response", {})
-        if response.get("type") == "memory" and "id" in response:
-            if response["id"] not in memory_ids:
-                print(
-                    f"❌ 関連性 #{i+1}: レスポンスが存在しない記憶ID '{response['id']}' を参照しています"
-                )
-                valid = False
-        elif response.get("type") == "emotion" and "id" in response:
-            if response["id"] not in emotion_ids:
-                print(
-                    f"❌ 関連性 #{i+1}: レスポンスが存在しない感情ID '{response['id']}' を参照しています"
-                )
-                valid = False
-    if valid:
-        print("✅ 関連性参照の検証: 成功")
-    return valid
 
 
-def validate_cognitive_system(profile: Dict) -> bool:
-    valid = True
+def check_structure(profile: Dict, items: Dict[str, CheckResult] | None = None) -> CheckResult:
+    """Check that the values the reference checks read have the right container types.
+
+    The reference checks assume that sections such as ``memory_system`` are
+    mappings; when this check fails they are not run. ``items`` holds the
+    findings of :func:`check_structure_item` already collected per section
+    (by the streaming validator); the lists of other sections are checked
+    in ``profile``.
+    """
+    result = CheckResult("structure", "構造検証")
+    for keys in STRUCTURE_MAPPINGS:
+        parent = profile
+        for key in keys[:-1]:
+            parent = parent.get(key) if isinstance(parent, dict) else None
+        if not isinstance(parent, dict) or keys[-1] not in parent:
+            continue
+        value = parent[keys[-1]]
+        if value is None and keys in _NULLABLE_MAPPINGS:
+            continue
+        if _check_container(result, value, dict, *keys) and keys in STRUCTURE_MAPPING_VALUES:
+            for name, item in value.items():
+                _check_container(result, item, dict, *keys, name)
+    for section, list_key in STRUCTURE_LISTS.items():
+        value = profile.get(section)
+        if not isinstance(value, dict) or list_key not in value:
+            continue
+        if not _check_container(result, value[list_key], list, section, list_key):
+            continue
+        if items is not None and section in items:
+            result.findings.extend(items[section].findings)
+            continue
+        for i, item in enumerate(value[list_key]):
+            check_structure_item(result, section, i, item)
+    return result
+
+
+def unexpected_error_result(error: Exception) -> CheckResult:
+    """Return a failed result for an exception raised while validating a profile."""
+    result = CheckResult("internal", "内部エラー")
+    result.error(
+        "internal.error",
+        "$",
+        f"検証中に予期しないエラーが発生しました: {type(error).__name__}: {error}",
+    )
+    return result
+
+
+def check_emotion_references(profile: Dict, index: ProfileIndex | None = None) -> CheckResult:
+    result = CheckResult("emotion_references", "感情参照の検証")
+    if "emotion_system" not in profile:
+        return result.skip(
+            json_path("emotion_system"),
+            "emotion_systemフィールドが見つかりません。感情参照検証をスキップします",
+        )
+    if index is None:
+        index = ProfileIndex.from_profile(profile)
+    for ref in index.references.get("current_emotion_state", []):
+        if ref.target not in index.emotion_ids:
+            result.error(
+                "emotion_references.undefined",
+                ref.path,
+                f"current_emotion_stateで参照されている感情 '{ref.target}' はemotion_systemで定義されていません",
+            )
+    for ref in index.references.get("memory_system", []):
+        if ref.target not in index.emotion_ids:
+            result.error(
+                "emotion_references.undefined",
+                ref.path,
+                f"記憶ID '{ref.owner}' の関連感情 '{ref.target}' はemotion_systemで定義されていません",
+            )
+    return result
+
+
+def validate_emotion_references(profile: Dict, index: ProfileIndex | None = None) -> bool:
+    return print_result(check_emotion_references(profile, index))
+
+
+def check_memory_references(profile: Dict, index: ProfileIndex | None = None) -> CheckResult:
+    result = CheckResult("memory_references", "記憶参照の検証")
+    if "memory_system" not in profile:
+        return result.skip(
+            json_path("memory_system"),
+            "memory_systemフィールドが見つかりません。記憶参照検証をスキップします",
+        )
+    if index is None:
+        index = ProfileIndex.from_profile(profile)
+    for mem_id, count in index.memory_id_counts.items():
+        if count > 1:
+            result.error(
+                "memory_references.duplicate_id",
+                json_path("memory_system", "memories"),
+                f"記憶ID '{mem_id}' が複数回（{count}回）定義されています",
+            )
+    return result
+
+
+def validate_memory_references(profile: Dict, index: ProfileIndex | None = None) -> bool:
+    return print_result(check_memory_references(profile, index))
+
+
+_KIND_LABELS = {"memory": "記憶", "emotion": "感情"}
+
+
+def check_association_references(
+    profile: Dict, index: ProfileIndex | None = None
+) -> CheckResult:
+    result = CheckResult("association_references", "関連性参照の検証")
+    if "association_system" not in profile:
+        return result.skip(
+            json_path("association_system"),
+            "association_systemフィールドが見つかりません。関連性参照検証をスキップします",
+        )
+    if index is None:
+        index = ProfileIndex.from_profile(profile)
+    for assoc_id, count in index.association_id_counts.items():
+        if count > 1:
+            result.error(
+                "association_references.duplicate_id",
+                json_path("association_system", "associations"),
+                f"関連性ID '{assoc_id}' が複数回（{count}回）定義されています",
+            )
+    for ref in index.references.get("association_system", []):
+        if index.has_target(ref.kind, ref.target):
+            continue
+        label = _KIND_LABELS[ref.kind]
+        i = ref.association
+        if ref.source == "association_trigger":
+            message = f"関連性 #{i+1}: トリガーが存在しない{label}ID '{ref.target}' を参照しています"
+        elif ref.source == "association_condition":
+            message = (
+                f"関連性 #{i+1}, 条件 #{ref.condition+1}: 条件が存在しない{label}ID '{ref.target}' を参照しています"
+            )
+        else:
+            message = f"関連性 #{i+1}: レスポンスが存在しない{label}ID '{ref.target}' を参照しています"
+        result.error("association_references.undefined", ref.path, message)
+    return result
+
+
+def validate_association_references(
+    profile: Dict, index: ProfileIndex | None = None
+) -> bool:
+    return print_result(check_association_references(profile, index))
+
+
+def _check_level(
+    result: CheckResult, info: Dict, path: Tuple[str, ...], label: str
+) -> None:
+    level = info["level"]
+    if not isinstance(level, int):
+        result.error(
+            "cognitive_system.level_type",
+            json_path(*path, "level"),
+            f"{label}は整数である必要があります",
+        )
+    elif not 0 <= level <= 100:
+        result.error(
+            "cognitive_system.level_range",
+            json_path(*path, "level"),
+            f"{label}は0から100の範囲である必要があります",
+        )
+
+
+def check_cognitive_system(profile: Dict) -> CheckResult:
+    result = CheckResult("cognitive_system", "認知能力システムの検証")
     if "cognitive_system" not in profile:
-        print("⚠️ cognitive_systemフィールドが見つかりません。認知能力検証をスキップします")
-        return True
-    if "model" not in profile["cognitive_system"]:
-        print("❌ cognitive_systemにmodelフィールドがありません")
-        valid = False
-    if "abilities" not in profile["cognitive_system"]:
-        print("❌ cognitive_systemにabilitiesフィールドがありません")
-        return False
+        return result.skip(
+            json_path("cognitive_system"),
+            "cognitive_systemフィールドが見つかりません。認知能力検証をスキップします",
+        )
+    cognitive = profile["cognitive_system"]
+    if "model" not in cognitive:
+        result.error(
+            "cognitive_system.missing_model",
+            json_path("cognitive_system", "model"),
+            "cognitive_systemにmodelフィールドがありません",
+        )
+    if "abilities" not in cognitive:
+        result.error(
+            "cognitive_system.missing_abilities",
+            json_path("cognitive_system", "abilities"),
+            "cognitive_systemにabilitiesフィールドがありません",
+        )
+        return result
     required_abilities = [
         "verbal_comprehension",
         "perceptual_reasoning",
         "working_memory",
         "processing_speed",
     ]
-    abilities = profile["cognitive_system"]["abilities"]
+    abilities = cognitive["abilities"]
     for ability in required_abilities:
         if ability not in abilities:
-            print(f"❌ cognitive_systemのabilities内に'{ability}'能力がありません")
-            valid = False
+            result.error(
+                "cognitive_system.missing_ability",
+                json_path("cognitive_system", "abilities", ability),
+                f"cognitive_systemのabilities内に'{ability}'能力がありません",
+            )
 
     for ability_name, ability_info in abilities.items():
         if "level" not in ability_info:
-            print(f"❌ cognitive_systemの'{ability_name}'能力にlevelフィールドがありません")
-            valid = False
-            continue
-        level = ability_info["level"]
-        if not isinstance(level, int):
-            print(
-                f"❌ cognitive_systemの'{ability_name}'能力のlevelは整数である必要があります"
-            )
-            valid = False
-        elif not 0 <= level <= 100:
-            print(
-                f"❌ cognitive_systemの'{ability_name}'能力のlevelは0から100の範囲である必要があります"
+            result.error(
+                "cognitive_system.missing_level",
+                json_path("cognitive_system", "abilities", ability_name, "level"),
+                f"cognitive_systemの'{ability_name}'能力にlevelフィールドがありません",
             )
-            valid = False
-    if "general_ability" in profile["cognitive_system"]:
-        general = profile["cognitive_system"]["general_ability"]
+            continue
+        _check_level(
+            result,
+            ability_info,
+            ("cognitive_system", "abilities", ability_name),
+            f"cognitive_systemの'{ability_name}'能力のlevel",
+        )
+    if "general_ability" in cognitive:
+        general = cognitive["general_ability"]
         if "level" not in general:
-            print("❌ cognitive_systemのgeneral_abilityにlevelフィールドがありません")
-            valid = False
+            result.error(
+                "cognitive_system.missing_level",
+                json_path("cognitive_system", "general_ability", "level"),
+                "cognitive_systemのgeneral_abilityにlevelフィールドがありません",
+            )
         else:
-            level = general["level"]
-            if not isinstance(level, int):
-                print("❌ cognitive_systemのgeneral_ability.levelは整数である必要があります")
-                valid = False
-            elif not 0 <= level <= 100:
-                print(
-                    "❌ cognitive_systemのgeneral_ability.levelは0から100の範囲である必要があります"
-                )
-                valid = False
+            _check_level(
+                result,
+                general,
+                ("cognitive_system", "general_ability"),
+                "cognitive_systemのgeneral_ability.level",
+            )
     else:
-        print("⚠️ cognitive_systemにgeneral_abilityフィールドがありません")
-    if valid:
-        print("✅ 認知能力システムの検証: 成功")
-    return valid
+        result.warning(
+            "cognitive_system.missing_general_ability",
+            json_path("cognitive_system", "general_ability"),
+            "cognitive_systemにgeneral_abilityフィールドがありません",
+        )
+    return result
 
 
-def validate_dialogue_instructions(profile: Dict) -> bool:
-    valid = True
+def validate_cognitive_system(profile: Dict) -> bool:
+    return print_result(check_cognitive_system(profile))
+
+
+def check_dialogue_instructions(profile: Dict, templates=None) -> CheckResult:
+    """Check ``dialogue_instructions`` and that ``template_ref`` exists.
+
+    ``templates`` is any container of known template names, normally a
+    ``TemplateRegistry``; by default the repository's templates directory is
+    used. If no templates directory can be found, existence is not checked.
+    """
+    result = CheckResult("dialogue_instructions", "対話指示の検証")
     if "dialogue_instructions" not in profile:
-        print("⚠️ dialogue_instructionsフィールドが見つかりません。対話指示検証をスキップします")
-        return True
+        return result.skip(
+            json_path("dialogue_instructions"),
+            "dialogue_instructionsフィールドが見つかりません。対話指示検証をスキップします",
+        )
     instructions = profile["dialogue_instructions"]
     template_ref = instructions.get("template_ref")
     direct_description = instructions.get("direct_description")
     if not template_ref and not direct_description:
-        print(
-            "❌ dialogue_instructionsにはtemplate_refまたはdirect_descriptionのいずれかが必要です"
+        result.error(
+            "dialogue_instructions.missing_instruction",
+            json_path("dialogue_instructions"),
+            "dialogue_instructionsにはtemplate_refまたはdirect_descriptionのいずれかが必要です",
         )
-        valid = False
     if template_ref is not None and not isinstance(template_ref, str):
-        print("❌ dialogue_instructions.template_refは文字列である必要があります")
-        valid = False
+        result.error(
+            "dialogue_instructions.template_ref_type",
+            json_path("dialogue_instructions", "template_ref"),
+            "dialogue_instructions.template_refは文字列である必要があります",
+        )
+    elif template_ref:
+        if templates is None:
+            from template_registry import default_registry
+
+            templates = default_registry()
+        if templates is not None and template_ref not in templates:
+            result.error(
+                "dialogue_instructions.undefined_template",
+                json_path("dialogue_instructions", "template_ref"),
+                f"dialogue_instructions.template_refで参照されているテンプレート '{template_ref}' が見つかりません",
+            )
     if direct_description is not None and not isinstance(direct_description, str):
-        print("❌ dialogue_instructions.direct_descriptionは文字列である必要があります")
-        valid = False
-    if valid:
-        print("✅ 対話指示の検証: 成功")
-    return valid
+        result.error(
+            "dialogue_instructions.direct_description_type",
+            json_path("dialogue_instructions", "direct_description"),
+            "dialogue_instructions.direct_descriptionは文字列である必要があります",
+        )
+    return result
 
 
-def validate_non_dialogue_metadata(profile: Dict) -> bool:
-    valid = True
+def validate_dialogue_instructions(profile: Dict, templates=None) -> bool:
+    return print_result(check_dialogue_instructions(profile, templates))
+
+
+def check_non_dialogue_metadata(profile: Dict) -> CheckResult:
+    result = CheckResult("non_dialogue_metadata", "非対話メタデータの検証")
     if "non_dialogue_metadata" not in profile:
-        print(
-            "⚠️ non_dialogue_metadataフィールドが見つかりません。非対話メタデータ検証をスキップします"
+        return result.skip(
+            json_path("non_dialogue_metadata"),
+            "non_dialogue_metadataフィールドが見つかりません。非対話メタデータ検証をスキップします",
         )
-        return True
     metadata = profile["non_dialogue_metadata"]
 
     clinical = metadata.get("clinical_data")
     if clinical is None:
-        print("❌ non_dialogue_metadataにclinical_dataフィールドがありません")
-        return False
+        result.error(
+            "non_dialogue_metadata.missing_clinical_data",
+            json_path("non_dialogue_metadata", "clinical_data"),
+            "non_dialogue_metadataにclinical_dataフィールドがありません",
+        )
+        return result
     primary = clinical.get("primary_diagnosis")
     if primary is None:
-        print(
-            "❌ non_dialogue_metadata.clinical_dataにprimary_diagnosisフィールドがありません"
+        result.error(
+            "non_dialogue_metadata.missing_primary_diagnosis",
+            json_path("non_dialogue_metadata", "clinical_data", "primary_diagnosis"),
+            "non_dialogue_metadata.clinical_dataにprimary_diagnosisフィールドがありません",
         )
-        valid = False
     else:
         icd = primary.get("icd_11")
         dsm = primary.get("dsm_5_tr")
         if not icd and not dsm:
-            print(
-                "❌ primary_diagnosisにicd_11またはdsm_5_trの診断コードが必要です"
+            result.error(
+                "non_dialogue_metadata.missing_diagnosis_code",
+                json_path("non_dialogue_metadata", "clinical_data", "primary_diagnosis"),
+                "primary_diagnosisにicd_11またはdsm_5_trの診断コードが必要です",
             )
-            valid = False
 
     # validation情報はclinical_data内またはnon_dialogue_metadata直下に配置される場合がある
     validation = metadata.get("validation")
+    validation_path: Tuple[str, ...] = ("non_dialogue_metadata", "validation")
     if validation is None and isinstance(clinical, dict):
         validation = clinical.get("validation")
+        validation_path = ("non_dialogue_metadata", "clinical_data", "validation")
     if validation and "quality_score" in validation:
         qs = validation.get("quality_score")
         if not isinstance(qs, (int, float)) or qs < 0 or qs > 100:
-            print("❌ validation.quality_scoreは0-100の範囲である必要があります")
-            valid = False
+            result.error(
+                "non_dialogue_metadata.quality_score_range",
+                json_path(*validation_path, "quality_score"),
+                "validation.quality_scoreは0-100の範囲である必要があります",
+            )
+    return result
+
+
+def validate_non_dialogue_metadata(profile: Dict) -> bool:
+    return print_result(check_non_dialogue_metadata(profile))
+
+
+class CheckContext:
+    """Inputs shared by the reference checks of one profile.
+
+    ``index`` is built from ``profile`` on first use unless it is given.
+    ``templates`` is passed to the ``dialogue_instructions`` check and
+    ``graph`` (an ``AssociationGraph``, e.g. collected while streaming) to the
+    association graph analysis.
+    """
+
+    def __init__(
+        self,
+        profile: Dict,
+        index: ProfileIndex | None = None,
+        templates=None,
+        graph=None,
+    ) -> None:
+        self.profile = profile
+        self.templates = templates
+        self.graph = graph
+        self._index = index
+
+    @property
+    def index(self) -> ProfileIndex:
+        if self._index is None:
+            self._index = ProfileIndex.from_profile(self.profile)
+        return self._index
+
+
+@dataclass(frozen=True)
+class ReferenceCheck:
+    """A reference/semantic check and the top-level sections it reads."""
+
+    check_id: str
+    sections: Tuple[str, ...]
+    run: Callable[[CheckContext], CheckResult]
 
-    if valid:
-        print("✅ 非対話メタデータの検証: 成功")
-    return valid
+
+def _check_association_graph(context: CheckContext) -> CheckResult:
+    from association_graph import check_association_graph
+
+    return check_association_graph(context.profile, context.index, context.graph)
+
+
+# 参照チェックの実行順と各チェックが読み取るトップレベルセクション（全体・ストリーミング・セクション単位の検証で共通）
+REFERENCE_CHECKS: Tuple[ReferenceCheck, ...] = (
+    ReferenceCheck(
+        "version",
+        ("non_dialogue_metadata",),
+        lambda context: check_version(context.profile, EXPECTED_PROFILE_VERSION),
+    ),
+    ReferenceCheck(
+        "emotion_references",
+        ("emotion_system", "current_emotion_state", "memory_system"),
+        lambda context: check_emotion_references(context.profile, context.index),
+    ),
+    ReferenceCheck(
+        "memory_references",
+        ("memory_system",),
+        lambda context: check_memory_references(context.profile, context.index),
+    ),
+    ReferenceCheck(
+        "association_references",
+        ("association_system", "emotion_system", "memory_system"),
+        lambda context: check_association_references(context.profile, context.index),
+    ),
+    ReferenceCheck(
+        "cognitive_system",
+        ("cognitive_system",),
+        lambda context: check_cognitive_system(context.profile),
+    ),
+    ReferenceCheck(
+        "dialogue_instructions",
+        ("dialogue_instructions",),
+        lambda context: check_dialogue_instructions(context.profile, context.templates),
+    ),
+    ReferenceCheck(
+        "non_dialogue_metadata",
+        ("non_dialogue_metadata",),
+        lambda context: check_non_dialogue_metadata(context.profile),
+    ),
+    ReferenceCheck(
+        "association_graph",
+        ("association_system", "emotion_system", "memory_system"),
+        _check_association_graph,
+    ),
+)
+
+
+def run_reference_checks(
+    context: CheckContext, checks: Iterable[ReferenceCheck] = REFERENCE_CHECKS
+) -> List[CheckResult]:
+    """Run ``checks`` in order, timing each as a ``reference.<check_id>`` stage."""
+    metrics = current_metrics()
+    results = []
+    for check in checks:
+        with metrics.stage(f"reference.{check.check_id}"):
+            results.append(check.run(context))
+    return results
+
+
+def check_references(profile: Dict, templates=None) -> List[CheckResult]:
+    """Run every reference/semantic check against a shared ProfileIndex.
+
+    If :func:`check_structure` fails, its result is returned alone: the
+    other checks cannot read a profile whose sections have the wrong types.
+
+    When metrics are enabled (see ``instrumentation.py``) building the index
+    and every check are timed as separate stages, and the scanned memories,
+    associations and trigger conditions are counted.
+    """
+    metrics = current_metrics()
+    with metrics.stage("reference.structure"):
+        structure = check_structure(profile)
+    if not structure.passed:
+        return [structure]
+    with metrics.stage("reference.index"):
+        index = ProfileIndex.from_profile(profile)
+    metrics.count("memories", index.memories_scanned)
+    metrics.count("associations", index.associations_scanned)
+    metrics.count("conditions", index.conditions_scanned)
+    return run_reference_checks(CheckContext(profile, index, templates))
+
+
+def all_passed(results: Iterable[CheckResult]) -> bool:
+    return all(result.passed for result in results)
 
 
 def validate_references(profile: Dict) -> bool:
-    version_valid = validate_version(profile, EXPECTED_PROFILE_VERSION)
-    emotion_valid = validate_emotion_references(profile)
-    memory_valid = validate_memory_references(profile)
-    association_valid = validate_association_references(profile)
-    cognitive_valid = validate_cognitive_system(profile)
-    dialogue_valid = validate_dialogue_instructions(profile)
-    metadata_valid = validate_non_dialogue_metadata(profile)
-    return (
-        version_valid
-        and emotion_valid
-        and memory_valid
-        and association_valid
-        and cognitive_valid
-        and dialogue_valid
-        and metadata_valid
-    )
+    results = check_references(profile)
+    for result in results:
+        print_result(result)
+    return all_passed(results)